@@ -15,6 +15,11 @@
 import sys
 import os
 
+# Make the modular src package importable alongside the full implementation
+_repo_root = os.path.dirname(os.getcwd()) if os.path.basename(os.getcwd()) == "notebooks" else os.getcwd()
+if _repo_root not in sys.path:
+    sys.path.insert(0, _repo_root)
+
 # Set up Databricks credentials as environment variables
 try:
     token = dbutils.notebook.entry_point.getDbutils().notebook().getContext().apiToken().get()
@@ -170,6 +175,65 @@ if SHUFFLE_ANALYSIS_CONFIG.get('shuffle_analysis_enabled', True):
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## 📐 Shuffle Partition Sizing
+
+# COMMAND ----------
+
+# Solve per-shuffle partition counts and advisory sizes for the target size band
+from src.profiler.shuffle_sizing import solve_shuffle_partition_sizing, format_shuffle_sizing_report
+
+# Total task slots of the warehouse/cluster (0 = unknown, no wave alignment)
+TASK_SLOTS = 0
+
+shuffle_sizing = solve_shuffle_partition_sizing(extracted_metrics.get('node_metrics', []), task_slots=TASK_SLOTS)
+print(format_shuffle_sizing_report(shuffle_sizing, OUTPUT_LANGUAGE))
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## 🖥️ Cluster Sizing
+
+# COMMAND ----------
+
+# Predict latency and cost at each warehouse size from task time and parallelism
+from src.profiler.cluster_sizing import recommend_cluster_size, format_cluster_sizing_report
+
+if SHUFFLE_ANALYSIS_CONFIG.get('enable_cluster_sizing_advice', True):
+    cluster_sizing = recommend_cluster_size(extracted_metrics, task_slots=TASK_SLOTS or None)
+    print(format_cluster_sizing_report(cluster_sizing, OUTPUT_LANGUAGE))
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## 💾 Scan I/O Efficiency
+
+# COMMAND ----------
+
+# Per-table pruning, file sizes, remote/cache throughput and predicted scan time after OPTIMIZE/clustering
+from src.profiler.scan_io import analyze_scan_io, format_scan_io_report
+
+scan_io = analyze_scan_io(extracted_metrics.get('node_metrics', []), extracted_metrics.get('overall_metrics', {}))
+print(format_scan_io_report(scan_io, OUTPUT_LANGUAGE))
+
+# COMMAND ----------
+
+# MAGIC %md
+# MAGIC ## 🔗 Join Strategy Evaluation
+
+# COMMAND ----------
+
+# Build/probe size estimates against the session's broadcast threshold, with rewrites ranked by shuffle saved
+from src.profiler.join_strategy import evaluate_join_strategies, format_join_strategy_report
+
+join_evaluation = evaluate_join_strategies(
+    profiler_data,
+    threshold_bytes=int(get_spark_broadcast_threshold() * 1024 * 1024),
+)
+print(format_join_strategy_report(join_evaluation, OUTPUT_LANGUAGE))
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## 🚀 Query Optimization
 
@@ -196,6 +260,32 @@ else:
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## ⚡ Photon Fallback Analysis
+
+# COMMAND ----------
+
+# Break down non-Photon operator time and attribute it to the Photon explanation
+import glob
+from src.profiler.photon_fallback import analyze_photon_fallback, format_photon_fallback_report
+
+photon_explanation = ""
+explain_files = sorted(glob.glob(f"{OUTPUT_FILE_DIR}/output_explain_original_*.txt"), key=os.path.getmtime)
+if explain_files:
+    with open(explain_files[-1], 'r', encoding='utf-8') as f:
+        explain_text = f.read()
+    if "== Photon Explanation ==" in explain_text:
+        photon_explanation = explain_text[explain_text.find("== Photon Explanation =="):]
+
+photon_fallback = analyze_photon_fallback(
+    extracted_metrics.get('node_metrics', []),
+    photon_explanation,
+    extracted_metrics.get('overall_metrics', {}),
+)
+print(format_photon_fallback_report(photon_fallback, OUTPUT_LANGUAGE))
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## 📝 Generate Report
 
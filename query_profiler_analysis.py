@@ -97,6 +97,84 @@ if 'DEBUG_ENABLED' not in dir():
 if 'MAX_OPTIMIZATION_ATTEMPTS' not in dir():
     MAX_OPTIMIZATION_ATTEMPTS = 3
 
+# 🧪 Candidate rewrites per attempt (CANDIDATES_PER_ATTEMPT: default 1 = one rewrite per LLM call)
+# - 2 or more: The LLM returns that many alternative rewrites in one call, their EXPLAIN / EXPLAIN COST
+#   run concurrently (EXPLAIN_PARALLELISM threads) and the candidate with the lowest comprehensive cost ratio
+#   continues through the attempt (requires EXPLAIN_ENABLED = 'Y')
+if 'CANDIDATES_PER_ATTEMPT' not in dir():
+    CANDIDATES_PER_ATTEMPT = 1
+if 'EXPLAIN_PARALLELISM' not in dir():
+    EXPLAIN_PARALLELISM = 4
+
+# 📦 Structured LLM output (STRUCTURED_LLM_OUTPUT: 'Y' = optimization prompts ask for a JSON answer
+#    with sql / rationale / applied_hints / expected_effects, parsed strictly without the SQL extraction heuristics;
+#    responses that are not valid JSON still fall back to the heuristics, 'N' = markdown answers only)
+if 'STRUCTURED_LLM_OUTPUT' not in dir():
+    STRUCTURED_LLM_OUTPUT = 'Y'
+
+# ✍️ Report refinement by section (REPORT_SECTION_MAX_CHARS: sections are split at # / ## headings and
+#    refined concurrently, each with its own token budget; longer sections are split between paragraphs)
+if 'REPORT_SECTION_MAX_CHARS' not in dir():
+    REPORT_SECTION_MAX_CHARS = 12000
+
+# 🗜️ Compact prompt metrics (COMPACT_PROMPT_METRICS: 'Y' = profile metrics in prompts are encoded as fixed-column tables
+#    with abbreviated units; COMPACT_PROMPT_TOP_K rows per table, the rest aggregated into one "others" row)
+if 'COMPACT_PROMPT_METRICS' not in dir():
+    COMPACT_PROMPT_METRICS = 'Y'
+if 'COMPACT_PROMPT_TOP_K' not in dir():
+    COMPACT_PROMPT_TOP_K = 5
+
+# 🔌 EXPLAIN backend (EXPLAIN_BACKEND: 'spark' = notebook Spark session, 'databricks_sql' = SQL Statement API,
+#    'replay' = recorded outputs in EXPLAIN_FIXTURE_DIR for offline runs, regression tests and benchmarks)
+# - EXPLAIN_WAREHOUSE_ID: SQL warehouse used by 'databricks_sql'
+# - EXPLAIN_RECORD_DIR: When set, EXPLAIN outputs of 'spark' / 'databricks_sql' are also saved there for later replay
+if 'EXPLAIN_BACKEND' not in dir():
+    EXPLAIN_BACKEND = 'spark'
+if 'EXPLAIN_WAREHOUSE_ID' not in dir():
+    EXPLAIN_WAREHOUSE_ID = ''
+if 'EXPLAIN_FIXTURE_DIR' not in dir():
+    EXPLAIN_FIXTURE_DIR = ''
+if 'EXPLAIN_RECORD_DIR' not in dir():
+    EXPLAIN_RECORD_DIR = ''
+
+# ⏱️ Execute-and-measure verification (EXECUTION_VERIFICATION: 'Y' = run original and optimized queries, 'N' = EXPLAIN COST estimate only)
+# - Runs both queries VERIFICATION_REPEATS times with the disk/result caches disabled and reports median duration and bytes read
+# - VERIFICATION_ROW_LIMIT: Wrap both queries in LIMIT n to bound the cost of verification (0 = full queries)
+# - QUERY_EXECUTOR: 'spark' = notebook Spark session, 'replay' = recorded runs in QUERY_EXECUTOR_FIXTURE_DIR
+if 'EXECUTION_VERIFICATION' not in dir():
+    EXECUTION_VERIFICATION = 'N'
+if 'VERIFICATION_REPEATS' not in dir():
+    VERIFICATION_REPEATS = 3
+if 'VERIFICATION_ROW_LIMIT' not in dir():
+    VERIFICATION_ROW_LIMIT = 0
+if 'QUERY_EXECUTOR' not in dir():
+    QUERY_EXECUTOR = 'spark'
+if 'QUERY_EXECUTOR_FIXTURE_DIR' not in dir():
+    QUERY_EXECUTOR_FIXTURE_DIR = ''
+
+# 🧮 Result equivalence check (RESULT_EQUIVALENCE_CHECK: 'Y' = compare row counts and result checksums before adopting a rewrite, 'N' = off)
+# - Runs through QUERY_EXECUTOR; a mismatch keeps the original query
+# - EQUIVALENCE_SAMPLE_PERCENT: Compare on a repeatable TABLESAMPLE of every table (0 = full data)
+if 'RESULT_EQUIVALENCE_CHECK' not in dir():
+    RESULT_EQUIVALENCE_CHECK = 'N'
+if 'EQUIVALENCE_SAMPLE_PERCENT' not in dir():
+    EQUIVALENCE_SAMPLE_PERCENT = 0
+
+# 📐 Cost model calibration (COST_MODEL_CALIBRATION: 'Y' = record each analyzed profile and refit, 'N' = off)
+# - COST_HISTORY_PATH: JSON-lines history of (original query EXPLAIN COST features, observed duration)
+# - COST_MODEL_PATH: Fitted comprehensive cost ratio weights; used instead of the defaults once calibrated
+if 'COST_MODEL_CALIBRATION' not in dir():
+    COST_MODEL_CALIBRATION = 'N'
+if 'COST_HISTORY_PATH' not in dir():
+    COST_HISTORY_PATH = ''
+if 'COST_MODEL_PATH' not in dir():
+    COST_MODEL_PATH = ''
+
+# 🤖 LLM call telemetry (LLM_TELEMETRY: 'Y' = write per-stage latency/token/retry/cost breakdown of all LLM calls, 'N' = off)
+# - Written at the end of the run as output_llm_telemetry_*.json and output_llm_telemetry_*.md
+if 'LLM_TELEMETRY' not in dir():
+    LLM_TELEMETRY = 'Y'
+
 # Ensure output directory exists
 import os
 if not os.path.exists(OUTPUT_FILE_DIR):
@@ -121,9 +199,44 @@ else:
 # Note: LLM_CONFIG can be overridden by setting it BEFORE running this file via %run
 if 'LLM_CONFIG' not in dir():
     LLM_CONFIG = {
-        # Endpoint type: 'databricks', 'openai', 'azure_openai', 'anthropic'
+        # Endpoint type: 'databricks', 'openai', 'azure_openai', 'anthropic', 'mock' (offline, see "mock" below)
         "provider": "databricks",
 
+        # Shared by every LLM call (all calls go through one dispatcher)
+        "timeout_sec": 300,          # Per-request timeout
+        "max_retries": 3,            # Attempts per call
+        "max_concurrency": 4,        # Concurrent in-flight calls
+        "response_cache_size": 128,  # Identical prompts answered from cache (0 = off)
+        "prompt_price_per_1k_tokens": 0.0,      # USD, for the telemetry cost breakdown (0 = not reported)
+        "completion_price_per_1k_tokens": 0.0,
+        "record_path": "",           # Append live responses to this JSON-lines file (replay with the mock provider)
+
+        # Routing: fallback providers tried in order when the primary fails (each needs its section below),
+        # and hedged requests - also fire the next provider after this many seconds (0 = off; follows the p95 latency)
+        "fallback_providers": [],    # e.g. ["openai", "anthropic"]
+        "hedge_after_sec": 0,
+        
+        # Model tiering: translation, report polishing and EXPLAIN summaries run on light_model
+        # (endpoint / model / deployment of the provider above; '' = same model as SQL rewriting)
+        "light_model": "",           # e.g. "databricks-claude-haiku-4-5"
+        "light_max_tokens": 0,       # 0 = provider max_tokens
+        # Per-stage overrides, e.g. {"translation_en": {"model": "...", "max_tokens": 8000}}
+        # Stages: sql_optimization, sql_refinement, sql_error_correction, performance_improvement,
+        #         liquid_clustering_analysis, explain_summary, translation_en, translation_ja,
+        #         report_refinement, report_content_refinement
+        "stages": {},
+        
+        # Retry policy shared by all providers (jittered backoff, Retry-After, prompt shrinking, circuit breaker)
+        "retry": {
+            "backoff_base_sec": 1.0,           # Backoff ceiling doubles per retry from this base
+            "backoff_max_sec": 30.0,
+            "retry_after_max_sec": 120.0,      # Upper bound on honored Retry-After (429/503)
+            "prompt_shrink_ratio": 0.7,        # Prompt length kept after a token-limit error (EXPLAIN summary,
+                                               # report and translation stages only; SQL prompts are never cut)
+            "circuit_failure_threshold": 5,    # Consecutive endpoint failures before failing fast
+            "circuit_reset_sec": 120.0         # Fail-fast period before the endpoint is tried again
+        },
+
         # Databricks Model Serving configuration (high-speed execution priority)
         "databricks": {
             "endpoint_name": "databricks-claude-opus-4-5",  # Model Serving endpoint name
@@ -157,6 +270,16 @@ if 'LLM_CONFIG' not in dir():
             "model": "claude-3-5-sonnet-20241022",  # claude-3-5-sonnet-20241022, claude-3-opus-20240229
             "max_tokens": 16000,  # Maximum within Anthropic limits
             "temperature": 0.0    # For deterministic output
+        },
+
+        # Mock provider: deterministic local answers without a model endpoint (offline runs, benchmarks)
+        "mock": {
+            "recorded_path": "",      # Responses recorded via record_path, replayed by prompt
+            "responses_path": "",     # JSON: {"responses": [{"match": regex, "response": template}], "default": ...}
+            "default_response": "",
+            "latency_ms": 0,          # Simulated latency per call (+ seeded jitter)
+            "latency_jitter_ms": 0,
+            "seed": 0
         }
     }
 
@@ -178,12 +301,19 @@ elif LLM_CONFIG['provider'] == 'azure_openai':
     print(f"🔗 Azure OpenAI deployment: {LLM_CONFIG['azure_openai']['deployment_name']}")
 elif LLM_CONFIG['provider'] == 'anthropic':
     print(f"🔗 Anthropic model: {LLM_CONFIG['anthropic']['model']}")
+elif LLM_CONFIG['provider'] == 'mock':
+    mock_settings = LLM_CONFIG.get('mock', {})
+    print(f"🧪 Mock LLM (offline): recorded={mock_settings.get('recorded_path') or '-'}, "
+          f"templates={mock_settings.get('responses_path') or '-'}, latency={mock_settings.get('latency_ms', 0)} ms")
+if LLM_CONFIG.get('light_model'):
+    print(f"🪶 Light model (translation / report polishing / EXPLAIN summary): {LLM_CONFIG['light_model']}")
 
 print()
 print("💡 LLM provider switching examples:")
 print('   LLM_CONFIG["provider"] = "openai"      # Switch to OpenAI GPT-4')
 print('   LLM_CONFIG["provider"] = "anthropic"   # Switch to Anthropic Claude')
 print('   LLM_CONFIG["provider"] = "azure_openai" # Switch to Azure OpenAI')
+print('   LLM_CONFIG["provider"] = "mock"        # Offline run with recorded / templated responses')
 print()
 print("🧠 Databricks extended thinking mode configuration examples:")
 print('   LLM_CONFIG["databricks"]["thinking_enabled"] = False  # Disable extended thinking mode (default, fast execution)')
@@ -200,8 +330,15 @@ except ImportError:
     requests = None
 import os
 import re
+import sys
 # pyspark SparkSession import disabled (not used in this script)
 
+# Make the modular src package importable
+# Repository root: this notebook's directory, or its parent when run from notebooks/
+_src_root = os.getcwd() if os.path.isdir(os.path.join(os.getcwd(), "src")) else os.path.dirname(os.getcwd())
+if _src_root not in sys.path:
+    sys.path.insert(0, _src_root)
+
 # Safely retrieve Databricks Runtime information
 try:
     if spark is not None:
@@ -951,6 +1088,141 @@ print("🚀 Please proceed to the next cell")
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## 🧰 Precompiled Regex Registry
+# MAGIC
+# MAGIC Module-level compiled patterns for the text-processing hot paths:
+# MAGIC - LLM response cleanup (`clean_response_text`, `is_valid_content`)
+# MAGIC - SQL extraction (`extract_sql_from_llm_response`, `clean_extracted_sql`)
+# MAGIC - BROADCAST hint placement (`fix_broadcast_hint_placement`, `fix_join_broadcast_hint_placement`)
+# MAGIC - EXPLAIN / EXPLAIN COST plan parsing
+# MAGIC
+# MAGIC Patterns are compiled once here instead of per call / per line inside loops.
+
+# COMMAND ----------
+
+import re
+
+# --- LLM response cleanup ---
+# Applied in order: the wrapper patterns rely on the key/value patterns having run first
+_RESPONSE_JSON_ARTIFACT_RES = [
+    re.compile(pattern, re.IGNORECASE | re.DOTALL)
+    for pattern in (
+        r"'type':\s*'[^']*'",
+        r'"type":\s*"[^"]*"',
+        r"\[?\{'type':[^}]*\}[,\]]?",
+        r'\[?\{"type":[^}]*\}[,\]]?',
+        r"'reasoning':\s*\[[^\]]*\]",
+        r'"reasoning":\s*\[[^\]]*\]',
+        r"'signature':\s*'[A-Za-z0-9+/=]{50,}'",
+        r'"signature":\s*"[A-Za-z0-9+/=]{50,}"',
+    )
+]
+_RESPONSE_LEADING_BRACKET_RE = re.compile(r'^\s*[\[\{]')
+_RESPONSE_TRAILING_BRACKET_RE = re.compile(r'[\]\}]\s*$')
+_RESPONSE_LEADING_SEPARATOR_RE = re.compile(r'^\s*[,;]\s*')
+_RESPONSE_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n+')
+_RESPONSE_SPACES_RE = re.compile(r'[ \t]+')
+_INVALID_CONTENT_RES = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r'^[{\[\'"]*$',            # JSON構造のみ
+        r'^[,;:\s]*$',              # 区切り文字のみ
+        r'^\s*reasoning\s*$',       # reasoningのみ
+        r'^\s*metadata\s*$',        # metadataのみ
+        r'^[A-Za-z0-9+/=]{50,}$',   # Base64っぽい長い文字列
+    )
+]
+
+# --- SQL extraction from LLM responses ---
+_SQL_CODE_BLOCK_RE = re.compile(r'```sql\s*(.*?)\s*```', re.DOTALL | re.IGNORECASE)
+_CODE_BLOCK_RE = re.compile(r'```\s*(.*?)\s*```', re.DOTALL)
+_SQL_STATEMENT_START_RE = re.compile(r'^(SELECT|WITH|CREATE|INSERT|UPDATE|DELETE)', re.IGNORECASE)
+_SQL_LINE_START_RE = re.compile(r'^(WITH|SELECT|CREATE|INSERT|UPDATE|DELETE)\s', re.IGNORECASE)
+_SQL_OR_CLAUSE_LINE_START_RE = re.compile(
+    r'^(WITH|SELECT|FROM|WHERE|GROUP BY|ORDER BY|LIMIT|CREATE|INSERT|UPDATE|DELETE)\s', re.IGNORECASE
+)
+_SQL_BLOCK_OPEN_RE = re.compile(r'```sql', re.IGNORECASE)
+_SQL_BLOCK_CLOSE_RE = re.compile(r'```')
+_EXPLAIN_COST_PREFIX_RE = re.compile(r'^\s*EXPLAIN\s+COST\s+', re.IGNORECASE)
+_EXPLAIN_PREFIX_RE = re.compile(r'^\s*EXPLAIN\s+', re.IGNORECASE)
+
+# EXPLAIN結果内の再試行可能エラー（LLMで修正可能）: compile_pattern_matcherで単一の結合パターンにして1パス検出（scan_text_chunksで大文字小文字無視）
+_EXPLAIN_ERROR_PATTERNS = (
+    "Error occurred during query planning",
+    "Query planning failed",
+    "Plan optimization failed",
+    "Failed to plan query",
+    "Analysis exception",
+    "AMBIGUOUS_REFERENCE",
+    "reference is ambiguous",
+    "ambiguous reference",
+    "ParseException",
+    "SemanticException",
+    "AnalysisException",
+    "Syntax error",
+    "PARSE_SYNTAX_ERROR",
+    "INVALID_IDENTIFIER",
+    "TABLE_OR_VIEW_NOT_FOUND",
+    "COLUMN_NOT_FOUND",
+    "UNRESOLVED_COLUMN",
+    "UNRESOLVED_COLUMN.WITH_SUGGESTION",
+)
+_USE_STATEMENT_RE = re.compile(r'^\s*USE\s+(CATALOG|SCHEMA|DATABASE)\s+\w+\s*;?\s*', re.IGNORECASE | re.MULTILINE)
+_SQL_LINE_COMMENT_RE = re.compile(r'^\s*--.*$', re.MULTILINE)
+_FROM_FIRST_RE = re.compile(r'^FROM\s', re.IGNORECASE)
+
+# --- BROADCAST hint placement ---
+_SUBQUERY_BROADCAST_HINT_RE = re.compile(r'JOIN\s*\(\s*SELECT\s*/\*\+\s*BROADCAST\([^)]+\)\s*\*/', re.IGNORECASE)
+_CTE_BROADCAST_HINT_RE = re.compile(r'(WITH\s+\w+\s+AS\s*\(\s*SELECT\s*)/\*\+\s*BROADCAST\([^)]+\)\s*\*/', re.IGNORECASE)
+_FROM_BROADCAST_HINT_RE = re.compile(r'FROM\s+\w+\s*/\*\+\s*BROADCAST\([^)]+\)\s*\*/', re.IGNORECASE)
+_WHERE_BROADCAST_HINT_RE = re.compile(r'WHERE\s*/\*\+\s*BROADCAST\([^)]+\)\s*\*/', re.IGNORECASE)
+_SELECT_DISTINCT_RE = re.compile(r'^\s*SELECT\s*(/\*\+[^*]*\*/)?\s*DISTINCT\b', re.IGNORECASE)
+_MAIN_SELECT_HINT_RE = re.compile(r'^\s*SELECT\s*(/\*\+[^*]*\*/)?\s*(DISTINCT\s*)?', re.IGNORECASE)
+_LEADING_SELECT_RE = re.compile(r'^\s*SELECT\s*', re.IGNORECASE)
+_DISTINCT_BEFORE_HINT_RE = re.compile(r'^\s*SELECT\s*DISTINCT\s*(/\*\+[^*]*\*/)', re.IGNORECASE)
+_JOIN_BROADCAST_HINT_RE = re.compile(r'JOIN\s+/\*\+\s*BROADCAST\(([^)]+)\)\s*\*/\s*(\w+)', re.IGNORECASE | re.MULTILINE)
+_JOIN_BROADCAST_HINT_STRIP_RE = re.compile(r'JOIN\s+/\*\+\s*BROADCAST\([^)]+\)\s*\*/\s*', re.IGNORECASE | re.MULTILINE)
+_SELECT_LINE_RE = re.compile(r'^(\s*SELECT)\s+', re.IGNORECASE | re.MULTILINE)
+_SELECT_WITH_HINT_RE = re.compile(r'^(\s*SELECT)\s+(/\*\+[^*]*\*/)\s+', re.IGNORECASE | re.MULTILINE)
+_BROADCAST_HINT_ARGS_RE = re.compile(r'BROADCAST\(([^)]+)\)', re.IGNORECASE)
+
+# --- EXPLAIN / EXPLAIN COST plan parsing ---
+_PHOTON_REASON_FUNCTION_RE = re.compile(r"([A-Za-z_][A-Za-z0-9_]*)\s*\(")
+_PLAN_JOIN_WORD_RE = re.compile(r'\bJoin\b|\bBroadcastHashJoin\b|\bSortMergeJoin\b', re.IGNORECASE)
+_PLAN_SCAN_WORD_RE = re.compile(r'\bScan\b|\bFileScan\b|\bTableScan\b', re.IGNORECASE)
+_PLAN_EXCHANGE_WORD_RE = re.compile(r'\bExchange\b|\bShuffle\b', re.IGNORECASE)
+_PLAN_PHOTON_WORD_RE = re.compile(r'\bPhoton\w*\b', re.IGNORECASE)
+_PHOTON_JOIN_DETAIL_RE = re.compile(r'Photon\w*Join\s+\[([^\]]+)\],\s*\[([^\]]+)\],\s*(\w+),\s*(\w+)')
+_PHOTON_SCAN_DETAIL_RE = re.compile(r'PhotonScan\s+parquet\s+([a-zA-Z_][a-zA-Z0-9_.]*)\[([^\]]+)\]')
+_FILE_SCAN_DETAIL_RE = re.compile(r'FileScan\s+([^,\s\[]+)')
+_PLAN_STATISTICS_TEXT_RE = re.compile(r',?\s*Statistics\([^)]*\)')
+_PLAN_SIZE_TEXT_RE = re.compile(r'sizeInBytes=([0-9.]+)\s*([KMGT]i?B)?')
+_RELATION_TABLE_RE = re.compile(r'Relation\s+([a-zA-Z_][a-zA-Z0-9_]*(?:\.[a-zA-Z_][a-zA-Z0-9_]*)+)')
+_PLAN_COST_RE = re.compile(r'Cost\(([0-9.]+)\)')
+_PLAN_MEMORY_SIZE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([KMGT]i?B)')
+
+_COST_SIZE_FALLBACK_RE = re.compile(r'(?:size_bytes|sizeInBytes)["\s]*[:=]\s*([0-9.]+)', re.IGNORECASE)
+_COST_ROWS_FALLBACK_RE = re.compile(r'rowCount["\s]*[:=]\s*([0-9.Ee+\-]+)|\b(?:num)?rows["\s]*[:=]\s*([0-9]+)', re.IGNORECASE)
+_COST_MEMORY_RE = re.compile(r'memory(?:Size)?["\s]*[:=]\s*([0-9.]+)', re.IGNORECASE)
+_COST_IS_PHOTON_RE = re.compile(r'IS_PHOTON["\s]*[:=]\s*true', re.IGNORECASE)
+_COST_PARTITIONS_RE = re.compile(r'partitions?["\s]*[:=]\s*([0-9]+)', re.IGNORECASE)
+_COST_HASH_PARTITIONING_RE = re.compile(r'hashpartitioning\(([^)]+),\s*(\d+)\)', re.IGNORECASE)
+_COST_RANGE_PARTITIONING_RE = re.compile(r'rangepartitioning\([^,]+,\s*(\d+)\)', re.IGNORECASE)
+_COST_ROUNDROBIN_PARTITIONING_RE = re.compile(r'roundrobinpartitioning\(\s*(\d+)\)', re.IGNORECASE)
+_COST_SINGLE_PARTITIONING_RE = re.compile(r'singlepartition\(\)', re.IGNORECASE)
+_COST_SINGLE_PARTITION_KEYWORD_RE = re.compile(r'\bSinglePartition\b', re.IGNORECASE)
+# 演算子数カウント対象（Photon接頭辞を除いた小文字名）
+_COST_OTHER_OPERATORS = {
+    'aggregate', 'hashaggregate', 'groupingaggregate', 'groupingagg', 'sortaggregate', 'project', 'filter',
+    'sort', 'limit', 'globallimit', 'locallimit', 'topk', 'window', 'union', 'repartition', 'coalesce',
+    'broadcast', 'subquery', 'expand', 'generate', 'collectlimit', 'takeorderedandproject',
+}
+
+print("✅ Precompiled regex registry loaded")
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## 📂 SQL Profiler JSON File Loading Function
 # MAGIC
@@ -3929,18 +4201,19 @@ def analyze_liquid_clustering_opportunities(profiler_data: Dict[str, Any], metri
         efficiency = scan['rows'] / max(scan['duration_ms'], 1)
         scan_performance.append(f"  - {scan['name']}: {scan['rows']:,} rows, {scan['duration_ms']:,}ms, efficiency={efficiency:.1f} rows/ms")
 
-    # Generate language-appropriate clustering prompt
-    if OUTPUT_LANGUAGE == 'en':
-        prompt_intro = "You are a Databricks Liquid Clustering expert. Please analyze the following SQL profiler data and provide optimal Liquid Clustering recommendations. **🚨 IMPORTANT: Provide only single, complete SQL statements - never decompose into multiple separate SQL queries.**"
-        output_instruction = "Please provide concise and practical analysis results in English. **🚨 Use only single SQL statements per table - never provide multiple separate SQL queries.**"
+    # プロファイルデータ部分（COMPACT_PROMPT_METRICS = 'Y' の場合は表形式で圧縮）
+    if str(globals().get('COMPACT_PROMPT_METRICS', 'Y')).upper() == 'Y':
+        compact_overall = encode_overall_metrics(metrics)
+        compact_filter_rate = calculate_filter_rate_percentage(overall_metrics, metrics)
+        profile_data_section = f"""【Query Performance Overview】
+{compact_overall} filter_rate={compact_filter_rate:.4f}
+
+【プロファイルデータ（表形式、|区切り、others(n)=上位以外の集計）】
+{encode_clustering_data(dict(extracted_data, table_info=consolidated_table_info), globals().get('COMPACT_PROMPT_TOP_K', 5))}
+⚠️ 注意: aggregate_columns のカラムは参考情報のみで、クラスタリングキーの候補から除外してください。
+⚠️ class: small=10GB未満（推奨しない）、medium=10-50GB（条件付き推奨）、large=50GB以上（強く推奨）"""
     else:
-        prompt_intro = "You are a Databricks Liquid Clustering expert. Please analyze the following SQL profiler data and provide optimal Liquid Clustering recommendations. **🚨 重要: 必ず単体の完全なSQL文のみを提供し、複数の分割されたSQLクエリには絶対に分解しないでください。**"
-        output_instruction = "簡潔で実践的な分析結果を日本語で提供してください。**🚨 テーブルごとに単体のSQL文のみを使用し、複数の分割されたSQLクエリは絶対に提供しないでください。**"
-    
-    clustering_prompt = f"""
-{prompt_intro}
-
-【Query Performance Overview】
+        profile_data_section = f"""【Query Performance Overview】
 - Execution time: {total_time_sec:.1f} seconds
 - Data read: {read_gb:.2f}GB
 - Output rows: {rows_produced:,} rows
@@ -3967,7 +4240,20 @@ def analyze_liquid_clustering_opportunities(profiler_data: Dict[str, Any], metri
 {chr(10).join(table_summary)}
 
 【スキャンノードパフォーマンス】
-{chr(10).join(scan_performance)}
+{chr(10).join(scan_performance)}"""
+
+    # Generate language-appropriate clustering prompt
+    if OUTPUT_LANGUAGE == 'en':
+        prompt_intro = "You are a Databricks Liquid Clustering expert. Please analyze the following SQL profiler data and provide optimal Liquid Clustering recommendations. **🚨 IMPORTANT: Provide only single, complete SQL statements - never decompose into multiple separate SQL queries.**"
+        output_instruction = "Please provide concise and practical analysis results in English. **🚨 Use only single SQL statements per table - never provide multiple separate SQL queries.**"
+    else:
+        prompt_intro = "You are a Databricks Liquid Clustering expert. Please analyze the following SQL profiler data and provide optimal Liquid Clustering recommendations. **🚨 重要: 必ず単体の完全なSQL文のみを提供し、複数の分割されたSQLクエリには絶対に分解しないでください。**"
+        output_instruction = "簡潔で実践的な分析結果を日本語で提供してください。**🚨 テーブルごとに単体のSQL文のみを使用し、複数の分割されたSQLクエリは絶対に提供しないでください。**"
+    
+    clustering_prompt = f"""
+{prompt_intro}
+
+{profile_data_section}
 
 【現在のボトルネック指標】
 - スピル発生: {'あり' if bottleneck_indicators.get('has_spill', False) else 'なし'}
@@ -4084,16 +4370,7 @@ OPTIMIZE [テーブル名] FULL;
         provider = LLM_CONFIG["provider"]
         print(f"🤖 Analyzing Liquid Clustering using {provider}...")
         
-        if provider == "databricks":
-            llm_analysis = _call_databricks_llm(clustering_prompt)
-        elif provider == "openai":
-            llm_analysis = _call_openai_llm(clustering_prompt)
-        elif provider == "azure_openai":
-            llm_analysis = _call_azure_openai_llm(clustering_prompt)
-        elif provider == "anthropic":
-            llm_analysis = _call_anthropic_llm(clustering_prompt)
-        else:
-            llm_analysis = f"❌ Unsupported LLM provider: {provider}"
+        llm_analysis = _call_llm(clustering_prompt, stage="liquid_clustering_analysis")
         
         # Post-process and validate LLM analysis to remove inappropriate reordering recommendations
         if llm_analysis and not llm_analysis.startswith("❌"):
@@ -4577,9 +4854,8 @@ def translate_explain_summary_to_english(explain_content: str) -> str:
     Returns:
         str: 英語版EXPLAIN要約
     """
-    # OUTPUT_LANGUAGEが'en'の場合は翻訳をスキップ
-    output_language = globals().get('OUTPUT_LANGUAGE', 'ja')
-    if output_language == 'en':
+    # 要約ファイルはOUTPUT_LANGUAGEで生成されるため、日本語を含まない場合は翻訳不要
+    if not contains_japanese(explain_content):
         return explain_content
     # 日本語から英語への翻訳マッピング
     translation_map = {
@@ -4992,106 +5268,107 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
     report_lines = []
     
     # タイトルとサマリー
-    report_lines.append("# 📊 Databricks SQLパフォーマンス包括分析レポート")
-    report_lines.append(f"**生成日時**: {timestamp}")
+    report_lines.append(t("# 📊 Databricks SQLパフォーマンス包括分析レポート", "# 📊 Databricks SQL Comprehensive Performance Analysis Report"))
+    report_lines.append(f"**{t('生成日時', 'Generated')}**: {timestamp}")
     report_lines.append("")
     
     # パフォーマンス概要
-    report_lines.append("## 1. パフォーマンス概要")
+    good = t("✅ 良好", "✅ Good")
+    needs_improvement = t("⚠️ 要改善", "⚠️ Needs Improvement")
+    report_lines.append(t("## 1. パフォーマンス概要", "## 1. Performance Overview"))
     report_lines.append("")
-    report_lines.append("### 主要パフォーマンス指標")
+    report_lines.append(t("### 主要パフォーマンス指標", "### Key Performance Indicators"))
     report_lines.append("")
-    report_lines.append("| 指標 | 値 | 評価 |")
+    report_lines.append(t("| 指標 | 値 | 評価 |", "| Metric | Value | Evaluation |"))
     report_lines.append("|------|-----|------|")
-    report_lines.append(f"| Execution Time | {total_time_sec:.1f}s | {'✅ Good' if total_time_sec < 60 else '⚠️ Needs Improvement'} |")
-    report_lines.append(f"| Data Read | {read_gb:.2f}GB | {'✅ Good' if read_gb < 10 else '⚠️ Large Volume'} |")
-    report_lines.append(f"| Photon Utilization | {photon_utilization:.1f}% | {'✅ Good' if photon_utilization >= 80 else '⚠️ Needs Improvement'} |")
-    report_lines.append(f"| Cache Efficiency | {cache_hit_ratio:.1f}% | {'✅ Good' if cache_hit_ratio > 80 else '⚠️ Needs Improvement'} |")
-    report_lines.append(f"| Filter Rate | {data_selectivity:.1f}% | {'✅ Good' if data_selectivity > 50 else '⚠️ Check Filter Conditions'} |")
+    report_lines.append(f"| {t('実行時間', 'Execution Time')} | {total_time_sec:.1f}s | {good if total_time_sec < 60 else needs_improvement} |")
+    report_lines.append(f"| {t('データ読み込み量', 'Data Read')} | {read_gb:.2f}GB | {good if read_gb < 10 else t('⚠️ 大容量', '⚠️ Large Volume')} |")
+    report_lines.append(f"| {t('Photon利用率', 'Photon Utilization')} | {photon_utilization:.1f}% | {good if photon_utilization >= 80 else needs_improvement} |")
+    report_lines.append(f"| {t('キャッシュ効率', 'Cache Efficiency')} | {cache_hit_ratio:.1f}% | {good if cache_hit_ratio > 80 else needs_improvement} |")
+    report_lines.append(f"| {t('フィルタ率', 'Filter Rate')} | {data_selectivity:.1f}% | {good if data_selectivity > 50 else t('⚠️ フィルタ条件を確認', '⚠️ Check Filter Conditions')} |")
     # 影響度ベースのシャッフル評価
     shuffle_impact_ratio = bottleneck_indicators.get('shuffle_impact_ratio', 0)
     shuffle_priority = bottleneck_indicators.get('shuffle_optimization_priority', 'low')
     
+    shuffle_display = f"{shuffle_impact_ratio:.1%} {t('影響', 'impact')}"
     if shuffle_priority == 'high':
-        shuffle_display = f"{shuffle_impact_ratio:.1%} impact"
-        shuffle_status = "❌ Serious Optimization Needed"
+        shuffle_status = t("❌ 本格的な最適化が必要", "❌ Serious Optimization Needed")
     elif shuffle_priority == 'medium':
-        shuffle_display = f"{shuffle_impact_ratio:.1%} impact"
-        shuffle_status = "⚠️ Light Tuning Recommended"
+        shuffle_status = t("⚠️ 軽いチューニングを推奨", "⚠️ Light Tuning Recommended")
     else:
-        shuffle_display = f"{shuffle_impact_ratio:.1%} impact"
-        shuffle_status = "✅ Focus on Other Bottlenecks"
+        shuffle_status = t("✅ 他のボトルネックを優先", "✅ Focus on Other Bottlenecks")
     
-    report_lines.append(f"| Shuffle Impact | {shuffle_display} | {shuffle_status} |")
-    report_lines.append(f"| Spill Occurred | {'Yes' if has_spill else 'No'} | {'❌ Problem' if has_spill else '✅ Good'} |")
+    report_lines.append(f"| {t('シャッフル影響度', 'Shuffle Impact')} | {shuffle_display} | {shuffle_status} |")
+    report_lines.append(f"| {t('スピル発生', 'Spill Occurred')} | {t('あり', 'Yes') if has_spill else t('なし', 'No')} | {t('❌ 問題あり', '❌ Problem') if has_spill else good} |")
     
     # スキュー検出の判定
     if has_skew:
-        skew_status = "Detected & handled by AQE"
-        skew_evaluation = "🔧 AQE handled"
+        skew_status = t("検出・AQEで対応済", "Detected & handled by AQE")
+        skew_evaluation = t("🔧 AQE対応済", "🔧 AQE handled")
     elif has_aqe_shuffle_skew_warning:
-        skew_status = "Potential skew possibility"
-        skew_evaluation = "⚠️ Improvement needed"
+        skew_status = t("潜在的なスキューの可能性あり", "Potential skew possibility")
+        skew_evaluation = needs_improvement
     else:
-        skew_status = "Not detected"
-        skew_evaluation = "✅ Good"
+        skew_status = t("未検出", "Not detected")
+        skew_evaluation = good
     
-    report_lines.append(f"| Skew Detection | {skew_status} | {skew_evaluation} |")
+    report_lines.append(f"| {t('スキュー検出', 'Skew Detection')} | {skew_status} | {skew_evaluation} |")
     report_lines.append("")
     
     # 主要ボトルネック分析
-    report_lines.append("## 2. 主要ボトルネック分析")
+    report_lines.append(t("## 2. 主要ボトルネック分析", "## 2. Key Bottleneck Analysis"))
     report_lines.append("")
     
     # Photon分析
-    photon_status = ("未使用" if photon_utilization < 1 else "低利用" if photon_utilization < 50 else "適切" if photon_utilization < 80 else "高利用")
-    photon_recommendation = ""
     if photon_utilization < 1:
-        photon_recommendation = " → **Photonの適用拡大を推奨**"
+        photon_status = t("未使用", "Not used")
+        photon_recommendation = t(" → **Photonの適用拡大を推奨**", " → **Expanding Photon coverage recommended**")
     elif photon_utilization < 50:
-        photon_recommendation = " → **Photon利用率の向上を推奨**"
+        photon_status = t("低利用", "Low utilization")
+        photon_recommendation = t(" → **Photon利用率の向上を推奨**", " → **Improving Photon utilization recommended**")
     elif photon_utilization < 80:
-        photon_recommendation = " → **Photon設定の最適化を推奨**"
+        photon_status = t("適切", "Adequate")
+        photon_recommendation = t(" → **Photon設定の最適化を推奨**", " → **Photon configuration tuning recommended**")
     else:
-        photon_recommendation = " → **最適化済み**"
+        photon_status = t("高利用", "High utilization")
+        photon_recommendation = t(" → **最適化済み**", " → **Already optimized**")
     
-    report_lines.append("### Photonエンジン")
-    report_lines.append(f"- **状態**: {photon_status} (利用率: {photon_utilization:.1f}%){photon_recommendation}")
+    report_lines.append(t("### Photonエンジン", "### Photon Engine"))
+    report_lines.append(f"- **{t('状態', 'Status')}**: {photon_status} ({t('利用率', 'utilization')}: {photon_utilization:.1f}%){photon_recommendation}")
     report_lines.append("")
     
     # 並列度・シャッフル分析
-    report_lines.append("### 並列度・シャッフル")
-    shuffle_status = "❌ ボトルネックあり" if has_shuffle_bottleneck else "✅ 良好"
-    parallelism_status = "❌ 低並列度あり" if has_low_parallelism else "✅ 適切"
+    report_lines.append(t("### 並列度・シャッフル", "### Parallelism & Shuffle"))
+    parallelism_status = t("❌ 低並列度あり", "❌ Low parallelism detected") if has_low_parallelism else t("✅ 適切", "✅ Adequate")
     
     # シャッフル評価を時間・I/O比率ベースに変更
     shuffle_impact_ratio = bottleneck_indicators.get('shuffle_impact_ratio', 0)
     shuffle_priority = bottleneck_indicators.get('shuffle_optimization_priority', 'low')
     
     if shuffle_priority == 'high':
-        shuffle_display = f"{shuffle_impact_ratio:.1%} ❌ 最適化を本格検討"
+        shuffle_display = f"{shuffle_impact_ratio:.1%} {t('❌ 最適化を本格検討', '❌ Consider full optimization')}"
     elif shuffle_priority == 'medium':
-        shuffle_display = f"{shuffle_impact_ratio:.1%} ⚠️ 軽いチューニングを検討"
+        shuffle_display = f"{shuffle_impact_ratio:.1%} {t('⚠️ 軽いチューニングを検討', '⚠️ Consider light tuning')}"
     else:
-        shuffle_display = f"{shuffle_impact_ratio:.1%} ✅ 他のボトルネックを優先"
+        shuffle_display = f"{shuffle_impact_ratio:.1%} {t('✅ 他のボトルネックを優先', '✅ Prioritize other bottlenecks')}"
     
-    report_lines.append(f"- **シャッフル影響度**: {shuffle_display}")
-    report_lines.append(f"- **並列度**: {parallelism_status}")
+    report_lines.append(f"- **{t('シャッフル影響度', 'Shuffle impact')}**: {shuffle_display}")
+    report_lines.append(f"- **{t('並列度', 'Parallelism')}**: {parallelism_status}")
     if has_low_parallelism:
-        report_lines.append(f"  - 低並列度ステージ: {low_parallelism_count}個")
+        report_lines.append(f"  - {t('低並列度ステージ', 'Low-parallelism stages')}: {low_parallelism_count}{t('個', '')}")
     report_lines.append("")
     
     # スピル分析
-    report_lines.append("### メモリ使用状況")
+    report_lines.append(t("### メモリ使用状況", "### Memory Usage"))
     if has_spill:
-        report_lines.append(f"- **メモリスピル**: ❌ 発生中 ({spill_gb:.2f}GB)")
-        report_lines.append("  - **対応必要**: クラスター設定の見直し、クエリ最適化")
+        report_lines.append(f"- **{t('メモリスピル', 'Memory spill')}**: {t('❌ 発生中', '❌ Occurring')} ({spill_gb:.2f}GB)")
+        report_lines.append(t("  - **対応必要**: クラスター設定の見直し、クエリ最適化", "  - **Action required**: Review cluster configuration and optimize the query"))
     else:
-        report_lines.append("- **メモリスピル**: ✅ なし")
+        report_lines.append(t("- **メモリスピル**: ✅ なし", "- **Memory spill**: ✅ None"))
     report_lines.append("")
     
     # TOP5 Processing Time Bottlenecks - Enhanced with detailed information
-    report_lines.append("## 3. TOP5 Processing Time Bottlenecks")
+    report_lines.append(t("## 3. 処理時間ボトルネックTOP5", "## 3. TOP5 Processing Time Bottlenecks"))
     report_lines.append("")
     
     # Generate detailed process information for each critical process (same logic as cell 37)
@@ -5209,13 +5486,13 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
         # Generate detailed output
         report_lines.append(f"### {i+1}. {time_icon}{memory_icon}{parallelism_icon}{spill_icon}{skew_icon} [{severity:8}] {short_name}")
         report_lines.append("")
-        report_lines.append(f"**実行時間**: {duration_ms:,}ms ({time_percentage:.1f}% of total)")
-        report_lines.append(f"**重要度**: {severity}")
+        report_lines.append(f"**{t('実行時間', 'Execution time')}**: {duration_ms:,}ms ({t('全体の', '')}{time_percentage:.1f}%{t('', ' of total')})")
+        report_lines.append(f"**{t('重要度', 'Severity')}**: {severity}")
         report_lines.append("")
-        report_lines.append("**📊 詳細メトリクス:**")
-        report_lines.append(f"- ⏱️  実行時間: {duration_ms:>8,} ms ({duration_ms/1000:>6.1f} sec)")
-        report_lines.append(f"- 📊 処理行数: {rows_num:>8,} 行")
-        report_lines.append(f"- 💾 ピークメモリ: {memory_mb:>6.1f} MB")
+        report_lines.append(t("**📊 詳細メトリクス:**", "**📊 Detailed Metrics:**"))
+        report_lines.append(f"- ⏱️  {t('実行時間', 'Execution time')}: {duration_ms:>8,} ms ({duration_ms/1000:>6.1f} sec)")
+        report_lines.append(f"- 📊 {t('処理行数', 'Rows processed')}: {rows_num:>8,} {t('行', 'rows')}")
+        report_lines.append(f"- 💾 {t('ピークメモリ', 'Peak memory')}: {memory_mb:>6.1f} MB")
         
         # Display multiple Tasks total metrics
         parallelism_display = []
@@ -5223,21 +5500,21 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
             parallelism_display.append(f"{task_metric['name']}: {task_metric['value']}")
         
         if parallelism_display:
-            report_lines.append(f"- 🔧 並列度: {' | '.join(parallelism_display)}")
+            report_lines.append(f"- 🔧 {t('並列度', 'Parallelism')}: {' | '.join(parallelism_display)}")
         else:
-            report_lines.append(f"- 🔧 並列度: {num_tasks:>3d} タスク")
+            report_lines.append(f"- 🔧 {t('並列度', 'Parallelism')}: {num_tasks:>3d} {t('タスク', 'tasks')}")
         
         # Skew status
         aqe_shuffle_skew_warning = parallelism_data.get('aqe_shuffle_skew_warning', False)
         
         if skew_detected:
-            skew_status = "AQEで検出・対応済"
+            skew_status = t("AQEで検出・対応済", "Detected & handled by AQE")
         elif aqe_shuffle_skew_warning:
-            skew_status = "潜在的なスキューの可能性あり"
+            skew_status = t("潜在的なスキューの可能性あり", "Potential skew possibility")
         else:
-            skew_status = "なし"
+            skew_status = t("なし", "None")
         
-        report_lines.append(f"- 💿 スピル: {'あり' if spill_detected else 'なし'} | ⚖️ スキュー: {skew_status}")
+        report_lines.append(f"- 💿 {t('スピル', 'Spill')}: {t('あり', 'Yes') if spill_detected else t('なし', 'No')} | ⚖️ {t('スキュー', 'Skew')}: {skew_status}")
         
         # AQEShuffleRead metrics display
         aqe_shuffle_metrics = parallelism_data.get('aqe_shuffle_metrics', [])
@@ -5245,9 +5522,9 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
             aqe_display = []
             for aqe_metric in aqe_shuffle_metrics:
                 if aqe_metric['name'] == "AQEShuffleRead - Number of partitions":
-                    aqe_display.append(f"パーティション数: {aqe_metric['value']}")
+                    aqe_display.append(f"{t('パーティション数', 'Partitions')}: {aqe_metric['value']}")
                 elif aqe_metric['name'] == "AQEShuffleRead - Partition data size":
-                    aqe_display.append(f"データサイズ: {aqe_metric['value']:,} bytes")
+                    aqe_display.append(f"{t('データサイズ', 'Data size')}: {aqe_metric['value']:,} bytes")
             
             if aqe_display:
                 report_lines.append(f"- 🔄 AQEShuffleRead: {' | '.join(aqe_display)}")
@@ -5256,16 +5533,17 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
                 avg_partition_size = parallelism_data.get('aqe_shuffle_avg_partition_size', 0)
                 if avg_partition_size > 0:
                     avg_size_mb = avg_partition_size / (1024 * 1024)
-                    report_lines.append(f"- 📊 平均パーティションサイズ: {avg_size_mb:.2f} MB")
+                    report_lines.append(f"- 📊 {t('平均パーティションサイズ', 'Average partition size')}: {avg_size_mb:.2f} MB")
                     
                     # Warning when 512MB or more
                     if parallelism_data.get('aqe_shuffle_skew_warning', False):
-                        report_lines.append(f"- ⚠️  **警告** 平均パーティションサイズが512MB以上 - 潜在的なスキューの可能性あり")
+                        report_lines.append(t("- ⚠️  **警告** 平均パーティションサイズが512MB以上 - 潜在的なスキューの可能性あり",
+                                              "- ⚠️  **Warning** Average partition size is 512MB or more - potential skew"))
         
         # Processing efficiency calculation
         if duration_ms > 0:
             rows_per_sec = (rows_num * 1000) / duration_ms
-            report_lines.append(f"- 🚀 処理効率: {rows_per_sec:>8,.0f} 行/秒")
+            report_lines.append(f"- 🚀 {t('処理効率', 'Throughput')}: {rows_per_sec:>8,.0f} {t('行/秒', 'rows/sec')}")
         
         # Filter rate display
         filter_result = calculate_filter_rate(node)
@@ -5274,7 +5552,7 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
             report_lines.append(f"- {filter_display}")
         else:
             if filter_result["has_filter_metrics"]:
-                report_lines.append(f"- 📂 フィルタ率: {filter_result['filter_rate']:.1%} (読み込み: {filter_result['files_read_bytes']/(1024*1024*1024):.2f}GB, プルーン: {filter_result['files_pruned_bytes']/(1024*1024*1024):.2f}GB)")
+                report_lines.append(f"- 📂 {t('フィルタ率', 'Filter rate')}: {filter_result['filter_rate']:.1%} ({t('読み込み', 'read')}: {filter_result['files_read_bytes']/(1024*1024*1024):.2f}GB, {t('プルーン', 'pruned')}: {filter_result['files_pruned_bytes']/(1024*1024*1024):.2f}GB)")
         
         # Spill details (simple display)
         if spill_detected and spill_bytes > 0:
@@ -5283,13 +5561,13 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
                 spill_display = f"{spill_mb/1024:.2f} GB"
             else:  # MB unit
                 spill_display = f"{spill_mb:.1f} MB"
-            report_lines.append(f"- 💿 スピル詳細: {spill_display}")
+            report_lines.append(f"- 💿 {t('スピル詳細', 'Spill details')}: {spill_display}")
         
         # Shuffle attributes for shuffle nodes
         if "shuffle" in raw_node_name.lower():
             shuffle_attributes = extract_shuffle_attributes(node)
             if shuffle_attributes:
-                report_lines.append(f"- 🔄 Shuffle属性: {', '.join(shuffle_attributes)}")
+                report_lines.append(f"- 🔄 {t('Shuffle属性', 'Shuffle attributes')}: {', '.join(shuffle_attributes)}")
                 
                 # REPARTITION suggestion (only when spill is detected)
                 if spill_detected and spill_bytes > 0:
@@ -5322,56 +5600,57 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
                     # Use all detected shuffle attribute columns
                     repartition_columns = ", ".join(shuffle_attributes)
                     
-                    report_lines.append(f"- 💡 **最適化提案**: REPARTITION({suggested_partitions}, {repartition_columns})")
-                    report_lines.append(f"  - **理由**: スピル({spill_mb:.1f} MB)を改善するため")
-                    report_lines.append(f"  - **対象**: Shuffle属性全{len(shuffle_attributes)}カラムを完全使用")
+                    report_lines.append(f"- 💡 **{t('最適化提案', 'Optimization proposal')}**: REPARTITION({suggested_partitions}, {repartition_columns})")
+                    report_lines.append(t(f"  - **理由**: スピル({spill_mb:.1f} MB)を改善するため", f"  - **Reason**: To resolve the spill ({spill_mb:.1f} MB)"))
+                    report_lines.append(t(f"  - **対象**: Shuffle属性全{len(shuffle_attributes)}カラムを完全使用", f"  - **Columns**: All {len(shuffle_attributes)} shuffle attribute columns"))
             else:
-                report_lines.append(f"- 🔄 Shuffle属性: 設定なし")
+                report_lines.append(t("- 🔄 Shuffle属性: 設定なし", "- 🔄 Shuffle attributes: None"))
         
         # Clustering keys for scan nodes
         if "scan" in raw_node_name.lower():
             cluster_attributes = extract_cluster_attributes(node)
             if cluster_attributes:
-                report_lines.append(f"- 📊 クラスタリングキー: {', '.join(cluster_attributes)}")
+                report_lines.append(f"- 📊 {t('クラスタリングキー', 'Clustering keys')}: {', '.join(cluster_attributes)}")
             else:
-                report_lines.append(f"- 📊 クラスタリングキー: 設定なし")
+                report_lines.append(t("- 📊 クラスタリングキー: 設定なし", "- 📊 Clustering keys: None"))
         
         # Skew details
         if skew_detected and skewed_partitions > 0:
-            report_lines.append(f"- ⚖️ スキュー詳細: {skewed_partitions} 個のスキューパーティション (AQEShuffleRead検出)")
+            report_lines.append(t(f"- ⚖️ スキュー詳細: {skewed_partitions} 個のスキューパーティション (AQEShuffleRead検出)",
+                                  f"- ⚖️ Skew details: {skewed_partitions} skewed partitions (detected by AQEShuffleRead)"))
         
         # Node ID
-        report_lines.append(f"- 🆔 ノードID: {node.get('node_id', node.get('id', 'N/A'))}")
+        report_lines.append(f"- 🆔 {t('ノードID', 'Node ID')}: {node.get('node_id', node.get('id', 'N/A'))}")
         report_lines.append("")
     
     # Liquid Clustering Recommendations
-    report_lines.append("## 4. Liquid Clustering Recommendations")
+    report_lines.append(t("## 4. Liquid Clustering推奨", "## 4. Liquid Clustering Recommendations"))
     report_lines.append("")
     
     if identified_tables:
-        report_lines.append("### 対象テーブル")
+        report_lines.append(t("### 対象テーブル", "### Target Tables"))
         for i, table_name in enumerate(identified_tables, 1):
             # 現在のクラスタリングキー情報を取得
             table_details = table_info.get(table_name, {})
             current_keys = table_details.get('current_clustering_keys', [])
-            current_keys_str = ', '.join(current_keys) if current_keys else '設定なし'
+            current_keys_str = ', '.join(current_keys) if current_keys else t('設定なし', 'None')
             
             report_lines.append(f"{i}. `{table_name}`")
-            report_lines.append(f"   - 現在のクラスタリングキー: `{current_keys_str}`")
+            report_lines.append(f"   - {t('現在のクラスタリングキー', 'Current clustering keys')}: `{current_keys_str}`")
         report_lines.append("")
     
     if filter_columns or join_columns or groupby_columns:
-        report_lines.append("### 推奨クラスタリングキー")
+        report_lines.append(t("### 推奨クラスタリングキー", "### Recommended Clustering Keys"))
         
         if filter_columns:
-            report_lines.append("**フィルター条件カラム (高優先度)**:")
+            report_lines.append(t("**フィルター条件カラム (高優先度)**:", "**Filter condition columns (high priority)**:"))
             for i, col in enumerate(filter_columns[:5], 1):
                 expression = col.get('expression', 'Unknown')
                 report_lines.append(f"  {i}. `{expression}`")
             report_lines.append("")
         
         if join_columns:
-            report_lines.append("**JOIN条件カラム (中優先度)**:")
+            report_lines.append(t("**JOIN条件カラム (中優先度)**:", "**JOIN condition columns (medium priority)**:"))
             for i, col in enumerate(join_columns[:5], 1):
                 expression = col.get('expression', 'Unknown')
                 key_type = col.get('key_type', '')
@@ -5379,63 +5658,63 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
             report_lines.append("")
         
         if groupby_columns:
-            report_lines.append("**GROUP BY条件カラム (中優先度)**:")
+            report_lines.append(t("**GROUP BY条件カラム (中優先度)**:", "**GROUP BY columns (medium priority)**:"))
             for i, col in enumerate(groupby_columns[:5], 1):
                 expression = col.get('expression', 'Unknown')
                 report_lines.append(f"  {i}. `{expression}`")
             report_lines.append("")
     
     # テーブル最適化推奨セクション
-    report_lines.append("## 📋 テーブル最適化推奨")
+    report_lines.append(t("## 📋 テーブル最適化推奨", "## 📋 Table Optimization Recommendations"))
     report_lines.append("")
     
     # テーブル分析がある場合のみ、対象テーブル分析として表示
     if identified_tables:
         # 最初のテーブルに対する分析
         main_table = identified_tables[0] if identified_tables else "unknown_table"
-        report_lines.append(f"├── {main_table} テーブル分析")
-        report_lines.append("│   ├── テーブルサイズ・クラスタリングキー情報")
-        report_lines.append("│   ├── 選定根拠")
-        report_lines.append("│   ├── 実装SQL")
-        report_lines.append("│   └── 期待される改善効果")
+        report_lines.append(f"├── {main_table} {t('テーブル分析', 'table analysis')}")
+        report_lines.append(t("│   ├── テーブルサイズ・クラスタリングキー情報", "│   ├── Table size and clustering key information"))
+        report_lines.append(t("│   ├── 選定根拠", "│   ├── Selection rationale"))
+        report_lines.append(t("│   ├── 実装SQL", "│   ├── Implementation SQL"))
+        report_lines.append(t("│   └── 期待される改善効果", "│   └── Expected improvements"))
         report_lines.append("│")
-        report_lines.append("└── 💡 Liquid Clustering キー選定ガイドライン")
-        report_lines.append("    ├── キー選定の原則")
-        report_lines.append("    ├── GROUP BY キーの考慮条件")
-        report_lines.append("    └── 実務上の推奨")
+        report_lines.append(t("└── 💡 Liquid Clustering キー選定ガイドライン", "└── 💡 Liquid Clustering Key Selection Guidelines"))
+        report_lines.append(t("    ├── キー選定の原則", "    ├── Key selection principles"))
+        report_lines.append(t("    ├── GROUP BY キーの考慮条件", "    ├── GROUP BY key consideration conditions"))
+        report_lines.append(t("    └── 実務上の推奨", "    └── Practical recommendations"))
         report_lines.append("")
         
         # ガイドラインをサブ項目として配置
-        report_lines.append("### 💡 Liquid Clustering キー選定ガイドライン")
+        report_lines.append(t("### 💡 Liquid Clustering キー選定ガイドライン", "### 💡 Liquid Clustering Key Selection Guidelines"))
         report_lines.append("")
         report_lines.append(get_liquid_clustering_guidelines())
         report_lines.append("")
     else:
         # テーブル分析がない場合は従来通り
-        report_lines.append("### 📋 Liquid Clustering キー選定ガイドライン")
+        report_lines.append(t("### 📋 Liquid Clustering キー選定ガイドライン", "### 📋 Liquid Clustering Key Selection Guidelines"))
         report_lines.append("")
         report_lines.append(get_liquid_clustering_guidelines())
         report_lines.append("")
     
     # 実装SQL例
     if identified_tables:
-        report_lines.append("### 実装SQL例")
+        report_lines.append(t("### 実装SQL例", "### Implementation SQL Examples"))
         for table_name in identified_tables[:2]:  # TOP2テーブルのみ
             # 現在のクラスタリングキー情報を取得
             table_details = table_info.get(table_name, {})
             current_keys = table_details.get('current_clustering_keys', [])
-            current_keys_str = ', '.join(current_keys) if current_keys else '設定なし'
+            current_keys_str = ', '.join(current_keys) if current_keys else t('設定なし', 'None')
             
             report_lines.append(f"```sql")
-            report_lines.append(f"-- {table_name}テーブルにLiquid Clusteringを適用")
-            report_lines.append(f"-- 現在のクラスタリングキー: {current_keys_str}")
+            report_lines.append(t(f"-- {table_name}テーブルにLiquid Clusteringを適用", f"-- Apply Liquid Clustering to {table_name}"))
+            report_lines.append(f"-- {t('現在のクラスタリングキー', 'Current clustering keys')}: {current_keys_str}")
             report_lines.append(f"ALTER TABLE {table_name}")
             report_lines.append(f"CLUSTER BY (column1, column2, column3, column4);")
             report_lines.append(f"```")
             report_lines.append("")
     
     # Optimization recommendation actions
-    report_lines.append("## 5. Recommended Optimization Actions")
+    report_lines.append(t("## 5. 推奨最適化アクション", "## 5. Recommended Optimization Actions"))
     report_lines.append("")
     
     # Priority-based recommendations
@@ -5445,53 +5724,53 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
     
     # CRITICAL/HIGH priority actions
     if photon_utilization < 20:
-        high_priority_actions.append("**Increase Photon Utilization** - Adopt Photon operators and optimize configuration")
+        high_priority_actions.append(t("**Photon利用率の向上** - Photon対応演算子の採用と設定の最適化", "**Increase Photon Utilization** - Adopt Photon operators and optimize configuration"))
     
     if has_spill:
-        high_priority_actions.append(f"**Resolve Memory Spill** - Eliminate {spill_gb:.2f}GB spill")
+        high_priority_actions.append(t(f"**メモリスピルの解消** - {spill_gb:.2f}GBのスピルを解消", f"**Resolve Memory Spill** - Eliminate {spill_gb:.2f}GB spill"))
     
     if has_shuffle_bottleneck:
-        high_priority_actions.append("**Shuffle Optimization** - JOIN order and REPARTITION application")
+        high_priority_actions.append(t("**シャッフル最適化** - JOIN順序の見直しとREPARTITIONの適用", "**Shuffle Optimization** - JOIN order and REPARTITION application"))
     
     # MEDIUM actions
     if 20 <= photon_utilization < 80:
-        medium_priority_actions.append("**Improve Photon Utilization** - Configuration optimization")
+        medium_priority_actions.append(t("**Photon利用率の改善** - 設定の最適化", "**Improve Photon Utilization** - Configuration optimization"))
     
     if has_low_parallelism:
-        medium_priority_actions.append("**Improve Parallelism** - Cluster configuration review")
+        medium_priority_actions.append(t("**並列度の改善** - クラスター設定の見直し", "**Improve Parallelism** - Cluster configuration review"))
     
     if cache_hit_ratio < 50:
-        medium_priority_actions.append("**Improve Cache Efficiency** - Data access pattern optimization")
+        medium_priority_actions.append(t("**キャッシュ効率の改善** - データアクセスパターンの最適化", "**Improve Cache Efficiency** - Data access pattern optimization"))
     
     # Liquid Clustering
     if identified_tables:
-        medium_priority_actions.append("**Implement Liquid Clustering** - Clustering of key tables")
+        medium_priority_actions.append(t("**Liquid Clusteringの実装** - 主要テーブルのクラスタリング", "**Implement Liquid Clustering** - Clustering of key tables"))
     
     # LOW actions
     if data_selectivity < 50:
-        low_priority_actions.append("**WHERE Clause Optimization** - Improve filter efficiency")
+        low_priority_actions.append(t("**WHERE句の最適化** - フィルタ効率の改善", "**WHERE Clause Optimization** - Improve filter efficiency"))
     
     # Action output
     if high_priority_actions:
-        report_lines.append("### 🚨 Urgent Response (HIGH Priority)")
+        report_lines.append(t("### 🚨 緊急対応 (HIGH優先度)", "### 🚨 Urgent Response (HIGH Priority)"))
         for i, action in enumerate(high_priority_actions, 1):
             report_lines.append(f"{i}. {action}")
         report_lines.append("")
     
     if medium_priority_actions:
-        report_lines.append("### ⚠️ Important Improvements (MEDIUM Priority)")
+        report_lines.append(t("### ⚠️ 重要な改善 (MEDIUM優先度)", "### ⚠️ Important Improvements (MEDIUM Priority)"))
         for i, action in enumerate(medium_priority_actions, 1):
             report_lines.append(f"{i}. {action}")
         report_lines.append("")
     
     if low_priority_actions:
-        report_lines.append("### 📝 Long-term Optimization (LOW Priority)")
+        report_lines.append(t("### 📝 長期的な最適化 (LOW優先度)", "### 📝 Long-term Optimization (LOW Priority)"))
         for i, action in enumerate(low_priority_actions, 1):
             report_lines.append(f"{i}. {action}")
         report_lines.append("")
     
     # Expected effects
-    report_lines.append("## 6. Expected Performance Improvements")
+    report_lines.append(t("## 6. 期待されるパフォーマンス改善", "## 6. Expected Performance Improvements"))
     report_lines.append("")
     
     total_improvement_estimate = 0
@@ -5499,22 +5778,22 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
     
     if photon_utilization < 20:
         total_improvement_estimate += 40
-        improvement_details.append("- **Increase Photon Utilization**: 30-50% execution time reduction expected")
+        improvement_details.append(t("- **Photon利用率の向上**: 実行時間30-50%短縮の見込み", "- **Increase Photon Utilization**: 30-50% execution time reduction expected"))
     elif photon_utilization < 80:
         total_improvement_estimate += 20
-        improvement_details.append("- **Photon Tuning**: 10-30% execution time reduction expected")
+        improvement_details.append(t("- **Photonチューニング**: 実行時間10-30%短縮の見込み", "- **Photon Tuning**: 10-30% execution time reduction expected"))
     
     if has_spill:
         total_improvement_estimate += 25
-        improvement_details.append(f"- **Spill Resolution**: 20-30% execution time reduction ({spill_gb:.2f}GB spill reduction)")
+        improvement_details.append(t(f"- **スピル解消**: 実行時間20-30%短縮 ({spill_gb:.2f}GBのスピル削減)", f"- **Spill Resolution**: 20-30% execution time reduction ({spill_gb:.2f}GB spill reduction)"))
     
     if has_shuffle_bottleneck:
         total_improvement_estimate += 20
-        improvement_details.append("- **Shuffle Optimization**: 15-25% execution time reduction")
+        improvement_details.append(t("- **シャッフル最適化**: 実行時間15-25%短縮", "- **Shuffle Optimization**: 15-25% execution time reduction"))
     
     if identified_tables:
         total_improvement_estimate += 15
-        improvement_details.append("- **Liquid Clustering**: 10-20% execution time reduction")
+        improvement_details.append(t("- **Liquid Clustering**: 実行時間10-20%短縮", "- **Liquid Clustering**: 10-20% execution time reduction"))
     
     # Set upper limit for improvement effects
     total_improvement_estimate = min(total_improvement_estimate, 80)
@@ -5523,164 +5802,172 @@ def analyze_bottlenecks_with_llm(metrics: Dict[str, Any]) -> str:
         for detail in improvement_details:
             report_lines.append(detail)
         report_lines.append("")
-        report_lines.append(f"**Overall Improvement Estimate**: Up to {total_improvement_estimate}% execution time reduction")
+        report_lines.append(t(f"**総合改善見込み**: 最大{total_improvement_estimate}%の実行時間短縮", f"**Overall Improvement Estimate**: Up to {total_improvement_estimate}% execution time reduction"))
     else:
-        report_lines.append("Current performance is relatively good. Fine-tuning optimizations can expect 5-10% improvement.")
+        report_lines.append(t("現在のパフォーマンスは比較的良好です。微調整により5-10%の改善が見込めます。", "Current performance is relatively good. Fine-tuning optimizations can expect 5-10% improvement."))
     
     # === Detailed analysis based on EXPLAIN + EXPLAIN COST results ===
     if explain_enabled.upper() == 'Y' and (physical_plan or cost_statistics):
         report_lines.append("")
-        report_lines.append("## 6. EXPLAIN + EXPLAIN COST Detailed Analysis")
+        report_lines.append(t("## 6. EXPLAIN + EXPLAIN COST詳細分析", "## 6. EXPLAIN + EXPLAIN COST Detailed Analysis"))
         report_lines.append("")
         
         if physical_plan:
-            report_lines.append("### 🔍 Physical Plan Analysis")
+            report_lines.append(t("### 🔍 Physical Plan分析", "### 🔍 Physical Plan Analysis"))
             report_lines.append("")
             
             # Extract important information from Physical Plan
             plan_analysis = []
             if "Exchange" in physical_plan:
-                plan_analysis.append("- **Shuffle Operation Detected**: Potential data transfer bottleneck")
+                plan_analysis.append(t("- **シャッフル操作を検出**: データ転送がボトルネックになる可能性", "- **Shuffle Operation Detected**: Potential data transfer bottleneck"))
             if "BroadcastExchange" in physical_plan:
-                plan_analysis.append("- **BROADCAST JOIN Applied**: Efficient distribution of small tables")
+                plan_analysis.append(t("- **BROADCAST JOIN適用**: 小さいテーブルを効率的に配布", "- **BROADCAST JOIN Applied**: Efficient distribution of small tables"))
             if "HashAggregate" in physical_plan:
-                plan_analysis.append("- **Hash Aggregation Processing**: Memory efficiency optimization is important")
+                plan_analysis.append(t("- **ハッシュ集約処理**: メモリ効率の最適化が重要", "- **Hash Aggregation Processing**: Memory efficiency optimization is important"))
             if "FileScan" in physical_plan:
-                plan_analysis.append("- **File Scan Operation**: Check I/O efficiency and filter pushdown")
+                plan_analysis.append(t("- **ファイルスキャン操作**: I/O効率とフィルタプッシュダウンを確認", "- **File Scan Operation**: Check I/O efficiency and filter pushdown"))
             if "SortMergeJoin" in physical_plan:
-                plan_analysis.append("- **Sort Merge JOIN**: Large table joins, consider BROADCAST application")
+                plan_analysis.append(t("- **ソートマージJOIN**: 大規模テーブルの結合、BROADCASTの適用を検討", "- **Sort Merge JOIN**: Large table joins, consider BROADCAST application"))
             
             if plan_analysis:
                 for analysis in plan_analysis:
                     report_lines.append(analysis)
             else:
-                report_lines.append("- Physical Plan detailed information is available")
+                report_lines.append(t("- Physical Planの詳細情報があります", "- Physical Plan detailed information is available"))
             report_lines.append("")
         
         if photon_explanation:
-            report_lines.append("### 🚀 Photon Explanation Analysis")
+            report_lines.append(t("### 🚀 Photon Explanation分析", "### 🚀 Photon Explanation Analysis"))
             report_lines.append("")
             
             photon_analysis = []
             if "photon" in photon_explanation.lower():
-                photon_analysis.append("- **Photon Processing Information**: Vectorized processing optimization details")
+                photon_analysis.append(t("- **Photon処理情報**: ベクトル化処理の最適化の詳細", "- **Photon Processing Information**: Vectorized processing optimization details"))
             if "unsupported" in photon_explanation.lower():
-                photon_analysis.append("- **Unsupported Function Detected**: Opportunity to improve Photon utilization")
+                photon_analysis.append(t("- **未対応関数を検出**: Photon利用率を改善できる余地あり", "- **Unsupported Function Detected**: Opportunity to improve Photon utilization"))
             if "compiled" in photon_explanation.lower():
-                photon_analysis.append("- **Compilation Processing**: Runtime optimization application status")
+                photon_analysis.append(t("- **コンパイル処理**: 実行時最適化の適用状況", "- **Compilation Processing**: Runtime optimization application status"))
             
             if photon_analysis:
                 for analysis in photon_analysis:
                     report_lines.append(analysis)
             else:
-                report_lines.append("- Photon execution detailed information is available")
+                report_lines.append(t("- Photon実行の詳細情報があります", "- Photon execution detailed information is available"))
             report_lines.append("")
         
         if cost_statistics:
-            report_lines.append("### 💰 EXPLAIN COST Statistical Analysis")
+            report_lines.append(t("### 💰 EXPLAIN COST統計分析", "### 💰 EXPLAIN COST Statistical Analysis"))
             report_lines.append("")
             
             # Extract important information from EXPLAIN COST statistics
             cost_analysis = []
             if "サイズ情報" in cost_statistics:
-                cost_analysis.append("- **Table Size Statistics**: Improved BROADCAST judgment accuracy with accurate size information")
+                cost_analysis.append(t("- **テーブルサイズ統計**: 正確なサイズ情報によりBROADCAST判定の精度が向上", "- **Table Size Statistics**: Improved BROADCAST judgment accuracy with accurate size information"))
             if "行数情報" in cost_statistics:
-                cost_analysis.append("- **Row Count Statistics**: Partition number optimization and memory usage prediction")
+                cost_analysis.append(t("- **行数統計**: パーティション数の最適化とメモリ使用量の予測", "- **Row Count Statistics**: Partition number optimization and memory usage prediction"))
             if "選択率情報" in cost_statistics:
-                cost_analysis.append("- **Selectivity Statistics**: Filter efficiency optimization and WHERE condition order adjustment")
+                cost_analysis.append(t("- **選択率統計**: フィルタ効率の最適化とWHERE条件の順序調整", "- **Selectivity Statistics**: Filter efficiency optimization and WHERE condition order adjustment"))
             if "コスト情報" in cost_statistics:
-                cost_analysis.append("- **Cost Estimation**: JOIN strategy and access path selection optimization")
+                cost_analysis.append(t("- **コスト見積もり**: JOIN戦略とアクセスパス選択の最適化", "- **Cost Estimation**: JOIN strategy and access path selection optimization"))
             if "パーティション情報" in cost_statistics:
-                cost_analysis.append("- **Partition Statistics**: Data distribution optimization and skew countermeasures")
+                cost_analysis.append(t("- **パーティション統計**: データ分散の最適化とスキュー対策", "- **Partition Statistics**: Data distribution optimization and skew countermeasures"))
             
             if cost_analysis:
                 for analysis in cost_analysis:
                     report_lines.append(analysis)
                 report_lines.append("")
-                report_lines.append("**Benefits of Statistics-Based Optimization**:")
-                report_lines.append("- Optimization based on actual statistics rather than guesswork")
-                report_lines.append("- Proactive bottleneck prediction and spill avoidance")
-                report_lines.append("- Optimal strategy selection through accurate cost estimation")
+                report_lines.append(t("**統計情報に基づく最適化の利点**:", "**Benefits of Statistics-Based Optimization**:"))
+                report_lines.append(t("- 推測ではなく実際の統計情報に基づく最適化", "- Optimization based on actual statistics rather than guesswork"))
+                report_lines.append(t("- ボトルネックの事前予測とスピルの回避", "- Proactive bottleneck prediction and spill avoidance"))
+                report_lines.append(t("- 正確なコスト見積もりによる最適な戦略選択", "- Optimal strategy selection through accurate cost estimation"))
             else:
-                report_lines.append("- EXPLAIN COST statistical information is available")
+                report_lines.append(t("- EXPLAIN COSTの統計情報があります", "- EXPLAIN COST statistical information is available"))
             report_lines.append("")
     elif explain_enabled.upper() == 'Y':
         report_lines.append("")
-        report_lines.append("## 6. EXPLAIN Analysis")
+        report_lines.append(t("## 6. EXPLAIN分析", "## 6. EXPLAIN Analysis"))
         report_lines.append("")
-        report_lines.append("⚠️ EXPLAIN・EXPLAIN COST result files not found")
-        report_lines.append("Statistics-based detailed analysis requires prior EXPLAIN execution")
+        report_lines.append(t("⚠️ EXPLAIN・EXPLAIN COST結果ファイルが見つかりません", "⚠️ EXPLAIN・EXPLAIN COST result files not found"))
+        report_lines.append(t("統計情報に基づく詳細分析には事前のEXPLAIN実行が必要です", "Statistics-based detailed analysis requires prior EXPLAIN execution"))
         report_lines.append("")
     
     report_lines.append("")
     report_lines.append("---")
-    report_lines.append(f"*Report generated: {timestamp} | Analysis engine: Databricks SQL Profiler + EXPLAIN integration*")
+    report_lines.append(t(f"*レポート生成: {timestamp} | 分析エンジン: Databricks SQL Profiler + EXPLAIN統合*",
+                          f"*Report generated: {timestamp} | Analysis engine: Databricks SQL Profiler + EXPLAIN integration*"))
     
     print("✅ Comprehensive performance analysis report (EXPLAIN+EXPLAIN COST integration) completed")
     
     return "\n".join(report_lines)
 
 
-def _call_databricks_llm(prompt: str) -> str:
-    """Call Databricks Model Serving API"""
-    try:
-        # Databricksトークンの取得
-        try:
-            token = dbutils.notebook.entry_point.getDbutils().notebook().getContext().apiToken().get()
-        except Exception:
-            token = os.environ.get('DATABRICKS_TOKEN')
-            if not token:
-                return "❌ Failed to obtain Databricks token. Please set the environment variable DATABRICKS_TOKEN."
-        
-        # ワークスペースURLの取得
-        try:
-            workspace_url = spark.conf.get("spark.databricks.workspaceUrl")
-        except Exception:
-            workspace_url = dbutils.notebook.entry_point.getDbutils().notebook().getContext().tags().get("browserHostName").get()
-        
-        config = LLM_CONFIG["databricks"]
-        endpoint_url = f"https://{workspace_url}/serving-endpoints/{config['endpoint_name']}/invocations"
-        
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": config["max_tokens"],
-            "temperature": config["temperature"]
-        }
-        
-        # 拡張思考モードが有効な場合は追加
-        if config.get("thinking_enabled", False):
-            payload["thinking"] = {
-                "type": "enabled",
-                "budget_tokens": config.get("thinking_budget_tokens", 65536)
-            }
-        
-        # リトライ機能（SQL最適化用に増強）
-        max_retries = 3
-        for attempt in range(max_retries):
+from src.config import llm_config_from_dict
+from src.llm import CircuitOpenError, LLMDispatcher, TokenLimitError
+from src.llm import format_llm_telemetry, save_llm_telemetry, summarize_llm_calls
+from src.profiler.compact import encode_clustering_data, encode_overall_metrics, encode_shuffle_analysis, encode_top_nodes
+from src.report.sections import refine_report_sections, split_report_sections
+from src.report.translation import contains_japanese, count_translatable_characters, translate_free_text
+from src.models import OptimizationResponse
+from src.utils.structured_output import (
+    build_structured_output_instruction, format_optimization_response, parse_optimization_response,
+)
+
+# このランのLLM呼び出し記録（ステージ別テレメトリ用）
+_llm_call_records = []
+
+_LLM_PROVIDER_NAMES = {
+    'databricks': 'Databricks',
+    'openai': 'OpenAI',
+    'azure_openai': 'Azure OpenAI',
+    'anthropic': 'Anthropic',
+    'mock': 'Mock'
+}
+
+
+def get_notebook_llm_dispatcher():
+    """
+    LLM dispatcher built from LLM_CONFIG (rebuilt when LLM_CONFIG changes, so cached responses never cross models)
+    """
+    settings = json.dumps(LLM_CONFIG, sort_keys=True, default=str)
+    records = globals().setdefault('_llm_call_records', [])
+    cached = globals().get('_notebook_llm_dispatcher')
+    if cached and cached[0] == settings:
+        cached[1].records = records
+        return cached[1]
+    
+    llm_config = llm_config_from_dict(LLM_CONFIG)
+    if 'databricks' in [llm_config.provider] + list(llm_config.fallback_providers):
+        # dbutils / spark はノートブックのグローバルにのみ存在するため、ここでトークンとURLを解決して渡す
+        if not llm_config.databricks.token:
             try:
-                if attempt > 0:
-                    print(f"🔄 Retrying... (attempt {attempt + 1}/{max_retries})")
-                
-                response = requests.post(endpoint_url, headers=headers, json=payload, timeout=300)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    analysis_text = result.get('choices', [{}])[0].get('message', {}).get('content', '')
-                    print("✅ Bottleneck analysis completed")
-                    return analysis_text
-                else:
-                    error_msg = f"API Error: Status code {response.status_code}"
-                    if response.status_code == 400:
-                        # 400エラーの場合は詳細な解決策を提供
-                        error_detail = response.text
-                        if "maximum tokens" in error_detail.lower():
-                            if attempt == max_retries - 1:
-                                detailed_error = f"""❌ {error_msg}
+                llm_config.databricks.token = dbutils.notebook.entry_point.getDbutils().notebook().getContext().apiToken().get()
+            except Exception:
+                pass
+        if not llm_config.databricks.workspace_url:
+            try:
+                llm_config.databricks.workspace_url = spark.conf.get("spark.databricks.workspaceUrl")
+            except Exception:
+                try:
+                    llm_config.databricks.workspace_url = dbutils.notebook.entry_point.getDbutils().notebook().getContext().tags().get("browserHostName").get()
+                except Exception:
+                    pass
+    
+    dispatcher = LLMDispatcher(llm_config, records=records)
+    globals()['_notebook_llm_dispatcher'] = (settings, dispatcher)
+    return dispatcher
+
+
+def _call_llm(prompt: str, stage: str = "", max_tokens: int = 0) -> str:
+    """
+    Send a prompt to the configured LLM provider through the shared dispatcher
+    Errors are returned as text so the callers' error checks keep working
+    max_tokens caps the response (0 = configured max_tokens)
+    """
+    provider = LLM_CONFIG.get("provider", "databricks")
+    try:
+        return get_notebook_llm_dispatcher().dispatch(prompt, stage=stage, max_tokens=max_tokens)
+    except TokenLimitError as e:
+        detailed_error = f"""❌ API Error: {str(e)}
 
 🔧 Token limit error solutions:
 1. Reduce LLM_CONFIG["databricks"]["max_tokens"] to 65536 (64K)
@@ -5690,150 +5977,53 @@ def _call_databricks_llm(prompt: str) -> str:
 
 💡 Recommended settings:
 LLM_CONFIG["databricks"]["max_tokens"] = 65536
-LLM_CONFIG["databricks"]["thinking_budget_tokens"] = 32768
-
-Detailed error: {error_detail}"""
-                                print(detailed_error)
-                                return detailed_error
-                            else:
-                                print(f"⚠️ {error_msg} (Token limit) - Retrying...")
-                                continue
-                    
-                    if attempt == max_retries - 1:
-                        print(f"❌ {error_msg}\nResponse: {response.text}")
-                        return f"{error_msg}\nResponse: {response.text}"
-                    else:
-                        print(f"⚠️ {error_msg} - Retrying...")
-                        continue
-                        
-            except requests.exceptions.Timeout:
-                if attempt == max_retries - 1:
-                    timeout_msg = f"""⏰ Timeout Error: Databricks endpoint response did not complete within 300 seconds.
+LLM_CONFIG["databricks"]["thinking_budget_tokens"] = 32768"""
+        print(detailed_error)
+        return detailed_error
+    except CircuitOpenError as e:
+        circuit_msg = f"❌ {_LLM_PROVIDER_NAMES.get(provider, provider)} API call error: endpoint unavailable - {str(e)}"
+        print(circuit_msg)
+        return circuit_msg
+    except TimeoutError:
+        timeout_sec = LLM_CONFIG.get("timeout_sec", 300)
+        timeout_msg = f"""⏰ Timeout Error: {_LLM_PROVIDER_NAMES.get(provider, provider)} endpoint response did not complete within {timeout_sec} seconds.
 
 🔧 Solutions:
 1. Check LLM endpoint operational status
 2. Reduce prompt size
 3. Use a higher performance model
-4. Execute SQL optimization manually
-
-💡 Recommended Actions:
-- Check query complexity
-- Scale up Databricks Model Serving endpoint
-- Test execution with simpler queries"""
-                    print(f"❌ {timeout_msg}")
-                    return timeout_msg
-                else:
-                    print(f"⏰ Timeout occurred (300 seconds) - Retrying... (attempt {attempt + 1}/{max_retries})")
-                    continue
-                    
-    except Exception as e:
-        return f"Databricks API call error: {str(e)}"
-
-def _call_openai_llm(prompt: str) -> str:
-    """Call OpenAI API"""
-    try:
-        config = LLM_CONFIG["openai"]
-        api_key = config["api_key"] or os.environ.get('OPENAI_API_KEY')
-        
-        if not api_key:
-            return "❌ OpenAI API key is not configured. Please set LLM_CONFIG['openai']['api_key'] or environment variable OPENAI_API_KEY."
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": config["model"],
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": config["max_tokens"],
-            "temperature": config["temperature"]
-        }
-        
-        response = requests.post("https://api.openai.com/v1/chat/completions", 
-                               headers=headers, json=payload, timeout=300)
-        
-        if response.status_code == 200:
-            result = response.json()
-            analysis_text = result['choices'][0]['message']['content']
-            print("✅ OpenAI analysis completed")
-            return analysis_text
-        else:
-            return f"OpenAI API Error: Status code {response.status_code}\n{response.text}"
-            
+4. Execute SQL optimization manually"""
+        print(f"❌ {timeout_msg}")
+        return timeout_msg
     except Exception as e:
-        return f"OpenAI API call error: {str(e)}"
+        error_msg = f"{_LLM_PROVIDER_NAMES.get(provider, provider)} API call error: {str(e)}"
+        print(f"❌ {error_msg}")
+        return error_msg
 
-def _call_azure_openai_llm(prompt: str) -> str:
-    """Call Azure OpenAI API"""
-    try:
-        config = LLM_CONFIG["azure_openai"]
-        api_key = config["api_key"] or os.environ.get('AZURE_OPENAI_API_KEY')
-        
-        if not api_key or not config["endpoint"] or not config["deployment_name"]:
-            return "❌ Azure OpenAI configuration is incomplete. Please set api_key, endpoint, and deployment_name."
-        
-        endpoint_url = f"{config['endpoint']}/openai/deployments/{config['deployment_name']}/chat/completions?api-version={config['api_version']}"
-        
-        headers = {
-            "api-key": api_key,
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": config["max_tokens"],
-            "temperature": config["temperature"]
-        }
-        
-        response = requests.post(endpoint_url, headers=headers, json=payload, timeout=300)
-        
-        if response.status_code == 200:
-            result = response.json()
-            analysis_text = result['choices'][0]['message']['content']
-            print("✅ Azure OpenAI analysis completed")
-            return analysis_text
-        else:
-            return f"Azure OpenAI API Error: Status code {response.status_code}\n{response.text}"
-            
-    except Exception as e:
-        return f"Azure OpenAI API call error: {str(e)}"
 
-def _call_anthropic_llm(prompt: str) -> str:
-    """Call Anthropic API"""
-    try:
-        config = LLM_CONFIG["anthropic"]
-        api_key = config["api_key"] or os.environ.get('ANTHROPIC_API_KEY')
-        
-        if not api_key:
-            return "❌ Anthropic APIキーが設定されていません。LLM_CONFIG['anthropic']['api_key']または環境変数ANTHROPIC_API_KEYを設定してください。"
-        
-        headers = {
-            "x-api-key": api_key,
-            "Content-Type": "application/json",
-            "anthropic-version": "2023-06-01"
-        }
-        
-        payload = {
-            "model": config["model"],
-            "max_tokens": config["max_tokens"],
-            "temperature": config["temperature"],
-            "messages": [{"role": "user", "content": prompt}]
-        }
-        
-        response = requests.post("https://api.anthropic.com/v1/messages", 
-                               headers=headers, json=payload, timeout=300)
-        
-        if response.status_code == 200:
-            result = response.json()
-            analysis_text = result['content'][0]['text']
-            print("✅ Anthropic analysis completed")
-            return analysis_text
-        else:
-            return f"Anthropic API Error: Status code {response.status_code}\n{response.text}"
-            
-    except Exception as e:
-        return f"Anthropic API call error: {str(e)}"
+def save_llm_call_telemetry() -> Dict[str, str]:
+    """
+    Write the per-stage LLM call breakdown of this run (LLM_TELEMETRY = 'Y')
+    """
+    if str(globals().get('LLM_TELEMETRY', 'Y')).upper() != 'Y' or not _llm_call_records:
+        return {}
+    
+    from datetime import datetime
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    language = globals().get('OUTPUT_LANGUAGE', 'ja')
+    json_filename = f"{OUTPUT_FILE_DIR}/output_llm_telemetry_{timestamp}.json"
+    markdown_filename = f"{OUTPUT_FILE_DIR}/output_llm_telemetry_{timestamp}.md"
+    
+    save_llm_telemetry(_llm_call_records, json_filename)
+    markdown = format_llm_telemetry(_llm_call_records, language)
+    with open(markdown_filename, 'w', encoding='utf-8') as f:
+        f.write(markdown + "\n")
+    
+    total = summarize_llm_calls(_llm_call_records)['total']
+    print(t(f"🤖 LLM呼び出し: {total['calls']}回, 合計 {total['latency_ms'] / 1000:,.1f}秒, リトライ {total['retries']}回, キャッシュヒット {total['cache_hits']}回",
+            f"🤖 LLM calls: {total['calls']}, total {total['latency_ms'] / 1000:,.1f} s, {total['retries']} retries, {total['cache_hits']} cache hits"))
+    print(markdown)
+    return {'json': json_filename, 'markdown': markdown_filename}
 
 print("✅ Function definition completed: analyze_bottlenecks_with_llm")
 
@@ -5871,6 +6061,8 @@ elif provider == "anthropic":
     model = LLM_CONFIG["anthropic"]["model"]
     print(f"🤖 Starting Anthropic ({model}) bottleneck analysis...")
     print("⚠️  Anthropic API key is required")
+elif provider == "mock":
+    print("🧪 Mock LLM: recorded / templated responses, no endpoint required")
 
 print("📝 Simplifying analysis prompts to reduce timeout risk...")
 print()
@@ -6290,28 +6482,17 @@ def clean_response_text(text):
     # JSON構造の除去
     
     # 典型的なJSON構造パターンを除去
-    json_patterns = [
-        r"'type':\s*'[^']*'",
-        r'"type":\s*"[^"]*"',
-        r"\[?\{'type':[^}]*\}[,\]]?",
-        r'\[?\{"type":[^}]*\}[,\]]?',
-        r"'reasoning':\s*\[[^\]]*\]",
-        r'"reasoning":\s*\[[^\]]*\]',
-        r"'signature':\s*'[A-Za-z0-9+/=]{50,}'",
-        r'"signature":\s*"[A-Za-z0-9+/=]{50,}"'
-    ]
-    
-    for pattern in json_patterns:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
+    for pattern in _RESPONSE_JSON_ARTIFACT_RES:
+        text = pattern.sub('', text)
     
     # 不完全なJSONブラケットの除去
-    text = re.sub(r'^\s*[\[\{]', '', text)  # 先頭の [ や {
-    text = re.sub(r'[\]\}]\s*$', '', text)  # 末尾の ] や }
-    text = re.sub(r'^\s*[,;]\s*', '', text)  # 先頭のカンマやセミコロン
+    text = _RESPONSE_LEADING_BRACKET_RE.sub('', text)  # 先頭の [ や {
+    text = _RESPONSE_TRAILING_BRACKET_RE.sub('', text)  # 末尾の ] や }
+    text = _RESPONSE_LEADING_SEPARATOR_RE.sub('', text)  # 先頭のカンマやセミコロン
     
     # 連続する空白・改行の正規化
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)  # 3つ以上の連続改行を2つに
-    text = re.sub(r'[ \t]+', ' ', text)  # 連続するスペース・タブを1つに
+    text = _RESPONSE_BLANK_LINES_RE.sub('\n\n', text)  # 3つ以上の連続改行を2つに
+    text = _RESPONSE_SPACES_RE.sub(' ', text)  # 連続するスペース・タブを1つに
     
     # 前後の空白を除去
     text = text.strip()
@@ -6325,16 +6506,9 @@ def is_valid_content(text):
         return False
     
     # 無効なパターンをチェック
-    invalid_patterns = [
-        r'^[{\[\'"]*$',  # JSON構造のみ
-        r'^[,;:\s]*$',   # 区切り文字のみ
-        r'^\s*reasoning\s*$',  # reasoningのみ
-        r'^\s*metadata\s*$',   # metadataのみ
-        r'^[A-Za-z0-9+/=]{50,}$',  # Base64っぽい長い文字列
-    ]
-    
-    for pattern in invalid_patterns:
-        if re.match(pattern, text.strip(), re.IGNORECASE):
+    stripped = text.strip()
+    for pattern in _INVALID_CONTENT_RES:
+        if pattern.match(stripped):
             return False
     
     return True
@@ -7101,6 +7275,8 @@ elif provider == "anthropic":
     model = LLM_CONFIG["anthropic"]["model"]
     print(f"🤖 Starting bottleneck analysis with Anthropic ({model})...")
     print("⚠️  Anthropic API key is required")
+elif provider == "mock":
+    print("🧪 Mock LLM: recorded / templated responses, no endpoint required")
 
 print("📝 Simplifying analysis prompt to reduce timeout risk...")
 print()
@@ -7188,6 +7364,215 @@ print("🎉" * 20)
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## 🌳 EXPLAIN Plan Tree Parser
+# MAGIC
+# MAGIC Loads the single-pass EXPLAIN / EXPLAIN COST parser from the modular `src` package.
+# MAGIC The plan and cost extraction functions below query one cached operator tree per plan text instead of re-scanning it line by line.
+# MAGIC EXPLAIN / EXPLAIN COST run through one shared service that caches results per catalog, database and normalized query.
+# MAGIC The service runs statements on the backend chosen by `EXPLAIN_BACKEND` (Spark session, Databricks SQL Statement API, or recorded outputs for offline replay).
+# MAGIC Degradation analysis aligns the original and optimized plans operator by operator to name the exact operator whose estimates or join strategy got worse.
+# MAGIC The comprehensive cost ratio uses weights calibrated from observed runtimes (`COST_MODEL_PATH`) when available.
+# MAGIC With `EXECUTION_VERIFICATION = 'Y'` the original and optimized queries are also executed and their measured speedup is reported next to the estimate.
+# MAGIC With `RESULT_EQUIVALENCE_CHECK = 'Y'` a rewrite is only adopted when its row count and order-insensitive result checksum match the original query.
+
+# COMMAND ----------
+
+from src.utils.explain_plan import compile_pattern_matcher, find_plan_nodes, parse_explain_plan, parse_size_to_bytes, scan_text_chunks
+from src.optimization.explain_service import get_explain_service, normalize_sql
+from src.optimization.plan_diff import describe_operator_diff, diff_explain_plans
+from src.optimization.cost_model import calibrate_cost_model, get_cost_weights, make_cost_observation
+from src.utils.sql import extract_sql_candidates, extract_table_names
+from src.optimization.verification import format_execution_verification, verify_by_execution
+from src.optimization.equivalence import check_result_equivalence, format_equivalence_result
+from src.config import ExecutionConfig, ExplainBackendConfig
+from src.explain import create_explain_backend
+from src.execution import create_query_executor
+
+
+def get_notebook_explain_backend():
+    """
+    EXPLAIN backend selected by EXPLAIN_BACKEND (created once per setting and reused so the EXPLAIN cache survives)
+    """
+    settings = (
+        globals().get('EXPLAIN_BACKEND', 'spark'),
+        globals().get('EXPLAIN_WAREHOUSE_ID', ''),
+        globals().get('EXPLAIN_FIXTURE_DIR', ''),
+        globals().get('EXPLAIN_RECORD_DIR', '')
+    )
+    cached = globals().get('_notebook_explain_backend')
+    if cached and cached[0] == settings:
+        return cached[1]
+    
+    backend_config = ExplainBackendConfig(
+        backend=settings[0],
+        warehouse_id=settings[1],
+        fixture_dir=settings[2],
+        record_dir=settings[3]
+    )
+    backend = create_explain_backend(backend_config, spark=globals().get('spark'))
+    globals()['_notebook_explain_backend'] = (settings, backend)
+    print(f"🔌 EXPLAIN backend: {backend.backend_name}")
+    return backend
+
+
+def get_notebook_query_executor():
+    """
+    Query executor selected by QUERY_EXECUTOR (created once per setting and reused)
+    """
+    settings = (
+        globals().get('QUERY_EXECUTOR', 'spark'),
+        globals().get('QUERY_EXECUTOR_FIXTURE_DIR', '')
+    )
+    cached = globals().get('_notebook_query_executor')
+    if cached and cached[0] == settings:
+        return cached[1]
+    
+    executor = create_query_executor(
+        ExecutionConfig(executor=settings[0], fixture_dir=settings[1]),
+        spark=globals().get('spark')
+    )
+    globals()['_notebook_query_executor'] = (settings, executor)
+    print(f"🔌 Query executor: {executor.executor_name}")
+    return executor
+
+
+def run_execution_verification(original_query: str, optimized_query: str, performance_comparison: Dict[str, Any] = None):
+    """
+    Execute original and optimized queries and record the measured speedup next to the estimated cost ratio
+    Only active with EXECUTION_VERIFICATION = 'Y'; the result is attached to performance_comparison for the report
+    """
+    if str(globals().get('EXECUTION_VERIFICATION', 'N')).upper() != 'Y':
+        return None
+    if not optimized_query or optimized_query.strip() == (original_query or '').strip():
+        return None
+    
+    repeats = int(globals().get('VERIFICATION_REPEATS', 3))
+    print(t(f"\n⏱️ 実行検証: 元クエリと最適化クエリを各{repeats}回実行中...",
+            f"\n⏱️ Execution verification: running original and optimized queries {repeats} times each..."))
+    try:
+        executor = get_notebook_query_executor()
+        executor.set_context(globals().get('CATALOG', ''), globals().get('DATABASE', ''))
+    except Exception as e:
+        print(f"⚠️ Execution verification skipped: {str(e)}")
+        return None
+    
+    estimated_cost_ratio = (performance_comparison or {}).get('total_cost_ratio')
+    verification = verify_by_execution(
+        executor,
+        original_query,
+        optimized_query,
+        repeats=repeats,
+        row_limit=int(globals().get('VERIFICATION_ROW_LIMIT', 0)),
+        disable_cache=True,
+        estimated_cost_ratio=estimated_cost_ratio
+    )
+    
+    if verification.is_successful:
+        print(t(f"   📊 実行時間 (中央値): {verification.original.median_duration_ms:,.0f} ms → {verification.optimized.median_duration_ms:,.0f} ms",
+                f"   📊 Duration (median): {verification.original.median_duration_ms:,.0f} ms → {verification.optimized.median_duration_ms:,.0f} ms"))
+        print(t(f"   🚀 実測スピードアップ: {verification.measured_speedup:.2f}x (推定コスト比率: {estimated_cost_ratio})",
+                f"   🚀 Measured speedup: {verification.measured_speedup:.2f}x (estimated cost ratio: {estimated_cost_ratio})"))
+    else:
+        print(f"❌ Execution verification failed: {verification.error_message}")
+    
+    if performance_comparison is not None:
+        performance_comparison['execution_verification'] = verification
+    return verification
+
+
+def run_result_equivalence_check(original_query: str, optimized_query: str, performance_comparison: Dict[str, Any] = None) -> str:
+    """
+    Compare row counts and result checksums of original and optimized queries
+    Only active with RESULT_EQUIVALENCE_CHECK = 'Y'; returns the query to adopt (the original one on mismatch)
+    """
+    if str(globals().get('RESULT_EQUIVALENCE_CHECK', 'N')).upper() != 'Y':
+        return optimized_query
+    if not optimized_query or optimized_query.strip() == (original_query or '').strip():
+        return optimized_query
+    
+    sample_percent = float(globals().get('EQUIVALENCE_SAMPLE_PERCENT', 0) or 0)
+    print(t("\n🧮 結果の同値性チェック: 元クエリと最適化クエリの行数・チェックサムを比較中...",
+            "\n🧮 Result equivalence check: comparing row counts and checksums of original and optimized queries..."))
+    try:
+        executor = get_notebook_query_executor()
+        executor.set_context(globals().get('CATALOG', ''), globals().get('DATABASE', ''))
+    except Exception as e:
+        print(f"⚠️ Result equivalence check skipped: {str(e)}")
+        return optimized_query
+    
+    equivalence = check_result_equivalence(executor, original_query, optimized_query, sample_percent=sample_percent)
+    if performance_comparison is not None:
+        performance_comparison['result_equivalence'] = equivalence
+    
+    if equivalence.status == 'error':
+        print(f"❌ Result equivalence check failed: {equivalence.error_message}")
+        return optimized_query
+    
+    print(t(f"   📊 行数: {equivalence.original.row_count:,} → {equivalence.optimized.row_count:,}",
+            f"   📊 Row count: {equivalence.original.row_count:,} → {equivalence.optimized.row_count:,}"))
+    if equivalence.is_equivalent:
+        print(t("   ✅ 結果は一致しました - 最適化クエリを採用します",
+                "   ✅ Results match - adopting the optimized query"))
+        return optimized_query
+    
+    print(t("   🚨 結果が一致しません - 元クエリを使用します",
+            "   🚨 Results differ - keeping the original query"))
+    if performance_comparison is not None:
+        performance_comparison['recommendation'] = 'use_original'
+        performance_comparison['is_optimization_beneficial'] = False
+        performance_comparison.setdefault('details', []).append(
+            t(f"結果の同値性チェック不一致 ({equivalence.status}) のため元クエリ使用",
+              f"Result equivalence check mismatch ({equivalence.status}) - reverting to original query")
+        )
+    return original_query
+
+
+def get_cost_model_weights():
+    """
+    Comprehensive cost ratio weights: calibrated weights from COST_MODEL_PATH when available, defaults otherwise
+    Reloaded only when the model file changes
+    """
+    model_path = globals().get('COST_MODEL_PATH', '')
+    mtime = os.path.getmtime(model_path) if model_path and os.path.exists(model_path) else None
+    cached = globals().get('_cost_model_weights')
+    if cached and cached[0] == (model_path, mtime):
+        return dict(cached[1])
+    
+    weights = get_cost_weights(model_path)
+    globals()['_cost_model_weights'] = ((model_path, mtime), weights)
+    return dict(weights)
+
+
+def record_cost_calibration_sample(original_query: str, metrics: Dict[str, Any]) -> None:
+    """
+    Add the analyzed query's EXPLAIN COST features and observed duration to the history and refit the cost model
+    Only active with COST_MODEL_CALIBRATION = 'Y'
+    """
+    if str(globals().get('COST_MODEL_CALIBRATION', 'N')).upper() != 'Y':
+        return
+    history_path = globals().get('COST_HISTORY_PATH', '')
+    cost_metrics = globals().get('cached_original_cost_metrics')
+    duration_ms = (metrics or {}).get('overall_metrics', {}).get('total_time_ms', 0)
+    if not history_path or not cost_metrics or not duration_ms:
+        print(t("⚠️ コストモデル校正をスキップ: 履歴パス・EXPLAIN COSTメトリクス・実行時間のいずれかがありません",
+                "⚠️ Skipping cost model calibration: history path, EXPLAIN COST metrics or duration missing"))
+        return
+    
+    try:
+        observation = make_cost_observation(original_query, cost_metrics, duration_ms, extract_table_names(original_query))
+        model = calibrate_cost_model(observation, history_path=history_path, model_path=globals().get('COST_MODEL_PATH', ''))
+        status = t("校正済み", "calibrated") if model.calibrated else t("デフォルト重みを維持", "keeping default weights")
+        print(t(f"📐 コストモデル更新: 観測{model.observation_count}件 / ペア{model.pair_count}組 → {status}",
+                f"📐 Cost model updated: {model.observation_count} observations / {model.pair_count} pairs → {status}"))
+        if model.pair_count:
+            print(t(f"   平均絶対対数誤差: {model.baseline_mean_abs_log_error:.3f} (デフォルト) → {model.mean_abs_log_error:.3f}",
+                    f"   Mean absolute log error: {model.baseline_mean_abs_log_error:.3f} (default) → {model.mean_abs_log_error:.3f}"))
+    except Exception as e:
+        print(f"⚠️ Cost model calibration failed: {str(e)}")
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## 🔧 SQL Optimization Related Function Definitions
 # MAGIC
@@ -8068,6 +8453,17 @@ def estimate_uncompressed_size(compressed_size_mb: float, file_format: str = "pa
     
     return broadcast_analysis
 
+def format_plan_node_statistics(node) -> tuple:
+    """
+    プランノードのStatistics(...)を表示用の (サイズ, 行数) 文字列に変換
+    """
+    if node.size_bytes is None:
+        return "unknown", "unknown"
+    size_match = _PLAN_SIZE_TEXT_RE.search(node.text)
+    size_str = f"{size_match.group(1)}{size_match.group(2) or 'B'}" if size_match else f"{node.size_bytes}B"
+    rows_str = str(int(node.row_count)) if node.row_count is not None else "unknown"
+    return size_str, rows_str
+
 def extract_structured_physical_plan(physical_plan: str) -> Dict[str, Any]:
     """
     Structured extraction of important information only from Physical Plan (countermeasure for token limits)
@@ -8093,51 +8489,33 @@ def extract_structured_physical_plan(physical_plan: str) -> Dict[str, Any]:
     }
     
     try:
-        lines = physical_plan.split('\n')
+        plan = parse_explain_plan(physical_plan)
         join_count = scan_count = exchange_count = 0
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # JOIN情報の抽出（従来形式 + Photon形式完全対応）
-            # 従来のSpark JOIN形式（Statistics付き）
-            join_match = re.search(r'(\w*Join)\s+([^,\n]+).*?Statistics\(([^)]+)\)', line)
-            # Photon JOIN形式（Statistics無し、詳細なパラメータ付き）
-            photon_join_match = re.search(r'(Photon\w*Join)\s+\[([^\]]+)\],\s*\[([^\]]+)\],\s*(\w+),\s*(\w+)', line)
+        for node in plan.nodes:
+            operator = node.operator
+            line = node.text
             
-            if join_match or photon_join_match:
-                if join_match:
-                    # 従来のSpark JOIN形式
-                    join_type = join_match.group(1)
-                    condition = join_match.group(2).strip()
-                    stats = join_match.group(3)
-                    
-                    # 統計情報から数値抽出
-                    size_match = re.search(r'sizeInBytes=([0-9.]+)\s*([KMGT]i?B)?', stats)
-                    rows_match = re.search(r'rowCount=(\d+)', stats)
-                    
-                    size_str = f"{size_match.group(1)}{size_match.group(2) or 'B'}" if size_match else "unknown"
-                    rows_str = rows_match.group(1) if rows_match else "unknown"
-                    
-                elif photon_join_match:
-                    # Photon JOIN形式の詳細抽出
-                    join_type = photon_join_match.group(1)  # PhotonBroadcastHashJoin等
-                    left_keys = photon_join_match.group(2)   # 左側のJOINキー
-                    right_keys = photon_join_match.group(3)  # 右側のJOINキー
-                    join_method = photon_join_match.group(4) # Inner, Left等
-                    build_side = photon_join_match.group(5)  # BuildRight, BuildLeft等
+            # JOIN情報の抽出（従来形式 + Photon形式完全対応）
+            if operator.endswith('Join'):
+                # Photon JOIN形式（Statistics無し、詳細なパラメータ付き）
+                photon_join_match = _PHOTON_JOIN_DETAIL_RE.match(line) if operator.startswith('Photon') else None
+                
+                if photon_join_match:
+                    left_keys, right_keys, join_method, build_side = photon_join_match.groups()
                     
                     # JOIN条件の構成
                     condition = f"{left_keys} = {right_keys} ({join_method}, {build_side})"
                     
                     # Photon JOINは統計情報が別の場所にあるため、ここでは基本情報のみ
-                    size_str = "photon_optimized"
-                    rows_str = "photon_optimized"
+                    size_str = rows_str = "photon_optimized"
+                else:
+                    # 従来のSpark JOIN形式（Statistics付きならサイズ・行数も取得）
+                    condition = _PLAN_STATISTICS_TEXT_RE.sub('', line[len(operator):]).strip(' ,')
+                    size_str, rows_str = format_plan_node_statistics(node)
                 
                 extracted["joins"].append({
-                    "type": join_type,
+                    "type": operator,
                     "condition": condition[:100],  # 条件を100文字に制限
                     "size": size_str,
                     "rows": rows_str
@@ -8145,67 +8523,49 @@ def extract_structured_physical_plan(physical_plan: str) -> Dict[str, Any]:
                 join_count += 1
                 
             # テーブルスキャン情報の抽出（従来形式 + Photon形式完全対応）
-            elif ('FileScan' in line and 'Statistics(' in line) or ('PhotonScan' in line and 'parquet' in line):
-                # 従来形式：Statistics付きFileScan
-                stats_match = re.search(r'Statistics\(([^)]+)\)', line)
+            elif operator == 'PhotonScan' and 'parquet' in line:
                 # Photon形式：PhotonScan parquet table_name[columns]
-                photon_scan_match = re.search(r'PhotonScan\s+parquet\s+([a-zA-Z_][a-zA-Z0-9_.]*)\[([^\]]+)\]', line)
-                # 従来形式：FileScan
-                file_scan_match = re.search(r'FileScan\s+([^,\s\[]+)', line)
-                
-                if (stats_match and file_scan_match) or photon_scan_match:
-                    if photon_scan_match:
-                        # Photon形式の場合
-                        table = photon_scan_match.group(1)  # テーブル名
-                        columns = photon_scan_match.group(2)  # 列リスト
-                        stats = None  # PhotonScanには統計情報が同一行にない
-                        
-                        # テーブル統計の保存（Photon用の構造）
-                        extracted["scans"].append({
-                            "table": table[:50],
-                            "columns": columns[:100],
-                            "type": "PhotonScan",
-                            "size": "photon_scan",
-                            "rows": "photon_scan"
-                        })
-                        scan_count += 1
-                        
-                    elif stats_match and file_scan_match:
-                        # 従来形式の場合
-                        stats = stats_match.group(1)
-                        table = file_scan_match.group(1)
-                        
-                        size_match = re.search(r'sizeInBytes=([0-9.]+)\s*([KMGT]i?B)?', stats)
-                        rows_match = re.search(r'rowCount=(\d+)', stats)
-                        
-                        extracted["scans"].append({
-                            "table": table[:50],  # テーブル名を50文字に制限
-                            "type": "FileScan",
-                            "size": f"{size_match.group(1)}{size_match.group(2) or 'B'}" if size_match else "unknown",
-                            "rows": rows_match.group(1) if rows_match else "unknown"
-                        })
-                        scan_count += 1
+                photon_scan_match = _PHOTON_SCAN_DETAIL_RE.match(line)
+                if photon_scan_match:
+                    extracted["scans"].append({
+                        "table": photon_scan_match.group(1)[:50],
+                        "columns": photon_scan_match.group(2)[:100],
+                        "type": "PhotonScan",
+                        "size": "photon_scan",
+                        "rows": "photon_scan"
+                    })
+                    scan_count += 1
+                    
+            elif operator == 'FileScan' and node.size_bytes is not None:
+                # 従来形式：Statistics付きFileScan
+                file_scan_match = _FILE_SCAN_DETAIL_RE.match(line)
+                size_str, rows_str = format_plan_node_statistics(node)
+                extracted["scans"].append({
+                    "table": (file_scan_match.group(1) if file_scan_match else "unknown")[:50],  # テーブル名を50文字に制限
+                    "type": "FileScan",
+                    "size": size_str,
+                    "rows": rows_str
+                })
+                scan_count += 1
                     
             # データ移動（Exchange）の抽出
-            elif 'Exchange' in line:
-                if 'BroadcastExchange' in line:
-                    extracted["exchanges"].append({"type": "BROADCAST", "detail": line[:100]})
-                elif 'ShuffleExchange' in line or 'Exchange' in line:
-                    extracted["exchanges"].append({"type": "SHUFFLE", "detail": line[:100]})
+            elif 'Exchange' in operator:
+                exchange_type = "BROADCAST" if 'BroadcastExchange' in operator else "SHUFFLE"
+                extracted["exchanges"].append({"type": exchange_type, "detail": line[:100]})
                 exchange_count += 1
                 
             # 集約処理の抽出
-            elif 'Aggregate' in line or 'HashAggregate' in line:
+            elif 'Aggregate' in operator or operator == 'PhotonGroupingAgg':
                 extracted["aggregates"].append({"type": "AGGREGATE", "detail": line[:100]})
                 
             # Photon利用状況の確認
-            elif 'Photon' in line:
-                if 'PhotonResultStage' in line:
-                    extracted["photon_usage"]["result_stage"] = True
-                elif 'PhotonHashJoin' in line:
-                    extracted["photon_usage"]["hash_join"] = True
-                elif 'PhotonProject' in line:
-                    extracted["photon_usage"]["project"] = True
+            elif operator == 'PhotonResultStage':
+                extracted["photon_usage"]["result_stage"] = True
+            elif operator == 'PhotonProject':
+                extracted["photon_usage"]["project"] = True
+            
+            if operator.startswith('Photon') and operator.endswith('HashJoin'):
+                extracted["photon_usage"]["hash_join"] = True
         
         # 統計サマリー生成
         extracted["statistics"] = {
@@ -8258,7 +8618,7 @@ def extract_structured_cost_statistics(explain_cost_content: str) -> Dict[str, A
     }
     
     try:
-        lines = explain_cost_content.split('\n')
+        plan = parse_explain_plan(explain_cost_content)
         tables_found = costs_found = memory_found = 0
         
         # 重要統計値を追跡
@@ -8266,99 +8626,51 @@ def extract_structured_cost_statistics(explain_cost_content: str) -> Dict[str, A
         total_rows = 0
         broadcast_candidates = []
         
-        # テーブル名とサイズの対応を追跡
-        table_name_size_map = {}  # {table_name: {"size_bytes": int, "size_str": str, "rows": int}}
-        current_table_context = None  # 現在処理中のテーブル名
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        for node in plan.nodes:
+            line = node.text
             
-            # 🔍 テーブル名の抽出（Relationから）
-            table_name_match = re.search(r'Relation\s+([a-zA-Z_][a-zA-Z0-9_]*\.[a-zA-Z_][a-zA-Z0-9_]*)', line)
-            if table_name_match:
-                current_table_context = table_name_match.group(1)
-                
-            # 🔍 テーブル名の抽出（Join条件から）
-            elif 'Join' in line and '=' in line:
-                # JOIN条件からテーブル名を推定 (例: ty_brand#456 = ly_brand#789)
-                join_match = re.search(r'([a-zA-Z_][a-zA-Z0-9_]*)[#.]', line)
-                if join_match and not current_table_context:
-                    # JOIN条件のプレフィックスからテーブル推定
-                    prefix = join_match.group(1)
-                    if len(prefix) > 2:  # 意味のあるプレフィックス
-                        current_table_context = f"{prefix}_table"
-                
             # テーブル統計の抽出
-            if 'Statistics(' in line:
-                # サイズ情報の抽出
-                size_match = re.search(r'sizeInBytes=([0-9.]+)\s*([KMGT]i?B)?', line)
-                rows_match = re.search(r'rowCount=(\d+)', line)
+            if node.size_bytes is not None:
+                # テーブル名の決定（Relationはテーブル名、それ以外は演算子名）
+                relation_match = _RELATION_TABLE_RE.match(line) if node.operator == 'Relation' else None
+                table_name = relation_match.group(1) if relation_match else (node.operator or f"table_{tables_found}")
                 
-                # テーブル名の決定
-                if current_table_context:
-                    table_name = current_table_context
-                else:
-                    # フォールバック: 行番号から推定
-                    line_table_match = re.search(r'([a-zA-Z_][a-zA-Z0-9_]*)', line)
-                    table_name = line_table_match.group(1) if line_table_match else f"table_{tables_found}"
+                size_bytes = node.size_bytes
+                size_str, _ = format_plan_node_statistics(node)
+                rows = int(node.row_count) if node.row_count is not None else 0
                 
-                if size_match:
-                    size_val = float(size_match.group(1))
-                    size_unit = size_match.group(2) or 'B'
-                    size_str = f"{size_val}{size_unit}"
-                    
-                    # サイズ変換（バイト単位）
-                    size_bytes = size_val
-                    if 'KiB' in size_unit:
-                        size_bytes *= 1024
-                    elif 'MiB' in size_unit:
-                        size_bytes *= 1024 * 1024
-                    elif 'GiB' in size_unit:
-                        size_bytes *= 1024 * 1024 * 1024
-                    elif 'TiB' in size_unit:
-                        size_bytes *= 1024 * 1024 * 1024 * 1024
-                    
-                    # 行数の取得
-                    rows = int(rows_match.group(1)) if rows_match else 0
-                    
-                    # テーブル統計の保存
-                    extracted["table_stats"][table_name] = {
-                        "size_bytes": size_bytes,
-                        "size_str": size_str,
-                        "rows": rows,
-                        "is_broadcast_candidate": size_bytes < 30 * 1024 * 1024  # 30MB
-                    }
-                    
-                    # 最大テーブルの追跡
-                    if size_bytes > largest_table["size"]:
-                        largest_table = {"name": table_name, "size": size_bytes, "size_str": size_str}
-                    
-                    # ブロードキャスト候補（30MB未満）
-                    if size_bytes < 30 * 1024 * 1024:  # 30MB
-                        broadcast_candidates.append({"table": table_name, "size": size_str})
-                    
-                    tables_found += 1
-                    total_rows += rows
-                    
-                # 現在のコンテキストをリセット（次のテーブル用）
-                current_table_context = None
+                # テーブル統計の保存
+                extracted["table_stats"][table_name] = {
+                    "size_bytes": size_bytes,
+                    "size_str": size_str,
+                    "rows": rows,
+                    "is_broadcast_candidate": size_bytes < 30 * 1024 * 1024  # 30MB
+                }
+                
+                # 最大テーブルの追跡
+                if size_bytes > largest_table["size"]:
+                    largest_table = {"name": table_name, "size": size_bytes, "size_str": size_str}
+                
+                # ブロードキャスト候補（30MB未満）
+                if size_bytes < 30 * 1024 * 1024:  # 30MB
+                    broadcast_candidates.append({"table": table_name, "size": size_str})
+                
+                tables_found += 1
+                total_rows += rows
                     
             # コスト情報の抽出  
             elif 'Cost(' in line:
-                cost_match = re.search(r'Cost\(([0-9.]+)\)', line)
+                cost_match = _PLAN_COST_RE.search(line)
                 if cost_match:
                     extracted["cost_breakdown"][f"operation_{costs_found}"] = float(cost_match.group(1))
                     costs_found += 1
                     
             # メモリ関連情報の抽出
-            elif any(keyword in line.lower() for keyword in ['memory', 'spill', 'threshold']):
-                if 'memory' in line.lower():
-                    memory_match = re.search(r'(\d+(?:\.\d+)?)\s*([KMGT]i?B)', line)
-                    if memory_match:
-                        extracted["memory_estimates"][f"estimate_{memory_found}"] = f"{memory_match.group(1)}{memory_match.group(2)}"
-                        memory_found += 1
+            elif 'memory' in line.lower():
+                memory_match = _PLAN_MEMORY_SIZE_RE.search(line)
+                if memory_match:
+                    extracted["memory_estimates"][f"estimate_{memory_found}"] = f"{memory_match.group(1)}{memory_match.group(2)}"
+                    memory_found += 1
         
         # 重要統計値のまとめ
         extracted["critical_stats"] = {
@@ -8499,40 +8811,36 @@ def extract_cost_statistics_from_explain_cost(explain_cost_content: str) -> str:
     MAX_KEY_STATS = 5  # 重要統計情報の最大数
     
     try:
-        lines = explain_cost_content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        for node in parse_explain_plan(explain_cost_content).nodes:
+            line = node.text
+            lower_line = line.lower()
                 
             # テーブル統計情報の抽出（カウントのみ）
-            if 'statistics=' in line.lower() or 'stats=' in line.lower() or 'Statistics(' in line:
+            if node.size_bytes is not None or 'statistics=' in lower_line or 'stats=' in lower_line:
                 statistics_counts["テーブル統計"] += 1
-                if len(key_statistics) < MAX_KEY_STATS and 'sizeInBytes' in line:
-                    # 重要なサイズ情報のみ抽出
-                    if 'GiB' in line or 'TiB' in line:
-                        key_statistics.append(f"📊 テーブルサイズ: {line[:100]}...")
+                if len(key_statistics) < MAX_KEY_STATS and (node.size_bytes or 0) >= 1024 ** 3:
+                    # 重要なサイズ情報のみ抽出（GiB以上）
+                    key_statistics.append(f"📊 テーブルサイズ: {line[:100]}...")
             
             # 行数情報の抽出（カウントのみ）
-            elif 'rows=' in line.lower() or 'rowcount=' in line.lower() or 'rows:' in line.lower():
+            elif 'rows=' in lower_line or 'rowcount=' in lower_line or 'rows:' in lower_line:
                 statistics_counts["行数情報"] += 1
             
             # サイズ情報の抽出（カウントのみ）
-            elif ('size=' in line.lower() or 'sizeinbytes=' in line.lower() or 'sizeInBytes=' in line 
-                  or 'GB' in line or 'MB' in line or 'size:' in line.lower()):
+            elif ('size=' in lower_line or 'sizeinbytes=' in lower_line
+                  or 'GB' in line or 'MB' in line or 'size:' in lower_line):
                 statistics_counts["サイズ情報"] += 1
             
             # その他の統計情報のカウント
-            elif ('cost=' in line.lower() or 'Cost(' in line or 'cost:' in line.lower()):
+            elif 'cost=' in lower_line or 'Cost(' in line or 'cost:' in lower_line:
                 statistics_counts["コスト情報"] += 1
-            elif ('selectivity=' in line.lower() or 'filter=' in line.lower()):
+            elif 'selectivity=' in lower_line or 'filter=' in lower_line:
                 statistics_counts["選択率情報"] += 1
-            elif ('partition' in line.lower() and ('count' in line.lower() or 'size' in line.lower())):
+            elif 'partition' in lower_line and ('count' in lower_line or 'size' in lower_line):
                 statistics_counts["パーティション情報"] += 1
-            elif ('memory' in line.lower() or 'spill' in line.lower()):
+            elif 'memory' in lower_line or 'spill' in lower_line:
                 statistics_counts["メモリ情報"] += 1
-            elif ('join' in line.lower() and ('cost' in line.lower() or 'selectivity' in line.lower())):
+            elif 'join' in lower_line and ('cost' in lower_line or 'selectivity' in lower_line):
                 statistics_counts["JOIN情報"] += 1
     
     except Exception as e:
@@ -8621,7 +8929,7 @@ def parse_photon_explanation(photon_text: str) -> Dict[str, Any]:
     elements: List[str] = []
     for reason in result["reasons"]:
         # Capture function-like tokens abc(...)
-        elements += re.findall(r"([A-Za-z_][A-Za-z0-9_]*)\s*\(", reason)
+        elements += _PHOTON_REASON_FUNCTION_RE.findall(reason)
         # Capture common keywords that indicate unsupported features
         for kw in ["UDF", "Python UDF", "Scala UDF", "regex", "rlike", "regexp", "window", "offset", "map", "explode",
                    "csv", "json", "xml", "decimal", "non-deterministic", "java", "scala"]:
@@ -8751,6 +9059,7 @@ def generate_refined_query_with_previous_result(original_query: str, analysis_re
 
 **最適化クエリのみを出力してください（説明文は不要）：**
 """
+    refined_optimization_prompt += build_optimization_output_instruction()
 
     # LLM APIコール実行 - 設定されたプロバイダーを使用
     try:
@@ -8758,17 +9067,8 @@ def generate_refined_query_with_previous_result(original_query: str, analysis_re
         provider = LLM_CONFIG["provider"]
         print(f"🤖 Attempting refined optimization with {provider}...")
         
-        if provider == "databricks":
-            optimized_result = _call_databricks_llm(refined_optimization_prompt)
-        elif provider == "openai":
-            optimized_result = _call_openai_llm(refined_optimization_prompt)
-        elif provider == "azure_openai":
-            optimized_result = _call_azure_openai_llm(refined_optimization_prompt)
-        elif provider == "anthropic":
-            optimized_result = _call_anthropic_llm(refined_optimization_prompt)
-        else:
-            print(f"⚠️ Unsupported LLM provider: {provider}")
-            return f"LLM_ERROR: Unsupported LLM provider: {provider}"
+        optimized_result = _call_llm(refined_optimization_prompt, stage="sql_refinement")
+        optimized_result = normalize_structured_optimization_response(optimized_result)
         
         if optimized_result and not optimized_result.startswith("❌") and not optimized_result.startswith("Error"):
             print(f"✅ 試行2回目の最適化クエリを生成しました")
@@ -9058,7 +9358,22 @@ def generate_optimized_query_with_llm(original_query: str, analysis_result: str,
     enhanced_shuffle_summary = ""
     enhanced_shuffle_analysis = metrics.get('enhanced_shuffle_analysis', {})
     
-    if enhanced_shuffle_analysis and enhanced_shuffle_analysis.get('shuffle_nodes'):
+    compact_prompt_metrics = str(globals().get('COMPACT_PROMPT_METRICS', 'Y')).upper() == 'Y'
+    compact_top_k = globals().get('COMPACT_PROMPT_TOP_K', 5)
+    
+    if enhanced_shuffle_analysis and enhanced_shuffle_analysis.get('shuffle_nodes') and compact_prompt_metrics:
+        # 表形式（ノードはメモリ/パーティション閾値超過を優先、上位以外はothers行に集計）
+        enhanced_shuffle_summary = encode_shuffle_analysis(
+            enhanced_shuffle_analysis, compact_top_k,
+            SHUFFLE_ANALYSIS_CONFIG.get('memory_per_partition_threshold_mb', 512)
+        )
+        needs_optimization = enhanced_shuffle_analysis.get('overall_assessment', {}).get('needs_optimization', False)
+        enhanced_shuffle_summary += (
+            "\n🎯 最適化必要時: パーティション数調整（目標: target_mem/part以下）、高メモリノードのクラスター拡張、"
+            "REPARTITIONヒント（スピル検出時のみ）、Liquid ClusteringによるShuffle削減"
+            if needs_optimization else "\n✅ Shuffle操作は効率的に動作しており、特別な最適化は不要です。"
+        )
+    elif enhanced_shuffle_analysis and enhanced_shuffle_analysis.get('shuffle_nodes'):
         # Enhanced Shuffle分析結果をプロンプト用に要約
         overall_assessment = enhanced_shuffle_analysis.get('overall_assessment', {})
         shuffle_nodes = enhanced_shuffle_analysis.get('shuffle_nodes', [])
@@ -9160,9 +9475,13 @@ Shuffle効率性スコア: {efficiency_rate:.1f}%
         skewed_nodes_count = len(detailed_bottleneck["skew_analysis"]["skewed_nodes"])
         performance_critical_issues.append(f"⚖️ データスキュー: {total_skew}個のスキューパーティションが{skewed_nodes_count}個のノードで検出")
     
-    # TOP3ボトルネックノードの詳細分析
-    top3_bottlenecks = detailed_bottleneck["top_bottleneck_nodes"][:3]
-    performance_critical_issues.append("📊 TOP3処理時間ボトルネック:")
+    # TOP3ボトルネックノードの詳細分析（COMPACT_PROMPT_METRICS = 'Y' の場合は表形式、4位以下はothers行に集計）
+    top3_bottlenecks = [] if compact_prompt_metrics else detailed_bottleneck["top_bottleneck_nodes"][:3]
+    if compact_prompt_metrics:
+        performance_critical_issues.append("📊 TOP3処理時間ボトルネック（表形式、|区切り）:")
+        performance_critical_issues.append(encode_top_nodes(detailed_bottleneck["top_bottleneck_nodes"], min(compact_top_k, 3)))
+    else:
+        performance_critical_issues.append("📊 TOP3処理時間ボトルネック:")
     for node in top3_bottlenecks:
         severity_icon = "🔴" if node["severity"] == "CRITICAL" else "🟠" if node["severity"] == "HIGH" else "🟡"
         performance_critical_issues.append(f"   {severity_icon} #{node['rank']}: {node['node_name'][:60]}...")
@@ -9765,23 +10084,11 @@ FROM table1 cs
 ## 期待効果  
 [実行時間・メモリ・スピル改善の見込み（JOIN最適化効果を含む）]
 """)
+    optimization_prompt += build_optimization_output_instruction()
 
-    # 設定されたLLMプロバイダーを使用
-    provider = LLM_CONFIG["provider"]
-    
     try:
-        if provider == "databricks":
-            optimized_result = _call_databricks_llm(optimization_prompt)
-        elif provider == "openai":
-            optimized_result = _call_openai_llm(optimization_prompt)
-        elif provider == "azure_openai":
-            optimized_result = _call_azure_openai_llm(optimization_prompt)
-        elif provider == "anthropic":
-            optimized_result = _call_anthropic_llm(optimization_prompt)
-        else:
-            error_msg = "⚠️ Configured LLM provider is not recognized"
-            print(f"❌ LLM optimization error: {error_msg}")
-            return f"LLM_ERROR: {error_msg}"
+        optimized_result = _call_llm(optimization_prompt, stage="sql_optimization")
+        optimized_result = normalize_structured_optimization_response(optimized_result)
         
         # LLMレスポンスのエラーチェック（改善版：分析結果を誤ってエラーとして認識しない）
         if isinstance(optimized_result, str):
@@ -11078,27 +11385,7 @@ Please provide a concise summary in the following format (within 5000 characters
 """
 
     try:
-        # 設定されたLLMプロバイダーを使用
-        provider = LLM_CONFIG["provider"]
-        
-        if provider == "databricks":
-            summary_result = _call_databricks_llm(summarization_prompt)
-        elif provider == "openai":
-            summary_result = _call_openai_llm(summarization_prompt)
-        elif provider == "azure_openai":
-            summary_result = _call_azure_openai_llm(summarization_prompt)
-        elif provider == "anthropic":
-            summary_result = _call_anthropic_llm(summarization_prompt)
-        else:
-            # エラー時は切り詰め版を返す
-            print("❌ LLM provider error: Using truncated version")
-            return {
-                'explain_summary': explain_content[:30000] + "\n\n⚠️ 切り詰められました",
-                'explain_cost_summary': explain_cost_content[:30000] + "\n\n⚠️ 切り詰められました", 
-                'physical_plan_summary': explain_content[:20000] + "\n\n⚠️ 切り詰められました",
-                'cost_statistics_summary': extract_cost_statistics_from_explain_cost(explain_cost_content),
-                'summarized': True
-            }
+        summary_result = _call_llm(summarization_prompt, stage="explain_summary")
         
         # LLMエラーチェック
         if isinstance(summary_result, str) and summary_result.startswith("LLM_ERROR:"):
@@ -11620,56 +11907,39 @@ def generate_performance_comparison_section(performance_comparison: Dict[str, An
 💡 **Judgment Criteria**: Degradation detected if execution cost increases by 30% OR memory usage increases by 50%
 """
     
+    # ⏱️ 実行による検証結果（EXECUTION_VERIFICATION = 'Y' の場合）
+    verification = performance_comparison.get('execution_verification')
+    if verification is not None:
+        section += "\n" + format_execution_verification(verification, language) + "\n"
+    
+    # 🧮 結果の同値性チェック（RESULT_EQUIVALENCE_CHECK = 'Y' の場合）
+    equivalence = performance_comparison.get('result_equivalence')
+    if equivalence is not None:
+        section += "\n" + format_equivalence_result(equivalence, language) + "\n"
+    
     return section
 
 def translate_optimization_result_to_english(japanese_text: str) -> str:
     """
     最適化結果を日本語から英語に翻訳
-    SQLクエリ部分は変更せず、説明文のみを翻訳
+    SQLコードブロックと日本語を含まない行はそのまま保持し、日本語の説明文のみをLLMで翻訳
     """
     try:
-        print("🌐 Translating optimization result from Japanese to English...")
-        
-        translation_prompt = f"""
-以下のDatabricks SQL最適化結果を、技術的な正確性を保ちながら自然な英語に翻訳してください。
-SQLクエリ部分（```sql から ``` までの部分）は一切変更せず、そのまま保持してください。
-最適化手法の説明や効果分析の部分のみを英語に翻訳してください。
-
-【翻訳対象】
-{japanese_text}
-
-【翻訳要件】
-- SQLクエリ部分は絶対に変更しない（```sql から ``` までは完全に保持）
-- 技術的正確性を最優先
-- 自然で読みやすい英語
-- SQL用語は適切な英語表現を使用
-- 数値・パフォーマンス指標はそのまま保持
-- 最適化手法の説明は明確で実用的な英語で表現
-- ファイル構造とフォーマットは完全に保持
-
-英語翻訳結果のみを出力してください：
-"""
+        pending_chars = count_translatable_characters(japanese_text, 'en')
+        if pending_chars == 0:
+            print("✅ No Japanese text in optimization result - skipping translation")
+            return japanese_text
         
-        provider = LLM_CONFIG.get("provider", "databricks")
+        print(f"🌐 Translating optimization result from Japanese to English ({pending_chars:,} of {len(japanese_text):,} characters)...")
+        english_result = translate_free_text(
+            japanese_text, 'en', lambda prompt: _call_llm(prompt, stage="translation_en")
+        )
         
-        if provider == "databricks":
-            english_result = _call_databricks_llm(translation_prompt)
-        elif provider == "openai":
-            english_result = _call_openai_llm(translation_prompt)
-        elif provider == "azure_openai":
-            english_result = _call_azure_openai_llm(translation_prompt)
-        elif provider == "anthropic":
-            english_result = _call_anthropic_llm(translation_prompt)
-        else:
-            print("❌ Unsupported LLM provider for translation")
-            return japanese_text
-            
-        if english_result and not english_result.startswith("LLM_ERROR:"):
+        if english_result != japanese_text:
             print("✅ Translation to English completed successfully")
-            return english_result
         else:
             print("⚠️ Translation failed, returning original Japanese result")
-            return japanese_text
+        return english_result
             
     except Exception as e:
         print(f"❌ Translation error: {str(e)}")
@@ -11678,47 +11948,24 @@ SQLクエリ部分（```sql から ``` までの部分）は一切変更せず
 def translate_analysis_to_japanese(english_text: str) -> str:
     """
     LLMを使用して英語の分析結果を日本語に翻訳
+    コードブロックと日本語を含む行はそのまま保持し、英語の説明文のみを翻訳
+    （analyze_bottlenecks_with_llm の分析結果は OUTPUT_LANGUAGE で直接生成されるため翻訳不要）
     """
     try:
-        print("🌐 Translating analysis result to Japanese...")
-        
-        translation_prompt = f"""
-以下の英語のSQL分析結果を、技術的な正確性を保ちながら自然な日本語に翻訳してください。
-専門用語は適切な日本語に翻訳し、数値やメトリクス名はそのまま保持してください。
-
-【翻訳対象】
-{english_text}
-
-【翻訳要件】
-- 技術的正確性を最優先
-- 自然で読みやすい日本語
-- SQL用語は適切な日本語表現を使用
-- 数値・パフォーマンス指標はそのまま保持
-- 推奨事項は実用的な日本語で表現
-
-日本語翻訳結果のみを出力してください：
-"""
-        
-        provider = LLM_CONFIG.get("provider", "databricks")
-        
-        if provider == "databricks":
-            japanese_result = _call_databricks_llm(translation_prompt)
-        elif provider == "openai":
-            japanese_result = _call_openai_llm(translation_prompt)
-        elif provider == "azure_openai":
-            japanese_result = _call_azure_openai_llm(translation_prompt)
-        elif provider == "anthropic":
-            japanese_result = _call_anthropic_llm(translation_prompt)
-        else:
-            print(f"⚠️ Unknown LLM provider: {provider}, skipping translation")
+        pending_chars = count_translatable_characters(english_text, 'ja')
+        if pending_chars == 0:
             return english_text
         
-        if japanese_result and japanese_result.strip():
+        print(f"🌐 Translating analysis result to Japanese ({pending_chars:,} of {len(english_text):,} characters)...")
+        japanese_result = translate_free_text(
+            english_text, 'ja', lambda prompt: _call_llm(prompt, stage="translation_ja")
+        )
+        
+        if japanese_result != english_text:
             print("✅ Translation to Japanese completed")
-            return japanese_result.strip()
         else:
             print("⚠️ Translation failed, using original English text")
-            return english_text
+        return japanese_result
             
     except Exception as e:
         print(f"⚠️ Translation error: {str(e)}, using original English text")
@@ -11772,6 +12019,8 @@ def format_trial_history_summary(optimization_attempts: list, language: str = 'j
             'excessive_joins': 'JOIN操作増加',
             'cost_increase': 'コスト増加',
             'memory_increase': 'メモリ増加', 
+            'operator_regression': '演算子の推定値悪化',
+            'join_strategy_change': 'JOIN戦略変化',
             'optimization_backfire': '最適化逆効果',
             'analysis_error': '分析エラー',
             'no_degradation': '悪化なし',
@@ -11781,6 +12030,8 @@ def format_trial_history_summary(optimization_attempts: list, language: str = 'j
             'excessive_joins': 'Excessive JOIN operations',
             'cost_increase': 'Cost increase',
             'memory_increase': 'Memory increase',
+            'operator_regression': 'Operator estimate regression',
+            'join_strategy_change': 'Join strategy change',
             'optimization_backfire': 'Optimization backfire', 
             'analysis_error': 'Analysis error',
             'no_degradation': 'No degradation',
@@ -12049,9 +12300,7 @@ def generate_comprehensive_optimization_report(query_id: str, optimized_result:
     signature_pattern = r"'signature':\s*'[A-Za-z0-9+/=]{100,}'"
     analysis_result_str = re.sub(signature_pattern, "'signature': '[REMOVED]'", analysis_result_str)
     
-    # 日本語出力の場合、analysis_result_strをLLMで日本語に翻訳
-    if OUTPUT_LANGUAGE == 'ja' and analysis_result_str and analysis_result_str.strip():
-        analysis_result_str = translate_analysis_to_japanese(analysis_result_str)
+    # 分析結果は analyze_bottlenecks_with_llm が OUTPUT_LANGUAGE で直接生成するため、LLM翻訳は行わない
     
     # レポートの構成
     if OUTPUT_LANGUAGE == 'ja':
@@ -13059,22 +13308,9 @@ def refine_report_with_llm(raw_report: str, query_id: str) -> str:
     
     print("🤖 Executing LLM-based report refinement...")
     
-    # 🚨 トークン制限対策: レポートサイズ制限
-    MAX_REPORT_SIZE = 50000  # 50KB制限
-    original_size = len(raw_report)
-    
-    if original_size > MAX_REPORT_SIZE:
-        print(f"⚠️ Report size too large: {original_size:,} characters → truncated to {MAX_REPORT_SIZE:,} characters")
-        # 重要セクションを優先的に保持
-        truncated_report = raw_report[:MAX_REPORT_SIZE]
-        truncated_report += f"\n\n⚠️ レポートが大きすぎるため、{MAX_REPORT_SIZE:,} 文字に切り詰められました（元サイズ: {original_size:,} 文字）"
-        raw_report = truncated_report
-    else:
-        print(f"📊 Report size: {original_size:,} characters (executing refinement)")
-    
-    # 言語に応じてプロンプトを切り替え
+    # 言語に応じてプロンプトを切り替え（レポートはセクション単位で推敲するため切り詰めない）
     if OUTPUT_LANGUAGE == 'ja':
-        refinement_prompt = f"""
+        refinement_rules = """
 技術文書の編集者として、Databricks SQLパフォーマンス分析レポートを以下のルールに従って推敲してください。
 
 【見出しの骨子（出力に例文を含めないこと）]
@@ -13103,16 +13339,9 @@ def refine_report_with_llm(raw_report: str, query_id: str) -> str:
 - 数値は元の値を保持し、誤った再計算をしない
 - 主要指標テーブルにPhoton利用率の評価行を必ず含める
 - 「統計ベース最適化効果」やそれに準じる効果比較表は出力しない（見出し、列名、数値例のいずれも禁止）
-
-【入力レポート】
-```
-{raw_report}
-```
-
-上記ルールに従って推敲し、テンプレート文や例示テキストを一切含まない最終レポートを出力してください。
 """
     else:
-        refinement_prompt = f"""
+        refinement_rules = """
 As a technical document editor, refine the Databricks SQL performance analysis report according to these rules.
 
 [Heading Outline (do not include examples in output)]
@@ -13131,70 +13360,123 @@ As a technical document editor, refine the Databricks SQL performance analysis r
 - Preserve numeric values exactly
 - Include a Photon utilization evaluation row in the KPI table
 - Do not include the "Effects of Statistics-Based Optimization" table or any similar comparative effect tables (prohibit related headings, columns, and example numbers)
+"""
+    
+    try:
+        refined_report = refine_report_by_section(
+            raw_report, lambda section: build_section_refinement_prompt(refinement_rules, section), "report_refinement"
+        )
+        print(f"✅ LLM-based report refinement completed (Query ID: {query_id})")
+        return refined_report
+        
+    except Exception as e:
+        print(f"⚠️ Error occurred during LLM-based report refinement: {str(e)}")
+        print("📄 Returning original report")
+        return raw_report
+
+
+def is_report_refinement_error(refined_text: str) -> bool:
+    """
+    Detect LLM error messages in a refinement response (distinguished from report emojis)
+    """
+    actual_error_indicators = [
+        "APIエラー: ステータスコード",
+        "Input is too long for requested model",
+        "Bad Request",
+        "タイムアウトエラー:",
+        "API呼び出しエラー:",
+        'レスポンス: {"error_code":',
+        "❌ APIエラー:",
+        "⚠️ APIエラー:",
+        "API call error:",
+        "❌ API Error:",
+        "⏰ Timeout Error:"
+    ]
+    
+    # エラーメッセージの開始部分をチェック（先頭500文字以内）
+    return any(
+        refined_text.strip().startswith(indicator) or f"\n{indicator}" in refined_text[:500]
+        for indicator in actual_error_indicators
+    )
+
+
+def build_section_refinement_prompt(refinement_rules: str, section: str) -> str:
+    """
+    Refinement prompt of one report section: the shared editing rules followed by the section
+    The prompt depends only on the rules and the section, so unchanged sections are answered from the response cache
+    """
+    if OUTPUT_LANGUAGE == 'ja':
+        return f"""{refinement_rules}
+【対象セクション】
+以下は大きなレポートの1セクションです。このセクションのみを上記ルールに従って推敲し、推敲後のセクションのみを出力してください。
+- 先頭の見出しはそのまま保持し、他セクションの内容を追加しない
+- テンプレート文や例示テキスト、説明文を一切含めない
 
-[Input Report]
 ```
-{raw_report}
+{section}
 ```
+"""
+    return f"""{refinement_rules}
+[Target Section]
+The following is one section of a larger report. Refine only this section following the rules above and output only the refined section.
+- Keep its leading heading unchanged and do not add content from other sections
+- Do not include any template/example text or explanations
 
-Output the refined report following the rules above, without including any template/example text.
+```
+{section}
+```
 """
+
+
+def refine_report_by_section(report: str, build_prompt, stage: str) -> str:
+    """
+    Refine a report section by section: split at # / ## headings (sections over REPORT_SECTION_MAX_CHARS between paragraphs),
+    concurrent LLM calls with a token budget per section, results reassembled in report order
+    Sections whose prompt was answered before come from the dispatcher's response cache; failed sections keep the original text
+    """
+    max_chars = globals().get('REPORT_SECTION_MAX_CHARS', 12000)
+    section_count = sum(1 for section in split_report_sections(report, max_chars=max_chars) if section.strip())
+    print(f"📊 Report size: {len(report):,} characters → {section_count} sections (refined in parallel)")
     
-    try:
-        provider = LLM_CONFIG.get("provider", "databricks")
-        
-        if provider == "databricks":
-            refined_report = _call_databricks_llm(refinement_prompt)
-        elif provider == "openai":
-            refined_report = _call_openai_llm(refinement_prompt)
-        elif provider == "azure_openai":
-            refined_report = _call_azure_openai_llm(refinement_prompt)
-        elif provider == "anthropic":
-            refined_report = _call_anthropic_llm(refinement_prompt)
-        else:
-            raise ValueError(f"Unsupported LLM provider: {provider}")
-        
-        # 🚨 LLMエラーレスポンスの検出（精密化）
-        if isinstance(refined_report, str):
-            # より精密なエラー検出（レポート内容の絵文字と区別）
-            actual_error_indicators = [
-                "APIエラー: ステータスコード",
-                "Input is too long for requested model",
-                "Bad Request",
-                "タイムアウトエラー:",
-                "API呼び出しエラー:",
-                'レスポンス: {"error_code":',
-                "❌ APIエラー:",
-                "⚠️ APIエラー:"
-            ]
-            
-            # エラーメッセージの開始部分をチェック（より厳密）
-            is_error_response = any(
-                refined_report.strip().startswith(indicator) or 
-                f"\n{indicator}" in refined_report[:500]  # 先頭500文字以内でのエラーメッセージ
-                for indicator in actual_error_indicators
-            )
-            
-            if is_error_response:
-                print(f"❌ Error detected in LLM report refinement: {refined_report[:200]}...")
-                print("📄 Returning original report")
-                return raw_report
+    signature_pattern = r"'signature':\s*'[A-Za-z0-9+/=]{100,}'"
+    failed_sections = []
+    
+    def refine(section: str, budget: int):
+        heading = section.strip().split("\n", 1)[0][:80]
+        # _call_llm はエラーを本文として返すため、ディスパッチャを直接呼び出して例外で失敗を判定する
+        try:
+            refined_section = get_notebook_llm_dispatcher().dispatch(build_prompt(section), stage=stage, max_tokens=budget)
+        except Exception as e:
+            print(f"⚠️ Section refinement failed ({heading}): {str(e)}")
+            failed_sections.append(heading)
+            return None
         
         # thinking_enabled対応
-        if isinstance(refined_report, list):
-            refined_report = format_thinking_response(refined_report)
+        if isinstance(refined_section, list):
+            refined_section = format_thinking_response(refined_section)
         
-        # signature情報の除去
-        signature_pattern = r"'signature':\s*'[A-Za-z0-9+/=]{100,}'"
-        refined_report = re.sub(signature_pattern, "'signature': '[REMOVED]'", refined_report)
+        if not isinstance(refined_section, str) or not refined_section.strip() or is_report_refinement_error(refined_section):
+            failed_sections.append(heading)
+            return None
         
-        print(f"✅ LLM-based report refinement completed (Query ID: {query_id})")
-        return refined_report
+        # 推敲結果全体がコードブロックで囲まれている場合は外す
+        fenced = re.match(r"^\s*```[a-z]*\n(.*)\n```\s*$", refined_section, re.DOTALL)
+        if fenced:
+            refined_section = fenced.group(1)
         
-    except Exception as e:
-        print(f"⚠️ Error occurred during LLM-based report refinement: {str(e)}")
-        print("📄 Returning original report")
-        return raw_report
+        # signature情報の除去
+        return re.sub(signature_pattern, "'signature': '[REMOVED]'", refined_section)
+    
+    records_before = len(_llm_call_records)
+    refined_report = refine_report_sections(
+        report, refine, max_workers=LLM_CONFIG.get("max_concurrency", 4), max_chars=max_chars
+    )
+    cache_hits = sum(1 for record in _llm_call_records[records_before:] if record.stage == stage and record.cache_hit)
+    
+    if failed_sections:
+        print(f"⚠️ {len(failed_sections)} section(s) kept unrefined after LLM errors: {', '.join(failed_sections)}")
+    print(f"✂️ Sections refined: {section_count - len(failed_sections)}/{section_count} ({cache_hits} from cache)")
+    return refined_report
 
 def validate_and_fix_sql_syntax(sql_query: str) -> str:
     """
@@ -13250,28 +13532,22 @@ def fix_broadcast_hint_placement(sql_query: str) -> str:
     
     # サブクエリ内部のBROADCASTヒントを検出と削除
     # パターン1: LEFT JOIN (SELECT /*+ BROADCAST(...) */ ... のパターン
-    subquery_broadcast_pattern = r'JOIN\s*\(\s*SELECT\s*/\*\+\s*BROADCAST\([^)]+\)\s*\*/'
-    sql_query = re.sub(subquery_broadcast_pattern, 'JOIN (\n  SELECT', sql_query, flags=re.IGNORECASE)
+    sql_query = _SUBQUERY_BROADCAST_HINT_RE.sub('JOIN (\n  SELECT', sql_query)
     
     # パターン2: WITH句やサブクエリ内部のBROADCASTヒント
-    cte_broadcast_pattern = r'(WITH\s+\w+\s+AS\s*\(\s*SELECT\s*)/\*\+\s*BROADCAST\([^)]+\)\s*\*/'
-    sql_query = re.sub(cte_broadcast_pattern, r'\1', sql_query, flags=re.IGNORECASE)
+    sql_query = _CTE_BROADCAST_HINT_RE.sub(r'\1', sql_query)
     
     # パターン3: FROM句内のBROADCASTヒント
-    from_broadcast_pattern = r'FROM\s+\w+\s*/\*\+\s*BROADCAST\([^)]+\)\s*\*/'
-    sql_query = re.sub(from_broadcast_pattern, 'FROM', sql_query, flags=re.IGNORECASE)
+    sql_query = _FROM_BROADCAST_HINT_RE.sub('FROM', sql_query)
     
     # パターン4: WHERE句内のBROADCASTヒント
-    where_broadcast_pattern = r'WHERE\s*/\*\+\s*BROADCAST\([^)]+\)\s*\*/'
-    sql_query = re.sub(where_broadcast_pattern, 'WHERE', sql_query, flags=re.IGNORECASE)
+    sql_query = _WHERE_BROADCAST_HINT_RE.sub('WHERE', sql_query)
     
     # DISTINCT句の存在確認（大文字小文字を区別しない）
-    distinct_pattern = r'^\s*SELECT\s*(/\*\+[^*]*\*/)?\s*DISTINCT\b'
-    has_distinct = bool(re.search(distinct_pattern, sql_query, re.IGNORECASE))
+    has_distinct = bool(_SELECT_DISTINCT_RE.search(sql_query))
     
     # BROADCASTヒントがメインクエリのSELECT直後にあるかチェック
-    main_select_pattern = r'^\s*SELECT\s*(/\*\+[^*]*\*/)?\s*(DISTINCT\s*)?'
-    if not re.search(main_select_pattern, sql_query, re.IGNORECASE):
+    if not _MAIN_SELECT_HINT_RE.search(sql_query):
         # メインクエリのSELECT直後にBROADCASTヒントがない場合の処理
         # 削除されたBROADCASTヒントを復元してメインクエリに配置
         broadcast_tables = extract_broadcast_tables_from_sql(sql_query)
@@ -13279,17 +13555,16 @@ def fix_broadcast_hint_placement(sql_query: str) -> str:
             broadcast_hint = f"/*+ BROADCAST({', '.join(broadcast_tables)}) */"
             if has_distinct:
                 # DISTINCT句がある場合：SELECT /*+ BROADCAST(...) */ DISTINCT の形式にする
-                sql_query = re.sub(r'^\s*SELECT\s*', f'SELECT {broadcast_hint} ', sql_query, flags=re.IGNORECASE)
+                sql_query = _LEADING_SELECT_RE.sub(f'SELECT {broadcast_hint} ', sql_query)
             else:
                 # DISTINCT句がない場合：従来の形式
-                sql_query = re.sub(r'^\s*SELECT\s*', f'SELECT {broadcast_hint}\n  ', sql_query, flags=re.IGNORECASE)
+                sql_query = _LEADING_SELECT_RE.sub(f'SELECT {broadcast_hint}\n  ', sql_query)
     else:
         # 既にヒントがある場合、DISTINCT句が正しい位置にあるか確認
         # 間違った順序（SELECT DISTINCT /*+ BROADCAST(...) */ ）を修正
-        wrong_order_pattern = r'^\s*SELECT\s*DISTINCT\s*(/\*\+[^*]*\*/)'
-        if re.search(wrong_order_pattern, sql_query, re.IGNORECASE):
+        if _DISTINCT_BEFORE_HINT_RE.search(sql_query):
             # 間違った順序を修正：SELECT DISTINCT /*+ HINT */ → SELECT /*+ HINT */ DISTINCT
-            sql_query = re.sub(wrong_order_pattern, lambda m: f'SELECT {m.group(1)} DISTINCT', sql_query, flags=re.IGNORECASE)
+            sql_query = _DISTINCT_BEFORE_HINT_RE.sub(lambda m: f'SELECT {m.group(1)} DISTINCT', sql_query)
     
     return sql_query
 
@@ -13302,8 +13577,7 @@ def fix_join_broadcast_hint_placement(sql_query: str) -> str:
     
     try:
         # JOIN句内のBROADCASTヒントを検出・抽出
-        join_broadcast_pattern = r'JOIN\s+/\*\+\s*BROADCAST\(([^)]+)\)\s*\*/\s*(\w+)'
-        join_broadcast_matches = re.findall(join_broadcast_pattern, sql_query, re.IGNORECASE | re.MULTILINE)
+        join_broadcast_matches = _JOIN_BROADCAST_HINT_RE.findall(sql_query)
         
         if not join_broadcast_matches:
             # JOIN句内のBROADCASTヒントがない場合はそのまま返す
@@ -13326,41 +13600,28 @@ def fix_join_broadcast_hint_placement(sql_query: str) -> str:
         print(f"📋 BROADCAST targets: {', '.join(broadcast_tables)}")
         
         # JOIN句内のBROADCASTヒントを削除
-        fixed_query = re.sub(
-            r'JOIN\s+/\*\+\s*BROADCAST\([^)]+\)\s*\*/\s*',
-            'JOIN ',
-            sql_query,
-            flags=re.IGNORECASE | re.MULTILINE
-        )
+        fixed_query = _JOIN_BROADCAST_HINT_STRIP_RE.sub('JOIN ', sql_query)
         
         # メインクエリの最初のSELECT文を検出
-        select_pattern = r'^(\s*SELECT)\s+'
-        select_match = re.search(select_pattern, fixed_query, re.IGNORECASE | re.MULTILINE)
+        select_match = _SELECT_LINE_RE.search(fixed_query)
         
         if select_match:
             # 既存のヒント句があるかチェック
-            existing_hint_pattern = r'^(\s*SELECT)\s+(/\*\+[^*]*\*/)\s+'
-            existing_hint_match = re.search(existing_hint_pattern, fixed_query, re.IGNORECASE | re.MULTILINE)
+            existing_hint_match = _SELECT_WITH_HINT_RE.search(fixed_query)
             
             if existing_hint_match:
                 # 既存のヒント句にBROADCASTを追加
                 existing_hint = existing_hint_match.group(2)
                 
                 # 既存のBROADCAST指定を確認
-                existing_broadcast_pattern = r'BROADCAST\(([^)]+)\)'
-                existing_broadcast_match = re.search(existing_broadcast_pattern, existing_hint, re.IGNORECASE)
+                existing_broadcast_match = _BROADCAST_HINT_ARGS_RE.search(existing_hint)
                 
                 if existing_broadcast_match:
                     # 既存のBROADCAST指定に追加
                     existing_broadcast_tables = [t.strip() for t in existing_broadcast_match.group(1).split(',')]
                     all_broadcast_tables = list(set(existing_broadcast_tables + broadcast_tables))
                     new_broadcast = f"BROADCAST({', '.join(all_broadcast_tables)})"
-                    new_hint = re.sub(
-                        r'BROADCAST\([^)]+\)',
-                        new_broadcast,
-                        existing_hint,
-                        flags=re.IGNORECASE
-                    )
+                    new_hint = _BROADCAST_HINT_ARGS_RE.sub(new_broadcast, existing_hint)
                 else:
                     # 既存のヒント句にBROADCASTを追加
                     broadcast_hint = f"BROADCAST({', '.join(broadcast_tables)})"
@@ -13368,21 +13629,11 @@ def fix_join_broadcast_hint_placement(sql_query: str) -> str:
                     new_hint = existing_hint.replace('*/', f', {broadcast_hint} */')
                 
                 # ヒント句を置換
-                fixed_query = re.sub(
-                    r'^(\s*SELECT)\s+(/\*\+[^*]*\*/)\s+',
-                    f'{select_match.group(1)} {new_hint} ',
-                    fixed_query,
-                    flags=re.IGNORECASE | re.MULTILINE
-                )
+                fixed_query = _SELECT_WITH_HINT_RE.sub(f'{select_match.group(1)} {new_hint} ', fixed_query)
             else:
                 # 新しくヒント句を追加
                 broadcast_hint = f"/*+ BROADCAST({', '.join(broadcast_tables)}) */"
-                fixed_query = re.sub(
-                    r'^(\s*SELECT)\s+',
-                    f'{select_match.group(1)} {broadcast_hint} ',
-                    fixed_query,
-                    flags=re.IGNORECASE | re.MULTILINE
-                )
+                fixed_query = _SELECT_LINE_RE.sub(f'{select_match.group(1)} {broadcast_hint} ', fixed_query)
             
             print(f"✅ Completed moving BROADCAST hints to correct positions")
             return fixed_query
@@ -13455,16 +13706,16 @@ def fallback_performance_evaluation(original_explain: str, optimized_explain: st
             }
             
             # JOIN操作カウント
-            metrics['join_count'] = len(re.findall(r'\bJoin\b|\bBroadcastHashJoin\b|\bSortMergeJoin\b', explain_text, re.IGNORECASE))
+            metrics['join_count'] = len(_PLAN_JOIN_WORD_RE.findall(explain_text))
             
             # SCAN操作カウント
-            metrics['scan_count'] = len(re.findall(r'\bScan\b|\bFileScan\b|\bTableScan\b', explain_text, re.IGNORECASE))
+            metrics['scan_count'] = len(_PLAN_SCAN_WORD_RE.findall(explain_text))
             
             # Exchange操作カウント（Shuffle）
-            metrics['exchange_count'] = len(re.findall(r'\bExchange\b|\bShuffle\b', explain_text, re.IGNORECASE))
+            metrics['exchange_count'] = len(_PLAN_EXCHANGE_WORD_RE.findall(explain_text))
             
             # Photon操作カウント
-            metrics['photon_ops'] = len(re.findall(r'\bPhoton\w*\b', explain_text, re.IGNORECASE))
+            metrics['photon_ops'] = len(_PLAN_PHOTON_WORD_RE.findall(explain_text))
             
             # プラン深度の推定（インデント数の最大値）
             lines = explain_text.split('\n')
@@ -14443,23 +14694,11 @@ def generate_improved_query_for_performance_degradation(original_query: str, ana
 ## 改善詳細
 [悪化原因の解決方法と期待される性能改善の説明]
 """)
+    performance_improvement_prompt += build_optimization_output_instruction()
 
-    # 設定されたLLMプロバイダーを使用
-    provider = LLM_CONFIG["provider"]
-    
     try:
-        if provider == "databricks":
-            improved_result = _call_databricks_llm(performance_improvement_prompt)
-        elif provider == "openai":
-            improved_result = _call_openai_llm(performance_improvement_prompt)
-        elif provider == "azure_openai":
-            improved_result = _call_azure_openai_llm(performance_improvement_prompt)
-        elif provider == "anthropic":
-            improved_result = _call_anthropic_llm(performance_improvement_prompt)
-        else:
-            error_msg = "⚠️ Configured LLM provider is not recognized"
-            print(f"❌ LLM performance improvement error: {error_msg}")
-            return f"LLM_ERROR: {error_msg}"
+        improved_result = _call_llm(performance_improvement_prompt, stage="performance_improvement")
+        improved_result = normalize_structured_optimization_response(improved_result)
         
         # LLMレスポンスのエラーチェック
         if isinstance(improved_result, str):
@@ -14739,22 +14978,11 @@ FROM store_sales ss
 [エラーの原因と修正方法、および最適化要素保持の説明]
 """)
 
-    # 設定されたLLMプロバイダーを使用
-    provider = LLM_CONFIG["provider"]
-    
+    error_feedback_prompt += build_optimization_output_instruction(candidate_count=1)
+
     try:
-        if provider == "databricks":
-            optimized_result = _call_databricks_llm(error_feedback_prompt)
-        elif provider == "openai":
-            optimized_result = _call_openai_llm(error_feedback_prompt)
-        elif provider == "azure_openai":
-            optimized_result = _call_azure_openai_llm(error_feedback_prompt)
-        elif provider == "anthropic":
-            optimized_result = _call_anthropic_llm(error_feedback_prompt)
-        else:
-            error_msg = "⚠️ 設定されたLLMプロバイダーが認識できません"
-            print(f"❌ LLM error correction error: {error_msg}")
-            return f"LLM_ERROR: {error_msg}"
+        optimized_result = _call_llm(error_feedback_prompt, stage="sql_error_correction")
+        optimized_result = normalize_structured_optimization_response(optimized_result)
         
         # LLMレスポンスのエラーチェック（重要）
         if isinstance(optimized_result, str):
@@ -14947,15 +15175,8 @@ def calculate_comprehensive_cost_ratio(original_metrics, optimized_metrics):
     """
     すべてのメトリクスを考慮した総合コスト比率を計算
     """
-    # メトリクス重み設定（重要度に基づく）
-    weights = {
-        'data_processing_weight': 0.25,    # データサイズ + 行数
-        'operation_complexity_weight': 0.20, # スキャン + JOIN操作
-        'memory_efficiency_weight': 0.20,   # メモリ予測 + スピルリスク
-        'spill_management_weight': 0.15,    # スピル推定 + メモリ圧迫（新規追加）
-        'parallelism_weight': 0.12,         # シャッフルパーティション
-        'partitioning_efficiency_weight': 0.08  # ハッシュパーティション効率
-    }
+    # メトリクス重み設定（校正済みモデルがあれば実測値から学習した重み、なければデフォルト 0.25/0.20/0.20/0.15/0.12/0.08）
+    weights = {f"{component}_weight": weight for component, weight in get_cost_model_weights().items()}
     
     # 🚨 詳細ログ出力開始
     print("\n" + "="*80)
@@ -15768,203 +15989,150 @@ def compare_query_performance(original_explain_cost: str, optimized_explain_cost
             }
 
 
-            # ユニット付きサイズをバイトに変換
-            def parse_size_to_bytes(value_str, unit_str):
-                try:
-                    val = float(value_str)
-                except Exception:
-                    return 0
-                unit = (unit_str or '').lower()
-                if unit in ('b', ''):
-                    return int(val)
-                if unit in ('kb', 'kib'):
-                    return int(val * 1024)
-                if unit in ('mb', 'mib'):
-                    return int(val * 1024**2)
-                if unit in ('gb', 'gib'):
-                    return int(val * 1024**3)
-                if unit in ('tb', 'tib'):
-                    return int(val * 1024**4)
-                return int(val)
-
-            # Optimized Logical Planの統計から最大サイズ/行数を抽出（重複加算防止）
+            plan = parse_explain_plan(explain_cost_text)
+
+            # 統計から最大サイズ/行数を抽出（重複加算防止）
             max_size_bytes = 0
             max_row_count = 0.0
-            stats_iter = re.finditer(r"Statistics\(sizeInBytes=\s*([0-9.]+)\s*([KMGT]?i?B),\s*rowCount=\s*([0-9.Ee+\-]+)", explain_cost_text)
-            for m in stats_iter:
-                size_bytes = parse_size_to_bytes(m.group(1), m.group(2))
-                try:
-                    rows_val = float(m.group(3))
-                except Exception:
-                    rows_val = 0.0
-                if size_bytes > max_size_bytes:
-                    max_size_bytes = size_bytes
-                if rows_val > max_row_count:
-                    max_row_count = rows_val
-
-            # 旧来のサイズ抽出（バックアップ）: 数字のみ抽出した合計だと過大なので使用は最小限
-            total_size_bytes_sum = 0
-            size_patterns = [
-                r'size_bytes["\s]*[:=]\s*([0-9.]+)',
-                r'sizeInBytes["\s]*[:=]\s*([0-9.]+)'
-            ]
-            for pattern in size_patterns:
-                matches = re.findall(pattern, explain_cost_text, re.IGNORECASE)
-                for match in matches:
-                    try:
-                        total_size_bytes_sum += float(match)
-                    except Exception:
-                        continue
-
-            # 行数を抽出（バックアップ）
-            total_rows_max_fallback = 0
-            row_patterns = [
-                r'rowCount["\s]*[:=]\s*([0-9.Ee+\-]+)',
-                r'rows["\s]*[:=]\s*([0-9]+)',
-                r'numRows["\s]*[:=]\s*([0-9]+)'
-            ]
-            for pattern in row_patterns:
-                matches = re.findall(pattern, explain_cost_text, re.IGNORECASE)
-                for match in matches:
-                    try:
-                        total_rows_max_fallback = max(total_rows_max_fallback, float(match))
-                    except Exception:
-                        continue
+            for node in plan.nodes:
+                if node.size_bytes is not None and node.size_bytes > max_size_bytes:
+                    max_size_bytes = node.size_bytes
+                if node.row_count is not None and node.row_count > max_row_count:
+                    max_row_count = node.row_count
 
             # 決定値の設定（優先度: 統計の最大値 > フォールバック）
             if max_size_bytes > 0:
                 metrics['total_size_bytes'] = max_size_bytes
             else:
+                # 旧来のサイズ抽出（バックアップ）: 数字のみ抽出した合計だと過大なので使用は最小限
+                total_size_bytes_sum = 0
+                for match in _COST_SIZE_FALLBACK_RE.findall(explain_cost_text):
+                    try:
+                        total_size_bytes_sum += float(match)
+                    except ValueError:
+                        continue
                 metrics['total_size_bytes'] = int(total_size_bytes_sum)
 
             if max_row_count > 0:
                 metrics['total_rows'] = int(max_row_count)
             else:
+                # 行数を抽出（バックアップ）
+                total_rows_max_fallback = 0
+                for match in _COST_ROWS_FALLBACK_RE.finditer(explain_cost_text):
+                    try:
+                        total_rows_max_fallback = max(total_rows_max_fallback, float(next(g for g in match.groups() if g)))
+                    except (StopIteration, ValueError):
+                        continue
                 metrics['total_rows'] = int(total_rows_max_fallback)
 
             # メモリ予測値（保守的に最大推定値を利用）
-            memory_patterns = [
-                r'memorySize["\s]*[:=]\s*([0-9.]+)',
-                r'memory["\s]*[:=]\s*([0-9.]+)'
-            ]
             memory_candidates = []
-            for pattern in memory_patterns:
-                matches = re.findall(pattern, explain_cost_text, re.IGNORECASE)
-                for match in matches:
-                    try:
-                        memory_candidates.append(float(match))
-                    except Exception:
-                        continue
+            for match in _COST_MEMORY_RE.findall(explain_cost_text):
+                try:
+                    memory_candidates.append(float(match))
+                except ValueError:
+                    continue
             metrics['memory_estimates'] = max(memory_candidates) if memory_candidates else 0
             
-            # 旧ロジックでのメモリ加算は過大になり得るため削除（最大値に統一）
-            # （保持意図がある場合はコメントを外して併用検討）
-            
-            # スキャン・JOIN・Exchange操作数をカウント
-            metrics['scan_operations'] = len(re.findall(r'Scan|FileScan|TableScan', explain_cost_text, re.IGNORECASE))
-            metrics['join_operations'] = len(re.findall(r'Join|HashJoin|SortMergeJoin', explain_cost_text, re.IGNORECASE))
-            metrics['exchange_count'] = len(re.findall(r'\bExchange\b|\bShuffle\b', explain_cost_text, re.IGNORECASE))
+            # スキャン・JOIN・Exchange・Photon演算子数を演算子ツリーからカウント
+            other_ops_count = 0
+            photon_operator_count = 0
+            join_operators = set()
+            partition_nodes = []
+            for node in plan.nodes:
+                operator = node.operator.lower()
+                if operator.startswith('photon'):
+                    photon_operator_count += 1
+                    operator = operator[len('photon'):]
+                if 'scan' in operator:
+                    metrics['scan_operations'] += 1
+                elif 'join' in operator:
+                    metrics['join_operations'] += 1
+                    join_operators.add(operator)
+                elif 'exchange' in operator or 'shuffle' in operator:
+                    metrics['exchange_count'] += 1
+                elif operator in _COST_OTHER_OPERATORS:
+                    other_ops_count += 1
+                if 'partition' in node.text.lower():
+                    partition_nodes.append(node.text)
             
             # Photon演算子検出と利用度（密度）
-            photon_operator_count = len(re.findall(r'\bPhoton\w+\b', explain_cost_text, re.IGNORECASE))
-            # 代表的なオペレータも含めた概算の総オペレータ数
-            other_ops_count = len(re.findall(r'\b(Aggregate|HashAggregate|GroupingAggregate|Project|Filter|Sort|Limit|TopK|Window|Union|Repartition|Coalesce|Broadcast|Subquery|Expand|Generate|CollectLimit|TakeOrderedAndProject)\b', explain_cost_text, re.IGNORECASE))
             total_operator_count = metrics['scan_operations'] + metrics['join_operations'] + metrics['exchange_count'] + other_ops_count
             metrics['photon_operator_count'] = photon_operator_count
             metrics['total_operator_count'] = total_operator_count
             metrics['photon_operator_ratio'] = photon_operator_count / max(total_operator_count, 1)
-            metrics['photon_detected'] = photon_operator_count > 0 or bool(re.search(r'IS_PHOTON["\s]*[:=]\s*true', explain_cost_text, re.IGNORECASE))
+            metrics['photon_detected'] = photon_operator_count > 0 or bool(_COST_IS_PHOTON_RE.search(explain_cost_text))
             
             # JOIN戦略を検出（Broadcast/Shuffle/SortMerge/Unknown）
-            if re.search(r'PhotonBroadcastHashJoin|BroadcastHashJoin', explain_cost_text, re.IGNORECASE):
+            if any('broadcasthashjoin' in op for op in join_operators):
                 metrics['join_strategy'] = 'broadcast'
-            elif re.search(r'PhotonShuffledHashJoin|ShuffledHashJoin', explain_cost_text, re.IGNORECASE):
+            elif any('shuffledhashjoin' in op for op in join_operators):
                 metrics['join_strategy'] = 'shuffle'
-            elif re.search(r'SortMergeJoin', explain_cost_text, re.IGNORECASE):
+            elif any('sortmergejoin' in op for op in join_operators):
                 metrics['join_strategy'] = 'sortmerge'
             else:
                 metrics['join_strategy'] = 'unknown'
             
+            # パーティショニング情報はExchange等のパーティション記述を持つノードのみから抽出
+            partition_text = '\n'.join(partition_nodes)
+            
             # 従来のシャッフルパーティション数
-            shuffle_matches = re.findall(r'partitions?["\s]*[:=]\s*([0-9]+)', explain_cost_text, re.IGNORECASE)
-            for match in shuffle_matches:
-                try:
-                    metrics['shuffle_partitions'] += int(match)
-                except:
-                    continue
+            for match in _COST_PARTITIONS_RE.findall(partition_text):
+                metrics['shuffle_partitions'] += int(match)
             
             # Hash Partitioning情報を抽出（複数カラム対応）
-            hash_partition_patterns = [
-                r'hashpartitioning\(([^)]+),\s*(\d+)\)',         # hashpartitioning(columns, count)
-                r'HashPartitioning\(([^)]+),\s*(\d+)\)',         # 大文字バリエーション
-            ]
-            
             partition_details = []
             total_hash_partitions = 0
             
-            for pattern in hash_partition_patterns:
-                matches = re.finditer(pattern, explain_cost_text, re.IGNORECASE)
-                for match in matches:
+            for match in _COST_HASH_PARTITIONING_RE.finditer(partition_text):
+                try:
+                    columns_part = match.group(1).strip()
+                    partition_count = int(match.group(2))
+                    total_hash_partitions += partition_count
+                    
+                    # カラム情報をパース
+                    parsed_columns = parse_partitioning_columns(columns_part)
+                    
+                    partition_details.append({
+                        'type': 'hash',
+                        'columns': parsed_columns['columns'],
+                        'column_count': parsed_columns['count'],
+                        'raw_columns': columns_part,
+                        'partition_count': partition_count,
+                        'full_expression': match.group(0)
+                    })
+                    
+                except (ValueError, IndexError):
+                    continue
+            
+            # 他のパーティショニング方式も検索
+            other_partitions = 0
+            if _COST_SINGLE_PARTITIONING_RE.search(partition_text):
+                other_partitions += 1
+                partition_details.append({
+                    'type': 'single',
+                    'columns': [],
+                    'column_count': 0,
+                    'partition_count': 1,
+                    'full_expression': 'singlepartition()'
+                })
+            for partition_type, pattern in (('range', _COST_RANGE_PARTITIONING_RE), ('roundrobin', _COST_ROUNDROBIN_PARTITIONING_RE)):
+                for match in pattern.finditer(partition_text):
                     try:
-                        columns_part = match.group(1).strip()
-                        partition_count = int(match.group(2))
-                        total_hash_partitions += partition_count
-                        
-                        # カラム情報をパース
-                        parsed_columns = parse_partitioning_columns(columns_part)
-                        
+                        partition_count = int(match.group(1))
+                        other_partitions += partition_count
                         partition_details.append({
-                            'type': 'hash',
-                            'columns': parsed_columns['columns'],
-                            'column_count': parsed_columns['count'],
-                            'raw_columns': columns_part,
+                            'type': partition_type,
+                            'columns': ['extracted'],
+                            'column_count': 1,
                             'partition_count': partition_count,
                             'full_expression': match.group(0)
                         })
-                        
                     except (ValueError, IndexError):
                         continue
             
-            # 他のパーティショニング方式も検索
-            other_partition_patterns = [
-                r'rangepartitioning\([^,]+,\s*(\d+)\)',          # rangepartitioning
-                r'roundrobinpartitioning\(\s*(\d+)\)',           # roundrobinpartitioning
-                r'singlepartition\(\)',                          # singlepartition
-            ]
-            
-            other_partitions = 0
-            for pattern in other_partition_patterns:
-                if 'singlepartition' in pattern:
-                    if re.search(pattern, explain_cost_text, re.IGNORECASE):
-                        other_partitions += 1
-                        partition_details.append({
-                            'type': 'single',
-                            'columns': [],
-                            'column_count': 0,
-                            'partition_count': 1,
-                            'full_expression': 'singlepartition()'
-                        })
-                else:
-                    matches = re.finditer(pattern, explain_cost_text, re.IGNORECASE)
-                    for match in matches:
-                        try:
-                            partition_count = int(match.group(1))
-                            other_partitions += partition_count
-                            
-                            partition_type = 'range' if 'range' in pattern else 'roundrobin'
-                            partition_details.append({
-                                'type': partition_type,
-                                'columns': ['extracted'],
-                                'column_count': 1,
-                                'partition_count': partition_count,
-                                'full_expression': match.group(0)
-                            })
-                            
-                        except (ValueError, IndexError):
-                            continue
-            
             # Photonの物理プランに表示される 'SinglePartition' キーワードも検出
-            has_single_partition_photon = bool(re.search(r'\bSinglePartition\b', explain_cost_text, re.IGNORECASE))
+            has_single_partition_photon = bool(_COST_SINGLE_PARTITION_KEYWORD_RE.search(partition_text))
             if has_single_partition_photon and not any(d.get('type') == 'single' for d in partition_details):
                 partition_details.append({
                     'type': 'single',
@@ -16013,6 +16181,7 @@ def compare_query_performance(original_explain_cost: str, optimized_explain_cost
         # 元クエリと最適化クエリのメトリクス抽出
         original_metrics = extract_cost_metrics(original_explain_cost)
         optimized_metrics = extract_cost_metrics(optimized_explain_cost)
+        globals()['cached_original_cost_metrics'] = original_metrics  # コストモデル校正用
         
         # 元クエリと最適化クエリのメトリクスを中間結果として保存
         intermediate_data = {
@@ -16508,6 +16677,39 @@ def analyze_degradation_causes(performance_comparison: Dict[str, Any], original_
                     "検出されたBROADCAST問題を修正してください",
                     "適切なサイズのテーブルのみBROADCAST対象としてください"
                 ])
+            
+            # 🎯 演算子単位のプラン差分（悪化した演算子を特定）
+            plan_diff = diff_explain_plans(original_explain_cost, optimized_explain_cost)
+            degradation_analysis['analysis_details']['plan_diff'] = {
+                'regressions': [describe_operator_diff(d) for d in plan_diff.regressions[:5]],
+                'join_strategy_changes': [describe_operator_diff(d) for d in plan_diff.join_strategy_changes[:5]],
+            }
+            
+            operator_instructions = []
+            for diff in plan_diff.regressions[:3]:
+                degradation_analysis['specific_issues'].append(f"Operator regression: {describe_operator_diff(diff)}")
+                tables = ', '.join(diff.tables) or diff.operator
+                if diff.status == 'added':
+                    operator_instructions.append(
+                        f"元のプランに存在しない {diff.key} が追加されています。{tables} の重複JOIN（CTEの再展開など）を避けてください"
+                    )
+                elif diff.original_join_strategy != diff.optimized_join_strategy and diff.optimized_join_strategy:
+                    operator_instructions.append(
+                        f"{diff.key} のJOIN戦略が {diff.original_join_strategy} から {diff.optimized_join_strategy} に変化しています。"
+                        f"{tables} のJOINは元の {diff.original_join_strategy} を維持してください（BROADCASTヒントとJOIN順序を元に戻す）"
+                    )
+                else:
+                    operator_instructions.append(
+                        f"{diff.key} の推定値が悪化しています（{describe_operator_diff(diff, 'ja')}）。"
+                        f"{tables} への入力を元のクエリ以下に抑えてください（フィルタ位置・JOIN順序・集約位置を見直す）"
+                    )
+            # 演算子別の指示を先頭に置き、リトライプロンプトで優先させる
+            degradation_analysis['fix_instructions'] = operator_instructions + degradation_analysis['fix_instructions']
+            
+            if plan_diff.regressions and degradation_analysis['primary_cause'] in ('unknown', 'cost_increase'):
+                worst = plan_diff.regressions[0]
+                degradation_analysis['primary_cause'] = 'join_strategy_change' if worst in plan_diff.join_strategy_changes else 'operator_regression'
+                degradation_analysis['analysis_details']['worst_operator'] = worst.key
         
         # 原因が特定できない場合のフォールバック
         if degradation_analysis['primary_cause'] == 'unknown':
@@ -16518,8 +16720,8 @@ def analyze_degradation_causes(performance_comparison: Dict[str, Any], original_
                 "ヒント句の適用を最小限に抑えてください"
             ])
         
-        # 重複する修正指示を削除
-        degradation_analysis['fix_instructions'] = list(set(degradation_analysis['fix_instructions']))
+        # 重複する修正指示を削除（順序は維持）
+        degradation_analysis['fix_instructions'] = list(dict.fromkeys(degradation_analysis['fix_instructions']))
         
     except Exception as e:
         degradation_analysis['primary_cause'] = 'analysis_error'
@@ -16573,6 +16775,181 @@ def analyze_explain_cost_differences(original_cost: str, optimized_cost: str) ->
     return analysis
 
 
+def build_candidate_output_instruction(candidate_count: int) -> str:
+    """
+    Prompt addendum asking the LLM for several alternative rewrites in one call (CANDIDATES_PER_ATTEMPT >= 2)
+    Returns an empty string in single-candidate mode so prompts stay unchanged
+    """
+    if not candidate_count or candidate_count < 2:
+        return ""
+    
+    return f"""
+
+【🧪 複数候補の出力（{candidate_count}案）】
+- 異なる最適化アプローチ（JOIN順序、CTE構造化、フィルタ位置、REPARTITIONヒントの有無など）で**{candidate_count}個の代替クエリ**を生成してください
+- 各候補はそれぞれ**1つの完全なSQLクエリ**とし（単体クエリの方針は各候補に適用）、**候補ごとに独立した ```sql コードブロック**で出力してください
+- 候補番号はコードブロックの外（直前の `### 候補1` 見出しなど）に記載し、コードブロック内にはSQLのみを記載してください
+- 候補は互いに参照せず、単独で実行可能であること
+- 候補はEXPLAIN COSTで並列に評価され、総合コスト比率が最も低い候補が採用されます
+"""
+
+
+def build_optimization_output_instruction(candidate_count: int = None) -> str:
+    """
+    Output-format addendum of the optimization prompts
+    STRUCTURED_LLM_OUTPUT = 'Y': JSON schema (candidates form when CANDIDATES_PER_ATTEMPT >= 2), prose in OUTPUT_LANGUAGE
+    STRUCTURED_LLM_OUTPUT = 'N': the markdown multi-candidate instruction (empty in single-candidate mode)
+    """
+    if candidate_count is None:
+        candidate_count = globals().get('CANDIDATES_PER_ATTEMPT', 1)
+    
+    if str(globals().get('STRUCTURED_LLM_OUTPUT', 'N')).upper() != 'Y':
+        return build_candidate_output_instruction(candidate_count)
+    
+    # 指示文は日本語プロンプトに合わせ、根拠・期待効果は出力言語で記述させる（英語出力時の翻訳を不要にする）
+    return build_structured_output_instruction('ja', candidate_count, globals().get('OUTPUT_LANGUAGE', 'ja'))
+
+
+def normalize_structured_optimization_response(llm_response):
+    """
+    Convert a structured JSON optimization response into the markdown format the prompts describe
+    (SQL in ```sql blocks, one block per candidate) so the downstream extraction, reports and translation stay unchanged
+    Anything that is not exactly the JSON schema (error strings, markdown answers) is returned as-is
+    """
+    text = llm_response
+    if isinstance(llm_response, list):
+        # thinking有効時のコンテンツブロック: テキスト部分のみを連結
+        text = "\n".join(
+            str(item.get('text', '')) for item in llm_response
+            if isinstance(item, dict) and item.get('type', 'text') == 'text'
+        )
+    
+    responses = parse_optimization_response(text)
+    if not responses:
+        if str(globals().get('STRUCTURED_LLM_OUTPUT', 'N')).upper() == 'Y' and isinstance(text, str) and not text.startswith(("❌", "⚠️", "LLM_ERROR")):
+            print("📦 Response is not structured JSON - using SQL extraction heuristics")
+        return llm_response
+    
+    print(f"⚡ Structured JSON response parsed ({len(responses)} SQL)")
+    markdown = format_optimization_response(responses, globals().get('OUTPUT_LANGUAGE', 'ja'))
+    # 後段のSQL抽出がヒューリスティックを通さず .sql をそのまま使えるよう、整形後テキストに対応付けて保持
+    globals().setdefault('_structured_optimization_responses', {})[markdown.strip()] = responses
+    return markdown
+
+
+def get_structured_optimization_responses(llm_response) -> List[OptimizationResponse]:
+    """
+    Parsed rewrites behind a response returned by normalize_structured_optimization_response
+    Empty for any other text (markdown answers, errors, edited responses), which then go through the SQL extraction heuristics
+    """
+    if not isinstance(llm_response, str):
+        return []
+    return globals().get('_structured_optimization_responses', {}).get(llm_response.strip(), [])
+
+
+def extract_sql_candidates_from_llm_response(llm_response: str, max_candidates: int = 0) -> List[str]:
+    """
+    Extract all SQL code blocks of a multi-candidate LLM response (src.utils.sql.extract_sql_candidates)
+    and clean each with clean_extracted_sql; duplicates are removed, response order is kept
+    """
+    # 構造化JSONレスポンス: 各候補のsqlフィールドをそのまま使用
+    structured = get_structured_optimization_responses(llm_response)
+    if structured:
+        candidates = list(dict.fromkeys(response.sql for response in structured))
+        return candidates[:max_candidates] if max_candidates else candidates
+    
+    # "-- Candidate N" 行の除去と重複排除は extract_sql_candidates が行う
+    candidates = [clean_extracted_sql(sql) for sql in extract_sql_candidates(llm_response)]
+    candidates = [sql for sql in candidates if sql.strip()]
+    return candidates[:max_candidates] if max_candidates else candidates
+
+
+def select_best_candidate_by_parallel_explain(original_query: str, candidates: List[str], attempt_num: int) -> Dict[str, Any]:
+    """
+    Run EXPLAIN / EXPLAIN COST for the original query and all candidates concurrently,
+    then rank the candidates by comprehensive cost ratio (calculate_comprehensive_cost_ratio via compare_query_performance)
+    
+    Results land in the shared EXPLAIN service cache, so the rest of the attempt re-uses them without new roundtrips
+    
+    Returns:
+        Dict: best_query (None when no candidate could be planned), best_cost_ratio, evaluations per candidate
+    """
+    import time
+    
+    catalog = globals().get('CATALOG', 'main')
+    database = globals().get('DATABASE', 'default')
+    max_workers = globals().get('EXPLAIN_PARALLELISM', 4)
+    
+    selection = {
+        'best_query': None,
+        'best_candidate': 0,
+        'best_cost_ratio': None,
+        'evaluations': []
+    }
+    
+    print(f"🧪 Attempt {attempt_num}: Evaluating {len(candidates)} candidate rewrites with parallel EXPLAIN ({max_workers} threads)")
+    
+    service = get_explain_service(get_notebook_explain_backend(), catalog=catalog, database=database)
+    queries = [extract_select_from_ctas(original_query)] + [extract_select_from_ctas(candidate) for candidate in candidates]
+    
+    start_time = time.time()
+    explain_results = service.explain_many(
+        queries,
+        catalog=catalog,
+        database=database,
+        query_type=f"candidate_attempt_{attempt_num}",
+        max_workers=max_workers
+    )
+    print(f"   ⚡ Planned original + {len(candidates)} candidates in {time.time() - start_time:.1f}s")
+    
+    original_explain = explain_results[0]
+    if not original_explain.is_successful:
+        print(f"   ⚠️ Original query EXPLAIN failed, skipping candidate ranking: {original_explain.error_message[:200]}")
+        return selection
+    
+    for candidate_num, (candidate, explain) in enumerate(zip(candidates, explain_results[1:]), 1):
+        evaluation = {
+            'candidate': candidate_num,
+            'query': candidate,
+            'status': 'explain_failed',
+            'cost_ratio': None,
+            'error': explain.error_message
+        }
+        
+        # 構文・解析エラー時はEXPLAIN COSTに最適化済み論理プランが含まれない
+        if explain.is_successful and '== Optimized Logical Plan ==' in explain.explain_cost_output:
+            comparison = compare_query_performance(original_explain.explain_cost_output, explain.explain_cost_output)
+            evaluation['status'] = 'planned'
+            evaluation['cost_ratio'] = comparison.get('total_cost_ratio', 1.0)
+            evaluation['error'] = ''
+        elif explain.is_successful:
+            evaluation['error'] = explain.explain_cost_output.strip()[:200]
+        
+        selection['evaluations'].append(evaluation)
+    
+    planned = [e for e in selection['evaluations'] if e['status'] == 'planned']
+    
+    print(f"   📊 Candidate ranking:")
+    for evaluation in selection['evaluations']:
+        if evaluation['status'] == 'planned':
+            print(f"      Candidate {evaluation['candidate']}: cost ratio {evaluation['cost_ratio']:.3f}")
+        else:
+            print(f"      Candidate {evaluation['candidate']}: ❌ EXPLAIN failed ({evaluation['error'][:100]})")
+    
+    if planned:
+        best = min(planned, key=lambda e: e['cost_ratio'])
+        selection.update({
+            'best_query': best['query'],
+            'best_candidate': best['candidate'],
+            'best_cost_ratio': best['cost_ratio']
+        })
+        print(f"   🏆 Selected candidate {best['candidate']} (cost ratio {best['cost_ratio']:.3f})")
+    else:
+        print(f"   ⚠️ No candidate could be planned, continuing with the standard single-query path")
+    
+    return selection
+
+
 def execute_iterative_optimization_with_degradation_analysis(original_query: str, analysis_result: str, metrics: Dict[str, Any], max_optimization_attempts: int = 3) -> Dict[str, Any]:
     """
     Iterative optimization and performance degradation analysis
@@ -16593,9 +16970,11 @@ def execute_iterative_optimization_with_degradation_analysis(original_query: str
 
     # 前回実行のキャッシュをクリア（メトリクス重複防止）
     try:
-        for key in ['cached_original_explain_cost_result', 'cached_original_explain_cost_content', 'cached_optimized_explain_cost_content', 'cached_original_explain_cost_file', 'cached_optimized_explain_cost_file']:
+        for key in ['cached_original_explain_cost_result', 'cached_original_explain_cost_content', 'cached_optimized_explain_cost_content', 'cached_original_explain_cost_file', 'cached_optimized_explain_cost_file', 'cached_original_cost_metrics']:
             if key in globals():
                 globals().pop(key, None)
+        # EXPLAINサービスのキャッシュも実行単位でリセット（実行内の全試行では共有）
+        get_explain_service(get_notebook_explain_backend()).clear()
     except Exception:
         pass
     
@@ -16710,7 +17089,20 @@ def execute_iterative_optimization_with_degradation_analysis(original_query: str
         else:
             optimized_query_str = str(optimized_query)
         
-        extracted_sql = extract_sql_from_llm_response(optimized_query_str)
+        extracted_sql = ""
+        
+        # 🧪 複数候補モード: 候補を並列EXPLAINし、総合コスト比率が最小の候補でこの試行を継続
+        candidate_count = globals().get('CANDIDATES_PER_ATTEMPT', 1)
+        if candidate_count > 1 and globals().get('EXPLAIN_ENABLED', 'N').upper() == 'Y':
+            sql_candidates = extract_sql_candidates_from_llm_response(optimized_query_str, candidate_count)
+            if len(sql_candidates) > 1:
+                candidate_selection = select_best_candidate_by_parallel_explain(corrected_original_query, sql_candidates, attempt_num)
+                extracted_sql = candidate_selection['best_query'] or ""
+            else:
+                print(f"💡 Attempt {attempt_num}: {len(sql_candidates)} candidate returned, using the standard single-query path")
+        
+        if not extracted_sql:
+            extracted_sql = extract_sql_from_llm_response(optimized_query_str)
         current_query = extracted_sql if extracted_sql else original_query
         # グローバルに保持（ログ生成時の参照用）
         try:
@@ -17977,9 +18369,13 @@ def extract_sql_from_llm_response(llm_response: str) -> str:
     if not llm_response or not llm_response.strip():
         return ""
     
+    # 0. 構造化JSONレスポンス: sqlフィールドをそのまま使用（ヒューリスティック不要）
+    structured = get_structured_optimization_responses(llm_response)
+    if structured:
+        return structured[0].sql
+    
     # 1. SQLコードブロックを検索（```sql ... ```）
-    sql_pattern = r'```sql\s*(.*?)\s*```'
-    matches = re.findall(sql_pattern, llm_response, re.DOTALL | re.IGNORECASE)
+    matches = _SQL_CODE_BLOCK_RE.findall(llm_response)
     
     if matches:
         # 最長のSQLブロックを選択
@@ -17987,13 +18383,12 @@ def extract_sql_from_llm_response(llm_response: str) -> str:
         return clean_extracted_sql(sql_query)
     
     # 2. 一般的なコードブロックを検索（```のみ）
-    code_pattern = r'```\s*(.*?)\s*```'
-    matches = re.findall(code_pattern, llm_response, re.DOTALL)
+    matches = _CODE_BLOCK_RE.findall(llm_response)
     
     for match in matches:
         match = match.strip()
         # SQLキーワードで始まるかチェック
-        if re.match(r'^(SELECT|WITH|CREATE|INSERT|UPDATE|DELETE)', match, re.IGNORECASE):
+        if _SQL_STATEMENT_START_RE.match(match):
             return clean_extracted_sql(match)
     
     # 3. SQLキーワードで始まる行から分析セクションまでを抽出
@@ -18006,7 +18401,7 @@ def extract_sql_from_llm_response(llm_response: str) -> str:
 
         # SQL開始の検出（より厳密 - FROMのみで始まるクエリは無効）
         # 🚨 重要: FROMのみで始まるクエリはSELECT句がないため無効
-        if re.match(r'^(WITH|SELECT|CREATE|INSERT|UPDATE|DELETE)\s', line_stripped, re.IGNORECASE):
+        if _SQL_LINE_START_RE.match(line_stripped):
             in_sql = True
         
         if in_sql:
@@ -18060,18 +18455,18 @@ def clean_extracted_sql(sql_content: str) -> str:
     cleaned_sql = '\n'.join(cleaned_lines).strip()
 
     # 先頭に付いた EXPLAIN/EXPLAIN COST を除去して純粋なSELECT等に正規化
-    cleaned_sql = re.sub(r'^\s*EXPLAIN\s+COST\s+', '', cleaned_sql, flags=re.IGNORECASE)
-    cleaned_sql = re.sub(r'^\s*EXPLAIN\s+', '', cleaned_sql, flags=re.IGNORECASE)
+    cleaned_sql = _EXPLAIN_COST_PREFIX_RE.sub('', cleaned_sql)
+    cleaned_sql = _EXPLAIN_PREFIX_RE.sub('', cleaned_sql)
 
     # 🚨 バリデーション: FROMで始まるクエリはSELECT句がないため無効
     # USE CATALOG/USE SCHEMA/コメントを除いた最初のSQL文を確認
     sql_for_validation = cleaned_sql
     # USE文とコメントを除去してバリデーション
-    sql_for_validation = re.sub(r'^\s*USE\s+(CATALOG|SCHEMA|DATABASE)\s+\w+\s*;?\s*', '', sql_for_validation, flags=re.IGNORECASE | re.MULTILINE)
-    sql_for_validation = re.sub(r'^\s*--.*$', '', sql_for_validation, flags=re.MULTILINE)
+    sql_for_validation = _USE_STATEMENT_RE.sub('', sql_for_validation)
+    sql_for_validation = _SQL_LINE_COMMENT_RE.sub('', sql_for_validation)
     sql_for_validation = sql_for_validation.strip()
 
-    if sql_for_validation and re.match(r'^FROM\s', sql_for_validation, re.IGNORECASE):
+    if sql_for_validation and _FROM_FIRST_RE.match(sql_for_validation):
         print("🚨 警告: 生成されたSQLにSELECT句がありません。元のクエリを使用します。")
         return ""
 
@@ -18088,30 +18483,33 @@ def extract_analysis_content_from_llm_response(llm_response: str) -> str:
     if not llm_response or not llm_response.strip():
         return ""
     
+    # 構造化JSONレスポンス: 適用手法・根拠・期待効果をそのまま使用
+    structured = get_structured_optimization_responses(llm_response)
+    if structured:
+        return format_optimization_response(structured, globals().get('OUTPUT_LANGUAGE', 'ja'), include_sql=False)
+    
     # SQLコードブロックを除去した残りの部分を抽出
     lines = llm_response.split('\n')
     analysis_lines = []
     in_sql_block = False
-    sql_block_pattern = re.compile(r'```sql', re.IGNORECASE)
-    sql_block_end_pattern = re.compile(r'```')
     
     for line in lines:
         line_stripped = line.strip()
         
         # SQLブロックの開始を検出
-        if sql_block_pattern.search(line):
+        if _SQL_BLOCK_OPEN_RE.search(line):
             in_sql_block = True
             continue
         
         # SQLブロックの終了を検出
-        if in_sql_block and sql_block_end_pattern.search(line):
+        if in_sql_block and _SQL_BLOCK_CLOSE_RE.search(line):
             in_sql_block = False
             continue
         
         # SQLブロック内でない場合は分析コンテンツとして追加
         if not in_sql_block:
             # SQL文の行も除外（SQLブロック外にあるSQL文）
-            if not re.match(r'^(WITH|SELECT|FROM|WHERE|GROUP BY|ORDER BY|LIMIT|CREATE|INSERT|UPDATE|DELETE)\s', line_stripped, re.IGNORECASE):
+            if not _SQL_OR_CLAUSE_LINE_START_RE.match(line_stripped):
                 analysis_lines.append(line)
     
     # 分析コンテンツの整理
@@ -18174,10 +18572,6 @@ def execute_explain_and_save_to_file(original_query: str, query_type: str = "ori
     query_for_explain = re.sub(r'^\s*EXPLAIN\s+COST\s+', '', query_for_explain, flags=re.IGNORECASE)
     query_for_explain = re.sub(r'^\s*EXPLAIN\s+', '', query_for_explain, flags=re.IGNORECASE)
     
-    # EXPLAIN文とEXPLAIN COST文の生成
-    explain_query = f"EXPLAIN {query_for_explain}"
-    explain_cost_query = f"EXPLAIN COST {query_for_explain}"
-    
     # カタログとデータベースの設定を取得
     catalog = globals().get('CATALOG', 'main')
     database = globals().get('DATABASE', 'default')
@@ -18185,120 +18579,99 @@ def execute_explain_and_save_to_file(original_query: str, query_type: str = "ori
     print(f"📂 Using catalog: {catalog}")
     print(f"🗂️ Using database: {database}")
     
-    # カタログとデータベースを設定
-    try:
-        spark.sql(f"USE CATALOG {catalog}")
-        spark.sql(f"USE DATABASE {database}")
-    except Exception as e:
-        print(f"⚠️ Catalog/database configuration error: {str(e)}")
+    # EXPLAIN文とEXPLAIN COST文の生成（エラーファイル記録用）
+    explain_query = f"EXPLAIN {query_for_explain}"
+    explain_cost_query = f"EXPLAIN COST {query_for_explain}"
     
-    # EXPLAIN文とEXPLAIN COST文の実行
+    # EXPLAIN文とEXPLAIN COST文の実行（全試行で共有するEXPLAINサービス経由: キャッシュ・USE文の重複排除）
     try:
         print("🔄 Executing EXPLAIN and EXPLAIN COST statements...")
+        explain_service = get_explain_service(get_notebook_explain_backend(), catalog=catalog, database=database)
+        service_result = explain_service.explain(query_for_explain, catalog=catalog, database=database, query_type=query_type)
         
-        # 1. 通常のEXPLAIN実行
-        print("   📊 Executing EXPLAIN...")
-        explain_result_spark = spark.sql(explain_query)
-        explain_result = explain_result_spark.collect()
+        if service_result.from_cache:
+            print("   💾 Using cached EXPLAIN / EXPLAIN COST results (same catalog, database and query)")
+        elif service_result.plain_plan_derived:
+            print("   💰 Executed EXPLAIN COST (plain EXPLAIN plan derived from its output)")
+        else:
+            print("   📊 Executed EXPLAIN COST and EXPLAIN")
         
-        # EXPLAIN結果の内容をチェック
-        explain_content = ""
-        for row in explain_result:
-            explain_content += str(row[0]) + "\n"
+        explain_content = service_result.explain_output
+        explain_cost_content = service_result.explain_cost_output
         
-        # 2. EXPLAIN COST実行
-        print("   💰 Executing EXPLAIN COST...")
-        explain_cost_result_spark = spark.sql(explain_cost_query)
-        explain_cost_result = explain_cost_result_spark.collect()
+        def count_lines(text: str) -> int:
+            return text.count("\n") + (1 if text and not text.endswith("\n") else 0)
         
-        # EXPLAIN COST結果の内容をチェック
-        explain_cost_content = ""
-        for row in explain_cost_result:
-            explain_cost_content += str(row[0]) + "\n"
+        def print_preview(text: str, max_lines: int = 10) -> int:
+            preview = text.split("\n", max_lines)[:max_lines]
+            if preview and not preview[-1]:
+                preview = preview[:-1]
+            for i, row in enumerate(preview):
+                print(f"{i+1:2d}: {row[:100]}...")
+            return len(preview)
         
-        # 🚨 緊急修正: エラーパターンを厳密化（誤検出防止）
-        retryable_error_patterns = [
-            "Error occurred during query planning",
-            "error occurred during query planning", 
-            "Query planning failed",
-            "query planning failed",
-            "Plan optimization failed",
-            "plan optimization failed",
-            "Failed to plan query",
-            "failed to plan query",
-            "Analysis exception",
-            "analysis exception",
-            "AMBIGUOUS_REFERENCE",
-            "ambiguous_reference",
-            "[AMBIGUOUS_REFERENCE]",
-            # "Reference",  # 🚨 除去: 過度に一般的、正常結果も誤検出
-            "reference is ambiguous",  # より具体的なパターンに変更
-            # "is ambiguous",  # 🚨 除去: 過度に一般的
-            "ambiguous reference",  # より具体的なパターンに変更
-            # "Ambiguous",  # 🚨 除去: 過度に一般的
-            "ParseException",
-            "SemanticException", 
-            "AnalysisException",
-            "Syntax error",
-            "syntax error",
-            "PARSE_SYNTAX_ERROR",
-            "INVALID_IDENTIFIER",
-            "TABLE_OR_VIEW_NOT_FOUND",
-            "COLUMN_NOT_FOUND",
-            "UNRESOLVED_COLUMN",
-            "[UNRESOLVED_COLUMN",
-            "UNRESOLVED_COLUMN.WITH_SUGGESTION",
-            "[UNRESOLVED_COLUMN.WITH_SUGGESTION]"
-        ]
+        explain_line_count = count_lines(explain_content)
+        explain_cost_line_count = count_lines(explain_cost_content)
         
         # 🚨 重要: EXPLAIN結果とEXPLAIN COST結果の両方をエラーチェック
+        # 再試行可能エラーは _EXPLAIN_ERROR_PATTERNS を compile_pattern_matcher で結合したパターンで検出し、
+        # EXPLAIN_ENABLED=Yの場合は取得済みの結果をチャンク単位で結果ファイルへ書き込みながら同一パスで走査する
         detected_error = None
         error_source = None
+        save_results = explain_enabled.upper() == 'Y' and explain_filename and explain_cost_filename
+        written_files = []
+        error_matcher = compile_pattern_matcher(_EXPLAIN_ERROR_PATTERNS)
         
-        # 🚨 緊急デバッグ: エラー検出プロセスの詳細表示
-        print(f"🔍 Executing error pattern detection (patterns: {len(retryable_error_patterns)})")
+        print(f"🔍 Executing error pattern detection (patterns: {len(_EXPLAIN_ERROR_PATTERNS)}, single combined scan)")
         print(f"   📊 EXPLAIN content length: {len(explain_content)} characters")
         print(f"   💰 EXPLAIN COST content length: {len(explain_cost_content)} characters")
         
-        # 1. EXPLAIN結果のエラーチェック
-        for pattern in retryable_error_patterns:
-            if pattern in explain_content.lower():
-                detected_error = pattern
-                error_source = "EXPLAIN"
-                print(f"❌ Error pattern detected in EXPLAIN result: '{pattern}'")
+        result_outputs = (
+            ("EXPLAIN", explain_content, explain_filename, "EXPLAIN結果:"),
+            ("EXPLAIN COST", explain_cost_content, explain_cost_filename, "EXPLAIN COST結果（統計情報付き）:"),
+        )
+        for source, content, filename, section_title in result_outputs:
+            if save_results:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write(f"# {source}実行結果 ({query_type}クエリ)\n")
+                    f.write(f"実行日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                    f.write(f"クエリタイプ: {query_type}\n")
+                    f.write(f"クエリ文字数: {len(original_query):,}\n")
+                    f.write("\n" + "=" * 80 + "\n")
+                    f.write(f"{section_title}\n")
+                    f.write("=" * 80 + "\n\n")
+                    matched_pattern = scan_text_chunks(content, error_matcher, sink=f.write)
+                written_files.append(filename)
+            else:
+                matched_pattern = scan_text_chunks(content, error_matcher)
+            
+            if matched_pattern:
+                detected_error = matched_pattern
+                error_source = source
+                print(f"❌ Error pattern detected in {source} result: '{matched_pattern}'")
                 break
         
-        # 2. EXPLAIN COST結果のエラーチェック（EXPLAINでエラーが見つからない場合のみ）
-        if not detected_error:
-            for pattern in retryable_error_patterns:
-                if pattern in explain_cost_content.lower():
-                    detected_error = pattern
-                    error_source = "EXPLAIN COST"
-                    print(f"❌ Error pattern detected in EXPLAIN COST result: '{pattern}'")
-                    break
-        
         if not detected_error:
             print("✅ No error patterns detected: Processing as normal result")
         
         if detected_error:
-            # エラーが検出された場合はエラーとして処理
+            # エラーが検出された場合はエラーとして処理（途中まで書き込んだ結果ファイルは破棄）
             print(f"❌ Error detected in {error_source} result: {detected_error}")
+            for written_file in written_files:
+                try:
+                    os.remove(written_file)
+                except OSError:
+                    pass
             
             # 結果のプレビュー表示（エラー用）
             print(f"\n📋 {error_source} result preview:")
             print("-" * 50)
-            if error_source == "EXPLAIN":
-                preview_lines = min(10, len(explain_result))
-                for i, row in enumerate(explain_result[:preview_lines]):
-                    print(f"{i+1:2d}: {str(row[0])[:100]}...")
-            else:
-                preview_lines = min(10, len(explain_cost_result))
-                for i, row in enumerate(explain_cost_result[:preview_lines]):
-                    print(f"{i+1:2d}: {str(row[0])[:100]}...")
+            error_content = explain_content if error_source == "EXPLAIN" else explain_cost_content
+            error_line_count = explain_line_count if error_source == "EXPLAIN" else explain_cost_line_count
+            preview_lines = print_preview(error_content)
             
             # エラーファイルの保存（EXPLAIN_ENABLED=Yの場合のみ）
             error_filename = None
-            error_cost_filename = None
             if explain_enabled.upper() == 'Y':
                 # EXPLAIN結果エラーファイル
                 error_filename = f"{OUTPUT_FILE_DIR}/output_explain_error_{query_type}_{timestamp}.txt"
@@ -18319,21 +18692,17 @@ def execute_explain_and_save_to_file(original_query: str, query_type: str = "ori
                     f.write(explain_cost_content)
                 
                 print(f"📄 Saved error details: {error_filename}")
-                if error_source == "EXPLAIN" and len(explain_result) > preview_lines:
-                    print(f"... (Remaining {len(explain_result) - preview_lines} lines, see {error_filename})")
-                elif error_source == "EXPLAIN COST" and len(explain_cost_result) > preview_lines:
-                    print(f"... (Remaining {len(explain_cost_result) - preview_lines} lines, see {error_filename})")
+                if error_line_count > preview_lines:
+                    print(f"... (Remaining {error_line_count - preview_lines} lines, see {error_filename})")
             else:
                 print("💡 Error file not saved because EXPLAIN_ENABLED=N")
-                if error_source == "EXPLAIN" and len(explain_result) > preview_lines:
-                    print(f"... (Remaining {len(explain_result) - preview_lines} lines)")
-                elif error_source == "EXPLAIN COST" and len(explain_cost_result) > preview_lines:
-                    print(f"... (Remaining {len(explain_cost_result) - preview_lines} lines)")
+                if error_line_count > preview_lines:
+                    print(f"... (Remaining {error_line_count - preview_lines} lines)")
             
             print("-" * 50)
             
             result_dict = {
-                'error_message': explain_content.strip() if error_source == "EXPLAIN" else explain_cost_content.strip(),
+                'error_message': error_content.strip(),
                 'detected_pattern': detected_error,
                 'error_source': error_source
             }
@@ -18344,64 +18713,38 @@ def execute_explain_and_save_to_file(original_query: str, query_type: str = "ori
         
         # エラーが検出されなかった場合は成功として処理
         print(f"✅ EXPLAIN & EXPLAIN COST execution successful")
-        print(f"📊 EXPLAIN execution plan lines: {len(explain_result):,}")
-        print(f"💰 EXPLAIN COST statistics lines: {len(explain_cost_result):,}")
+        print(f"📊 EXPLAIN execution plan lines: {explain_line_count:,}")
+        print(f"💰 EXPLAIN COST statistics lines: {explain_cost_line_count:,}")
         
         # 結果のプレビュー表示
         print("\n📋 EXPLAIN results preview:")
         print("-" * 50)
-        preview_lines = min(10, len(explain_result))
-        for i, row in enumerate(explain_result[:preview_lines]):
-            print(f"{i+1:2d}: {str(row[0])[:100]}...")
+        preview_lines = print_preview(explain_content)
         
         print("\n💰 EXPLAIN COST results preview:")
         print("-" * 50)
-        cost_preview_lines = min(10, len(explain_cost_result))
-        for i, row in enumerate(explain_cost_result[:cost_preview_lines]):
-            print(f"{i+1:2d}: {str(row[0])[:100]}...")
-        
-        # 結果をファイルに保存（EXPLAIN_ENABLED=Yの場合のみ）
-        if explain_enabled.upper() == 'Y' and explain_filename and explain_cost_filename:
-            # EXPLAIN結果ファイル
-            with open(explain_filename, 'w', encoding='utf-8') as f:
-                f.write(f"# EXPLAIN実行結果 ({query_type}クエリ)\n")
-                f.write(f"実行日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"クエリタイプ: {query_type}\n")
-                f.write(f"クエリ文字数: {len(original_query):,}\n")
-                f.write("\n" + "=" * 80 + "\n")
-                f.write("EXPLAIN結果:\n")
-                f.write("=" * 80 + "\n\n")
-                f.write(explain_content)
-            
-            # EXPLAIN COST結果ファイル
-            with open(explain_cost_filename, 'w', encoding='utf-8') as f:
-                f.write(f"# EXPLAIN COST実行結果 ({query_type}クエリ)\n")
-                f.write(f"実行日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"クエリタイプ: {query_type}\n")
-                f.write(f"クエリ文字数: {len(original_query):,}\n")
-                f.write("\n" + "=" * 80 + "\n")
-                f.write("EXPLAIN COST結果（統計情報付き）:\n")
-                f.write("=" * 80 + "\n\n")
-                f.write(explain_cost_content)
-            
+        cost_preview_lines = print_preview(explain_cost_content)
+        
+        # 結果ファイルはエラー走査時に保存済み（EXPLAIN_ENABLED=Yの場合のみ）
+        if save_results:
             print(f"📄 Saved EXPLAIN results: {explain_filename}")
             print(f"💰 Saved EXPLAIN COST results: {explain_cost_filename}")
-            if len(explain_result) > preview_lines:
-                print(f"... (Remaining {len(explain_result) - preview_lines} lines, see {explain_filename})")
-            if len(explain_cost_result) > cost_preview_lines:
-                print(f"... (Remaining {len(explain_cost_result) - cost_preview_lines} lines, see {explain_cost_filename})")
+            if explain_line_count > preview_lines:
+                print(f"... (Remaining {explain_line_count - preview_lines} lines, see {explain_filename})")
+            if explain_cost_line_count > cost_preview_lines:
+                print(f"... (Remaining {explain_cost_line_count - cost_preview_lines} lines, see {explain_cost_filename})")
         else:
             print("💡 EXPLAIN result files not saved because EXPLAIN_ENABLED=N")
-            if len(explain_result) > preview_lines:
-                print(f"... (Remaining {len(explain_result) - preview_lines} lines)")
-            if len(explain_cost_result) > cost_preview_lines:
-                print(f"... (Remaining {len(explain_cost_result) - cost_preview_lines} lines)")
+            if explain_line_count > preview_lines:
+                print(f"... (Remaining {explain_line_count - preview_lines} lines)")
+            if explain_cost_line_count > cost_preview_lines:
+                print(f"... (Remaining {explain_cost_line_count - cost_preview_lines} lines)")
         
         print("-" * 50)
         
         result_dict = {
-            'plan_lines': len(explain_result),
-            'cost_lines': len(explain_cost_result)
+            'plan_lines': explain_line_count,
+            'cost_lines': explain_cost_line_count
         }
         if explain_filename and explain_enabled.upper() == 'Y':
             result_dict['explain_file'] = explain_filename
@@ -18737,6 +19080,7 @@ if original_query_for_explain and original_query_for_explain.strip():
                 current_metrics, 
                 max_optimization_attempts=max_optimization_attempts
             )            
+            record_cost_calibration_sample(original_query_for_explain, current_metrics)
             # 結果の表示
             print(f"\n📊 Final result: {retry_result['final_status']}")
             print(f"🔄 Total attempts: {retry_result['total_attempts']}")
@@ -18799,6 +19143,12 @@ if original_query_for_explain and original_query_for_explain.strip():
                 if explain_enabled.upper() == 'N':
                     print("🔍 EXPLAIN無効時でも最適クエリのSQLファイルを出力中...")
                 
+                # 🧮 結果の同値性チェック（RESULT_EQUIVALENCE_CHECK = 'Y' の場合のみ、不一致なら元クエリを使用）
+                final_query = run_result_equivalence_check(original_query_for_explain, final_query, performance_comparison)
+                
+                # ⏱️ 実行による検証（EXECUTION_VERIFICATION = 'Y' の場合のみ）
+                run_execution_verification(original_query_for_explain, final_query, performance_comparison)
+                
                 saved_files = save_optimized_sql_files(
                     original_query_for_explain,
                     final_query,  # 🚀 成功したクエリ（ヒント付き）を保存
@@ -19209,20 +19559,7 @@ def refine_report_content_with_llm(report_content: str) -> str:
         print("❌ LLM provider is not configured")
         return report_content
     
-    # 🚨 トークン制限対策: レポートサイズ制限
-    MAX_CONTENT_SIZE = 50000  # 50KB制限
-    original_size = len(report_content)
-    
-    if original_size > MAX_CONTENT_SIZE:
-        print(f"⚠️ Report size too large: {original_size:,} characters → truncated to {MAX_CONTENT_SIZE:,} characters")
-        # 重要セクションを優先的に保持
-        truncated_content = report_content[:MAX_CONTENT_SIZE]
-        truncated_content += f"\n\n⚠️ レポートが大きすぎるため、{MAX_CONTENT_SIZE:,} 文字に切り詰められました（元サイズ: {original_size:,} 文字）"
-        report_content = truncated_content
-    else:
-        print(f"📊 Report size: {original_size:,} characters (executing refinement)")
-    
-    # Photon利用率の抽出と評価判定
+    # Photon利用率の抽出と評価判定（評価指示は利用率を含むセクションのプロンプトにのみ付与）
     photon_pattern = r'利用率[：:]\s*(\d+(?:\.\d+)?)%'
     photon_match = re.search(photon_pattern, report_content)
     
@@ -19258,9 +19595,9 @@ def refine_report_content_with_llm(report_content: str) -> str:
 - Example: "Photon Utilization Rate: XX% (Evaluation: Good)"
 """
     
-    # 言語に応じて推敲プロンプトを切り替え
+    # 言語に応じて推敲プロンプトを切り替え（レポートはセクション単位で推敲するため切り詰めない）
     if OUTPUT_LANGUAGE == 'ja':
-        refinement_prompt = f"""あなたは技術文書編集者です。以下のDatabricks SQL パフォーマンス分析レポートを読みやすく簡潔に推敲してください。
+        refinement_rules = """あなたは技術文書編集者です。以下のDatabricks SQL パフォーマンス分析レポートを読みやすく簡潔に推敲してください。
 
 【推敲要件】
 1. 全体構成を整理し、論理的に情報を配置
@@ -19282,11 +19619,6 @@ def refine_report_content_with_llm(report_content: str) -> str:
 - **テーブル別詳細情報**: 各テーブルのノード情報、フィルタ効率、推奨事項
 - **Enhanced Shuffle操作最適化分析**: Shuffle操作の詳細分析、メモリ使用量、パーティション数、効率性評価等の情報
 
-{photon_evaluation_instruction}
-
-【現在のレポート内容】
-{report_content}
-
 【出力要件】
 - マークダウン形式で推敲されたレポートを出力
 - 技術情報を保持しつつ可読性を向上
@@ -19303,7 +19635,7 @@ def refine_report_content_with_llm(report_content: str) -> str:
 - **重複排除**: 同一テーブルの情報が複数セクションに記載されている場合は、より包括的で詳細な情報を持つセクションに統合し、重複部分を削除する
 """
     else:
-        refinement_prompt = f"""You are a technical document editor. Please refine the following Databricks SQL performance analysis report to make it readable and concise.
+        refinement_rules = """You are a technical document editor. Please refine the following Databricks SQL performance analysis report to make it readable and concise.
 
 【Refinement Requirements】
 1. Organize the overall structure and arrange information logically
@@ -19325,11 +19657,6 @@ def refine_report_content_with_llm(report_content: str) -> str:
 - **Table-specific detailed information**: Node information, filter efficiency, and recommendations for each table
 - **Enhanced Shuffle Operations Optimization Analysis**: Detailed analysis of shuffle operations, memory usage, partition counts, efficiency evaluations, etc.
 
-{photon_evaluation_instruction}
-
-【Current Report Content】
-{report_content}
-
 【Output Requirements】
 - Output refined report in markdown format
 - Maintain technical information while improving readability
@@ -19345,51 +19672,15 @@ def refine_report_content_with_llm(report_content: str) -> str:
 - **Eliminate Duplicates**: When the same table information appears in multiple sections, consolidate into the more comprehensive and detailed section, removing duplicate portions
 """
     
+    def build_prompt(section: str) -> str:
+        # Photon評価指示は利用率を含むセクションにのみ付与
+        rules = refinement_rules
+        if photon_evaluation_instruction and re.search(photon_pattern, section):
+            rules += photon_evaluation_instruction
+        return build_section_refinement_prompt(rules, section)
+    
     try:
-        # 設定されたLLMプロバイダーに基づいて推敲を実行
-        provider = LLM_CONFIG.get('provider', 'databricks')
-        
-        if provider == 'databricks':
-            refined_content = _call_databricks_llm(refinement_prompt)
-        elif provider == 'openai':
-            refined_content = _call_openai_llm(refinement_prompt)
-        elif provider == 'azure_openai':
-            refined_content = _call_azure_openai_llm(refinement_prompt)
-        elif provider == 'anthropic':
-            refined_content = _call_anthropic_llm(refinement_prompt)
-        else:
-            print(f"❌ Unsupported LLM provider: {provider}")
-            return report_content
-        
-        # 🚨 LLMエラーレスポンスの検出（精密化）
-        if isinstance(refined_content, str):
-            # より精密なエラー検出（レポート内容の絵文字と区別）
-            actual_error_indicators = [
-                "APIエラー: ステータスコード",
-                "Input is too long for requested model",
-                "Bad Request",
-                "タイムアウトエラー:",
-                "API呼び出しエラー:",
-                'レスポンス: {"error_code":',
-                "❌ APIエラー:",
-                "⚠️ APIエラー:"
-            ]
-            
-            # エラーメッセージの開始部分をチェック（より厳密）
-            is_error_response = any(
-                refined_content.strip().startswith(indicator) or 
-                f"\n{indicator}" in refined_content[:500]  # 先頭500文字以内でのエラーメッセージ
-                for indicator in actual_error_indicators
-            )
-            
-            if is_error_response:
-                print(f"❌ Error detected in LLM report refinement: {refined_content[:200]}...")
-                print("📄 Returning original report")
-                return report_content
-        
-        # thinking_enabled対応: 結果がリストの場合の処理
-        if isinstance(refined_content, list):
-            refined_content = format_thinking_response(refined_content)
+        refined_content = refine_report_by_section(report_content, build_prompt, "report_content_refinement")
         
         print(f"✅ LLM-based report refinement completed (Cell 47 independent processing)")
         return refined_content
@@ -19821,6 +20112,13 @@ try:
 except Exception as _e:
     print(f"⚠️ Cleanup step encountered an error: {str(_e)}")
 
+# 🤖 LLM呼び出しテレメトリの出力（LLM_TELEMETRY = 'Y' の場合）
+try:
+    for _telemetry_file in save_llm_call_telemetry().values():
+        print(f"📄 LLM telemetry: {_telemetry_file}")
+except Exception as _e:
+    print(f"⚠️ Failed to write LLM telemetry: {str(_e)}")
+
 print("🎉 All processing completed!")
 print("📁 Please check the generated files and utilize the analysis results.")
 
@@ -1,7 +1,7 @@
 """Configuration settings for the SQL Profiler Analysis Tool."""
 
-from dataclasses import dataclass, field
-from typing import Literal, Optional
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, Dict, List, Literal, Optional
 import os
 
 
@@ -13,6 +13,9 @@ class DatabricksLLMConfig:
     temperature: float = 0.0
     thinking_enabled: bool = False
     thinking_budget_tokens: int = 10000
+    # Resolved from the notebook context or environment when empty
+    workspace_url: str = ""
+    token: str = ""
 
 
 @dataclass
@@ -22,6 +25,8 @@ class OpenAIConfig:
     model: str = "gpt-4o"
     max_tokens: int = 16000
     temperature: float = 0.0
+    # OpenAI-compatible API base, e.g. http://localhost:8080/v1 for the mock server ('' = api.openai.com)
+    base_url: str = ""
 
     def __post_init__(self):
         if not self.api_key:
@@ -56,14 +61,156 @@ class AnthropicConfig:
             self.api_key = os.environ.get("ANTHROPIC_API_KEY", "")
 
 
+# Stages whose prompt can lose its middle (metrics, report or EXPLAIN text) after a token-limit
+# error; prompts of the SQL stages carry the query there and are never shortened
+SHRINKABLE_LLM_STAGES = (
+    "explain_summary",
+    "report_refinement",
+    "report_content_refinement",
+    "translation_en",
+    "translation_ja",
+)
+
+
+@dataclass
+class LLMRetryConfig:
+    """Retry policy shared by all LLM clients."""
+    # Full-jitter exponential backoff: sleep uniform(0, min(max, base * 2 ** attempt))
+    backoff_base_sec: float = 1.0
+    backoff_max_sec: float = 30.0
+    # Upper bound on honored Retry-After headers (429/503)
+    retry_after_max_sec: float = 120.0
+    # Prompt length kept after each token-limit error (middle is cut)
+    prompt_shrink_ratio: float = 0.7
+    # Stages retried with a shortened prompt; token-limit errors of other stages fail at once
+    shrinkable_stages: List[str] = field(default_factory=lambda: list(SHRINKABLE_LLM_STAGES))
+    # Circuit breaker: open after this many consecutive endpoint failures, retry after reset
+    circuit_failure_threshold: int = 5
+    circuit_reset_sec: float = 120.0
+
+
+@dataclass
+class MockLLMConfig:
+    """Deterministic local LLM stand-in (offline runs, benchmarks, tests)."""
+    # Model name recorded with the calls (and overridable per stage like a real model)
+    model: str = "mock"
+    max_tokens: int = 16000
+    # JSON file of templated responses: {"responses": [{"match": regex, "response": template}], "default": ...}
+    responses_path: str = ""
+    # JSON lines of recorded live responses (see LLMConfig.record_path), replayed by prompt
+    recorded_path: str = ""
+    default_response: str = ""
+    # Simulated latency per call: latency_ms + uniform(0, latency_jitter_ms), seeded
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    seed: int = 0
+
+
+# Stages that only translate or polish text; served by the light model when one is configured
+LIGHT_LLM_STAGES = (
+    "translation_en",
+    "translation_ja",
+    "report_refinement",
+    "report_content_refinement",
+    "explain_summary",
+)
+
+# Provider section field naming the model (endpoint, model or deployment)
+_MODEL_FIELDS = {
+    "databricks": "endpoint_name",
+    "openai": "model",
+    "azure_openai": "deployment_name",
+    "anthropic": "model",
+    "mock": "model",
+}
+
+
+@dataclass
+class LLMStageConfig:
+    """Model override of one pipeline stage (empty / 0 = provider default)."""
+    model: str = ""  # endpoint (Databricks), model (OpenAI, Anthropic) or deployment (Azure OpenAI)
+    max_tokens: int = 0
+
+
 @dataclass
 class LLMConfig:
     """LLM provider configuration."""
-    provider: Literal["databricks", "openai", "azure_openai", "anthropic"] = "databricks"
+    provider: Literal["databricks", "openai", "azure_openai", "anthropic", "mock"] = "databricks"
     databricks: DatabricksLLMConfig = field(default_factory=DatabricksLLMConfig)
     openai: OpenAIConfig = field(default_factory=OpenAIConfig)
     azure_openai: AzureOpenAIConfig = field(default_factory=AzureOpenAIConfig)
     anthropic: AnthropicConfig = field(default_factory=AnthropicConfig)
+    mock: MockLLMConfig = field(default_factory=MockLLMConfig)
+    retry: LLMRetryConfig = field(default_factory=LLMRetryConfig)
+    # Routing: providers tried in order when the primary fails, and the delay after which
+    # the next provider is also fired and the first valid answer taken (0 = no hedging)
+    fallback_providers: List[str] = field(default_factory=list)
+    hedge_after_sec: float = 0.0
+    # Per-request timeout and retries of every LLM call
+    timeout_sec: int = 300
+    max_retries: int = 3
+    # Dispatcher: concurrent in-flight calls and identical-prompt response cache (0 = no cache)
+    max_concurrency: int = 4
+    response_cache_size: int = 128
+    # Token prices for the per-stage cost breakdown (USD per 1K tokens, 0 = not reported)
+    prompt_price_per_1k_tokens: float = 0.0
+    completion_price_per_1k_tokens: float = 0.0
+    # Append every live response to this JSON-lines file for offline replay by the mock provider
+    record_path: str = ""
+    # Model tiering: light stages (LIGHT_LLM_STAGES) run on light_model, and
+    # per-stage overrides (keyed by stage name) take precedence over both
+    light_model: str = ""
+    light_max_tokens: int = 0
+    stages: Dict[str, LLMStageConfig] = field(default_factory=dict)
+
+    def stage_override(self, stage: str) -> Optional[LLMStageConfig]:
+        """Return the model override of a stage, if any."""
+        if stage in self.stages:
+            return self.stages[stage]
+        if stage in LIGHT_LLM_STAGES and (self.light_model or self.light_max_tokens):
+            return LLMStageConfig(model=self.light_model, max_tokens=self.light_max_tokens)
+        return None
+
+    def for_stage(self, stage: str) -> "LLMConfig":
+        """Return this configuration with a stage's model override applied.
+
+        The model replaces the primary provider's model; max_tokens applies
+        to every provider so fallbacks stay within the same budget.
+        """
+        override = self.stage_override(stage)
+        if override is None:
+            return self
+        sections = {}
+        for provider, model_field in _MODEL_FIELDS.items():
+            changes: Dict[str, Any] = {}
+            if override.model and provider == self.provider:
+                changes[model_field] = override.model
+            if override.max_tokens:
+                changes["max_tokens"] = override.max_tokens
+            sections[provider] = replace(getattr(self, provider), **changes)
+        return replace(self, **sections)
+
+    def with_max_tokens(self, limit: int) -> "LLMConfig":
+        """Return this configuration with every provider's max_tokens capped.
+
+        Databricks extended thinking keeps its budget on top of the cap, so
+        the limit applies to the visible answer.
+        """
+        if not limit or limit <= 0:
+            return self
+        sections = {}
+        for provider in _MODEL_FIELDS:
+            section = getattr(self, provider)
+            cap = limit
+            if getattr(section, "thinking_enabled", False):
+                cap += section.thinking_budget_tokens
+            sections[provider] = replace(section, max_tokens=min(section.max_tokens, cap))
+        return replace(self, **sections)
+
+    def model_name(self, provider: Optional[str] = None) -> str:
+        """Return the model (endpoint / deployment) of a provider."""
+        provider = provider or self.provider
+        return getattr(getattr(self, provider), _MODEL_FIELDS[provider])
 
 
 @dataclass
@@ -76,12 +223,96 @@ class ShuffleAnalysisConfig:
     enable_partition_tuning_advice: bool = True
     enable_cluster_sizing_advice: bool = True
     shuffle_analysis_enabled: bool = True
+    # Partition sizing solver: target size band per shuffle partition
+    target_partition_size_mb: int = 128
+    min_partition_size_mb: int = 64
+    max_partition_size_mb: int = 256
+    # Total task slots (cores) of the warehouse/cluster; 0 = unknown
+    task_slots: int = 0
+    # Cluster sizing model
+    cores_per_worker: int = 8
+    current_warehouse_size: str = ""
+    dbu_price_usd: float = 0.0
+    sizing_latency_tolerance: float = 0.2
 
     @property
     def memory_per_partition_threshold_bytes(self) -> int:
         return self.memory_per_partition_threshold_mb * 1024 * 1024
 
 
+@dataclass
+class ScanIOConfig:
+    """Scan I/O efficiency model settings."""
+    target_file_size_mb: int = 256
+    small_file_threshold_mb: int = 32
+    per_file_overhead_ms: float = 5.0
+    # Assumed throughput of disk-cache reads relative to remote reads
+    cache_speedup: float = 4.0
+
+    @property
+    def target_file_size_bytes(self) -> int:
+        return self.target_file_size_mb * 1024 * 1024
+
+
+@dataclass
+class JoinAnalysisConfig:
+    """Join strategy evaluation settings."""
+    # spark.databricks.optimizer.autoBroadcastJoinThreshold (uncompressed)
+    broadcast_threshold_mb: float = 30.0
+    # Compressed (Parquet/Delta) to in-memory size ratio
+    compression_ratio: float = 3.0
+    # Build sides up to this multiple of the threshold get a threshold-raise suggestion
+    threshold_raise_factor: float = 4.0
+
+    @property
+    def broadcast_threshold_bytes(self) -> int:
+        return int(self.broadcast_threshold_mb * 1024 * 1024)
+
+
+@dataclass
+class ExplainBackendConfig:
+    """EXPLAIN execution backend settings."""
+    backend: Literal["spark", "databricks_sql", "replay"] = "spark"
+    # SQL warehouse used by the databricks_sql backend
+    warehouse_id: str = ""
+    # Recorded EXPLAIN outputs served by the replay backend
+    fixture_dir: str = ""
+    # When set, EXPLAIN outputs of the spark/databricks_sql backends are also recorded here
+    record_dir: str = ""
+
+
+@dataclass
+class ExecutionConfig:
+    """Query execution settings for execute-and-measure verification and result equivalence."""
+    executor: Literal["spark", "replay"] = "spark"
+    # Recorded runs served by the replay executor
+    fixture_dir: str = ""
+    # Executions per query; medians are reported
+    repeats: int = 3
+    # Wrap queries in SELECT * FROM (...) LIMIT n (0 = run the full query)
+    row_limit: int = 0
+    # Disable the disk cache and the result cache while measuring
+    disable_cache: bool = True
+    # Compare row counts and result checksums of original and optimized queries
+    equivalence_check: bool = False
+    # Run the equivalence check on a repeatable TABLESAMPLE of every table (0 = full data)
+    sample_percent: float = 0.0
+    sample_seed: int = 42
+
+
+@dataclass
+class CostModelConfig:
+    """Comprehensive cost ratio calibration settings."""
+    # Fitted weights (JSON); the default weights are used when empty or missing
+    model_path: str = ""
+    # Observed (EXPLAIN COST features, duration) history (JSON lines)
+    history_path: str = ""
+    # Minimum (query, rewrite) pairs before fitted weights replace the defaults
+    min_pairs: int = 10
+    # Pull toward the default weights, relative to the number of pairs
+    ridge: float = 0.05
+
+
 @dataclass
 class AnalysisConfig:
     """Main analysis configuration."""
@@ -109,18 +340,62 @@ class AnalysisConfig:
     staged_judgment_mode: bool = True
     strict_validation_mode: bool = False
     debug_json_enabled: bool = False
+    # Ask optimization prompts for a JSON answer (sql, rationale, applied_hints,
+    # expected_effects); free-form responses still go through the SQL heuristics
+    structured_llm_output: bool = True
 
     # LLM configuration
     llm: LLMConfig = field(default_factory=LLMConfig)
 
+    # EXPLAIN backend configuration
+    explain_backend: ExplainBackendConfig = field(default_factory=ExplainBackendConfig)
+
     # Shuffle analysis configuration
     shuffle_analysis: ShuffleAnalysisConfig = field(default_factory=ShuffleAnalysisConfig)
 
+    # Scan I/O analysis configuration
+    scan_io: ScanIOConfig = field(default_factory=ScanIOConfig)
+
+    # Join strategy evaluation configuration
+    join_analysis: JoinAnalysisConfig = field(default_factory=JoinAnalysisConfig)
+
+    # Execute-and-measure verification configuration
+    execution: ExecutionConfig = field(default_factory=ExecutionConfig)
+
+    # Cost model calibration configuration
+    cost_model: CostModelConfig = field(default_factory=CostModelConfig)
+
     def __post_init__(self):
         if self.output_file_dir and not os.path.exists(self.output_file_dir):
             os.makedirs(self.output_file_dir, exist_ok=True)
 
 
+def llm_config_from_dict(values: Dict[str, Any]) -> LLMConfig:
+    """Build an LLMConfig from the notebook's ``LLM_CONFIG`` dictionary.
+
+    Unknown keys are ignored so older notebook settings keep working.
+
+    Args:
+        values: ``{"provider": ..., "databricks": {...}, "retry": {...}, ...}``
+
+    Returns:
+        LLMConfig with the given values over the defaults
+    """
+    def build(cls, section: Dict[str, Any]):
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (section or {}).items() if k in known})
+
+    config = build(LLMConfig, {k: v for k, v in values.items() if not isinstance(v, dict)})
+    config.databricks = build(DatabricksLLMConfig, values.get("databricks"))
+    config.openai = build(OpenAIConfig, values.get("openai"))
+    config.azure_openai = build(AzureOpenAIConfig, values.get("azure_openai"))
+    config.anthropic = build(AnthropicConfig, values.get("anthropic"))
+    config.mock = build(MockLLMConfig, values.get("mock"))
+    config.retry = build(LLMRetryConfig, values.get("retry"))
+    config.stages = {stage: build(LLMStageConfig, section) for stage, section in (values.get("stages") or {}).items()}
+    return config
+
+
 # Global configuration instance
 _config: Optional[AnalysisConfig] = None
 
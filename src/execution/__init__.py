@@ -0,0 +1,14 @@
+"""Query executors for measuring and checking rewritten queries."""
+
+from .base import QueryExecutor
+from .spark import SparkQueryExecutor
+from .replay import QueryFixtureNotFoundError, ReplayQueryExecutor
+from .factory import create_query_executor
+
+__all__ = [
+    "QueryExecutor",
+    "SparkQueryExecutor",
+    "ReplayQueryExecutor",
+    "QueryFixtureNotFoundError",
+    "create_query_executor",
+]
@@ -0,0 +1,69 @@
+"""Base query executor interface."""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Optional
+
+from ..models import QueryRun, ResultFingerprint
+
+
+class QueryExecutor(ABC):
+    """Abstract base class for executors that run queries to completion or fingerprint their results."""
+
+    @abstractmethod
+    def run(self, sql: str) -> QueryRun:
+        """Execute a query to completion without returning its rows.
+
+        Args:
+            sql: Query to execute
+
+        Returns:
+            QueryRun with the wall-clock duration, bytes read and row count
+        """
+        pass
+
+    @abstractmethod
+    def fingerprint(self, sql: str) -> ResultFingerprint:
+        """Compute the row count and an order-insensitive checksum of a query result.
+
+        Checksums are only comparable between results of the same executor.
+
+        Args:
+            sql: Query whose result is fingerprinted
+
+        Returns:
+            ResultFingerprint of the full result
+        """
+        pass
+
+    def set_context(self, catalog: str, database: str) -> None:  # noqa: B027 - optional hook, a no-op without a session
+        """Make ``catalog`` / ``database`` the target of following queries.
+
+        Args:
+            catalog: Catalog name (empty to keep the current one)
+            database: Database name (empty to keep the current one)
+        """
+
+    def configure(self, settings: dict) -> None:  # noqa: B027 - optional hook, a no-op without session settings
+        """Apply session settings (e.g. disable caches) to following queries.
+
+        Args:
+            settings: ``{key: value}`` pairs issued as ``SET key = value``;
+                a None value resets the key to its default
+        """
+
+    def get_settings(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Read the current session settings, so configure() can restore them.
+
+        Args:
+            keys: Setting keys
+
+        Returns:
+            ``{key: value}``, None for keys that are not set
+        """
+        return dict.fromkeys(keys)
+
+    @property
+    @abstractmethod
+    def executor_name(self) -> str:
+        """Return the executor name for logging."""
+        pass
@@ -0,0 +1,30 @@
+"""Query executor factory."""
+
+from typing import Any
+
+from .base import QueryExecutor
+from .replay import ReplayQueryExecutor
+from .spark import SparkQueryExecutor
+from ..config import ExecutionConfig, get_config
+
+
+def create_query_executor(config: ExecutionConfig = None, spark: Any = None) -> QueryExecutor:
+    """Create a query executor based on configuration.
+
+    Args:
+        config: Execution configuration. If None, uses global config.
+        spark: Spark session for the ``spark`` executor
+
+    Returns:
+        A query executor instance
+    """
+    if config is None:
+        config = get_config().execution
+
+    if config.executor == "spark":
+        if spark is None:
+            raise ValueError("A Spark session is required for the spark query executor")
+        return SparkQueryExecutor(spark)
+    if config.executor == "replay":
+        return ReplayQueryExecutor(fixture_dir=config.fixture_dir)
+    raise ValueError(f"Unknown query executor: {config.executor}")
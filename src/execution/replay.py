@@ -0,0 +1,126 @@
+"""Query executor replaying recorded measurements.
+
+Stands in for a cluster in tests and offline runs. Each query maps to one
+recorded run or a list of runs; repeated executions cycle through the
+list, so medians over repeats can be exercised without a warehouse.
+Result rows can be recorded as well and are fingerprinted locally.
+Queries are matched with whitespace and a trailing ``;`` ignored.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from .base import QueryExecutor
+from ..explain.replay import fixture_key
+from ..models import QueryRun, ResultFingerprint
+
+RecordedRuns = Union[Dict[str, Any], List[Dict[str, Any]]]
+
+
+class QueryFixtureNotFoundError(LookupError):
+    """No recorded run exists for a query."""
+
+
+class ReplayQueryExecutor(QueryExecutor):
+    """Serves recorded runs from a fixture directory and/or an in-memory mapping.
+
+    Fixture files are named ``<fixture_key(sql)>.run.json`` and hold
+    ``{"sql": ..., "runs": [{"duration_ms": ..., "bytes_read": ..., "row_count": ...}]}``;
+    recorded result rows live in ``<fixture_key(sql)>.rows.json`` as
+    ``{"sql": ..., "rows": [[...], ...]}``.
+    """
+
+    def __init__(
+        self,
+        fixture_dir: str = "",
+        fixtures: Optional[Dict[str, RecordedRuns]] = None,
+        results: Optional[Dict[str, List[Any]]] = None,
+    ):
+        """Initialize the executor.
+
+        Args:
+            fixture_dir: Directory of recorded fixture files
+            fixtures: Extra ``{sql: run or [runs]}`` entries (take precedence)
+            results: Extra ``{sql: [rows]}`` entries (take precedence)
+        """
+        self.fixture_dir = fixture_dir
+        self.settings: Dict[str, str] = {}
+        self.executed: List[str] = []
+        self._fixtures = {fixture_key(k): v for k, v in (fixtures or {}).items()}
+        self._results = {fixture_key(k): v for k, v in (results or {}).items()}
+        self._calls: Dict[str, int] = {}
+
+    @property
+    def executor_name(self) -> str:
+        return "Replay"
+
+    def add_fixture(self, sql: str, runs: RecordedRuns) -> None:
+        """Register recorded runs for a query."""
+        self._fixtures[fixture_key(sql)] = runs
+
+    def add_result(self, sql: str, rows: List[Any]) -> None:
+        """Register recorded result rows for a query."""
+        self._results[fixture_key(sql)] = rows
+
+    def configure(self, settings: dict) -> None:
+        """Remember applied settings (for inspection in tests); None values remove them."""
+        for key, value in settings.items():
+            if value is None:
+                self.settings.pop(key, None)
+            else:
+                self.settings[key] = value
+
+    def get_settings(self, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Return the remembered settings."""
+        return {key: self.settings.get(key) for key in keys}
+
+    def run(self, sql: str) -> QueryRun:
+        """Return the next recorded run of a query."""
+        key = fixture_key(sql)
+        runs = self._load(key)
+        if runs is None:
+            raise QueryFixtureNotFoundError(f"No recorded run for query: {sql[:200]}")
+        if isinstance(runs, dict):
+            runs = [runs]
+
+        self.executed.append(sql)
+        index = self._calls.get(key, 0)
+        self._calls[key] = index + 1
+        run = runs[index % len(runs)]
+        return QueryRun(
+            duration_ms=float(run.get("duration_ms", 0)),
+            bytes_read=int(run.get("bytes_read", 0)),
+            row_count=int(run.get("row_count", 0)),
+        )
+
+    def fingerprint(self, sql: str) -> ResultFingerprint:
+        """Fingerprint the recorded result rows of a query."""
+        key = fixture_key(sql)
+        rows = self._results.get(key)
+        if rows is None:
+            rows = self._load_file(key, "rows")
+        if rows is None:
+            raise QueryFixtureNotFoundError(f"No recorded result for query: {sql[:200]}")
+
+        self.executed.append(sql)
+        checksum = 0
+        for row in rows:
+            encoded = json.dumps(list(row), default=str).encode("utf-8")
+            checksum += int.from_bytes(hashlib.sha256(encoded).digest()[:8], "big")
+        return ResultFingerprint(row_count=len(rows), checksum=str(checksum))
+
+    def _load(self, key: str) -> Optional[RecordedRuns]:
+        if key in self._fixtures:
+            return self._fixtures[key]
+        return self._load_file(key, "runs")
+
+    def _load_file(self, key: str, field: str) -> Optional[Any]:
+        if self.fixture_dir:
+            suffix = "run" if field == "runs" else field
+            path = os.path.join(self.fixture_dir, f"{key}.{suffix}.json")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)[field]
+        return None
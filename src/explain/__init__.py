@@ -0,0 +1,24 @@
+"""EXPLAIN execution backends."""
+
+from .base import ExplainBackend
+from .spark import SparkExplainBackend
+from .databricks_sql import DatabricksSQLExplainBackend
+from .replay import (
+    ExplainFixtureNotFoundError,
+    RecordingExplainBackend,
+    ReplayExplainBackend,
+    fixture_key,
+)
+from .factory import as_explain_backend, create_explain_backend
+
+__all__ = [
+    "ExplainBackend",
+    "SparkExplainBackend",
+    "DatabricksSQLExplainBackend",
+    "ReplayExplainBackend",
+    "RecordingExplainBackend",
+    "ExplainFixtureNotFoundError",
+    "fixture_key",
+    "as_explain_backend",
+    "create_explain_backend",
+]
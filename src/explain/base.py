@@ -0,0 +1,33 @@
+"""Base EXPLAIN backend interface."""
+
+from abc import ABC, abstractmethod
+
+
+class ExplainBackend(ABC):
+    """Abstract base class for backends that run EXPLAIN statements."""
+
+    @abstractmethod
+    def execute(self, statement: str) -> str:
+        """Run a statement and return its output text.
+
+        Args:
+            statement: SQL statement, e.g. ``EXPLAIN COST SELECT ...``
+
+        Returns:
+            Output text, one line per result row
+        """
+        pass
+
+    def set_context(self, catalog: str, database: str) -> None:  # noqa: B027 - optional hook, a no-op for context-free backends
+        """Make ``catalog`` / ``database`` the target of following statements.
+
+        Args:
+            catalog: Catalog name (empty to keep the current one)
+            database: Database name (empty to keep the current one)
+        """
+
+    @property
+    @abstractmethod
+    def backend_name(self) -> str:
+        """Return the backend name for logging."""
+        pass
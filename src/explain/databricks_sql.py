@@ -0,0 +1,149 @@
+"""EXPLAIN backend using the Databricks SQL Statement Execution API."""
+
+import os
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+from .base import ExplainBackend
+
+_TERMINAL_STATES = ("SUCCEEDED", "FAILED", "CANCELED", "CLOSED")
+
+
+class DatabricksSQLExplainBackend(ExplainBackend):
+    """Runs statements on a SQL warehouse over REST (no Spark session needed).
+
+    The API is stateless, so the catalog/database set by ``set_context`` are
+    sent with every statement instead of issuing ``USE``.
+    """
+
+    def __init__(
+        self,
+        warehouse_id: str,
+        workspace_url: Optional[str] = None,
+        token: Optional[str] = None,
+        timeout: int = 300,
+        poll_interval: float = 1.0,
+    ):
+        self.warehouse_id = warehouse_id
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.catalog = ""
+        self.database = ""
+        self._workspace_url = workspace_url
+        self._token = token
+
+    @property
+    def backend_name(self) -> str:
+        return "Databricks SQL"
+
+    def _get_token(self) -> str:
+        """Get Databricks API token."""
+        if self._token:
+            return self._token
+
+        # Try to get from dbutils (Databricks notebook environment)
+        try:
+            # pylint: disable=undefined-variable
+            return dbutils.notebook.entry_point.getDbutils().notebook().getContext().apiToken().get()  # noqa: F821
+        except Exception:
+            pass
+
+        token = os.environ.get("DATABRICKS_TOKEN")
+        if token:
+            return token
+
+        raise ValueError(
+            "Failed to obtain Databricks token. "
+            "Please set the environment variable DATABRICKS_TOKEN."
+        )
+
+    def _get_workspace_url(self) -> str:
+        """Get Databricks workspace URL (host name without scheme)."""
+        workspace_url = self._workspace_url
+        if not workspace_url:
+            # Try to get from spark config (Databricks notebook environment)
+            try:
+                # pylint: disable=undefined-variable
+                workspace_url = spark.conf.get("spark.databricks.workspaceUrl")  # noqa: F821
+            except Exception:
+                workspace_url = os.environ.get("DATABRICKS_WORKSPACE_URL", "")
+        if workspace_url:
+            return workspace_url.replace("https://", "").rstrip("/")
+
+        raise ValueError(
+            "Failed to obtain Databricks workspace URL. "
+            "Please set the environment variable DATABRICKS_WORKSPACE_URL."
+        )
+
+    def set_context(self, catalog: str, database: str) -> None:
+        """Remember the catalog/database sent with following statements."""
+        self.catalog = catalog or self.catalog
+        self.database = database or self.database
+
+    def _build_payload(self, statement: str) -> Dict[str, Any]:
+        """Build the statement execution request payload."""
+        payload = {
+            "statement": statement,
+            "warehouse_id": self.warehouse_id,
+            "wait_timeout": "30s",
+            "on_wait_timeout": "CONTINUE",
+            "disposition": "INLINE",
+            "format": "JSON_ARRAY",
+        }
+        if self.catalog:
+            payload["catalog"] = self.catalog
+        if self.database:
+            payload["schema"] = self.database
+        return payload
+
+    def execute(self, statement: str) -> str:
+        """Submit a statement, poll until it finishes and return its rows."""
+        if requests is None:
+            raise ImportError("requests library is required for Databricks SQL EXPLAIN backend")
+
+        base_url = f"https://{self._get_workspace_url()}/api/2.0/sql/statements"
+        headers = {
+            "Authorization": f"Bearer {self._get_token()}",
+            "Content-Type": "application/json",
+        }
+
+        response = requests.post(base_url, headers=headers, json=self._build_payload(statement), timeout=self.timeout)
+        result = self._check_response(response)
+
+        deadline = time.time() + self.timeout
+        while result.get("status", {}).get("state") not in _TERMINAL_STATES:
+            if time.time() > deadline:
+                raise TimeoutError(f"Statement did not finish within {self.timeout} seconds")
+            time.sleep(self.poll_interval)
+            response = requests.get(f"{base_url}/{result['statement_id']}", headers=headers, timeout=self.timeout)
+            result = self._check_response(response)
+
+        return self.parse_result(result)
+
+    @staticmethod
+    def parse_result(result: Dict[str, Any]) -> str:
+        """Convert a finished statement response into output text.
+
+        Raises:
+            RuntimeError: If the statement did not succeed
+        """
+        status = result.get("status", {})
+        if status.get("state") != "SUCCEEDED":
+            error = status.get("error", {})
+            raise RuntimeError(
+                f"Statement {status.get('state', 'UNKNOWN')}: "
+                f"{error.get('error_code', '')} {error.get('message', '')}".strip()
+            )
+        rows = result.get("result", {}).get("data_array") or []
+        return "".join(str(row[0]) + "\n" for row in rows if row)
+
+    @staticmethod
+    def _check_response(response: Any) -> Dict[str, Any]:
+        if response.status_code != 200:
+            raise RuntimeError(f"API Error: Status code {response.status_code}\n{response.text}")
+        return response.json()
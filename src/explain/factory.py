@@ -0,0 +1,50 @@
+"""EXPLAIN backend factory."""
+
+from typing import Any
+
+from .base import ExplainBackend
+from .databricks_sql import DatabricksSQLExplainBackend
+from .replay import RecordingExplainBackend, ReplayExplainBackend
+from .spark import SparkExplainBackend
+from ..config import ExplainBackendConfig, get_config
+
+
+def create_explain_backend(config: ExplainBackendConfig = None, spark: Any = None) -> ExplainBackend:
+    """Create an EXPLAIN backend based on configuration.
+
+    Args:
+        config: Backend configuration. If None, uses global config.
+        spark: Spark session for the ``spark`` backend
+
+    Returns:
+        An EXPLAIN backend instance (wrapped for recording when
+        ``record_dir`` is set)
+    """
+    if config is None:
+        config = get_config().explain_backend
+
+    backend_type = config.backend
+
+    if backend_type == "spark":
+        if spark is None:
+            raise ValueError("A Spark session is required for the spark EXPLAIN backend")
+        backend = SparkExplainBackend(spark)
+    elif backend_type == "databricks_sql":
+        if not config.warehouse_id:
+            raise ValueError("warehouse_id is required for the databricks_sql EXPLAIN backend")
+        backend = DatabricksSQLExplainBackend(warehouse_id=config.warehouse_id)
+    elif backend_type == "replay":
+        return ReplayExplainBackend(fixture_dir=config.fixture_dir)
+    else:
+        raise ValueError(f"Unknown EXPLAIN backend: {backend_type}")
+
+    if config.record_dir:
+        backend = RecordingExplainBackend(backend, config.record_dir)
+    return backend
+
+
+def as_explain_backend(backend: Any) -> ExplainBackend:
+    """Return ``backend`` itself, or a Spark backend when given a Spark session."""
+    if isinstance(backend, ExplainBackend):
+        return backend
+    return SparkExplainBackend(backend)
@@ -0,0 +1,98 @@
+"""EXPLAIN backends replaying and recording outputs as fixture files.
+
+Fixtures are JSON files named by a hash of the statement (whitespace and a
+trailing ``;`` ignored) holding ``{"statement": ..., "output": ...}``, so
+runs recorded on Databricks can be replayed locally by the full
+optimization pipeline for regression tests and benchmarks.
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Optional
+
+from .base import ExplainBackend
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class ExplainFixtureNotFoundError(LookupError):
+    """No recorded output exists for a statement."""
+
+
+def fixture_key(statement: str) -> str:
+    """Return the fixture key (hash) of a statement."""
+    normalized = _WHITESPACE_RE.sub(" ", statement or "").strip().rstrip(";").strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:24]
+
+
+class ReplayExplainBackend(ExplainBackend):
+    """Serves recorded outputs from a fixture directory and/or an in-memory mapping."""
+
+    def __init__(
+        self,
+        fixture_dir: str = "",
+        fixtures: Optional[Dict[str, str]] = None,
+        default_output: Optional[str] = None,
+    ):
+        """Initialize the backend.
+
+        Args:
+            fixture_dir: Directory of recorded fixture files
+            fixtures: Extra ``{statement: output}`` entries (take precedence)
+            default_output: Output for unknown statements; None raises
+                ExplainFixtureNotFoundError instead
+        """
+        self.fixture_dir = fixture_dir
+        self.default_output = default_output
+        self._fixtures = {fixture_key(k): v for k, v in (fixtures or {}).items()}
+
+    @property
+    def backend_name(self) -> str:
+        return "Replay"
+
+    def add_fixture(self, statement: str, output: str) -> None:
+        """Register an output for a statement."""
+        self._fixtures[fixture_key(statement)] = output
+
+    def execute(self, statement: str) -> str:
+        """Return the recorded output of a statement."""
+        key = fixture_key(statement)
+        if key in self._fixtures:
+            return self._fixtures[key]
+
+        if self.fixture_dir:
+            path = os.path.join(self.fixture_dir, f"{key}.json")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)["output"]
+
+        if self.default_output is not None:
+            return self.default_output
+        raise ExplainFixtureNotFoundError(f"No recorded output for statement: {statement[:200]}")
+
+
+class RecordingExplainBackend(ExplainBackend):
+    """Wraps another backend and writes every EXPLAIN output as a fixture file."""
+
+    def __init__(self, backend: ExplainBackend, fixture_dir: str):
+        self.backend = backend
+        self.fixture_dir = fixture_dir
+
+    @property
+    def backend_name(self) -> str:
+        return f"Recording({self.backend.backend_name})"
+
+    def set_context(self, catalog: str, database: str) -> None:
+        self.backend.set_context(catalog, database)
+
+    def execute(self, statement: str) -> str:
+        """Run the statement on the wrapped backend and record its output."""
+        output = self.backend.execute(statement)
+        if statement.lstrip().upper().startswith("EXPLAIN"):
+            os.makedirs(self.fixture_dir, exist_ok=True)
+            path = os.path.join(self.fixture_dir, f"{fixture_key(statement)}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"statement": statement, "output": output}, f, ensure_ascii=False, indent=2)
+        return output
@@ -0,0 +1,31 @@
+"""EXPLAIN backend running statements on a Spark session."""
+
+from typing import Any
+
+from .base import ExplainBackend
+
+
+class SparkExplainBackend(ExplainBackend):
+    """Runs statements through ``spark.sql`` (Databricks notebooks and jobs)."""
+
+    def __init__(self, spark: Any):
+        self.spark = spark
+
+    @property
+    def backend_name(self) -> str:
+        return "Spark"
+
+    def execute(self, statement: str) -> str:
+        """Run a statement and concatenate the first column of its rows.
+
+        Rows are fetched one partition at a time with ``toLocalIterator``
+        instead of collecting them all on the driver first.
+        """
+        return "".join(str(row[0]) + "\n" for row in self.spark.sql(statement).toLocalIterator())
+
+    def set_context(self, catalog: str, database: str) -> None:
+        """Issue USE CATALOG / USE DATABASE on the session."""
+        if catalog:
+            self.spark.sql(f"USE CATALOG {catalog}")
+        if database:
+            self.spark.sql(f"USE DATABASE {database}")
@@ -5,7 +5,12 @@ from .databricks import DatabricksLLMClient
 from .openai import OpenAILLMClient
 from .azure_openai import AzureOpenAILLMClient
 from .anthropic import AnthropicLLMClient
-from .factory import create_llm_client, get_llm_client, call_llm, reset_llm_client
+from .mock import MockLLMClient
+from .mock_server import MockLLMServer
+from .factory import RoutingLLMClient, create_llm_client, get_llm_client, call_llm, reset_llm_client
+from .dispatcher import LLMDispatcher, get_llm_dispatcher, set_llm_dispatcher
+from .retry import APIError, CircuitOpenError, TokenLimitError
+from .telemetry import format_llm_telemetry, save_llm_telemetry, summarize_llm_calls
 
 __all__ = [
     "LLMClient",
@@ -13,8 +18,20 @@ __all__ = [
     "OpenAILLMClient",
     "AzureOpenAILLMClient",
     "AnthropicLLMClient",
+    "MockLLMClient",
+    "MockLLMServer",
+    "RoutingLLMClient",
     "create_llm_client",
     "get_llm_client",
     "call_llm",
     "reset_llm_client",
+    "LLMDispatcher",
+    "get_llm_dispatcher",
+    "set_llm_dispatcher",
+    "APIError",
+    "CircuitOpenError",
+    "TokenLimitError",
+    "format_llm_telemetry",
+    "save_llm_telemetry",
+    "summarize_llm_calls",
 ]
@@ -1,7 +1,7 @@
 """Anthropic LLM client."""
 
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 try:
     import requests
@@ -9,7 +9,8 @@ except ImportError:
     requests = None
 
 from .base import LLMClient
-from ..config import AnthropicConfig
+from .retry import APIError  # noqa: F401  (re-exported)
+from ..config import AnthropicConfig, LLMRetryConfig
 
 
 class AnthropicLLMClient(LLMClient):
@@ -22,8 +23,9 @@ class AnthropicLLMClient(LLMClient):
         config: AnthropicConfig,
         max_retries: int = 3,
         timeout: int = 300,
+        retry: Optional[LLMRetryConfig] = None,
     ):
-        super().__init__(max_retries=max_retries, timeout=timeout)
+        super().__init__(max_retries=max_retries, timeout=timeout, retry=retry)
         self.config = config
 
     @property
@@ -65,29 +67,22 @@ class AnthropicLLMClient(LLMClient):
         payload = self._build_payload(prompt)
 
         try:
-            response = requests.post(
+            response = self._post(
                 self.API_URL,
                 headers=headers,
                 json=payload,
-                timeout=self.timeout,
             )
 
             if response.status_code == 200:
                 result = response.json()
+                self._record_usage(result.get("usage"))
                 content = result["content"][0]["text"]
                 print("✅ Anthropic analysis completed")
                 return content
 
-            raise APIError(
-                f"Anthropic API Error: Status code {response.status_code}\n{response.text}"
-            )
+            raise self._api_error(response)
 
         except requests.exceptions.Timeout:
             raise TimeoutError(
                 f"Request timed out after {self.timeout} seconds."
             )
-
-
-class APIError(Exception):
-    """Raised for API errors."""
-    pass
@@ -1,7 +1,7 @@
 """Azure OpenAI LLM client."""
 
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 try:
     import requests
@@ -9,7 +9,8 @@ except ImportError:
     requests = None
 
 from .base import LLMClient
-from ..config import AzureOpenAIConfig
+from .retry import APIError  # noqa: F401  (re-exported)
+from ..config import AzureOpenAIConfig, LLMRetryConfig
 
 
 class AzureOpenAILLMClient(LLMClient):
@@ -20,8 +21,9 @@ class AzureOpenAILLMClient(LLMClient):
         config: AzureOpenAIConfig,
         max_retries: int = 3,
         timeout: int = 300,
+        retry: Optional[LLMRetryConfig] = None,
     ):
-        super().__init__(max_retries=max_retries, timeout=timeout)
+        super().__init__(max_retries=max_retries, timeout=timeout, retry=retry)
         self.config = config
 
     @property
@@ -78,29 +80,22 @@ class AzureOpenAILLMClient(LLMClient):
         endpoint_url = self._get_endpoint_url()
 
         try:
-            response = requests.post(
+            response = self._post(
                 endpoint_url,
                 headers=headers,
                 json=payload,
-                timeout=self.timeout,
             )
 
             if response.status_code == 200:
                 result = response.json()
+                self._record_usage(result.get("usage"))
                 content = result["choices"][0]["message"]["content"]
                 print("✅ Azure OpenAI analysis completed")
                 return content
 
-            raise APIError(
-                f"Azure OpenAI API Error: Status code {response.status_code}\n{response.text}"
-            )
+            raise self._api_error(response)
 
         except requests.exceptions.Timeout:
             raise TimeoutError(
                 f"Request timed out after {self.timeout} seconds."
             )
-
-
-class APIError(Exception):
-    """Raised for API errors."""
-    pass
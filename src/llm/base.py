@@ -1,16 +1,94 @@
 """Base LLM client interface."""
 
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
+import threading
 import time
 
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+from .retry import (
+    APIError,
+    CircuitBreaker,
+    TokenLimitError,
+    is_retryable,
+    is_token_limit_message,
+    parse_retry_after,
+    retry_delay,
+)
+from ..config import LLMRetryConfig
+
+# Connections kept open per host by the shared session
+HTTP_POOL_SIZE = 16
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> Any:
+    """Get the HTTP session shared by all LLM clients.
+
+    Reusing one session keeps TLS connections to the provider endpoints
+    alive between calls instead of reconnecting for every prompt.
+
+    Returns:
+        A pooled ``requests.Session``
+    """
+    global _http_session
+    if requests is None:
+        raise ImportError("requests library is required for LLM clients")
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
 
 class LLMClient(ABC):
     """Abstract base class for LLM clients."""
 
-    def __init__(self, max_retries: int = 3, timeout: int = 300):
+    def __init__(self, max_retries: int = 3, timeout: int = 300, retry: Optional[LLMRetryConfig] = None):
         self.max_retries = max_retries
         self.timeout = timeout
+        self.retry = retry or LLMRetryConfig()
+        self.circuit_breaker = CircuitBreaker(self.retry.circuit_failure_threshold, self.retry.circuit_reset_sec)
+        # Token usage and retries of the current call, per thread (dispatch may run concurrently)
+        self._call_state = threading.local()
+
+    def _record_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        """Remember the token usage reported in an API response."""
+        usage = usage or {}
+        self._call_state.usage = (
+            int(usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0),
+            int(usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0),
+        )
+
+    def last_call_stats(self) -> Tuple[int, int, int]:
+        """Return prompt tokens, completion tokens and retries of this thread's last call_with_retry."""
+        prompt_tokens, completion_tokens = getattr(self._call_state, "usage", (0, 0))
+        return prompt_tokens, completion_tokens, getattr(self._call_state, "retries", 0)
+
+    def _post(self, url: str, **kwargs: Any) -> Any:
+        """POST through the shared pooled session with the client timeout."""
+        return get_http_session().post(url, timeout=self.timeout, **kwargs)
+
+    def _api_error(self, response: Any) -> APIError:
+        """Build the error for a non-200 response (token-limit errors get their own type)."""
+        message = f"{self.provider_name} API Error: Status code {response.status_code}\n{response.text}"
+        if response.status_code == 400 and is_token_limit_message(response.text):
+            return TokenLimitError(message, status_code=400)
+        return APIError(
+            message,
+            status_code=response.status_code,
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+        )
 
     @abstractmethod
     def call(self, prompt: str) -> str:
@@ -24,30 +102,53 @@ class LLMClient(ABC):
         """
         pass
 
-    def call_with_retry(self, prompt: str) -> str:
-        """Call the LLM with retry logic.
+    def call_with_retry(self, prompt: str, shrink: Optional[Callable[[str], str]] = None) -> str:
+        """Call the LLM with the shared retry policy.
+
+        Transient errors are retried after a jittered backoff or the
+        server's Retry-After, token-limit errors are retried with the prompt
+        shortened by ``shrink`` (and fail immediately without one), other
+        errors and an open circuit breaker fail immediately.
 
         Args:
             prompt: The prompt text to send
+            shrink: Shortens the prompt after a token-limit error; None when
+                the prompt must be sent whole
 
         Returns:
             The LLM response text
         """
         last_error: Optional[Exception] = None
+        self._call_state.usage = (0, 0)
+        self._call_state.retries = 0
 
         for attempt in range(self.max_retries):
-            try:
-                if attempt > 0:
-                    print(f"🔄 Retrying... (attempt {attempt + 1}/{self.max_retries})")
-                    time.sleep(2 ** attempt)  # Exponential backoff
-
-                return self.call(prompt)
+            if attempt > 0:
+                self._call_state.retries = attempt
+                if isinstance(last_error, TokenLimitError):
+                    prompt = shrink(prompt)
+                    print(f"✂️ Token limit exceeded - retrying with a shorter prompt ({len(prompt):,} characters)")
+                else:
+                    delay = retry_delay(attempt, last_error, self.retry)
+                    print(f"🔄 Retrying in {delay:.1f}s... (attempt {attempt + 1}/{self.max_retries})")
+                    time.sleep(delay)
 
+            self.circuit_breaker.before_call()
+            try:
+                response = self.call(prompt)
             except Exception as e:
                 last_error = e
+                retryable = is_retryable(e)
+                if retryable:
+                    self.circuit_breaker.record_failure()
+                if not (retryable or (isinstance(e, TokenLimitError) and shrink is not None)):
+                    raise
                 if attempt < self.max_retries - 1:
                     print(f"⚠️ Error occurred: {str(e)} - Retrying...")
-                    continue
+                continue
+
+            self.circuit_breaker.record_success()
+            return response
 
         raise last_error if last_error else RuntimeError("Unknown error")
 
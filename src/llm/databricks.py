@@ -9,7 +9,8 @@ except ImportError:
     requests = None
 
 from .base import LLMClient
-from ..config import DatabricksLLMConfig
+from .retry import APIError, TokenLimitError  # noqa: F401  (re-exported)
+from ..config import DatabricksLLMConfig, LLMRetryConfig
 
 
 class DatabricksLLMClient(LLMClient):
@@ -22,8 +23,9 @@ class DatabricksLLMClient(LLMClient):
         token: Optional[str] = None,
         max_retries: int = 3,
         timeout: int = 300,
+        retry: Optional[LLMRetryConfig] = None,
     ):
-        super().__init__(max_retries=max_retries, timeout=timeout)
+        super().__init__(max_retries=max_retries, timeout=timeout, retry=retry)
         self.config = config
         self._workspace_url = workspace_url
         self._token = token
@@ -34,8 +36,8 @@ class DatabricksLLMClient(LLMClient):
 
     def _get_token(self) -> str:
         """Get Databricks API token."""
-        if self._token:
-            return self._token
+        if self._token or self.config.token:
+            return self._token or self.config.token
 
         # Try to get from dbutils (Databricks notebook environment)
         try:
@@ -57,8 +59,8 @@ class DatabricksLLMClient(LLMClient):
 
     def _get_workspace_url(self) -> str:
         """Get Databricks workspace URL."""
-        if self._workspace_url:
-            return self._workspace_url
+        if self._workspace_url or self.config.workspace_url:
+            return self._workspace_url or self.config.workspace_url
 
         # Try to get from spark config
         try:
@@ -109,8 +111,10 @@ class DatabricksLLMClient(LLMClient):
         token = self._get_token()
         workspace_url = self._get_workspace_url()
 
+        # A URL with a scheme (e.g. http://localhost:8080 for the mock server) is used as-is
+        base_url = workspace_url if "://" in workspace_url else f"https://{workspace_url}"
         endpoint_url = (
-            f"https://{workspace_url}/serving-endpoints/"
+            f"{base_url.rstrip('/')}/serving-endpoints/"
             f"{self.config.endpoint_name}/invocations"
         )
 
@@ -122,15 +126,15 @@ class DatabricksLLMClient(LLMClient):
         payload = self._build_payload(prompt)
 
         try:
-            response = requests.post(
+            response = self._post(
                 endpoint_url,
                 headers=headers,
                 json=payload,
-                timeout=self.timeout,
             )
 
             if response.status_code == 200:
                 result = response.json()
+                self._record_usage(result.get("usage"))
                 content = (
                     result.get("choices", [{}])[0]
                     .get("message", {})
@@ -139,29 +143,10 @@ class DatabricksLLMClient(LLMClient):
                 print("✅ Databricks analysis completed")
                 return content
 
-            # Handle specific error cases
-            if response.status_code == 400 and "maximum tokens" in response.text.lower():
-                raise TokenLimitError(
-                    f"Token limit exceeded. Consider reducing max_tokens. "
-                    f"Current: {self.config.max_tokens}"
-                )
-
-            raise APIError(
-                f"API Error: Status code {response.status_code}\n{response.text}"
-            )
+            raise self._api_error(response)
 
         except requests.exceptions.Timeout:
             raise TimeoutError(
                 f"Request timed out after {self.timeout} seconds. "
                 "Consider checking endpoint status or reducing prompt size."
             )
-
-
-class TokenLimitError(Exception):
-    """Raised when token limit is exceeded."""
-    pass
-
-
-class APIError(Exception):
-    """Raised for API errors."""
-    pass
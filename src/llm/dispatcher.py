@@ -0,0 +1,184 @@
+"""Single dispatch point for every LLM call.
+
+All prompts go through one LLMDispatcher, which selects the configured
+provider's LLMClient and adds the cross-cutting features in one place:
+pooled HTTP connections (via the clients), an identical-prompt response
+cache, a concurrency limit, the configured timeout and retries, a
+per-call record of latency, tokens, retries and outcome, and optionally a
+recording of live responses for offline replay by the mock provider.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional, Union
+
+from .base import LLMClient
+from .factory import create_llm_client
+from .retry import shrink_prompt
+from .mock import append_recorded_response
+from ..config import LLMConfig, get_config
+from ..models import LLMCallRecord
+
+
+class LLMDispatcher:
+    """Routes prompts to LLM clients with caching, a concurrency limit and call records."""
+
+    def __init__(
+        self,
+        config: LLMConfig = None,
+        clients: Optional[Dict[str, LLMClient]] = None,
+        records: Optional[List[LLMCallRecord]] = None,
+    ):
+        """Initialize the dispatcher.
+
+        Args:
+            config: LLM configuration. If None, uses global config.
+            clients: Pre-built clients per provider (created from config otherwise);
+                fallback routing is applied on top of them
+            records: List to append call records to (shared across dispatchers of one run)
+        """
+        self.config = config if config is not None else get_config().llm
+        self.records: List[LLMCallRecord] = records if records is not None else []
+        self._provided: Dict[str, LLMClient] = dict(clients or {})
+        self._clients: Dict[str, LLMClient] = {}
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, self.config.max_concurrency))
+
+    def client(self, provider: Optional[str] = None, stage: str = "", max_tokens: int = 0) -> LLMClient:
+        """Get (creating on first use) the client of a provider for a stage.
+
+        Stages with a model override (see LLMConfig.for_stage) and calls with
+        a token cap get their own client; pre-built clients are used as-is
+        for every stage.
+
+        Args:
+            provider: Provider name (defaults to the configured provider)
+            stage: Pipeline stage name
+            max_tokens: Cap on the response tokens (0 = the configured max_tokens)
+
+        Returns:
+            The provider's LLM client
+        """
+        provider = provider or self.config.provider
+        config = replace(self.config, provider=provider).for_stage(stage).with_max_tokens(max_tokens)
+        key = f"{provider}:{config.model_name()}:{getattr(config, provider).max_tokens}"
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = create_llm_client(config, clients=self._provided)
+            return self._clients[key]
+
+    def dispatch(self, prompt: str, stage: str = "", provider: Optional[str] = None, max_tokens: int = 0) -> str:
+        """Send a prompt and return the response text.
+
+        Identical prompts to the same provider and model are answered from
+        the cache. The stage selects the model (see LLMConfig.for_stage) and
+        whether a token-limit error is retried with a shortened prompt (see
+        LLMRetryConfig.shrinkable_stages).
+
+        Args:
+            prompt: The prompt to send
+            stage: Pipeline stage name, recorded with the call
+            provider: Provider override (defaults to the configured provider)
+            max_tokens: Cap on the response tokens (0 = the configured max_tokens)
+
+        Returns:
+            The LLM response text
+
+        Raises:
+            Exception: The last error of the client once its retries are exhausted
+        """
+        provider = provider or self.config.provider
+        model = replace(self.config, provider=provider).for_stage(stage).model_name()
+        record = LLMCallRecord(stage=stage, provider=provider, model=model)
+        key = self._cache_key(f"{provider}:{model}:{max_tokens or ''}", prompt)
+        start = time.perf_counter()
+
+        cached = self._cached(key)
+        if cached is not None:
+            record.cache_hit = True
+            record.success = True
+            self._record(record, start)
+            return cached
+
+        client = None
+        try:
+            client = self.client(provider, stage, max_tokens)
+            with self._slots:
+                response = client.call_with_retry(prompt, self._prompt_shrinker(stage))
+        except Exception as e:
+            record.error_message = str(e)
+            if client is not None:
+                record.retries = client.last_call_stats()[2]
+            self._record(record, start)
+            raise
+
+        record.prompt_tokens, record.completion_tokens, record.retries = client.last_call_stats()
+        record.cost_usd = (
+            record.prompt_tokens * self.config.prompt_price_per_1k_tokens
+            + record.completion_tokens * self.config.completion_price_per_1k_tokens
+        ) / 1000
+        record.success = True
+        self._store(key, response)
+        if self.config.record_path and provider != "mock":
+            append_recorded_response(self.config.record_path, prompt, response, stage)
+        self._record(record, start)
+        return response
+
+    def _prompt_shrinker(self, stage: str) -> Optional[Callable[[str], str]]:
+        """Prompt shortening of a stage after token-limit errors (None = send prompts whole)."""
+        retry = self.config.retry
+        if stage not in retry.shrinkable_stages:
+            return None
+        return lambda prompt: shrink_prompt(prompt, retry.prompt_shrink_ratio)
+
+    def clear_cache(self) -> None:
+        """Drop all cached responses."""
+        with self._lock:
+            self._cache.clear()
+
+    @staticmethod
+    def _cache_key(provider: str, prompt: str) -> str:
+        return f"{provider}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}"
+
+    def _cached(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def _store(self, key: str, response: str) -> None:
+        if self.config.response_cache_size <= 0 or not response:
+            return
+        with self._lock:
+            self._cache[key] = response
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.config.response_cache_size:
+                self._cache.popitem(last=False)
+
+    def _record(self, record: LLMCallRecord, start: float) -> None:
+        record.latency_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.records.append(record)
+
+
+# Module-level dispatcher instance (lazy initialization)
+_dispatcher: Union[LLMDispatcher, None] = None
+
+
+def get_llm_dispatcher() -> LLMDispatcher:
+    """Get or create the global LLM dispatcher."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = LLMDispatcher()
+    return _dispatcher
+
+
+def set_llm_dispatcher(dispatcher: Optional[LLMDispatcher]) -> None:
+    """Replace (or with None, reset) the global LLM dispatcher."""
+    global _dispatcher
+    _dispatcher = dispatcher
@@ -1,39 +1,177 @@
-"""LLM client factory."""
+"""LLM client factory and multi-provider routing."""
 
-from typing import Union
+import statistics
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 from .base import LLMClient
 from .databricks import DatabricksLLMClient
 from .openai import OpenAILLMClient
 from .azure_openai import AzureOpenAILLMClient
 from .anthropic import AnthropicLLMClient
+from .mock import MockLLMClient
 from ..config import LLMConfig, get_config
 
 
-def create_llm_client(config: LLMConfig = None) -> LLMClient:
+class RoutingLLMClient(LLMClient):
+    """Primary provider with ordered fallbacks and optional hedged requests.
+
+    Without hedging, providers are tried in order and the next one is used
+    when a provider fails (after its own retries). With hedging, the next
+    provider is also fired once the current one has not answered within the
+    hedge delay, and the first valid answer wins. The hedge delay starts at
+    ``hedge_after_sec`` and follows the primary's observed p95 latency once
+    enough calls have been seen.
+    """
+
+    def __init__(self, clients: List[LLMClient], hedge_after_sec: float = 0.0, hedge_min_samples: int = 20):
+        """Initialize the router.
+
+        Args:
+            clients: Primary client first, then fallbacks in order
+            hedge_after_sec: Initial hedge delay (0 = no hedging, failover only)
+            hedge_min_samples: Primary latencies needed before the p95 is used
+        """
+        super().__init__(max_retries=1, timeout=max(c.timeout for c in clients))
+        self.clients = clients
+        self.hedge_after_sec = hedge_after_sec
+        self.hedge_min_samples = hedge_min_samples
+        self._primary_latencies: deque = deque(maxlen=200)
+
+    @property
+    def provider_name(self) -> str:
+        return " → ".join(c.provider_name for c in self.clients)
+
+    def call(self, prompt: str) -> str:
+        """Route a prompt (each provider applies its own retry policy)."""
+        return self.call_with_retry(prompt)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for a provider before hedging (None = hedging off)."""
+        if self.hedge_after_sec <= 0 or len(self.clients) < 2:
+            return None
+        if len(self._primary_latencies) >= self.hedge_min_samples:
+            return statistics.quantiles(self._primary_latencies, n=20)[18]
+        return self.hedge_after_sec
+
+    def call_with_retry(self, prompt: str, shrink: Optional[Callable[[str], str]] = None) -> str:
+        """Get the first valid answer from the providers.
+
+        Args:
+            prompt: The prompt text to send
+            shrink: Shortens the prompt after a token-limit error (passed to each provider)
+
+        Returns:
+            The LLM response text
+
+        Raises:
+            Exception: The last provider error when no provider answered
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._call_in_order(prompt, shrink)
+        return self._call_hedged(prompt, delay, shrink)
+
+    def _call_client(
+        self, index: int, prompt: str, shrink: Optional[Callable[[str], str]] = None
+    ) -> Tuple[str, Tuple[int, int, int]]:
+        client = self.clients[index]
+        start = time.perf_counter()
+        response = client.call_with_retry(prompt, shrink)
+        if index == 0:
+            self._primary_latencies.append(time.perf_counter() - start)
+        if not response:
+            raise ValueError(f"{client.provider_name} returned an empty response")
+        return response, client.last_call_stats()
+
+    def _accept(self, response: str, stats: Tuple[int, int, int]) -> str:
+        prompt_tokens, completion_tokens, retries = stats
+        self._call_state.usage = (prompt_tokens, completion_tokens)
+        self._call_state.retries = retries
+        return response
+
+    def _call_in_order(self, prompt: str, shrink: Optional[Callable[[str], str]] = None) -> str:
+        last_error: Optional[Exception] = None
+        for index, client in enumerate(self.clients):
+            try:
+                return self._accept(*self._call_client(index, prompt, shrink))
+            except Exception as e:
+                last_error = e
+                if index < len(self.clients) - 1:
+                    print(f"⚠️ {client.provider_name} failed: {str(e)} - falling back to {self.clients[index + 1].provider_name}")
+        raise last_error if last_error else RuntimeError("No LLM provider configured")
+
+    def _call_hedged(self, prompt: str, delay: float, shrink: Optional[Callable[[str], str]] = None) -> str:
+        pool = ThreadPoolExecutor(max_workers=len(self.clients))
+        pending = {pool.submit(self._call_client, 0, prompt, shrink)}
+        next_index = 1
+        last_error: Optional[Exception] = None
+        try:
+            while pending:
+                can_hedge = next_index < len(self.clients)
+                done, pending = wait(pending, timeout=delay if can_hedge else None, return_when=FIRST_COMPLETED)
+                if not done:
+                    print(f"⏱️ No answer after {delay:.1f}s - hedging with {self.clients[next_index].provider_name}")
+                    pending.add(pool.submit(self._call_client, next_index, prompt, shrink))
+                    next_index += 1
+                    continue
+                for future in done:
+                    try:
+                        return self._accept(*future.result())
+                    except Exception as e:
+                        last_error = e
+                if not pending and next_index < len(self.clients):
+                    print(f"⚠️ Provider failed: {str(last_error)} - falling back to {self.clients[next_index].provider_name}")
+                    pending.add(pool.submit(self._call_client, next_index, prompt, shrink))
+                    next_index += 1
+        finally:
+            # Slower requests still in flight are abandoned
+            pool.shutdown(wait=False)
+        raise last_error if last_error else RuntimeError("No LLM provider configured")
+
+
+def _create_provider_client(config: LLMConfig, provider: str) -> LLMClient:
+    """Create the client of a single provider."""
+    options = {"max_retries": config.max_retries, "timeout": config.timeout_sec, "retry": config.retry}
+
+    if provider == "databricks":
+        return DatabricksLLMClient(config=config.databricks, **options)
+    elif provider == "openai":
+        return OpenAILLMClient(config=config.openai, **options)
+    elif provider == "azure_openai":
+        return AzureOpenAILLMClient(config=config.azure_openai, **options)
+    elif provider == "anthropic":
+        return AnthropicLLMClient(config=config.anthropic, **options)
+    elif provider == "mock":
+        return MockLLMClient(config=config.mock, **options)
+    else:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def create_llm_client(config: LLMConfig = None, clients: Optional[Dict[str, LLMClient]] = None) -> LLMClient:
     """Create an LLM client based on configuration.
 
+    With ``fallback_providers`` configured, the primary and fallback clients
+    are wrapped in a RoutingLLMClient.
+
     Args:
         config: LLM configuration. If None, uses global config.
+        clients: Pre-built clients per provider, used instead of creating them
 
     Returns:
         An LLM client instance
     """
     if config is None:
         config = get_config().llm
+    clients = clients or {}
 
-    provider = config.provider
-
-    if provider == "databricks":
-        return DatabricksLLMClient(config=config.databricks)
-    elif provider == "openai":
-        return OpenAILLMClient(config=config.openai)
-    elif provider == "azure_openai":
-        return AzureOpenAILLMClient(config=config.azure_openai)
-    elif provider == "anthropic":
-        return AnthropicLLMClient(config=config.anthropic)
-    else:
-        raise ValueError(f"Unknown LLM provider: {provider}")
+    providers = [config.provider] + [p for p in config.fallback_providers if p != config.provider]
+    routed = [clients.get(p) or _create_provider_client(config, p) for p in dict.fromkeys(providers)]
+    if len(routed) == 1:
+        return routed[0]
+    return RoutingLLMClient(routed, hedge_after_sec=config.hedge_after_sec)
 
 
 # Module-level client instance (lazy initialization)
@@ -49,19 +187,25 @@ def get_llm_client() -> LLMClient:
 
 
 def reset_llm_client() -> None:
-    """Reset the global LLM client instance."""
+    """Reset the global LLM client and dispatcher instances."""
     global _client
+    from .dispatcher import set_llm_dispatcher
+
     _client = None
+    set_llm_dispatcher(None)
 
 
-def call_llm(prompt: str) -> str:
-    """Convenience function to call the LLM.
+def call_llm(prompt: str, stage: str = "", max_tokens: int = 0) -> str:
+    """Convenience function to call the LLM through the global dispatcher.
 
     Args:
         prompt: The prompt to send
+        stage: Pipeline stage name, recorded with the call
+        max_tokens: Cap on the response tokens (0 = the configured max_tokens)
 
     Returns:
         The LLM response
     """
-    client = get_llm_client()
-    return client.call_with_retry(prompt)
+    from .dispatcher import get_llm_dispatcher
+
+    return get_llm_dispatcher().dispatch(prompt, stage=stage, max_tokens=max_tokens)
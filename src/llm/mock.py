@@ -0,0 +1,147 @@
+"""Deterministic local LLM provider.
+
+Answers prompts without a model endpoint so the pipeline can run offline:
+first from recorded live responses (replayed by prompt hash), then from
+templated responses matched by regular expression, then with a default.
+A seeded, configurable latency is simulated per call, which makes the mock
+usable for end-to-end throughput benchmarks and concurrency tests. The same
+responder backs the in-process client and the HTTP server in
+``mock_server``.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import string
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .base import LLMClient
+from ..config import LLMRetryConfig, MockLLMConfig
+
+_record_lock = threading.Lock()
+
+
+def prompt_key(prompt: str) -> str:
+    """Key of a prompt in recorded-response files."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def append_recorded_response(path: str, prompt: str, response: str, stage: str = "") -> None:
+    """Append a live response to a JSON-lines recording for later replay.
+
+    Args:
+        path: Recording file path
+        prompt: Prompt that was sent
+        response: Response that was received
+        stage: Pipeline stage name (informational)
+    """
+    entry = {"key": prompt_key(prompt), "stage": stage, "prompt_chars": len(prompt), "response": response}
+    with _record_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def load_recorded_responses(path: str) -> Dict[str, str]:
+    """Load a JSON-lines recording as ``{prompt key: response}`` (later lines win)."""
+    recorded: Dict[str, str] = {}
+    if not path or not os.path.exists(path):
+        return recorded
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recorded[entry["key"]] = entry["response"]
+    return recorded
+
+
+def load_response_templates(path: str) -> Tuple[List[Tuple[re.Pattern, str]], Optional[str]]:
+    """Load templated responses.
+
+    The file holds ``{"responses": [{"match": regex, "response": template}],
+    "default": template}``. Templates may use ``$name`` placeholders filled
+    from the named groups of the matching regex.
+
+    Returns:
+        Compiled (pattern, template) pairs in file order and the default template
+    """
+    if not path:
+        return [], None
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    templates = [
+        (re.compile(item["match"], re.IGNORECASE | re.DOTALL), item["response"])
+        for item in data.get("responses", [])
+    ]
+    return templates, data.get("default")
+
+
+class MockResponder:
+    """Chooses the response and simulated latency of a prompt."""
+
+    def __init__(self, config: MockLLMConfig):
+        self.config = config
+        self.recorded = load_recorded_responses(config.recorded_path)
+        self.templates, default = load_response_templates(config.responses_path)
+        self.default_response = config.default_response or default
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    def respond(self, prompt: str) -> str:
+        """Recorded response, else the first matching template, else the default."""
+        key = prompt_key(prompt)
+        if key in self.recorded:
+            return self.recorded[key]
+        for pattern, template in self.templates:
+            match = pattern.search(prompt)
+            if match:
+                return string.Template(template).safe_substitute(match.groupdict())
+        if self.default_response is not None:
+            return self.default_response
+        return f"Mock LLM response for prompt {key[:12]} ({len(prompt):,} characters)"
+
+    def latency_sec(self) -> float:
+        """Simulated latency of the next call."""
+        jitter = 0.0
+        if self.config.latency_jitter_ms > 0:
+            with self._lock:
+                jitter = self._rng.uniform(0, self.config.latency_jitter_ms)
+        return max(0.0, self.config.latency_ms + jitter) / 1000
+
+
+class MockLLMClient(LLMClient):
+    """In-process client answering from a MockResponder."""
+
+    def __init__(
+        self,
+        config: MockLLMConfig,
+        max_retries: int = 3,
+        timeout: int = 300,
+        retry: Optional[LLMRetryConfig] = None,
+    ):
+        super().__init__(max_retries=max_retries, timeout=timeout, retry=retry)
+        self.config = config
+        self.responder = MockResponder(config)
+
+    @property
+    def provider_name(self) -> str:
+        return "Mock"
+
+    def call(self, prompt: str) -> str:
+        """Answer after the simulated latency."""
+        latency = self.responder.latency_sec()
+        if latency > self.timeout:
+            time.sleep(self.timeout)
+            raise TimeoutError(f"Request timed out after {self.timeout} seconds.")
+        time.sleep(latency)
+        response = self.responder.respond(prompt)
+        self._record_usage({"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(response)})
+        return response
@@ -0,0 +1,167 @@
+"""Tiny HTTP server speaking the Databricks / OpenAI chat schema.
+
+Serves ``POST /serving-endpoints/<name>/invocations`` (Databricks Model
+Serving) and ``POST /v1/chat/completions`` (OpenAI) from a MockResponder,
+so the real clients, their connection pooling, retries and routing can be
+exercised end to end without a model endpoint. Point the databricks
+provider's ``workspace_url`` (or the openai provider's ``base_url``) at
+``server.url``.
+
+Run standalone::
+
+    python -m src.llm.mock_server --port 8080 --responses responses.json --latency-ms 500
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from .mock import MockResponder, estimate_tokens
+from ..config import MockLLMConfig
+
+
+def _prompt_from_messages(messages: List[Dict[str, Any]]) -> str:
+    """Join the text of chat messages (string or content-block form)."""
+    parts = []
+    for message in messages or []:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = "".join(block.get("text", "") for block in content if isinstance(block, dict))
+        parts.append(str(content))
+    return "\n".join(parts)
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    server: "_MockHTTPServer"
+
+    def do_POST(self) -> None:  # noqa: N802  (http.server naming)
+        if not (self.path.startswith("/serving-endpoints/") or self.path.rstrip("/").endswith("/chat/completions")):
+            self._send(404, {"error": {"message": f"Unknown path: {self.path}"}})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            self._send(400, {"error": {"message": "Request body is not valid JSON"}})
+            return
+
+        prompt = _prompt_from_messages(body.get("messages"))
+        time.sleep(self.server.responder.latency_sec())
+        content = self.server.responder.respond(prompt)
+        self._send(200, {
+            "object": "chat.completion",
+            "model": body.get("model") or self.server.responder.config.model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": estimate_tokens(prompt),
+                "completion_tokens": estimate_tokens(content),
+                "total_tokens": estimate_tokens(prompt) + estimate_tokens(content),
+            },
+        })
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, responder: MockResponder, verbose: bool):
+        super().__init__(address, _ChatHandler)
+        self.responder = responder
+        self.verbose = verbose
+
+
+class MockLLMServer:
+    """Mock chat endpoint running on a background thread.
+
+    Usable as a context manager::
+
+        with MockLLMServer(MockLLMConfig(latency_ms=200)) as server:
+            config.databricks.workspace_url = server.url
+    """
+
+    def __init__(self, config: Optional[MockLLMConfig] = None, host: str = "127.0.0.1", port: int = 0, verbose: bool = False):
+        """Initialize the server.
+
+        Args:
+            config: Mock responses and latency (defaults to MockLLMConfig())
+            host: Interface to bind
+            port: Port to bind (0 = any free port)
+            verbose: Log each request to stderr
+        """
+        self._httpd = _MockHTTPServer((host, port), MockResponder(config or MockLLMConfig()), verbose)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server, e.g. ``http://127.0.0.1:51234``."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the mock server in the foreground."""
+    parser = argparse.ArgumentParser(description="Mock LLM endpoint (Databricks / OpenAI chat schema)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--responses", default="", help="JSON file of templated responses")
+    parser.add_argument("--recorded", default="", help="JSON-lines file of recorded responses")
+    parser.add_argument("--default-response", default="")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = MockLLMConfig(
+        responses_path=args.responses,
+        recorded_path=args.recorded,
+        default_response=args.default_response,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        seed=args.seed,
+    )
+    httpd = _MockHTTPServer((args.host, args.port), MockResponder(config), verbose=True)
+    print(f"🧪 Mock LLM server listening on http://{args.host}:{httpd.server_address[1]}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
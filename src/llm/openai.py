@@ -1,7 +1,7 @@
 """OpenAI LLM client."""
 
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 try:
     import requests
@@ -9,7 +9,8 @@ except ImportError:
     requests = None
 
 from .base import LLMClient
-from ..config import OpenAIConfig
+from .retry import APIError  # noqa: F401  (re-exported)
+from ..config import OpenAIConfig, LLMRetryConfig
 
 
 class OpenAILLMClient(LLMClient):
@@ -22,8 +23,9 @@ class OpenAILLMClient(LLMClient):
         config: OpenAIConfig,
         max_retries: int = 3,
         timeout: int = 300,
+        retry: Optional[LLMRetryConfig] = None,
     ):
-        super().__init__(max_retries=max_retries, timeout=timeout)
+        super().__init__(max_retries=max_retries, timeout=timeout, retry=retry)
         self.config = config
 
     @property
@@ -40,6 +42,12 @@ class OpenAILLMClient(LLMClient):
             )
         return api_key
 
+    def _api_url(self) -> str:
+        """Chat completions URL (base_url points at any OpenAI-compatible server)."""
+        if self.config.base_url:
+            return f"{self.config.base_url.rstrip('/')}/chat/completions"
+        return self.API_URL
+
     def _build_payload(self, prompt: str) -> Dict[str, Any]:
         """Build the API request payload."""
         return {
@@ -64,29 +72,22 @@ class OpenAILLMClient(LLMClient):
         payload = self._build_payload(prompt)
 
         try:
-            response = requests.post(
-                self.API_URL,
+            response = self._post(
+                self._api_url(),
                 headers=headers,
                 json=payload,
-                timeout=self.timeout,
             )
 
             if response.status_code == 200:
                 result = response.json()
+                self._record_usage(result.get("usage"))
                 content = result["choices"][0]["message"]["content"]
                 print("✅ OpenAI analysis completed")
                 return content
 
-            raise APIError(
-                f"OpenAI API Error: Status code {response.status_code}\n{response.text}"
-            )
+            raise self._api_error(response)
 
         except requests.exceptions.Timeout:
             raise TimeoutError(
                 f"Request timed out after {self.timeout} seconds."
             )
-
-
-class APIError(Exception):
-    """Raised for API errors."""
-    pass
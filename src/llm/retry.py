@@ -0,0 +1,167 @@
+"""Retry policy shared by all LLM clients.
+
+Errors are classified before retrying: rate limits, server errors,
+timeouts and connection errors are retried with full-jitter exponential
+backoff (or after the server's ``Retry-After``), token-limit errors are
+retried with a shortened prompt when the caller allows it (see
+``LLMRetryConfig.shrinkable_stages``), and anything else fails immediately. A
+per-client circuit breaker fails fast once an endpoint keeps failing, so
+a batch run does not spend every query's full retry budget on a dead
+endpoint.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+from ..config import LLMRetryConfig
+
+# Status codes worth retrying (timeouts, conflicts, rate limits, server errors)
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Response fragments of context/token limit errors across providers
+_TOKEN_LIMIT_MARKERS = (
+    "maximum context length",
+    "context_length_exceeded",
+    "prompt is too long",
+    "too many tokens",
+)
+
+
+class APIError(Exception):
+    """Raised for API errors."""
+
+    def __init__(self, message: str, status_code: int = 0, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenLimitError(APIError):
+    """Raised when token limit is exceeded."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the endpoint while its circuit breaker is open."""
+
+
+# Fragments of errors about the max_tokens request parameter, which a shorter prompt cannot fix
+_MAX_TOKENS_PARAMETER_MARKERS = ("max_tokens", "max_output_tokens", "max_completion_tokens")
+
+
+def is_token_limit_message(text: str) -> bool:
+    """Whether an error response reports a prompt exceeding the token/context limit."""
+    lowered = (text or "").lower()
+    if any(marker in lowered for marker in _MAX_TOKENS_PARAMETER_MARKERS):
+        return False
+    return any(marker in lowered for marker in _TOKEN_LIMIT_MARKERS)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header (seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error is transient and the same request may succeed later.
+
+    Token-limit errors are not retryable as-is; they need a shorter prompt.
+    """
+    if isinstance(error, (TokenLimitError, CircuitOpenError)):
+        return False
+    if isinstance(error, APIError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    # TimeoutError and connection errors (both OSError subclasses)
+    return isinstance(error, OSError)
+
+
+def retry_delay(attempt: int, error: Exception, config: LLMRetryConfig, rng: random.Random = None) -> float:
+    """Seconds to wait before retry number ``attempt`` (1-based).
+
+    Args:
+        attempt: Retry number
+        error: Error of the previous attempt
+        config: Retry policy
+        rng: Random source (for tests)
+
+    Returns:
+        The server's Retry-After when given (capped), otherwise a full-jitter
+        exponential backoff
+    """
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        return min(retry_after, config.retry_after_max_sec)
+    ceiling = min(config.backoff_max_sec, config.backoff_base_sec * 2 ** attempt)
+    return (rng or random).uniform(0, ceiling)
+
+
+def shrink_prompt(prompt: str, ratio: float) -> str:
+    """Shorten a prompt to about ``ratio`` of its length by cutting the middle.
+
+    Instructions usually sit at the start and the output format at the end,
+    so both ends are kept. Only for prompts whose middle may be lost (never
+    a query to rewrite).
+    """
+    keep = int(len(prompt) * ratio)
+    if keep >= len(prompt):
+        return prompt
+    head = keep // 2
+    tail = keep - head
+    removed = len(prompt) - keep
+    return (
+        prompt[:head]
+        + f"\n\n... [{removed:,} characters omitted to fit the model context] ...\n\n"
+        + prompt[len(prompt) - tail:]
+    )
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker of one endpoint.
+
+    After ``failure_threshold`` consecutive endpoint failures the circuit
+    opens and calls fail fast for ``reset_sec``; then one trial call is let
+    through, closing the circuit on success.
+    """
+
+    def __init__(self, failure_threshold: int, reset_sec: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_sec = reset_sec
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None and self._clock() - self._opened_at < self.reset_sec
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError while the circuit is open."""
+        if self.is_open:
+            raise CircuitOpenError(
+                f"Circuit breaker open after {self._failures} consecutive failures; "
+                f"skipping calls for up to {self.reset_sec:.0f} seconds"
+            )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.failure_threshold > 0 and self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
@@ -0,0 +1,107 @@
+"""Per-stage breakdown of LLM call records.
+
+Turns the LLMCallRecords collected by the dispatcher into per-stage totals
+(calls, cache hits, retries, failures, latency, tokens, cost) and writes
+them as JSON or a markdown table, so the slowest or most expensive stage
+of a run is visible at a glance.
+"""
+
+import json
+from dataclasses import asdict
+from typing import Any, Dict, List
+
+from ..models import LLMCallRecord
+
+
+def summarize_llm_calls(records: List[LLMCallRecord]) -> Dict[str, Any]:
+    """Aggregate call records per pipeline stage.
+
+    Args:
+        records: Call records of one run
+
+    Returns:
+        ``{"stages": {stage: totals}, "total": totals}``; stages are ordered
+        by total latency, largest first, and each carries its share of the
+        total LLM latency
+    """
+    def empty() -> Dict[str, Any]:
+        return {
+            "calls": 0,
+            "cache_hits": 0,
+            "retries": 0,
+            "failures": 0,
+            "latency_ms": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cost_usd": 0.0,
+        }
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    total = empty()
+    for record in records:
+        for totals in (stages.setdefault(record.stage or "unknown", empty()), total):
+            totals["calls"] += 1
+            totals["cache_hits"] += int(record.cache_hit)
+            totals["retries"] += record.retries
+            totals["failures"] += int(not record.success)
+            totals["latency_ms"] += record.latency_ms
+            totals["prompt_tokens"] += record.prompt_tokens
+            totals["completion_tokens"] += record.completion_tokens
+            totals["cost_usd"] += record.cost_usd
+
+    ordered = dict(sorted(stages.items(), key=lambda item: item[1]["latency_ms"], reverse=True))
+    for totals in ordered.values():
+        totals["latency_share"] = totals["latency_ms"] / total["latency_ms"] if total["latency_ms"] else 0.0
+    return {"stages": ordered, "total": total}
+
+
+def format_llm_telemetry(records: List[LLMCallRecord], language: str = "en") -> str:
+    """Format the per-stage breakdown as a markdown section.
+
+    Args:
+        records: Call records of one run
+        language: Output language ('ja' or 'en')
+
+    Returns:
+        Formatted markdown section
+    """
+    ja = language == "ja"
+    summary = summarize_llm_calls(records)
+    lines = ["## 🤖 LLM呼び出しの内訳" if ja else "## 🤖 LLM Call Breakdown", ""]
+    if not records:
+        lines.append("LLM呼び出しはありません" if ja else "No LLM calls")
+        return "\n".join(lines)
+
+    if ja:
+        lines.append("| ステージ | 呼び出し | キャッシュ | リトライ | 失敗 | 所要時間 | 割合 | 入力トークン | 出力トークン | コスト |")
+    else:
+        lines.append("| Stage | Calls | Cached | Retries | Failed | Latency | Share | Prompt tokens | Completion tokens | Cost |")
+    lines.append("|-------|------:|-------:|--------:|-------:|--------:|------:|--------------:|------------------:|-----:|")
+
+    def row(name: str, totals: Dict[str, Any], share: str) -> str:
+        return (
+            f"| {name} | {totals['calls']} | {totals['cache_hits']} | {totals['retries']} | {totals['failures']} | "
+            f"{totals['latency_ms'] / 1000:,.1f} s | {share} | {totals['prompt_tokens']:,} | "
+            f"{totals['completion_tokens']:,} | ${totals['cost_usd']:,.4f} |"
+        )
+
+    for stage, totals in summary["stages"].items():
+        lines.append(row(stage, totals, f"{totals['latency_share']:.0%}"))
+    lines.append(row("**合計**" if ja else "**Total**", summary["total"], "100%"))
+    return "\n".join(lines)
+
+
+def save_llm_telemetry(records: List[LLMCallRecord], path: str) -> None:
+    """Write the call records and their per-stage breakdown as JSON.
+
+    Args:
+        records: Call records of one run
+        path: Output file path
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"summary": summarize_llm_calls(records), "calls": [asdict(r) for r in records]},
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
@@ -70,6 +70,178 @@ class ShuffleMetrics:
     skew_ratio: float = 0.0
 
 
+@dataclass
+class ShufflePartitionPlan:
+    """Partition sizing recommendation for a single shuffle node."""
+    node_id: str = ""
+    node_name: str = ""
+    data_size_bytes: int = 0
+    current_partitions: int = 0
+    aqe_partitions: int = 0
+    current_partition_size_bytes: int = 0
+    recommended_partitions: int = 0
+    advisory_partition_size_bytes: int = 0
+    current_spill_bytes: int = 0
+    predicted_spill_bytes: int = 0
+    task_count_change: int = 0
+    within_target: bool = False
+
+
+@dataclass
+class ShuffleSizingResult:
+    """Query-level shuffle partition sizing recommendation."""
+    plans: List[ShufflePartitionPlan] = field(default_factory=list)
+    shuffle_partitions: int = 0
+    advisory_partition_size_bytes: int = 0
+    set_statements: List[str] = field(default_factory=list)
+    current_total_tasks: int = 0
+    predicted_total_tasks: int = 0
+    current_total_spill_bytes: int = 0
+    predicted_total_spill_bytes: int = 0
+
+
+@dataclass
+class ClusterSizingOption:
+    """Predicted latency and cost of a query at one warehouse size."""
+    size: str = ""
+    workers: int = 0
+    task_slots: int = 0
+    predicted_latency_ms: float = 0.0
+    speedup: float = 1.0
+    dbu_per_hour: float = 0.0
+    predicted_dbu: float = 0.0
+    predicted_cost_usd: float = 0.0
+
+
+@dataclass
+class ClusterSizingResult:
+    """Amdahl-style cluster sizing analysis for a query."""
+    total_task_time_ms: float = 0.0
+    execution_time_ms: float = 0.0
+    current_task_slots: int = 0
+    observed_parallelism: float = 0.0
+    serial_fraction: float = 0.0
+    max_task_parallelism: int = 0
+    peak_stage_concurrency: int = 0
+    options: List[ClusterSizingOption] = field(default_factory=list)
+    current: Optional[ClusterSizingOption] = None
+    recommended: Optional[ClusterSizingOption] = None
+
+
+@dataclass
+class PhotonBlocker:
+    """A reason from the Photon explanation that keeps an operator off Photon."""
+    reason: str = ""
+    feature: str = ""
+    operator: str = ""
+
+
+@dataclass
+class PhotonFallbackOperator:
+    """A non-Photon operator with its time and the feature blocking Photon."""
+    node_id: str = ""
+    node_name: str = ""
+    tag: str = ""
+    exclusive_time_ms: float = 0.0
+    blockers: List[PhotonBlocker] = field(default_factory=list)
+    recoverable_time_ms: float = 0.0
+
+
+@dataclass
+class PhotonFallbackResult:
+    """Per-operator breakdown of time spent outside Photon."""
+    fully_supported: bool = False
+    photon_time_ms: float = 0.0
+    task_time_ms: float = 0.0
+    non_photon_time_ms: float = 0.0
+    total_recoverable_time_ms: float = 0.0
+    operators: List[PhotonFallbackOperator] = field(default_factory=list)
+    unattributed_blockers: List[PhotonBlocker] = field(default_factory=list)
+
+
+@dataclass
+class TableScanIO:
+    """I/O efficiency of all scans of one table."""
+    table_name: str = ""
+    scan_node_ids: List[str] = field(default_factory=list)
+    files_read: int = 0
+    files_pruned: int = 0
+    bytes_read: int = 0
+    bytes_pruned: int = 0
+    remote_bytes: int = 0
+    cache_bytes: int = 0
+    rows_read: int = 0
+    rows_output: int = 0
+    scan_time_ms: float = 0.0
+    avg_file_size_bytes: float = 0.0
+    pruning_ratio: float = 0.0
+    small_file_overhead_ms: float = 0.0
+    remote_throughput_mb_s: float = 0.0
+    cache_throughput_mb_s: float = 0.0
+    predicted_optimize_time_ms: float = 0.0
+    predicted_clustered_time_ms: float = 0.0
+
+
+@dataclass
+class ScanIOResult:
+    """Scan I/O efficiency aggregated per table."""
+    tables: List[TableScanIO] = field(default_factory=list)
+    total_bytes_read: int = 0
+    total_files_read: int = 0
+    total_scan_time_ms: float = 0.0
+    remote_bytes: int = 0
+    cache_bytes: int = 0
+
+
+@dataclass
+class JoinSide:
+    """Size estimate of one input of a join."""
+    root_node_id: str = ""
+    tables: List[str] = field(default_factory=list)
+    rows: int = 0
+    compressed_bytes: int = 0
+    estimated_bytes: int = 0
+    shuffle_bytes: int = 0
+
+
+@dataclass
+class JoinEvaluation:
+    """Build/probe estimate and strategy of a single join node."""
+    node_id: str = ""
+    node_name: str = ""
+    strategy: str = "unknown"
+    build: JoinSide = field(default_factory=JoinSide)
+    probe: JoinSide = field(default_factory=JoinSide)
+    output_rows: int = 0
+    broadcastable: bool = False
+
+
+@dataclass
+class JoinRewrite:
+    """A join rewrite candidate with its expected shuffle savings."""
+    kind: str = ""  # "broadcast", "raise_threshold" or "reorder"
+    node_id: str = ""
+    node_name: str = ""
+    # Tables (or the root node ID) of the build side and its uncompressed size
+    build_name: str = ""
+    build_bytes: int = 0
+    threshold_bytes: int = 0
+    # "reorder": the join to run after this one and the fraction of probe rows kept
+    input_join_id: str = ""
+    input_join_name: str = ""
+    selectivity: float = 0.0
+    hint: str = ""
+    expected_shuffle_bytes_saved: int = 0
+
+
+@dataclass
+class JoinEvaluationResult:
+    """Join strategy evaluation for a query."""
+    threshold_bytes: int = 0
+    joins: List[JoinEvaluation] = field(default_factory=list)
+    rewrites: List[JoinRewrite] = field(default_factory=list)
+
+
 @dataclass
 class FilterRateResult:
     """Filter operation rate calculation result."""
@@ -117,6 +289,15 @@ class OptimizationAttempt:
     is_successful: bool = False
 
 
+@dataclass
+class OptimizationResponse:
+    """Rewrite returned by the LLM in the structured JSON output mode."""
+    sql: str = ""
+    rationale: str = ""
+    applied_hints: List[str] = field(default_factory=list)
+    expected_effects: List[str] = field(default_factory=list)
+
+
 @dataclass
 class OptimizationResult:
     """Complete optimization result."""
@@ -151,3 +332,142 @@ class ExplainResult:
     file_paths: Dict[str, str] = field(default_factory=dict)
     is_successful: bool = False
     error_message: str = ""
+    from_cache: bool = False
+    plain_plan_derived: bool = False  # explain_output sliced from the EXPLAIN COST output
+
+
+@dataclass
+class PlanNode:
+    """Operator of a parsed EXPLAIN plan tree."""
+    operator: str = ""
+    text: str = ""  # Operator line without the tree prefix (continuation lines appended)
+    section: str = ""
+    depth: int = 0
+    line_number: int = 0
+    size_bytes: Optional[int] = None
+    row_count: Optional[float] = None
+    children: List["PlanNode"] = field(default_factory=list)
+
+
+@dataclass
+class ExplainPlan:
+    """EXPLAIN / EXPLAIN COST output parsed into operator trees per section."""
+    content_hash: str = ""
+    sections: Dict[str, List[PlanNode]] = field(default_factory=dict)  # section -> roots
+    nodes: List[PlanNode] = field(default_factory=list)  # every node in text order
+
+
+@dataclass
+class OperatorDiff:
+    """Estimate and join strategy change of one operator aligned across two plans."""
+    key: str = ""  # Operator and the tables below it, e.g. "Join[main.db.items, main.db.sales]"
+    operator: str = ""
+    tables: List[str] = field(default_factory=list)
+    status: str = "matched"  # "matched", "added" or "removed"
+    original_size_bytes: Optional[int] = None
+    optimized_size_bytes: Optional[int] = None
+    original_rows: Optional[float] = None
+    optimized_rows: Optional[float] = None
+    size_ratio: Optional[float] = None
+    row_ratio: Optional[float] = None
+    original_join_strategy: str = ""
+    optimized_join_strategy: str = ""
+    text: str = ""  # Optimized operator text (original for removed operators)
+
+
+@dataclass
+class PlanDiffResult:
+    """Operator-level diff of the original and optimized EXPLAIN COST plans."""
+    operators: List[OperatorDiff] = field(default_factory=list)  # plan order of the optimized plan
+    regressions: List[OperatorDiff] = field(default_factory=list)  # worst first
+    join_strategy_changes: List[OperatorDiff] = field(default_factory=list)
+    regression_ratio: float = 0.0
+
+
+@dataclass
+class CostObservation:
+    """EXPLAIN COST features of a query paired with its observed duration."""
+    query_hash: str = ""
+    group: str = ""  # Queries in one group (same tables read) are rewrites of each other
+    features: Dict[str, float] = field(default_factory=dict)
+    duration_ms: float = 0.0
+    recorded_at: str = ""
+
+
+@dataclass
+class CostModel:
+    """Weights of the comprehensive cost ratio, default or fitted to observed durations."""
+    weights: Dict[str, float] = field(default_factory=dict)
+    calibrated: bool = False
+    observation_count: int = 0
+    pair_count: int = 0
+    # Mean absolute log error of predicted vs. observed duration ratios
+    mean_abs_log_error: float = 0.0
+    baseline_mean_abs_log_error: float = 0.0  # same, with the default weights
+    fitted_at: str = ""
+
+
+@dataclass
+class QueryRun:
+    """Measurements of one query execution."""
+    duration_ms: float = 0.0
+    bytes_read: int = 0  # 0 when the executor cannot report it
+    row_count: int = 0
+
+
+@dataclass
+class MeasuredQuery:
+    """Repeated executions of one query with their medians."""
+    label: str = ""
+    sql: str = ""
+    runs: List[QueryRun] = field(default_factory=list)
+    median_duration_ms: float = 0.0
+    median_bytes_read: float = 0.0
+
+
+@dataclass
+class ExecutionVerificationResult:
+    """Measured original vs. optimized execution, next to the EXPLAIN COST estimate."""
+    original: MeasuredQuery = field(default_factory=MeasuredQuery)
+    optimized: MeasuredQuery = field(default_factory=MeasuredQuery)
+    repeats: int = 0
+    settings: Dict[str, str] = field(default_factory=dict)  # session settings applied before measuring
+    row_limit: int = 0
+    measured_speedup: float = 0.0  # original median / optimized median (> 1.0 means faster)
+    estimated_cost_ratio: Optional[float] = None
+    is_successful: bool = False
+    error_message: str = ""
+
+
+@dataclass
+class ResultFingerprint:
+    """Row count and order-insensitive checksum of a query result."""
+    row_count: int = 0
+    checksum: str = ""
+
+
+@dataclass
+class EquivalenceResult:
+    """Result comparison of an original and a rewritten query."""
+    status: str = ""  # "equivalent", "row_count_mismatch", "checksum_mismatch" or "error"
+    is_equivalent: bool = False
+    original: Optional[ResultFingerprint] = None
+    optimized: Optional[ResultFingerprint] = None
+    sample_percent: float = 0.0  # 0 = full data
+    error_message: str = ""
+
+
+@dataclass
+class LLMCallRecord:
+    """One LLM call routed through the dispatcher."""
+    stage: str = ""
+    provider: str = ""
+    model: str = ""
+    latency_ms: float = 0.0
+    prompt_tokens: int = 0  # as reported by the API (0 when not reported or cached)
+    completion_tokens: int = 0
+    retries: int = 0
+    cost_usd: float = 0.0
+    cache_hit: bool = False
+    success: bool = False
+    error_message: str = ""
@@ -9,6 +9,37 @@ from .performance import (
     compare_performance,
     format_performance_comparison,
 )
+from .explain_service import (
+    ExplainService,
+    create_execute_explain_fn,
+    explain_cost_metrics,
+    get_explain_service,
+    reset_explain_service,
+)
+from .plan_diff import (
+    describe_operator_diff,
+    diff_explain_plans,
+    format_plan_diff,
+)
+from .cost_model import (
+    DEFAULT_COST_WEIGHTS,
+    calibrate_cost_model,
+    fit_cost_model,
+    get_cost_weights,
+    load_cost_model,
+    make_cost_observation,
+    predict_cost_ratio,
+    save_cost_model,
+)
+from .verification import (
+    format_execution_verification,
+    verify_by_execution,
+)
+from .equivalence import (
+    apply_table_sample,
+    check_result_equivalence,
+    format_equivalence_result,
+)
 from .iterative import (
     execute_iterative_optimization,
     format_optimization_attempts_summary,
@@ -20,6 +51,27 @@ __all__ = [
     "generate_error_corrected_query",
     "compare_performance",
     "format_performance_comparison",
+    "ExplainService",
+    "create_execute_explain_fn",
+    "explain_cost_metrics",
+    "get_explain_service",
+    "reset_explain_service",
+    "describe_operator_diff",
+    "diff_explain_plans",
+    "format_plan_diff",
+    "DEFAULT_COST_WEIGHTS",
+    "calibrate_cost_model",
+    "fit_cost_model",
+    "get_cost_weights",
+    "load_cost_model",
+    "make_cost_observation",
+    "predict_cost_ratio",
+    "save_cost_model",
+    "format_execution_verification",
+    "verify_by_execution",
+    "apply_table_sample",
+    "check_result_equivalence",
+    "format_equivalence_result",
     "execute_iterative_optimization",
     "format_optimization_attempts_summary",
 ]
@@ -0,0 +1,356 @@
+"""Calibrated weights for the comprehensive cost ratio.
+
+The comprehensive cost ratio is a weighted sum of six component ratios
+(data processing, operation complexity, memory, spill, parallelism and
+partitioning), each comparing EXPLAIN COST features of a rewrite with its
+original. The default weights are hand-tuned. This module fits them to
+observed runtimes instead:
+
+* every analyzed profile adds one observation, the EXPLAIN COST features of
+  its query and the duration it actually took, to a local JSON-lines history;
+* observations of queries reading the same tables are treated as rewrites of
+  each other, and each ordered pair yields the six component ratios and the
+  observed duration ratio;
+* weights minimizing the squared error of the predicted ratio, pulled toward
+  the defaults by a ridge term, are clipped to be non-negative and rescaled
+  to sum to 1 (so identical plans keep a ratio of exactly 1.0).
+
+Fitted weights are only kept when they predict the observed ratios better
+than the defaults.
+"""
+
+import hashlib
+import json
+import math
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..config import get_config
+from ..models import CostModel, CostObservation
+
+COST_COMPONENTS = (
+    "data_processing",
+    "operation_complexity",
+    "memory_efficiency",
+    "spill_management",
+    "parallelism",
+    "partitioning_efficiency",
+)
+
+DEFAULT_COST_WEIGHTS: Dict[str, float] = {
+    "data_processing": 0.25,  # data size + rows
+    "operation_complexity": 0.20,  # scans + joins
+    "memory_efficiency": 0.20,  # memory estimate + spill risk
+    "spill_management": 0.15,  # estimated spill + memory pressure
+    "parallelism": 0.12,  # shuffle partitions
+    "partitioning_efficiency": 0.08,  # hash partitioning
+}
+
+# EXPLAIN COST metrics the component ratios are computed from
+COST_FEATURES = (
+    "total_size_bytes",
+    "total_rows",
+    "scan_operations",
+    "join_operations",
+    "memory_estimates",
+    "spill_risk_score",
+    "estimated_spill_gb",
+    "memory_pressure_score",
+    "spill_probability",
+    "shuffle_partitions",
+    "hash_partitions",
+    "total_partitions",
+)
+
+_EPS = 1e-6
+
+
+def _safe_ratio(optimized: float, original: float) -> float:
+    if abs(original) < _EPS:
+        if abs(optimized) < _EPS:
+            return 1.0
+        return 2.0 if optimized > 0 else 0.5
+    return optimized / original
+
+
+def _clamp(value: float, lo: float = 0.2, hi: float = 5.0) -> float:
+    if value != value:  # NaN
+        return 1.0
+    return max(lo, min(hi, value))
+
+
+def cost_component_ratios(original: Dict[str, Any], optimized: Dict[str, Any]) -> Dict[str, float]:
+    """Compute the six clamped component ratios of the comprehensive cost ratio.
+
+    Args:
+        original: EXPLAIN COST metrics of the original query
+        optimized: EXPLAIN COST metrics of the rewritten query
+
+    Returns:
+        Ratio (optimized / original) per component in COST_COMPONENTS
+    """
+
+    def ratio(key: str) -> float:
+        return _safe_ratio(float(optimized.get(key) or 0), float(original.get(key) or 0))
+
+    return {
+        "data_processing": _clamp((ratio("total_size_bytes") + ratio("total_rows")) / 2),
+        "operation_complexity": _clamp((ratio("scan_operations") + ratio("join_operations")) / 2),
+        "memory_efficiency": _clamp(ratio("memory_estimates") * 0.4 + ratio("spill_risk_score") * 0.6, hi=3.0),
+        "spill_management": _clamp(
+            ratio("estimated_spill_gb") * 0.4 + ratio("memory_pressure_score") * 0.3 + ratio("spill_probability") * 0.3,
+            hi=3.0,
+        ),
+        "parallelism": _clamp(ratio("shuffle_partitions")),
+        "partitioning_efficiency": _clamp(ratio("hash_partitions") * 0.7 + ratio("total_partitions") * 0.3),
+    }
+
+
+def predict_cost_ratio(
+    original: Dict[str, Any],
+    optimized: Dict[str, Any],
+    weights: Optional[Dict[str, float]] = None,
+) -> float:
+    """Predict the duration ratio of a rewrite from EXPLAIN COST metrics.
+
+    Args:
+        original: EXPLAIN COST metrics of the original query
+        optimized: EXPLAIN COST metrics of the rewritten query
+        weights: Component weights (defaults to DEFAULT_COST_WEIGHTS)
+
+    Returns:
+        Weighted sum of the component ratios (< 1.0 means faster)
+    """
+    weights = weights or DEFAULT_COST_WEIGHTS
+    ratios = cost_component_ratios(original, optimized)
+    return sum(ratios[c] * weights.get(c, 0.0) for c in COST_COMPONENTS)
+
+
+def make_cost_observation(
+    query: str,
+    explain_cost_metrics: Dict[str, Any],
+    duration_ms: float,
+    tables: Sequence[str] = (),
+) -> CostObservation:
+    """Build a history observation for an executed query.
+
+    Args:
+        query: Query text
+        explain_cost_metrics: EXPLAIN COST metrics of the query
+        duration_ms: Observed duration
+        tables: Tables the query reads; rewrites of one query share them
+
+    Returns:
+        CostObservation keeping only the COST_FEATURES metrics
+    """
+    features = {}
+    for key in COST_FEATURES:
+        try:
+            features[key] = float(explain_cost_metrics.get(key) or 0)
+        except (TypeError, ValueError):
+            features[key] = 0.0
+    return CostObservation(
+        query_hash=hashlib.sha256(" ".join((query or "").split()).encode("utf-8")).hexdigest(),
+        group=",".join(sorted(t.lower() for t in tables)),
+        features=features,
+        duration_ms=float(duration_ms),
+        recorded_at=datetime.now().isoformat(timespec="seconds"),
+    )
+
+
+def fit_cost_model(
+    observations: Iterable[CostObservation],
+    min_pairs: Optional[int] = None,
+    ridge: Optional[float] = None,
+) -> CostModel:
+    """Fit the component weights to observed duration ratios.
+
+    Args:
+        observations: History of executed queries
+        min_pairs: Minimum pairs required to fit (defaults to config)
+        ridge: Pull toward the default weights (defaults to config)
+
+    Returns:
+        CostModel; ``calibrated`` is False and the weights are the defaults
+        when there are too few pairs or the fit does not beat the defaults
+    """
+    config = get_config().cost_model
+    min_pairs = config.min_pairs if min_pairs is None else min_pairs
+    ridge = config.ridge if ridge is None else ridge
+
+    observations = [o for o in observations if o.duration_ms > 0]
+    pairs = _build_pairs(observations)
+    model = CostModel(
+        weights=dict(DEFAULT_COST_WEIGHTS),
+        observation_count=len(observations),
+        pair_count=len(pairs),
+        fitted_at=datetime.now().isoformat(timespec="seconds"),
+    )
+    if not pairs:
+        return model
+    model.baseline_mean_abs_log_error = model.mean_abs_log_error = _mean_abs_log_error(pairs, DEFAULT_COST_WEIGHTS)
+    if len(pairs) < min_pairs:
+        return model
+
+    weights = _fit_weights(pairs, ridge)
+    error = _mean_abs_log_error(pairs, weights)
+    if error < model.baseline_mean_abs_log_error:
+        model.weights = weights
+        model.mean_abs_log_error = error
+        model.calibrated = True
+    return model
+
+
+def _build_pairs(observations: List[CostObservation]) -> List[Tuple[List[float], float]]:
+    """Component ratios and clamped observed duration ratio of every ordered pair in a group."""
+    groups: Dict[str, List[CostObservation]] = defaultdict(list)
+    for observation in observations:
+        groups[observation.group].append(observation)
+
+    pairs = []
+    for members in groups.values():
+        for original in members:
+            for optimized in members:
+                if original is optimized:
+                    continue
+                ratios = cost_component_ratios(original.features, optimized.features)
+                target = _clamp(optimized.duration_ms / original.duration_ms)
+                pairs.append(([ratios[c] for c in COST_COMPONENTS], target))
+    return pairs
+
+
+def _fit_weights(pairs: List[Tuple[List[float], float]], ridge: float) -> Dict[str, float]:
+    """Ridge least squares toward the defaults, clipped to >= 0 and rescaled to sum to 1."""
+    n = len(COST_COMPONENTS)
+    prior = [DEFAULT_COST_WEIGHTS[c] for c in COST_COMPONENTS]
+    penalty = ridge * len(pairs)
+
+    # Normal equations: (X^T X + penalty * I) w = X^T y + penalty * prior
+    a = [[penalty if i == j else 0.0 for j in range(n)] for i in range(n)]
+    b = [penalty * p for p in prior]
+    for x, y in pairs:
+        for i in range(n):
+            b[i] += x[i] * y
+            for j in range(n):
+                a[i][j] += x[i] * x[j]
+
+    solution = _solve(a, b) or prior
+    clipped = [max(0.0, w) for w in solution]
+    total = sum(clipped)
+    if total <= 0:
+        return dict(DEFAULT_COST_WEIGHTS)
+    return {c: w / total for c, w in zip(COST_COMPONENTS, clipped)}
+
+
+def _solve(a: List[List[float]], b: List[float]) -> Optional[List[float]]:
+    """Solve a small dense linear system by Gaussian elimination (None if singular)."""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(col + 1, n):
+            factor = m[r][col] / m[col][col]
+            for c in range(col, n + 1):
+                m[r][c] -= factor * m[col][c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (m[r][n] - sum(m[r][c] * x[c] for c in range(r + 1, n))) / m[r][r]
+    return x
+
+
+def _mean_abs_log_error(pairs: List[Tuple[List[float], float]], weights: Dict[str, float]) -> float:
+    w = [weights[c] for c in COST_COMPONENTS]
+    errors = [
+        abs(math.log(max(sum(wi * xi for wi, xi in zip(w, x)), _EPS)) - math.log(y))
+        for x, y in pairs
+    ]
+    return sum(errors) / len(errors)
+
+
+def load_cost_observations(path: str) -> List[CostObservation]:
+    """Load the observation history (JSON lines); malformed lines are skipped."""
+    observations = []
+    if not path or not os.path.exists(path):
+        return observations
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                observations.append(CostObservation(**json.loads(line)))
+            except (TypeError, ValueError):
+                continue
+    return observations
+
+
+def append_cost_observation(path: str, observation: CostObservation) -> None:
+    """Append one observation to the history file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(observation.__dict__, ensure_ascii=False) + "\n")
+
+
+def save_cost_model(model: CostModel, path: str) -> str:
+    """Persist a cost model as JSON and return the path."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(model.__dict__, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_cost_model(path: str) -> Optional[CostModel]:
+    """Load a persisted cost model (None when missing or unreadable)."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            model = CostModel(**json.load(f))
+    except (OSError, TypeError, ValueError):
+        return None
+    if set(model.weights) != set(COST_COMPONENTS):
+        return None
+    return model
+
+
+def calibrate_cost_model(
+    observation: Optional[CostObservation] = None,
+    history_path: str = "",
+    model_path: str = "",
+) -> CostModel:
+    """Record an observation, refit the weights on the whole history and persist them.
+
+    Args:
+        observation: New observation to append first (optional)
+        history_path: History file (defaults to config)
+        model_path: Model file (defaults to config; not written when empty)
+
+    Returns:
+        The refitted CostModel
+    """
+    config = get_config().cost_model
+    history_path = history_path or config.history_path
+    model_path = model_path or config.model_path
+    if not history_path:
+        raise ValueError("A cost history path is required for calibration")
+
+    if observation is not None:
+        append_cost_observation(history_path, observation)
+    model = fit_cost_model(load_cost_observations(history_path))
+    if model_path:
+        save_cost_model(model, model_path)
+    return model
+
+
+def get_cost_weights(model_path: str = "") -> Dict[str, float]:
+    """Get the weights to use: the persisted calibrated model's, else the defaults."""
+    model = load_cost_model(model_path or get_config().cost_model.model_path)
+    if model is not None and model.calibrated:
+        return dict(model.weights)
+    return dict(DEFAULT_COST_WEIGHTS)
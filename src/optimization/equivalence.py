@@ -0,0 +1,214 @@
+"""Result-equivalence check of an original and a rewritten query.
+
+A rewrite that is faster but returns different rows must not be applied.
+This opt-in stage fingerprints both results through a QueryExecutor (row
+count plus an order-insensitive, duplicate-aware checksum) and compares
+them. With ``sample_percent`` set, every base table of both queries is
+replaced by the same repeatable TABLESAMPLE, so equivalent queries still
+see identical inputs while the check reads only a fraction of the data.
+"""
+
+import re
+from typing import Optional
+
+from ..config import get_config
+from ..execution import QueryExecutor
+from ..models import EquivalenceResult
+
+_CTE_NAME_PATTERN = re.compile(r"(?:\bWITH|,)\s*(?:RECURSIVE\s+)?([A-Za-z_]\w*)\s+AS\s*\(", re.IGNORECASE)
+_TABLE_LIST_KEYWORD_PATTERN = re.compile(r"\b(FROM|JOIN)\b", re.IGNORECASE)
+_TABLE_NAME_PATTERN = re.compile(r"\s*([A-Za-z_`][\w.`]*)")
+_TABLESAMPLE_PATTERN = re.compile(r"\s*TABLESAMPLE\s*\([^)]*\)(?:\s*REPEATABLE\s*\(\s*\d+\s*\))?", re.IGNORECASE)
+_ALIAS_PATTERN = re.compile(r"\s+(?:AS\s+)?([A-Za-z_]\w*|`[^`]+`)", re.IGNORECASE)
+_OPEN_PAREN_PATTERN = re.compile(r"\s*\(")
+_COMMA_PATTERN = re.compile(r"\s*,")
+_SELECT_PATTERN = re.compile(r"\bSELECT\b", re.IGNORECASE)
+
+# Words that end a table reference instead of aliasing it
+_CLAUSE_KEYWORDS = {
+    "where", "group", "order", "having", "limit", "offset", "join", "inner", "left", "right",
+    "full", "cross", "natural", "semi", "anti", "on", "using", "union", "except", "intersect",
+    "minus", "lateral", "window", "qualify", "pivot", "unpivot", "cluster", "distribute", "sort",
+    "tablesample", "select", "from",
+}
+
+
+def _is_function_from(sql: str, position: int) -> bool:
+    """Whether FROM at ``position`` is a function argument (EXTRACT(x FROM col), TRIM(... FROM col))."""
+    depth = 0
+    for index in range(position - 1, -1, -1):
+        char = sql[index]
+        if char == ")":
+            depth += 1
+        elif char == "(":
+            if depth == 0:
+                return not _SELECT_PATTERN.search(sql, index + 1, position)
+            depth -= 1
+    return False
+
+
+def _skip_parentheses(sql: str, position: int) -> int:
+    """Position after the parenthesized group opening at ``position``."""
+    depth = 0
+    for index in range(position, len(sql)):
+        if sql[index] == "(":
+            depth += 1
+        elif sql[index] == ")":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return len(sql)
+
+
+def _scan_table_reference(sql: str, position: int, cte_names: set, sample_positions: list) -> Optional[int]:
+    """Scan one FROM/JOIN list item, recording where a base table needs a sample clause.
+
+    Returns:
+        Position after the item and its alias, or None when no item starts here
+    """
+    parenthesized = _OPEN_PAREN_PATTERN.match(sql, position)
+    if parenthesized:
+        # Subquery: its own FROM clauses are sampled where they appear
+        position = _skip_parentheses(sql, parenthesized.end() - 1)
+    else:
+        name = _TABLE_NAME_PATTERN.match(sql, position)
+        if not name or name.group(1).lower() in _CLAUSE_KEYWORDS:
+            return None
+        position = name.end()
+        call = _OPEN_PAREN_PATTERN.match(sql, position)
+        if call:
+            # Table-valued function call
+            position = _skip_parentheses(sql, call.end() - 1)
+        else:
+            sampled = _TABLESAMPLE_PATTERN.match(sql, position)
+            if sampled:
+                position = sampled.end()
+            elif name.group(1).replace("`", "").lower() not in cte_names:
+                sample_positions.append(position)
+
+    alias = _ALIAS_PATTERN.match(sql, position)
+    if alias and alias.group(1).lower() not in _CLAUSE_KEYWORDS:
+        position = alias.end()
+    return position
+
+
+def apply_table_sample(sql: str, sample_percent: float, seed: int = 42) -> str:
+    """Add a repeatable TABLESAMPLE clause to every base table reference.
+
+    Covers tables after JOIN and every table of a comma-separated FROM
+    list, so ``FROM a, b`` and ``FROM a JOIN b`` sample the same inputs.
+    CTE names, subqueries, table-valued functions and function-style
+    ``FROM`` (e.g. ``EXTRACT``) are left alone. A ``sample_percent`` of 0
+    or 100 and above returns the query unchanged.
+
+    Args:
+        sql: Query to sample
+        sample_percent: Percentage of each table to keep
+        seed: REPEATABLE seed, identical for both queries of a comparison
+
+    Returns:
+        Query reading sampled tables
+    """
+    if sample_percent <= 0 or sample_percent >= 100:
+        return sql
+
+    cte_names = {name.lower() for name in _CTE_NAME_PATTERN.findall(sql)}
+    clause = f" TABLESAMPLE ({sample_percent:g} PERCENT) REPEATABLE ({int(seed)})"
+
+    sample_positions: list = []
+    for keyword in _TABLE_LIST_KEYWORD_PATTERN.finditer(sql):
+        is_from = keyword.group(1).upper() == "FROM"
+        if is_from and _is_function_from(sql, keyword.start()):
+            continue
+        position = _scan_table_reference(sql, keyword.end(), cte_names, sample_positions)
+        while is_from and position is not None:
+            comma = _COMMA_PATTERN.match(sql, position)
+            if not comma:
+                break
+            position = _scan_table_reference(sql, comma.end(), cte_names, sample_positions)
+
+    for position in sorted(set(sample_positions), reverse=True):
+        sql = sql[:position] + clause + sql[position:]
+    return sql
+
+
+def check_result_equivalence(
+    executor: QueryExecutor,
+    original_query: str,
+    optimized_query: str,
+    sample_percent: Optional[float] = None,
+    seed: Optional[int] = None,
+) -> EquivalenceResult:
+    """Compare the results of the original and optimized queries.
+
+    Args:
+        executor: Executor fingerprinting the results
+        original_query: Original query
+        optimized_query: Optimized query
+        sample_percent: Table sample percentage (defaults to config, 0 = full data)
+        seed: TABLESAMPLE seed (defaults to config)
+
+    Returns:
+        EquivalenceResult; a failing execution yields status ``"error"``
+    """
+    config = get_config().execution
+    sample_percent = config.sample_percent if sample_percent is None else sample_percent
+    seed = config.sample_seed if seed is None else seed
+
+    result = EquivalenceResult(sample_percent=sample_percent)
+    try:
+        result.original = executor.fingerprint(apply_table_sample(original_query, sample_percent, seed))
+        result.optimized = executor.fingerprint(apply_table_sample(optimized_query, sample_percent, seed))
+    except Exception as e:
+        result.status = "error"
+        result.error_message = str(e)
+        return result
+
+    if result.original.row_count != result.optimized.row_count:
+        result.status = "row_count_mismatch"
+    elif result.original.checksum != result.optimized.checksum:
+        result.status = "checksum_mismatch"
+    else:
+        result.status = "equivalent"
+        result.is_equivalent = True
+    return result
+
+
+def format_equivalence_result(result: EquivalenceResult, language: str = "en") -> str:
+    """Format an equivalence result as a markdown section.
+
+    Args:
+        result: Result of check_result_equivalence
+        language: Output language ('ja' or 'en')
+
+    Returns:
+        Formatted markdown section
+    """
+    ja = language == "ja"
+    lines = ["#### 🧮 結果の同値性チェック" if ja else "#### 🧮 Result Equivalence Check", ""]
+
+    if result.status == "error":
+        lines.append(
+            f"❌ 同値性チェックに失敗しました: {result.error_message}"
+            if ja
+            else f"❌ Equivalence check failed: {result.error_message}"
+        )
+        return "\n".join(lines)
+
+    verdicts = {
+        "equivalent": ("✅ 結果は一致しました", "✅ Results match"),
+        "row_count_mismatch": ("❌ 行数が一致しません", "❌ Row counts differ"),
+        "checksum_mismatch": ("❌ 行数は一致しましたが内容が異なります", "❌ Row counts match but contents differ"),
+    }
+    verdict_ja, verdict_en = verdicts.get(result.status, (result.status, result.status))
+    lines.append(f"- **{'判定' if ja else 'Verdict'}**: {verdict_ja if ja else verdict_en}")
+    lines.append(
+        f"- **{'行数' if ja else 'Row count'}**: "
+        f"{result.original.row_count:,} → {result.optimized.row_count:,}"
+    )
+    if result.sample_percent and result.sample_percent < 100:
+        scope = f"各テーブルの{result.sample_percent:g}%サンプル" if ja else f"{result.sample_percent:g}% sample of each table"
+    else:
+        scope = "全データ" if ja else "full data"
+    lines.append(f"- **{'対象' if ja else 'Scope'}**: {scope}")
+    return "\n".join(lines)
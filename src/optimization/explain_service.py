@@ -0,0 +1,336 @@
+"""EXPLAIN execution service with plan caching.
+
+Statements run through an ExplainBackend (Spark session, Databricks SQL
+statement API or recorded fixtures), so the optimization loop also runs
+outside Databricks.
+
+One service instance is shared by every optimization attempt. Results are
+cached by (catalog, database, normalized SQL hash), so the original query
+is planned once per run and a candidate validated and then compared is not
+re-planned. ``USE CATALOG`` / ``USE DATABASE`` are only issued when the
+target changes, and the plain plan is sliced out of the EXPLAIN COST output
+when it carries everything plain EXPLAIN would (physical plan and Photon
+explanation), saving the second EXPLAIN roundtrip.
+
+``explain_many`` plans several candidate rewrites concurrently on a thread
+pool against the same session; the catalog context is set once up front
+because ``USE`` changes session-wide state.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..config import get_config
+from ..explain import ExplainBackend, as_explain_backend
+from ..models import ExplainResult
+from ..utils.explain_plan import parse_explain_plan
+
+_EXPLAIN_PREFIX_RE = re.compile(r"^\s*EXPLAIN(?:\s+(?:COST|EXTENDED|FORMATTED|CODEGEN))?\s+", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+_SECTION_HEADER_RE = re.compile(r"^==\s*(.+?)\s*==\s*$", re.MULTILINE)
+
+PHYSICAL_PLAN_SECTION = "Physical Plan"
+PHOTON_EXPLANATION_SECTION = "Photon Explanation"
+
+
+def normalize_sql(sql: str) -> str:
+    """Normalize SQL for cache keys: strip EXPLAIN prefixes, collapse whitespace, drop trailing ';'."""
+    return _WHITESPACE_RE.sub(" ", strip_explain_prefix(sql)).strip()
+
+
+def strip_explain_prefix(sql: str) -> str:
+    """Strip leading EXPLAIN prefixes and a trailing ';', keeping the query text otherwise verbatim.
+
+    Line comments and whitespace inside literals must survive, so this (not
+    normalize_sql) is what gets sent to the backend.
+    """
+    sql = sql or ""
+    previous = None
+    while previous != sql:
+        previous = sql
+        sql = _EXPLAIN_PREFIX_RE.sub("", sql)
+    return sql.strip().rstrip(";").strip()
+
+
+def split_explain_sections(explain_output: str) -> Dict[str, str]:
+    """Split EXPLAIN output into ``{section title: body}`` keeping the body text verbatim."""
+    headers = list(_SECTION_HEADER_RE.finditer(explain_output or ""))
+    sections = {}
+    for index, header in enumerate(headers):
+        end = headers[index + 1].start() if index + 1 < len(headers) else len(explain_output)
+        sections[header.group(1)] = explain_output[header.end():end].strip("\n")
+    return sections
+
+
+def derive_plain_explain(explain_cost_output: str) -> Optional[str]:
+    """Rebuild plain EXPLAIN output from EXPLAIN COST / EXTENDED output.
+
+    Args:
+        explain_cost_output: Output of EXPLAIN COST or EXPLAIN EXTENDED
+
+    Returns:
+        The physical plan (and Photon explanation) in plain EXPLAIN layout,
+        or None when the output lacks either section
+    """
+    sections = split_explain_sections(explain_cost_output)
+    physical_plan = sections.get(PHYSICAL_PLAN_SECTION)
+    photon_explanation = sections.get(PHOTON_EXPLANATION_SECTION)
+    if not physical_plan or photon_explanation is None:
+        return None
+    return (
+        f"== {PHYSICAL_PLAN_SECTION} ==\n{physical_plan}\n\n"
+        f"== {PHOTON_EXPLANATION_SECTION} ==\n{photon_explanation}\n"
+    )
+
+
+class ExplainService:
+    """Runs EXPLAIN / EXPLAIN COST through an EXPLAIN backend with result caching."""
+
+    def __init__(
+        self,
+        backend: Any,
+        catalog: str = "",
+        database: str = "",
+        derive_plain_plan: bool = True,
+        max_entries: int = 64,
+    ):
+        """Initialize the service.
+
+        Args:
+            backend: ExplainBackend, or a Spark session (wrapped in SparkExplainBackend)
+            catalog: Default catalog (defaults to config)
+            database: Default database (defaults to config)
+            derive_plain_plan: Slice the plain plan out of EXPLAIN COST when possible
+            max_entries: Number of cached results kept (least recently used evicted)
+        """
+        config = get_config()
+        self.backend: ExplainBackend = as_explain_backend(backend)
+        self.catalog = catalog or config.catalog
+        self.database = database or config.database
+        self.derive_plain_plan = derive_plain_plan
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "roundtrips": 0, "derived_plans": 0}
+        self._cache: "OrderedDict[Tuple[str, str, str], ExplainResult]" = OrderedDict()
+        self._current_context: Optional[Tuple[str, str]] = None
+        self._lock = threading.RLock()
+
+    def cache_key(self, sql: str, catalog: Optional[str] = None, database: Optional[str] = None) -> Tuple[str, str, str]:
+        """Build the cache key for a query in a catalog/database."""
+        sql_hash = hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()
+        return (catalog or self.catalog, database or self.database, sql_hash)
+
+    def explain(
+        self,
+        sql: str,
+        catalog: Optional[str] = None,
+        database: Optional[str] = None,
+        query_type: str = "",
+    ) -> ExplainResult:
+        """Get EXPLAIN and EXPLAIN COST output for a query, from cache when possible.
+
+        Backend errors propagate to the caller and are not cached.
+
+        Args:
+            sql: Query to explain (a leading EXPLAIN / EXPLAIN COST is ignored)
+            catalog: Catalog to plan in (defaults to the service's)
+            database: Database to plan in (defaults to the service's)
+            query_type: Label stored on the returned result
+
+        Returns:
+            ExplainResult; ``from_cache`` tells whether the backend was contacted
+        """
+        key = self.cache_key(sql, catalog, database)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                self._use_context(key[0], key[1])
+        if cached is not None:
+            return ExplainResult(
+                query_type=query_type or cached.query_type,
+                explain_output=cached.explain_output,
+                explain_cost_output=cached.explain_cost_output,
+                photon_explanation=cached.photon_explanation,
+                is_successful=cached.is_successful,
+                from_cache=True,
+                plain_plan_derived=cached.plain_plan_derived,
+            )
+
+        query = strip_explain_prefix(sql)
+
+        explain_cost_output = self._run(f"EXPLAIN COST {query}")
+        explain_output = derive_plain_explain(explain_cost_output) if self.derive_plain_plan else None
+        derived = explain_output is not None
+        if derived:
+            self._count("derived_plans")
+        else:
+            explain_output = self._run(f"EXPLAIN {query}")
+
+        result = ExplainResult(
+            query_type=query_type,
+            explain_output=explain_output,
+            explain_cost_output=explain_cost_output,
+            photon_explanation=split_explain_sections(explain_output).get(PHOTON_EXPLANATION_SECTION, ""),
+            is_successful=True,
+            plain_plan_derived=derived,
+        )
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return result
+
+    def explain_many(
+        self,
+        sqls: Sequence[str],
+        catalog: Optional[str] = None,
+        database: Optional[str] = None,
+        query_type: str = "",
+        max_workers: int = 4,
+    ) -> List[ExplainResult]:
+        """Explain several queries concurrently (e.g. candidate rewrites).
+
+        Queries with the same cache key are planned once. A query whose
+        EXPLAIN raises gets an unsuccessful result carrying the error
+        instead of failing the batch.
+
+        Args:
+            sqls: Queries to explain
+            catalog: Catalog to plan in (defaults to the service's)
+            database: Database to plan in (defaults to the service's)
+            query_type: Label stored on the returned results
+            max_workers: Thread pool size
+
+        Returns:
+            One ExplainResult per query, in input order
+        """
+        unique: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        for sql in sqls:
+            unique.setdefault(self.cache_key(sql, catalog, database), sql)
+        if not unique:
+            return []
+
+        with self._lock:
+            first_key = next(iter(unique))
+            self._use_context(first_key[0], first_key[1])
+
+        def run(sql: str) -> ExplainResult:
+            try:
+                return self.explain(sql, catalog=catalog, database=database, query_type=query_type)
+            except Exception as e:
+                return ExplainResult(query_type=query_type, is_successful=False, error_message=str(e))
+
+        workers = max(1, min(max_workers, len(unique)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="explain") as pool:
+            results = dict(zip(unique.keys(), pool.map(run, unique.values())))
+        return [results[self.cache_key(sql, catalog, database)] for sql in sqls]
+
+    def uses(self, backend: Any) -> bool:
+        """Tell whether ``backend`` (a backend or Spark session) is the one in use."""
+        return backend is self.backend or backend is getattr(self.backend, "spark", None)
+
+    def clear(self) -> None:
+        """Drop cached results (e.g. at the start of a new optimization run)."""
+        with self._lock:
+            self._cache.clear()
+            self._current_context = None
+
+    def _use_context(self, catalog: str, database: str) -> None:
+        if self._current_context == (catalog, database):
+            return
+        try:
+            self.backend.set_context(catalog, database)
+            self._current_context = (catalog, database)
+        except Exception as e:
+            print(f"⚠️ Catalog/database configuration error: {str(e)}")
+
+    def _run(self, statement: str) -> str:
+        self._count("roundtrips")
+        return self.backend.execute(statement)
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+
+# Module-level service instance shared across attempts (lazy initialization)
+_service: Optional[ExplainService] = None
+
+
+def get_explain_service(backend: Any = None, catalog: str = "", database: str = "") -> ExplainService:
+    """Get or create the shared EXPLAIN service.
+
+    Args:
+        backend: ExplainBackend or Spark session; required on first use,
+            replaces the backend of the existing service when a different
+            one is passed
+        catalog: Default catalog for a newly created service
+        database: Default database for a newly created service
+
+    Returns:
+        The shared ExplainService
+    """
+    global _service
+    if _service is None:
+        if backend is None:
+            raise ValueError("An EXPLAIN backend or Spark session is required to create the EXPLAIN service")
+        _service = ExplainService(backend, catalog=catalog, database=database)
+    elif backend is not None and not _service.uses(backend):
+        _service.backend = as_explain_backend(backend)
+        _service.clear()
+    return _service
+
+
+def reset_explain_service() -> None:
+    """Reset the shared EXPLAIN service."""
+    global _service
+    _service = None
+
+
+def explain_cost_metrics(explain_cost_output: str) -> Dict[str, Any]:
+    """Summarize EXPLAIN COST output into the metrics used by compare_performance.
+
+    Args:
+        explain_cost_output: EXPLAIN COST output
+
+    Returns:
+        Dict with total_size_bytes / row_count (largest estimates in the
+        plan), scan_operations and join_operations
+    """
+    plan = parse_explain_plan(explain_cost_output)
+    sizes = [n.size_bytes for n in plan.nodes if n.size_bytes is not None]
+    rows = [n.row_count for n in plan.nodes if n.row_count is not None]
+    physical = [n for n in plan.nodes if "physical plan" in n.section.lower()] or plan.nodes
+    return {
+        "total_size_bytes": max(sizes, default=0),
+        "row_count": int(max(rows, default=0)),
+        "scan_operations": sum(1 for n in physical if "scan" in n.operator.lower() or n.operator == "Relation"),
+        "join_operations": sum(1 for n in physical if "join" in n.operator.lower()),
+    }
+
+
+def create_execute_explain_fn(service: ExplainService) -> Callable[[str], Tuple[str, Dict[str, Any]]]:
+    """Adapt an ExplainService to the ``execute_explain_fn`` of execute_iterative_optimization.
+
+    Args:
+        service: Service whose backend plans the optimized queries
+
+    Returns:
+        Function mapping a query to (EXPLAIN output, EXPLAIN COST metrics);
+        it raises when the query could not be planned
+    """
+
+    def execute_explain(query: str) -> Tuple[str, Dict[str, Any]]:
+        result = service.explain(query, query_type="optimized")
+        if "== Optimized Logical Plan ==" not in result.explain_cost_output:
+            raise RuntimeError(f"EXPLAIN failed: {result.explain_cost_output.strip()[:500]}")
+        return result.explain_output, explain_cost_metrics(result.explain_cost_output)
+
+    return execute_explain
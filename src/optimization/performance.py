@@ -4,6 +4,7 @@ from typing import Any, Dict, Optional
 
 from ..models import PerformanceComparison
 from ..config import get_config
+from ..utils.formatting import format_bytes
 
 
 def compare_performance(
@@ -178,8 +179,8 @@ def format_performance_comparison(
         lines.append("| 指標 | 元のクエリ | 最適化後 | 改善率 |")
         lines.append("|------|-----------|---------|--------|")
         lines.append(
-            f"| データサイズ | {_format_bytes(comparison.original_total_size)} | "
-            f"{_format_bytes(comparison.optimized_total_size)} | "
+            f"| データサイズ | {format_bytes(comparison.original_total_size)} | "
+            f"{format_bytes(comparison.optimized_total_size)} | "
             f"{comparison.size_improvement_ratio * 100:.1f}% |"
         )
         lines.append(
@@ -197,8 +198,8 @@ def format_performance_comparison(
         lines.append("| Metric | Original | Optimized | Improvement |")
         lines.append("|--------|----------|-----------|-------------|")
         lines.append(
-            f"| Data Size | {_format_bytes(comparison.original_total_size)} | "
-            f"{_format_bytes(comparison.optimized_total_size)} | "
+            f"| Data Size | {format_bytes(comparison.original_total_size)} | "
+            f"{format_bytes(comparison.optimized_total_size)} | "
             f"{comparison.size_improvement_ratio * 100:.1f}% |"
         )
         lines.append(
@@ -214,18 +215,6 @@ def format_performance_comparison(
     return "\n".join(lines)
 
 
-def _format_bytes(bytes_val: int) -> str:
-    """Format bytes as human-readable string."""
-    if bytes_val < 1024:
-        return f"{bytes_val} B"
-    elif bytes_val < 1024 ** 2:
-        return f"{bytes_val / 1024:.1f} KB"
-    elif bytes_val < 1024 ** 3:
-        return f"{bytes_val / (1024 ** 2):.1f} MB"
-    else:
-        return f"{bytes_val / (1024 ** 3):.2f} GB"
-
-
 def _translate_recommendation(recommendation: str, language: str) -> str:
     """Translate recommendation to target language."""
     translations = {
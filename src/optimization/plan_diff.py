@@ -0,0 +1,271 @@
+"""Operator-level diff of original and optimized EXPLAIN COST plans.
+
+Operators are aligned by their name and the set of tables read below them
+(``Join[main.db.items, main.db.sales]``), which survives the expression-id
+renumbering and subtree reordering a rewrite causes. Operators sharing a
+key are paired in plan order; the rest are reported as added or removed.
+
+Estimated size and rows come from the ``Optimized Logical Plan`` statistics.
+Join strategies come from the ``Physical Plan`` joins aligned the same way
+and are attached to the matching logical join.
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..models import OperatorDiff, PlanDiffResult, PlanNode
+from ..profiler.join_strategy import classify_join_strategy
+from ..utils.explain_plan import parse_explain_plan
+from ..utils.formatting import format_bytes
+
+LOGICAL_PLAN_SECTION = "optimized logical plan"
+PHYSICAL_PLAN_SECTION = "physical plan"
+
+# Estimate growth (optimized / original) from which an operator counts as a regression
+DEFAULT_REGRESSION_RATIO = 1.2
+
+_TABLE_RE = re.compile(r"(?:Relation|Scan)\s+(?:\w+\s+)?([\w.`]+)\[")
+_BROADCAST_STRATEGIES = ("broadcast_hash_join", "broadcast_nested_loop_join")
+
+_Entry = Tuple[str, PlanNode, Tuple[str, ...]]  # (operator key, node, tables)
+
+
+def diff_explain_plans(
+    original_cost: str,
+    optimized_cost: str,
+    regression_ratio: float = DEFAULT_REGRESSION_RATIO,
+) -> PlanDiffResult:
+    """Align two EXPLAIN COST outputs operator by operator.
+
+    Args:
+        original_cost: EXPLAIN COST output of the original query
+        optimized_cost: EXPLAIN COST output of the optimized query
+        regression_ratio: Size or row estimate growth from which a matched
+            operator is reported as a regression
+
+    Returns:
+        PlanDiffResult; regressions are ordered by estimated size growth
+    """
+    original_plan = parse_explain_plan(original_cost)
+    optimized_plan = parse_explain_plan(optimized_cost)
+
+    operators = _align(
+        _entries(original_plan.nodes, LOGICAL_PLAN_SECTION),
+        _entries(optimized_plan.nodes, LOGICAL_PLAN_SECTION),
+    )
+    physical_joins = _align(
+        _entries(original_plan.nodes, PHYSICAL_PLAN_SECTION, joins_only=True),
+        _entries(optimized_plan.nodes, PHYSICAL_PLAN_SECTION, joins_only=True),
+    )
+    for join in physical_joins:
+        logical = next(
+            (d for d in operators if d.key == join.key and not (d.original_join_strategy or d.optimized_join_strategy)),
+            None,
+        )
+        if logical is None:
+            operators.append(join)
+        else:
+            logical.original_join_strategy = join.original_join_strategy
+            logical.optimized_join_strategy = join.optimized_join_strategy
+
+    strategy_changes = [
+        d for d in operators
+        if d.status == "matched"
+        and d.original_join_strategy
+        and d.optimized_join_strategy
+        and d.original_join_strategy != d.optimized_join_strategy
+    ]
+    regressions = [d for d in operators if _is_regression(d, regression_ratio)]
+    regressions.sort(key=_growth, reverse=True)
+
+    return PlanDiffResult(
+        operators=operators,
+        regressions=regressions,
+        join_strategy_changes=strategy_changes,
+        regression_ratio=regression_ratio,
+    )
+
+
+def _entries(nodes: Iterable[PlanNode], section: str, joins_only: bool = False) -> List[_Entry]:
+    """Key the nodes of one section by operator and the tables below them, in plan order."""
+    section_nodes = [n for n in nodes if section in n.section.lower()]
+
+    # Nodes are in pre-order, so walking backwards visits children before parents
+    tables: Dict[int, frozenset] = {}
+    for node in reversed(section_nodes):
+        own = {m.replace("`", "").lower() for m in _TABLE_RE.findall(node.text)}
+        tables[id(node)] = frozenset(own.union(*(tables.get(id(c), ()) for c in node.children)))
+
+    entries = []
+    for node in section_nodes:
+        is_join = _is_join(node.operator)
+        if joins_only and not is_join:
+            continue
+        key_operator = "Join" if is_join else node.operator
+        entries.append((key_operator, node, tuple(sorted(tables[id(node)]))))
+    return entries
+
+
+def _align(original: List[_Entry], optimized: List[_Entry]) -> List[OperatorDiff]:
+    """Pair entries with the same key in plan order; unpaired ones are added/removed.
+
+    Entries left over after exact matching are paired with the same operator
+    reading the most shared tables, so a join that gained an input (and every
+    operator above it) still lines up with its original.
+    """
+    pending: Dict[Tuple[str, Tuple[str, ...]], List[PlanNode]] = defaultdict(list)
+    for operator, node, tables in original:
+        pending[(operator, tables)].append(node)
+
+    pairs: List[Optional[PlanNode]] = []
+    for operator, _node, tables in optimized:
+        candidates = pending.get((operator, tables))
+        pairs.append(candidates.pop(0) if candidates else None)
+
+    unpaired = {id(node) for nodes in pending.values() for node in nodes}
+    leftovers = [entry for entry in original if id(entry[1]) in unpaired]
+    for index, (operator, _node, tables) in enumerate(optimized):
+        if pairs[index] is not None:
+            continue
+        best = max(
+            (i for i, entry in enumerate(leftovers) if entry[0] == operator and set(entry[2]) & set(tables)),
+            key=lambda i: len(set(leftovers[i][2]) & set(tables)),
+            default=None,
+        )
+        if best is not None:
+            pairs[index] = leftovers.pop(best)[1]
+
+    diffs = [_diff(operator, tables, before, node) for (operator, node, tables), before in zip(optimized, pairs)]
+    diffs.extend(_diff(operator, tables, node, None) for operator, node, tables in leftovers)
+    return diffs
+
+
+def _diff(
+    key_operator: str,
+    tables: Tuple[str, ...],
+    original: Optional[PlanNode],
+    optimized: Optional[PlanNode],
+) -> OperatorDiff:
+    present = optimized or original
+    diff = OperatorDiff(
+        key=f"{key_operator}[{', '.join(tables)}]" if tables else key_operator,
+        operator=present.operator,
+        tables=list(tables),
+        status="matched" if original and optimized else ("added" if optimized else "removed"),
+        text=present.text,
+    )
+    if original is not None:
+        diff.original_size_bytes = original.size_bytes
+        diff.original_rows = original.row_count
+        if key_operator == "Join" and original.operator != "Join":
+            diff.original_join_strategy = classify_join_strategy(original.operator)
+    if optimized is not None:
+        diff.optimized_size_bytes = optimized.size_bytes
+        diff.optimized_rows = optimized.row_count
+        if key_operator == "Join" and optimized.operator != "Join":
+            diff.optimized_join_strategy = classify_join_strategy(optimized.operator)
+    diff.size_ratio = _ratio(diff.optimized_size_bytes, diff.original_size_bytes)
+    diff.row_ratio = _ratio(diff.optimized_rows, diff.original_rows)
+    return diff
+
+
+def _is_join(operator: str) -> bool:
+    return "join" in operator.lower() or operator == "CartesianProduct"
+
+
+def _ratio(optimized: Optional[float], original: Optional[float]) -> Optional[float]:
+    if optimized is None or not original:
+        return None
+    return optimized / original
+
+
+def _is_regression(diff: OperatorDiff, regression_ratio: float) -> bool:
+    if diff.status == "added":
+        # A join that was not in the original plan (e.g. a duplicated CTE)
+        return _is_join(diff.operator)
+    if diff.status != "matched":
+        return False
+    if (diff.size_ratio or 0) >= regression_ratio or (diff.row_ratio or 0) >= regression_ratio:
+        return True
+    return (
+        diff.original_join_strategy in _BROADCAST_STRATEGIES
+        and diff.optimized_join_strategy not in _BROADCAST_STRATEGIES
+    )
+
+
+def _growth(diff: OperatorDiff) -> Tuple[float, float]:
+    return (
+        (diff.optimized_size_bytes or 0) - (diff.original_size_bytes or 0),
+        (diff.optimized_rows or 0) - (diff.original_rows or 0),
+    )
+
+
+def describe_operator_diff(diff: OperatorDiff, language: str = "en") -> str:
+    """Describe one operator change in a single line.
+
+    Args:
+        diff: Operator diff
+        language: Output language ('ja' or 'en')
+
+    Returns:
+        e.g. ``Join[main.db.items, main.db.sales]: size 2.00 GB → 8.00 GB (x4.0)``
+    """
+    ja = language == "ja"
+    if diff.status == "added":
+        return f"{diff.key}: " + ("最適化後のプランで追加" if ja else "added in the optimized plan")
+    if diff.status == "removed":
+        return f"{diff.key}: " + ("最適化後のプランで削除" if ja else "removed from the optimized plan")
+
+    parts = []
+    if diff.original_size_bytes is not None and diff.optimized_size_bytes is not None:
+        change = (
+            f"{format_bytes(diff.original_size_bytes)} → {format_bytes(diff.optimized_size_bytes)}"
+            + (f" (x{diff.size_ratio:.1f})" if diff.size_ratio is not None else "")
+        )
+        parts.append(("推定サイズ " if ja else "size ") + change)
+    if diff.original_rows is not None and diff.optimized_rows is not None:
+        change = f"{diff.original_rows:,.0f} → {diff.optimized_rows:,.0f}"
+        parts.append(("推定行数 " if ja else "rows ") + change)
+    if diff.original_join_strategy != diff.optimized_join_strategy and diff.optimized_join_strategy:
+        change = f"{diff.original_join_strategy or '-'} → {diff.optimized_join_strategy}"
+        parts.append(("JOIN戦略 " if ja else "join strategy ") + change)
+    return f"{diff.key}: " + (", ".join(parts) if parts else ("変化なし" if ja else "unchanged"))
+
+
+def format_plan_diff(result: PlanDiffResult, language: str = "en", limit: int = 5) -> str:
+    """Format the regressed operators and join strategy changes as markdown.
+
+    Args:
+        result: Result of diff_explain_plans
+        language: Output language ('ja' or 'en')
+        limit: Maximum number of operators listed per category
+
+    Returns:
+        Formatted markdown report
+    """
+    ja = language == "ja"
+    lines = ["## 演算子別プラン差分" if ja else "## Operator-Level Plan Diff", ""]
+
+    if not result.regressions and not result.join_strategy_changes:
+        lines.append(
+            "✅ 推定値が悪化した演算子はありません。" if ja else "✅ No operator estimate got worse."
+        )
+        return "\n".join(lines)
+
+    if result.regressions:
+        lines.append("### 悪化した演算子" if ja else "### Regressed Operators")
+        lines.append("")
+        for rank, diff in enumerate(result.regressions[:limit], 1):
+            lines.append(f"{rank}. {describe_operator_diff(diff, language)}")
+        lines.append("")
+
+    if result.join_strategy_changes:
+        lines.append("### JOIN戦略の変化" if ja else "### Join Strategy Changes")
+        lines.append("")
+        for diff in result.join_strategy_changes[:limit]:
+            lines.append(
+                f"- {diff.key}: {diff.original_join_strategy} → {diff.optimized_join_strategy}"
+            )
+
+    return "\n".join(lines).rstrip()
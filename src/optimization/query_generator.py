@@ -6,6 +6,7 @@ from ..config import get_config, t
 from ..llm import call_llm
 from ..models import ExtractedMetrics, OptimizationAttempt, TrialType
 from ..utils.sql import extract_sql_from_llm_response, clean_sql
+from ..utils.structured_output import build_structured_output_instruction
 
 
 def generate_optimized_query(
@@ -30,8 +31,10 @@ def generate_optimized_query(
         bottleneck_analysis,
         config.output_language,
     )
+    if config.structured_llm_output:
+        prompt += build_structured_output_instruction(config.output_language)
 
-    response = call_llm(prompt)
+    response = call_llm(prompt, stage="sql_optimization")
     optimized_sql = extract_sql_from_llm_response(response)
 
     if not optimized_sql:
@@ -66,8 +69,10 @@ def generate_refined_query(
         bottleneck_analysis,
         config.output_language,
     )
+    if config.structured_llm_output:
+        prompt += build_structured_output_instruction(config.output_language)
 
-    response = call_llm(prompt)
+    response = call_llm(prompt, stage="sql_refinement")
     refined_sql = extract_sql_from_llm_response(response)
 
     if not refined_sql:
@@ -99,8 +104,10 @@ def generate_error_corrected_query(
         error_message,
         config.output_language,
     )
+    if config.structured_llm_output:
+        prompt += build_structured_output_instruction(config.output_language)
 
-    response = call_llm(prompt)
+    response = call_llm(prompt, stage="sql_error_correction")
     corrected_sql = extract_sql_from_llm_response(response)
 
     if not corrected_sql:
@@ -0,0 +1,154 @@
+"""Execute-and-measure verification of an optimized query.
+
+EXPLAIN COST only estimates an improvement. This opt-in stage runs the
+original and the optimized query through a QueryExecutor, repeats each
+``repeats`` times (interleaving the two and alternating which goes first,
+so warm-up and cluster drift affect both alike) and compares the median
+durations. The disk cache and the result cache are disabled first so
+repeats measure real work rather than cache hits, and restored afterwards
+because the settings are session-wide.
+"""
+
+import statistics
+from typing import Dict, Optional
+
+from ..config import get_config
+from ..execution import QueryExecutor
+from ..models import ExecutionVerificationResult, MeasuredQuery
+from ..utils.formatting import format_bytes
+
+CACHE_DISABLING_SETTINGS: Dict[str, str] = {
+    "spark.databricks.io.cache.enabled": "false",
+    "use_cached_result": "false",
+}
+
+
+def limit_query(sql: str, row_limit: int) -> str:
+    """Wrap a query so at most ``row_limit`` rows are produced (0 keeps it unchanged)."""
+    if row_limit <= 0:
+        return sql
+    body = sql.strip().rstrip(";").strip()
+    return f"SELECT * FROM (\n{body}\n) AS limited_query LIMIT {int(row_limit)}"
+
+
+def verify_by_execution(
+    executor: QueryExecutor,
+    original_query: str,
+    optimized_query: str,
+    repeats: Optional[int] = None,
+    row_limit: Optional[int] = None,
+    disable_cache: Optional[bool] = None,
+    estimated_cost_ratio: Optional[float] = None,
+) -> ExecutionVerificationResult:
+    """Measure the original and optimized queries and compare their medians.
+
+    Args:
+        executor: Executor running the queries
+        original_query: Original query
+        optimized_query: Optimized query
+        repeats: Executions per query (defaults to config)
+        row_limit: Row limit applied to both queries (defaults to config)
+        disable_cache: Disable caches before measuring (defaults to config)
+        estimated_cost_ratio: EXPLAIN COST based ratio, recorded alongside
+
+    Returns:
+        ExecutionVerificationResult; a failing execution leaves
+        ``is_successful`` False with the error message
+    """
+    config = get_config().execution
+    repeats = max(1, config.repeats if repeats is None else repeats)
+    row_limit = config.row_limit if row_limit is None else row_limit
+    disable_cache = config.disable_cache if disable_cache is None else disable_cache
+
+    result = ExecutionVerificationResult(
+        original=MeasuredQuery(label="original", sql=limit_query(original_query, row_limit)),
+        optimized=MeasuredQuery(label="optimized", sql=limit_query(optimized_query, row_limit)),
+        repeats=repeats,
+        settings=dict(CACHE_DISABLING_SETTINGS) if disable_cache else {},
+        row_limit=row_limit,
+        estimated_cost_ratio=estimated_cost_ratio,
+    )
+
+    previous_settings: Dict[str, Optional[str]] = {}
+    try:
+        if result.settings:
+            previous_settings = executor.get_settings(result.settings)
+            executor.configure(result.settings)
+        for repeat in range(repeats):
+            order = (result.original, result.optimized) if repeat % 2 == 0 else (result.optimized, result.original)
+            for measured in order:
+                measured.runs.append(executor.run(measured.sql))
+    except Exception as e:
+        result.error_message = str(e)
+        return result
+    finally:
+        if previous_settings:
+            executor.configure(previous_settings)
+
+    for measured in (result.original, result.optimized):
+        measured.median_duration_ms = statistics.median(r.duration_ms for r in measured.runs)
+        measured.median_bytes_read = statistics.median(r.bytes_read for r in measured.runs)
+    if result.optimized.median_duration_ms > 0:
+        result.measured_speedup = result.original.median_duration_ms / result.optimized.median_duration_ms
+    result.is_successful = True
+    return result
+
+
+def format_execution_verification(result: ExecutionVerificationResult, language: str = "en") -> str:
+    """Format a verification result as a markdown section.
+
+    Args:
+        result: Result of verify_by_execution
+        language: Output language ('ja' or 'en')
+
+    Returns:
+        Formatted markdown section
+    """
+    ja = language == "ja"
+    lines = ["#### ⏱️ 実行による検証" if ja else "#### ⏱️ Execution Verification", ""]
+
+    if not result.is_successful:
+        lines.append(
+            f"❌ 実行検証に失敗しました: {result.error_message}"
+            if ja
+            else f"❌ Execution verification failed: {result.error_message}"
+        )
+        return "\n".join(lines)
+
+    if ja:
+        lines.append("| 項目 | 元クエリ | 最適化クエリ |")
+    else:
+        lines.append("| Item | Original Query | Optimized Query |")
+    lines.append("|------|----------|-------------|")
+    lines.append(
+        ("| 実行時間 (中央値) | " if ja else "| Duration (median) | ")
+        + f"{result.original.median_duration_ms:,.0f} ms | {result.optimized.median_duration_ms:,.0f} ms |"
+    )
+    if result.original.median_bytes_read or result.optimized.median_bytes_read:
+        lines.append(
+            ("| 読み取りバイト (中央値) | " if ja else "| Bytes read (median) | ")
+            + f"{format_bytes(int(result.original.median_bytes_read))} | "
+            f"{format_bytes(int(result.optimized.median_bytes_read))} |"
+        )
+    lines.append("")
+
+    speedup = f"{result.measured_speedup:.2f}x"
+    estimated = (
+        f"{1 / result.estimated_cost_ratio:.2f}x ({'コスト比率' if ja else 'cost ratio'} {result.estimated_cost_ratio:.3f})"
+        if result.estimated_cost_ratio
+        else "-"
+    )
+    conditions = [f"{result.repeats}回" if ja else f"{result.repeats} runs each"]
+    if result.row_limit:
+        conditions.append(f"LIMIT {result.row_limit}")
+    if result.settings:
+        conditions.append("キャッシュ無効" if ja else "caches disabled")
+    if ja:
+        lines.append(f"- **実測スピードアップ**: {speedup}")
+        lines.append(f"- **EXPLAIN COST推定**: {estimated}")
+        lines.append(f"- **測定条件**: {', '.join(conditions)}")
+    else:
+        lines.append(f"- **Measured speedup**: {speedup}")
+        lines.append(f"- **EXPLAIN COST estimate**: {estimated}")
+        lines.append(f"- **Conditions**: {', '.join(conditions)}")
+    return "\n".join(lines)
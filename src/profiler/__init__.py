@@ -8,6 +8,19 @@ from .loader import (
 )
 from .metrics import extract_metrics, calculate_filter_rate
 from .bottleneck import analyze_bottlenecks, format_bottleneck_report
+from .shuffle_sizing import solve_shuffle_partition_sizing, format_shuffle_sizing_report
+from .cluster_sizing import recommend_cluster_size, format_cluster_sizing_report
+from .photon_fallback import analyze_photon_fallback, format_photon_fallback_report
+from .scan_io import analyze_scan_io, format_scan_io_report
+from .join_strategy import describe_join_rewrite, evaluate_join_strategies, format_join_strategy_report
+from .compact import (
+    encode_table,
+    encode_overall_metrics,
+    encode_top_nodes,
+    encode_shuffle_analysis,
+    encode_clustering_data,
+    estimate_text_tokens,
+)
 
 __all__ = [
     "load_profiler_json",
@@ -18,4 +31,21 @@ __all__ = [
     "calculate_filter_rate",
     "analyze_bottlenecks",
     "format_bottleneck_report",
+    "solve_shuffle_partition_sizing",
+    "format_shuffle_sizing_report",
+    "recommend_cluster_size",
+    "format_cluster_sizing_report",
+    "analyze_photon_fallback",
+    "format_photon_fallback_report",
+    "analyze_scan_io",
+    "format_scan_io_report",
+    "describe_join_rewrite",
+    "evaluate_join_strategies",
+    "format_join_strategy_report",
+    "encode_table",
+    "encode_overall_metrics",
+    "encode_top_nodes",
+    "encode_shuffle_analysis",
+    "encode_clustering_data",
+    "estimate_text_tokens",
 ]
@@ -0,0 +1,258 @@
+"""Cluster sizing recommendation from task-time and parallelism metrics.
+
+Total task time divided by wall-clock gives the parallelism the query
+actually achieved on its current task slots. Fitting Amdahl's law to that
+observation yields the serial fraction, from which wall-clock is predicted
+at each SQL warehouse size, capped by the task parallelism the query's
+stages can expose.
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import get_config
+from ..models import ClusterSizingOption, ClusterSizingResult
+from .node_metrics import get_node_metric
+
+# (size, workers, DBU per hour) of Databricks SQL warehouse sizes
+WAREHOUSE_SIZES: List[Tuple[str, int, float]] = [
+    ("2X-Small", 1, 4),
+    ("X-Small", 2, 6),
+    ("Small", 4, 12),
+    ("Medium", 8, 24),
+    ("Large", 16, 40),
+    ("X-Large", 32, 80),
+    ("2X-Large", 64, 144),
+    ("3X-Large", 128, 272),
+    ("4X-Large", 256, 528),
+]
+
+_TASKS_TOTAL_METRICS = ["Tasks total", "Sink - Tasks total", "Source - Tasks total"]
+
+
+def estimate_serial_fraction(total_task_time_ms: float, wall_clock_ms: float, task_slots: int) -> float:
+    """Fit Amdahl's law to one observation.
+
+    Solves ``wall = work * (s + (1 - s) / slots)`` for ``s``.
+
+    Args:
+        total_task_time_ms: Sum of task time across all tasks (work)
+        wall_clock_ms: Observed execution time
+        task_slots: Task slots the query ran on
+
+    Returns:
+        Serial fraction in [0, 1]
+    """
+    if total_task_time_ms <= 0 or wall_clock_ms <= 0 or task_slots <= 1:
+        return 0.0
+
+    serial = (wall_clock_ms / total_task_time_ms - 1.0 / task_slots) / (1.0 - 1.0 / task_slots)
+    return min(max(serial, 0.0), 1.0)
+
+
+def estimate_peak_stage_concurrency(stage_metrics: List[Dict[str, Any]]) -> int:
+    """Peak number of tasks belonging to stages that were running at the same time."""
+    events = []
+    for stage in stage_metrics:
+        start = stage.get("start_time_ms") or 0
+        end = stage.get("end_time_ms") or 0
+        tasks = stage.get("num_tasks") or 0
+        if end > start and tasks > 0:
+            events.append((start, tasks))
+            events.append((end, -tasks))
+
+    # Ends sort before starts at the same timestamp
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    peak = 0
+    running = 0
+    for _, delta in events:
+        running += delta
+        peak = max(peak, running)
+    return peak
+
+
+def predict_latency_ms(
+    total_task_time_ms: float,
+    serial_fraction: float,
+    task_slots: int,
+    max_task_parallelism: int = 0,
+) -> float:
+    """Predict wall-clock at a given number of task slots."""
+    usable_slots = task_slots
+    if max_task_parallelism > 0:
+        usable_slots = min(usable_slots, max_task_parallelism)
+    usable_slots = max(usable_slots, 1)
+
+    serial_ms = total_task_time_ms * serial_fraction
+    parallel_ms = total_task_time_ms * (1.0 - serial_fraction) / usable_slots
+    return serial_ms + parallel_ms
+
+
+def recommend_cluster_size(
+    extracted_metrics: Dict[str, Any],
+    task_slots: Optional[int] = None,
+    current_size: Optional[str] = None,
+    target_latency_ms: Optional[float] = None,
+) -> ClusterSizingResult:
+    """Recommend a warehouse size for a query.
+
+    Args:
+        extracted_metrics: Output of the notebook's ``extract_performance_metrics``
+            (uses ``overall_metrics``, ``stage_metrics`` and ``node_metrics``)
+        task_slots: Task slots the query ran on; defaults to the configured
+            value, then the configured warehouse size, then the observed parallelism
+        current_size: Current warehouse size name (defaults to config)
+        target_latency_ms: Optional latency goal; when set, the cheapest size
+            meeting it is recommended
+
+    Returns:
+        ClusterSizingResult with predictions for every warehouse size
+    """
+    shuffle_config = get_config().shuffle_analysis
+    result = ClusterSizingResult()
+
+    if not shuffle_config.enable_cluster_sizing_advice:
+        return result
+
+    overall = extracted_metrics.get("overall_metrics", {})
+    work_ms = overall.get("task_total_time_ms", 0) or 0
+    wall_ms = overall.get("execution_time_ms", 0) or overall.get("total_time_ms", 0) or 0
+    if work_ms <= 0 or wall_ms <= 0:
+        return result
+
+    cores_per_worker = max(shuffle_config.cores_per_worker, 1)
+    if current_size is None:
+        current_size = shuffle_config.current_warehouse_size
+    if task_slots is None:
+        task_slots = shuffle_config.task_slots
+    if not task_slots and current_size:
+        for size, workers, _ in WAREHOUSE_SIZES:
+            if size.lower() == current_size.lower():
+                task_slots = workers * cores_per_worker
+    observed_parallelism = work_ms / wall_ms
+    if not task_slots:
+        # Lower bound: the query kept at least this many slots busy on average
+        task_slots = max(math.ceil(observed_parallelism), 1)
+
+    stage_metrics = extracted_metrics.get("stage_metrics", [])
+    max_stage_tasks = max((s.get("num_tasks", 0) for s in stage_metrics), default=0)
+    max_node_tasks = max(
+        (int(get_node_metric(n, _TASKS_TOTAL_METRICS)) for n in extracted_metrics.get("node_metrics", [])),
+        default=0,
+    )
+    peak_concurrency = estimate_peak_stage_concurrency(stage_metrics)
+
+    result.total_task_time_ms = work_ms
+    result.execution_time_ms = wall_ms
+    result.current_task_slots = task_slots
+    result.observed_parallelism = observed_parallelism
+    result.serial_fraction = estimate_serial_fraction(work_ms, wall_ms, task_slots)
+    result.max_task_parallelism = max(max_stage_tasks, max_node_tasks, peak_concurrency)
+    result.peak_stage_concurrency = peak_concurrency
+
+    for size, workers, dbu_per_hour in WAREHOUSE_SIZES:
+        slots = workers * cores_per_worker
+        latency = predict_latency_ms(
+            work_ms, result.serial_fraction, slots, result.max_task_parallelism
+        )
+        dbu = dbu_per_hour * latency / 3_600_000
+        option = ClusterSizingOption(
+            size=size,
+            workers=workers,
+            task_slots=slots,
+            predicted_latency_ms=latency,
+            speedup=wall_ms / latency if latency > 0 else 1.0,
+            dbu_per_hour=dbu_per_hour,
+            predicted_dbu=dbu,
+            predicted_cost_usd=dbu * shuffle_config.dbu_price_usd,
+        )
+        result.options.append(option)
+        if current_size and size.lower() == current_size.lower():
+            result.current = option
+
+    if target_latency_ms:
+        candidates = [o for o in result.options if o.predicted_latency_ms <= target_latency_ms]
+    else:
+        best_latency = min(o.predicted_latency_ms for o in result.options)
+        limit = best_latency * (1.0 + shuffle_config.sizing_latency_tolerance)
+        candidates = [o for o in result.options if o.predicted_latency_ms <= limit]
+
+    if candidates:
+        result.recommended = min(candidates, key=lambda o: (o.predicted_dbu, o.workers))
+    else:
+        # Target unreachable: the fastest size is the best available
+        result.recommended = min(result.options, key=lambda o: o.predicted_latency_ms)
+
+    return result
+
+
+def format_cluster_sizing_report(result: ClusterSizingResult, language: str = "en") -> str:
+    """Format a cluster sizing result as a markdown report.
+
+    Args:
+        result: Result of recommend_cluster_size
+        language: Output language ('ja' or 'en')
+
+    Returns:
+        Formatted markdown report
+    """
+    lines = []
+    ja = language == "ja"
+
+    lines.append("## クラスターサイズ推奨" if ja else "## Cluster Sizing Recommendation")
+    lines.append("")
+
+    if not result.options:
+        lines.append(
+            "タスク時間または実行時間のメトリクスがないため、サイズ推奨を算出できません。"
+            if ja
+            else "Task time or execution time metrics are missing; no sizing recommendation."
+        )
+        return "\n".join(lines)
+
+    if ja:
+        lines.append(f"- 合計タスク時間: {result.total_task_time_ms / 1000:,.1f} 秒")
+        lines.append(f"- 実行時間: {result.execution_time_ms / 1000:,.1f} 秒")
+        lines.append(f"- 実効並列度: {result.observed_parallelism:.1f} (タスクスロット {result.current_task_slots:,})")
+        lines.append(f"- 逐次処理割合 (Amdahl): {result.serial_fraction * 100:.1f}%")
+        lines.append(f"- 最大タスク並列度: {result.max_task_parallelism:,} (ステージ同時実行ピーク {result.peak_stage_concurrency:,})")
+        lines.append("")
+        lines.append("| サイズ | ワーカー数 | タスクスロット | 予測実行時間 | 高速化 | 予測DBU | 予測コスト |")
+    else:
+        lines.append(f"- Total task time: {result.total_task_time_ms / 1000:,.1f} s")
+        lines.append(f"- Execution time: {result.execution_time_ms / 1000:,.1f} s")
+        lines.append(f"- Achieved parallelism: {result.observed_parallelism:.1f} (task slots {result.current_task_slots:,})")
+        lines.append(f"- Serial fraction (Amdahl): {result.serial_fraction * 100:.1f}%")
+        lines.append(f"- Max task parallelism: {result.max_task_parallelism:,} (peak stage concurrency {result.peak_stage_concurrency:,})")
+        lines.append("")
+        lines.append("| Size | Workers | Task Slots | Predicted Latency | Speedup | Predicted DBU | Predicted Cost |")
+    lines.append("|------|---------|------------|-------------------|---------|---------------|----------------|")
+
+    for option in result.options:
+        marker = ""
+        if result.recommended is option:
+            marker = " ⭐"
+        elif result.current is option:
+            marker = " (現在)" if ja else " (current)"
+        lines.append(
+            f"| {option.size}{marker} | {option.workers} | {option.task_slots:,} | "
+            f"{option.predicted_latency_ms / 1000:,.1f} s | {option.speedup:.2f}x | "
+            f"{option.predicted_dbu:.4f} | ${option.predicted_cost_usd:.4f} |"
+        )
+
+    if result.recommended:
+        rec = result.recommended
+        lines.append("")
+        if ja:
+            lines.append(
+                f"💡 **推奨: {rec.size}** — 予測実行時間 {rec.predicted_latency_ms / 1000:,.1f} 秒, "
+                f"{rec.predicted_dbu:.4f} DBU/クエリ"
+            )
+        else:
+            lines.append(
+                f"💡 **Recommended: {rec.size}** — predicted latency {rec.predicted_latency_ms / 1000:,.1f} s, "
+                f"{rec.predicted_dbu:.4f} DBU per query"
+            )
+
+    return "\n".join(lines)
@@ -0,0 +1,289 @@
+"""Compact tabular encoding of profile metrics for LLM prompts.
+
+Prompts used to carry metrics as prose lines and indented per-node
+blocks, repeating labels, icons and long units for every value. The
+encoders here render the same values as fixed-column tables: one header
+line, ``|``-separated rows, abbreviated units (``12.3s``, ``1.5GB``,
+``2.1M``) and, past the top-k rows, a single ``others(n)`` row holding the
+aggregate of the rest. They read the dictionaries of the notebook's
+``extract_performance_metrics``, top-10 process data, Enhanced Shuffle
+analysis and Liquid Clustering data.
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+# (header, key path or candidate paths, unit); paths are dotted ("spill.bytes")
+Column = Tuple[str, Union[str, Tuple[str, ...]], str]
+
+# Units whose values add up in the "others" row
+_SUMMED_UNITS = {"bytes", "mb", "gb", "ms", "sec", "count", "pct"}
+
+_BYTE_UNITS = ["B", "KB", "MB", "GB", "TB", "PB"]
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Rough token count: about four ASCII characters per token, one per other character."""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return int(ascii_chars / 4 + (len(text) - ascii_chars))
+
+
+def _trim(value: float) -> str:
+    """Format with up to one decimal, dropping a trailing .0."""
+    text = f"{value:.1f}"
+    return text[:-2] if text.endswith(".0") else text
+
+
+def compact_bytes(value: float) -> str:
+    """Abbreviate a byte count, e.g. ``1.5GB``."""
+    size = float(value or 0)
+    unit = 0
+    while abs(size) >= 1024 and unit < len(_BYTE_UNITS) - 1:
+        size /= 1024
+        unit += 1
+    return f"{_trim(size)}{_BYTE_UNITS[unit]}"
+
+
+def compact_duration(ms: float) -> str:
+    """Abbreviate a duration in milliseconds, e.g. ``850ms``, ``12.3s``, ``2.1min``."""
+    ms = float(ms or 0)
+    if abs(ms) < 1000:
+        return f"{ms:.0f}ms"
+    if abs(ms) < 60_000:
+        return f"{_trim(ms / 1000)}s"
+    if abs(ms) < 3_600_000:
+        return f"{_trim(ms / 60_000)}min"
+    return f"{_trim(ms / 3_600_000)}h"
+
+
+def compact_count(value: float) -> str:
+    """Abbreviate a count, e.g. ``950``, ``3.4K``, ``1.2M``, ``5B``."""
+    value = float(value or 0)
+    for threshold, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(value) >= threshold:
+            return f"{_trim(value / threshold)}{suffix}"
+    return f"{value:.0f}"
+
+
+def format_compact_value(value: Any, unit: str) -> str:
+    """Format one value for a compact table cell (``-`` when missing)."""
+    if value is None or value == "":
+        return "-"
+    if unit == "bytes":
+        return compact_bytes(value)
+    if unit == "mb":
+        return compact_bytes(float(value) * 1024 ** 2)
+    if unit == "gb":
+        return compact_bytes(float(value) * 1024 ** 3)
+    if unit == "ms":
+        return compact_duration(value)
+    if unit == "sec":
+        return compact_duration(float(value) * 1000)
+    if unit == "count":
+        return compact_count(value)
+    if unit == "pct":
+        return f"{_trim(float(value))}%"
+    if unit == "ratio":
+        return f"{_trim(float(value) * 100)}%"
+    if unit == "flag":
+        return "Y" if value else "N"
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(item) for item in value) or "-"
+    # Keep the table one row per line and unambiguous
+    return " ".join(str(value).split()).replace("|", "/")
+
+
+def _lookup(row: Dict[str, Any], key: Union[str, Tuple[str, ...]]) -> Any:
+    """Value of the first candidate path present in the row."""
+    for path in (key if isinstance(key, tuple) else (key,)):
+        value: Any = row
+        for part in path.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is not None:
+            return value
+    return None
+
+
+def encode_table(columns: Sequence[Column], rows: Sequence[Dict[str, Any]], top_k: int = 0, text_width: int = 60) -> str:
+    """Encode rows as a compact fixed-column table.
+
+    Args:
+        columns: ``(header, key, unit)`` per column; units are bytes, mb, gb,
+            ms, sec, count, pct (already a percentage), ratio (0-1), flag and
+            text
+        rows: Row dictionaries, most important first
+        top_k: Rows shown individually; the rest become one ``others(n)`` row
+            with summed byte, time, count and percentage columns (0 = all)
+        text_width: Maximum length of text cells
+
+    Returns:
+        Header line and one line per row, or an empty string without rows
+    """
+    if not rows:
+        return ""
+    shown = list(rows[:top_k]) if top_k and len(rows) > top_k else list(rows)
+    rest = list(rows[len(shown):])
+
+    lines = ["|".join(header for header, _, _ in columns)]
+    for row in shown:
+        cells = []
+        for _, key, unit in columns:
+            cell = format_compact_value(_lookup(row, key), unit)
+            cells.append(cell[:text_width] if unit == "text" else cell)
+        lines.append("|".join(cells))
+
+    if rest:
+        cells = []
+        for position, (_, key, unit) in enumerate(columns):
+            if position == 0:
+                cells.append(f"others({len(rest)})")
+            elif unit in _SUMMED_UNITS:
+                cells.append(format_compact_value(sum(float(_lookup(row, key) or 0) for row in rest), unit))
+            else:
+                cells.append("-")
+        lines.append("|".join(cells))
+    return "\n".join(lines)
+
+
+def encode_key_values(pairs: Sequence[Tuple[str, Any, str]]) -> str:
+    """Encode ``(name, value, unit)`` pairs as one ``name=value`` line, skipping missing values."""
+    return " ".join(
+        f"{name}={format_compact_value(value, unit)}"
+        for name, value, unit in pairs
+        if value is not None
+    )
+
+
+def encode_overall_metrics(extracted_metrics: Dict[str, Any]) -> str:
+    """Query-level metrics of ``extract_performance_metrics`` output as one line.
+
+    Args:
+        extracted_metrics: Dictionary with ``overall_metrics`` and ``bottleneck_indicators``
+
+    Returns:
+        ``name=value`` pairs (time, read volume, rows, spill, cache, Photon, shuffle)
+    """
+    overall = extracted_metrics.get("overall_metrics", {}) or {}
+    indicators = extracted_metrics.get("bottleneck_indicators", {}) or {}
+    return encode_key_values([
+        ("total", overall.get("total_time_ms"), "ms"),
+        ("exec", overall.get("execution_time_ms"), "ms"),
+        ("compile", overall.get("compilation_time_ms"), "ms"),
+        ("task", overall.get("task_total_time_ms"), "ms"),
+        ("read", overall.get("read_bytes"), "bytes"),
+        ("remote", overall.get("read_remote_bytes"), "bytes"),
+        ("cache_read", overall.get("read_cache_bytes"), "bytes"),
+        ("files", overall.get("read_files_count"), "count"),
+        ("rows_read", overall.get("rows_read_count"), "count"),
+        ("rows_out", overall.get("rows_produced_count"), "count"),
+        ("spill", overall.get("spill_to_disk_bytes", indicators.get("spill_bytes")), "bytes"),
+        ("cache_hit", indicators.get("cache_hit_ratio"), "ratio"),
+        ("photon", overall.get("photon_utilization_ratio"), "ratio"),
+        ("shuffle_impact", indicators.get("shuffle_impact_ratio"), "ratio"),
+        ("low_parallel_stages", indicators.get("low_parallelism_stages_count"), "count"),
+    ])
+
+
+# Nodes of the top-10 process data and of the detailed bottleneck analysis
+_NODE_COLUMNS: List[Column] = [
+    ("#", "rank", "count"),
+    ("node", ("short_name", "node_name"), "text"),
+    ("time", "duration_ms", "ms"),
+    ("share", "time_percentage", "pct"),
+    ("rows", "rows_processed", "count"),
+    ("mem", "memory_mb", "mb"),
+    ("spill", ("spill.bytes", "spill_bytes"), "bytes"),
+    ("skew_parts", ("skew.partitions", "skewed_partitions"), "count"),
+    ("tasks", ("parallelism.num_tasks", "num_tasks"), "count"),
+]
+
+_SHUFFLE_COLUMNS: List[Column] = [
+    ("node_id", "node_id", "text"),
+    ("priority", "priority", "text"),
+    ("parts", "partition_count", "count"),
+    ("peak_mem", "peak_memory_gb", "gb"),
+    ("mem/part", "memory_per_partition_mb", "mb"),
+    ("time", "duration_sec", "sec"),
+]
+
+
+def encode_top_nodes(nodes: Sequence[Dict[str, Any]], top_k: int = 5) -> str:
+    """Most time-consuming nodes as a table (top-10 data ``nodes`` or ``top_bottleneck_nodes``)."""
+    return encode_table(_NODE_COLUMNS, nodes, top_k)
+
+
+def encode_shuffle_analysis(enhanced_shuffle_analysis: Dict[str, Any], top_k: int = 5, memory_threshold_mb: float = 512) -> str:
+    """Enhanced Shuffle analysis as a summary line and a node table.
+
+    Nodes above the memory-per-partition threshold come first.
+
+    Args:
+        enhanced_shuffle_analysis: Dictionary with ``overall_assessment`` and ``shuffle_nodes``
+        top_k: Nodes shown individually
+        memory_threshold_mb: Memory per partition above which a node needs attention
+
+    Returns:
+        Summary line followed by the node table
+    """
+    assessment = enhanced_shuffle_analysis.get("overall_assessment", {}) or {}
+    nodes = list(enhanced_shuffle_analysis.get("shuffle_nodes", []) or [])
+    nodes.sort(key=lambda node: (node.get("memory_per_partition_mb", 0) or 0) <= memory_threshold_mb)
+    summary = encode_key_values([
+        ("shuffles", assessment.get("total_shuffle_nodes", len(nodes)), "count"),
+        ("inefficient", assessment.get("inefficient_nodes"), "count"),
+        ("total_mem", assessment.get("total_memory_gb"), "gb"),
+        ("avg_mem/part", assessment.get("avg_memory_per_partition_mb"), "mb"),
+        ("needs_optimization", assessment.get("needs_optimization"), "flag"),
+        ("target_mem/part", memory_threshold_mb, "mb"),
+    ])
+    table = encode_table(_SHUFFLE_COLUMNS, nodes, top_k)
+    return f"{summary}\n{table}" if table else summary
+
+
+def encode_clustering_data(extracted_data: Dict[str, Any], top_k: int = 5) -> str:
+    """Liquid Clustering inputs as compact tables.
+
+    Args:
+        extracted_data: ``extract_liquid_clustering_data`` output (column usage,
+            ``table_info`` and ``scan_nodes``)
+        top_k: Column usages and scan nodes shown individually per table
+
+    Returns:
+        Tables of tables, scans and filter / JOIN / GROUP BY / aggregate columns
+    """
+    tables = [
+        {
+            "table": name,
+            "size_gb": info.get("table_size_gb"),
+            "size_class": info.get("size_classification"),
+            "current_keys": info.get("current_clustering_keys") or "none",
+            "filter_rate": (info.get("filter_info") or {}).get("filter_rate") if (info.get("filter_info") or {}).get("has_filter_metrics") else None,
+            "read": (info.get("filter_info") or {}).get("files_read_bytes"),
+            "pruned": (info.get("filter_info") or {}).get("files_pruned_bytes"),
+        }
+        for name, info in (extracted_data.get("table_info") or {}).items()
+    ]
+    scans = [
+        dict(scan, rows_per_ms=(scan.get("rows", 0) or 0) / max(scan.get("duration_ms", 0) or 0, 1))
+        for scan in extracted_data.get("scan_nodes", []) or []
+    ]
+
+    sections = []
+    for title, columns, rows, limit in (
+        ("tables", [("table", "table", "text"), ("size", "size_gb", "gb"), ("class", "size_class", "text"),
+                    ("current_keys", "current_keys", "text"), ("filter_rate", "filter_rate", "ratio"),
+                    ("read", "read", "bytes"), ("pruned", "pruned", "bytes")], tables, 0),
+        ("scans", [("scan", "name", "text"), ("rows", "rows", "count"), ("time", "duration_ms", "ms"),
+                   ("rows/ms", "rows_per_ms", "count")], scans, top_k),
+        ("filter_columns", [("expression", "expression", "text"), ("node", "node_name", "text")],
+         extracted_data.get("filter_columns", []), top_k),
+        ("join_columns", [("expression", "expression", "text"), ("type", "key_type", "text"), ("node", "node_name", "text")],
+         extracted_data.get("join_columns", []), top_k),
+        ("groupby_columns", [("expression", "expression", "text"), ("node", "node_name", "text")],
+         extracted_data.get("groupby_columns", []), top_k),
+        ("aggregate_columns", [("expression", "expression", "text"), ("node", "node_name", "text")],
+         extracted_data.get("aggregate_columns", []), top_k),
+    ):
+        table = encode_table(columns, rows or [], limit)
+        total = len(rows or [])
+        sections.append(f"[{title} ({total})]\n{table}" if table else f"[{title} (0)]")
+    return "\n".join(sections)
@@ -0,0 +1,393 @@
+"""Join strategy evaluation.
+
+Walks the plan graph upstream from every join node to estimate the
+uncompressed size of its build and probe inputs, compares the build side
+against the broadcast threshold, and predicts the shuffle bytes that
+broadcasting the build side or reordering a selective join ahead of its
+input join would save. Rewrites are ranked by those savings.
+"""
+
+from typing import Any, Dict, List, Optional, Set
+
+from ..config import get_config
+from ..models import JoinEvaluation, JoinEvaluationResult, JoinRewrite, JoinSide
+from .node_metrics import get_key_metrics, get_node_id, get_node_metric, get_node_name
+from .scan_io import get_scan_table_name, is_scan_node
+from .shuffle_sizing import is_shuffle_node
+
+MB = 1024 * 1024
+
+_FILES_READ_BYTES = ["Size of files read", "Files read size"]
+_SHUFFLE_BYTES = [
+    "Sink - Num bytes written",
+    "Sink - Shuffle bytes written",
+    "Shuffle bytes written",
+    "shuffleWriteBytes",
+    "AQEShuffleRead - Partition data size",
+]
+
+# A join keeping at most this fraction of its probe rows is worth running earlier
+_SELECTIVE_JOIN_RATIO = 0.5
+
+
+def is_join_node(node: Dict[str, Any]) -> bool:
+    """Check whether a node is a join."""
+    return "JOIN" in get_node_name(node).upper()
+
+
+def get_join_strategy(node: Dict[str, Any]) -> str:
+    """Classify the join strategy from the node name."""
+    return classify_join_strategy(get_node_name(node))
+
+
+def classify_join_strategy(operator_name: str) -> str:
+    """Classify the join strategy from a profiler node or EXPLAIN operator name."""
+    name = operator_name.upper()
+    if "NESTED" in name:
+        return "broadcast_nested_loop_join"
+    if "BROADCAST" in name:
+        return "broadcast_hash_join"
+    if "SORT" in name and "MERGE" in name:
+        return "sort_merge_join"
+    if "HASH" in name:
+        return "shuffle_hash_join"
+    return "unknown"
+
+
+def _is_broadcast_exchange(node: Dict[str, Any]) -> bool:
+    name = get_node_name(node).upper()
+    return "BROADCAST" in name and "JOIN" not in name
+
+
+class _PlanGraph:
+    """Nodes of all profile graphs indexed by id, with their input edges."""
+
+    def __init__(self, profiler_data: Dict[str, Any]):
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.inputs: Dict[str, List[str]] = {}
+        for graph in profiler_data.get("graphs", []):
+            for node in graph.get("nodes", []):
+                self.nodes[get_node_id(node)] = node
+            for edge in graph.get("edges", []):
+                source, target = str(edge.get("source", "")), str(edge.get("target", ""))
+                if source and target:
+                    self.inputs.setdefault(target, []).append(source)
+
+    def input_ids(self, node_id: str) -> List[str]:
+        return [i for i in self.inputs.get(node_id, []) if i in self.nodes]
+
+
+def _estimate_side(graph: _PlanGraph, root_id: str, compression_ratio: float) -> JoinSide:
+    """Estimate the size of the subtree feeding a join from one side."""
+    root = graph.nodes[root_id]
+    side = JoinSide(root_node_id=root_id, rows=int(get_key_metrics(root).get("rowsNum", 0) or 0))
+
+    scan_bytes = 0
+    scan_rows = 0
+    visited: Set[str] = set()
+    stack = [root_id]
+    while stack:
+        node_id = stack.pop()
+        if node_id in visited:
+            continue
+        visited.add(node_id)
+        node = graph.nodes[node_id]
+
+        if not side.shuffle_bytes and is_shuffle_node(node):
+            # The exchange nearest the join carries what the join actually receives
+            side.shuffle_bytes = int(get_node_metric(node, _SHUFFLE_BYTES))
+        if is_scan_node(node):
+            table = get_scan_table_name(node)
+            if table not in side.tables:
+                side.tables.append(table)
+            scan_bytes += int(get_node_metric(node, _FILES_READ_BYTES))
+            scan_rows += int(get_key_metrics(node).get("rowsNum", 0) or 0)
+            continue
+        stack.extend(graph.input_ids(node_id))
+
+    if side.shuffle_bytes:
+        side.compressed_bytes = side.shuffle_bytes
+    else:
+        # Scale the files read down to the rows that survived filters on the way
+        selectivity = min(side.rows / scan_rows, 1.0) if scan_rows > 0 and side.rows > 0 else 1.0
+        side.compressed_bytes = int(scan_bytes * selectivity)
+    side.estimated_bytes = int(side.compressed_bytes * compression_ratio)
+    return side
+
+
+def _has_broadcast_exchange(graph: _PlanGraph, root_id: str) -> bool:
+    """Check whether a join input is fed through a broadcast exchange."""
+    node = graph.nodes[root_id]
+    if _is_broadcast_exchange(node):
+        return True
+    return any(_is_broadcast_exchange(graph.nodes[i]) for i in graph.input_ids(root_id))
+
+
+def _find_input_join(graph: _PlanGraph, root_id: str) -> Optional[str]:
+    """Find the nearest join upstream of a join input, stopping at scans."""
+    stack = [root_id]
+    visited: Set[str] = set()
+    while stack:
+        node_id = stack.pop()
+        if node_id in visited:
+            continue
+        visited.add(node_id)
+        node = graph.nodes[node_id]
+        if is_join_node(node):
+            return node_id
+        if not is_scan_node(node):
+            stack.extend(graph.input_ids(node_id))
+    return None
+
+
+def _broadcast_hint(tables: List[str]) -> str:
+    names = [table.split(".")[-1] for table in tables]
+    return f"/*+ BROADCAST({', '.join(names)}) */" if names else ""
+
+
+def evaluate_join_strategies(
+    profiler_data: Dict[str, Any],
+    threshold_bytes: Optional[int] = None,
+    compression_ratio: Optional[float] = None,
+) -> JoinEvaluationResult:
+    """Evaluate every join of a query and rank join rewrites.
+
+    Args:
+        profiler_data: Raw profiler JSON (uses ``graphs[*].nodes``/``edges``)
+        threshold_bytes: Effective broadcast threshold in bytes, e.g. from
+            ``spark.databricks.optimizer.autoBroadcastJoinThreshold``
+            (defaults to config)
+        compression_ratio: Compressed to in-memory size ratio (defaults to config)
+
+    Returns:
+        JoinEvaluationResult with per-join estimates and ranked rewrites
+    """
+    join_config = get_config().join_analysis
+    if threshold_bytes is None:
+        threshold_bytes = join_config.broadcast_threshold_bytes
+    if compression_ratio is None:
+        compression_ratio = join_config.compression_ratio
+
+    graph = _PlanGraph(profiler_data)
+    result = JoinEvaluationResult(threshold_bytes=threshold_bytes)
+
+    for node_id, node in graph.nodes.items():
+        if not is_join_node(node):
+            continue
+        input_ids = graph.input_ids(node_id)
+        if len(input_ids) < 2:
+            continue
+
+        sides = [_estimate_side(graph, i, compression_ratio) for i in input_ids[:2]]
+        broadcast_sides = [s for s in sides if _has_broadcast_exchange(graph, s.root_node_id)]
+        if broadcast_sides:
+            build = broadcast_sides[0]
+        else:
+            build = min(sides, key=lambda s: (s.estimated_bytes, s.rows))
+        probe = sides[1] if build is sides[0] else sides[0]
+
+        evaluation = JoinEvaluation(
+            node_id=node_id,
+            node_name=get_node_name(node),
+            strategy=get_join_strategy(node),
+            build=build,
+            probe=probe,
+            output_rows=int(get_key_metrics(node).get("rowsNum", 0) or 0),
+            broadcastable=0 < build.estimated_bytes <= threshold_bytes,
+        )
+        result.joins.append(evaluation)
+
+    joins_by_id = {j.node_id: j for j in result.joins}
+    for evaluation in result.joins:
+        rewrite = _broadcast_rewrite(evaluation, threshold_bytes, join_config.threshold_raise_factor)
+        if rewrite:
+            result.rewrites.append(rewrite)
+        rewrite = _reorder_rewrite(graph, evaluation, joins_by_id)
+        if rewrite:
+            result.rewrites.append(rewrite)
+
+    result.rewrites.sort(key=lambda r: r.expected_shuffle_bytes_saved, reverse=True)
+    return result
+
+
+def _broadcast_rewrite(
+    evaluation: JoinEvaluation,
+    threshold_bytes: int,
+    raise_factor: float,
+) -> Optional[JoinRewrite]:
+    """Suggest broadcasting the build side of a shuffled join."""
+    if evaluation.strategy in ("broadcast_hash_join", "broadcast_nested_loop_join"):
+        return None
+    build, probe = evaluation.build, evaluation.probe
+    if build.estimated_bytes <= 0:
+        return None
+
+    # Both exchanges go away; the build side is shipped once instead
+    saved = probe.shuffle_bytes + build.shuffle_bytes - build.compressed_bytes
+    if saved <= 0:
+        return None
+
+    build_name = ", ".join(build.tables) or build.root_node_id
+    if evaluation.broadcastable:
+        return JoinRewrite(
+            kind="broadcast",
+            node_id=evaluation.node_id,
+            node_name=evaluation.node_name,
+            build_name=build_name,
+            build_bytes=build.estimated_bytes,
+            threshold_bytes=threshold_bytes,
+            hint=_broadcast_hint(build.tables),
+            expected_shuffle_bytes_saved=saved,
+        )
+    if build.estimated_bytes <= threshold_bytes * raise_factor:
+        return JoinRewrite(
+            kind="raise_threshold",
+            node_id=evaluation.node_id,
+            node_name=evaluation.node_name,
+            build_name=build_name,
+            build_bytes=build.estimated_bytes,
+            threshold_bytes=threshold_bytes,
+            hint=(
+                "SET spark.databricks.optimizer.autoBroadcastJoinThreshold = "
+                f"{int(build.estimated_bytes * 1.2)};"
+            ),
+            expected_shuffle_bytes_saved=saved,
+        )
+    return None
+
+
+def _reorder_rewrite(
+    graph: _PlanGraph,
+    evaluation: JoinEvaluation,
+    joins_by_id: Dict[str, JoinEvaluation],
+) -> Optional[JoinRewrite]:
+    """Suggest running a selective join before the join feeding its probe side."""
+    probe = evaluation.probe
+    if probe.rows <= 0 or evaluation.output_rows <= 0:
+        return None
+    selectivity = evaluation.output_rows / probe.rows
+    if selectivity > _SELECTIVE_JOIN_RATIO:
+        return None
+
+    input_join_id = _find_input_join(graph, probe.root_node_id)
+    input_join = joins_by_id.get(input_join_id) if input_join_id else None
+    if input_join is None:
+        return None
+
+    # Rows dropped by this join would no longer flow through the input join's exchanges
+    moved_bytes = probe.shuffle_bytes or probe.compressed_bytes
+    saved = int(moved_bytes * (1.0 - selectivity))
+    if saved <= 0:
+        return None
+
+    return JoinRewrite(
+        kind="reorder",
+        node_id=evaluation.node_id,
+        node_name=evaluation.node_name,
+        build_name=", ".join(evaluation.build.tables) or evaluation.build.root_node_id,
+        build_bytes=evaluation.build.estimated_bytes,
+        input_join_id=input_join.node_id,
+        input_join_name=input_join.node_name,
+        selectivity=selectivity,
+        expected_shuffle_bytes_saved=saved,
+    )
+
+
+def describe_join_rewrite(rewrite: JoinRewrite, language: str = "en") -> str:
+    """Describe one join rewrite in a single line.
+
+    Args:
+        rewrite: Join rewrite
+        language: Output language ('ja' or 'en')
+
+    Returns:
+        e.g. ``Broadcast the build side (6.0 MB uncompressed) of SortMergeJoin``
+    """
+    ja = language == "ja"
+    build_mb = rewrite.build_bytes / MB
+    if rewrite.kind == "broadcast":
+        if ja:
+            return f"{rewrite.node_name} のビルド側 (非圧縮 {build_mb:,.1f} MB) をブロードキャスト"
+        return f"Broadcast the build side ({build_mb:,.1f} MB uncompressed) of {rewrite.node_name}"
+    if rewrite.kind == "raise_threshold":
+        threshold_mb = rewrite.threshold_bytes / MB
+        if ja:
+            return (
+                f"{rewrite.node_name} のビルド側 (非圧縮 {build_mb:,.1f} MB) が "
+                f"ブロードキャスト閾値 {threshold_mb:,.0f} MB を超えています"
+            )
+        return (
+            f"Build side of {rewrite.node_name} ({build_mb:,.1f} MB uncompressed) "
+            f"exceeds the {threshold_mb:,.0f} MB broadcast threshold"
+        )
+    input_join = f"{rewrite.input_join_name} ({rewrite.input_join_id})"
+    if ja:
+        return (
+            f"{rewrite.build_name} との結合を {input_join} より先に実行 "
+            f"(プローブ行の {rewrite.selectivity * 100:.1f}% のみ残ります)"
+        )
+    return (
+        f"Join {rewrite.build_name} before {input_join}; "
+        f"it keeps only {rewrite.selectivity * 100:.1f}% of the probe rows"
+    )
+
+
+def format_join_strategy_report(result: JoinEvaluationResult, language: str = "en", limit: int = 10) -> str:
+    """Format a join strategy evaluation as a markdown report.
+
+    Args:
+        result: Result of evaluate_join_strategies
+        language: Output language ('ja' or 'en')
+        limit: Maximum number of rewrites to list
+
+    Returns:
+        Formatted markdown report
+    """
+    ja = language == "ja"
+    lines = ["## JOIN 戦略評価" if ja else "## Join Strategy Evaluation", ""]
+
+    if not result.joins:
+        lines.append("JOIN ノードが見つかりません。" if ja else "No join nodes found.")
+        return "\n".join(lines)
+
+    lines.append(
+        f"- ブロードキャスト閾値: {result.threshold_bytes / MB:,.0f} MB"
+        if ja
+        else f"- Broadcast threshold: {result.threshold_bytes / MB:,.0f} MB"
+    )
+    lines.append("")
+    if ja:
+        lines.append("| JOIN | 戦略 | ビルド側 | ビルド推定 (非圧縮) | プローブ側 | プローブ推定 (非圧縮) | ブロードキャスト可 |")
+    else:
+        lines.append("| Join | Strategy | Build Side | Build Est. (uncompressed) | Probe Side | Probe Est. (uncompressed) | Broadcastable |")
+    lines.append("|------|----------|------------|---------------------------|------------|---------------------------|---------------|")
+
+    for evaluation in result.joins:
+        lines.append(
+            f"| {evaluation.node_name} ({evaluation.node_id}) | {evaluation.strategy} | "
+            f"{', '.join(evaluation.build.tables) or '-'} | {evaluation.build.estimated_bytes / MB:,.1f} MB | "
+            f"{', '.join(evaluation.probe.tables) or '-'} | {evaluation.probe.estimated_bytes / MB:,.1f} MB | "
+            f"{'✅' if evaluation.broadcastable else '-'} |"
+        )
+
+    lines.append("")
+    lines.append("### 推奨リライト" if ja else "### Ranked Rewrites")
+    lines.append("")
+    if not result.rewrites:
+        lines.append(
+            "✅ シャッフルを削減できる JOIN リライトはありません。"
+            if ja
+            else "✅ No join rewrite is expected to reduce shuffle."
+        )
+        return "\n".join(lines)
+
+    for rank, rewrite in enumerate(result.rewrites[:limit], 1):
+        saved = f"{rewrite.expected_shuffle_bytes_saved / MB:,.1f} MB"
+        lines.append(
+            f"{rank}. **{rewrite.kind}** — {describe_join_rewrite(rewrite, language)} "
+            + (f"(シャッフル削減見込み {saved})" if ja else f"(expected shuffle saved: {saved})")
+        )
+        if rewrite.hint:
+            lines.append(f"   - `{rewrite.hint}`")
+
+    return "\n".join(lines)
@@ -0,0 +1,101 @@
+"""Metric lookup helpers for profiler plan nodes.
+
+Nodes reach the analyzers in two shapes: raw profiler JSON nodes
+(``id``/``keyMetrics``/``metrics``) and the node dicts produced by the
+full analysis notebook's ``extract_performance_metrics``
+(``node_id``/``key_metrics``/``detailed_metrics``/``metrics``). These helpers
+read either shape so the analyzers don't have to care.
+"""
+
+from typing import Any, Dict, Iterable, List, Union
+
+
+def get_node_id(node: Dict[str, Any]) -> str:
+    """Get the node identifier from either node shape."""
+    return str(node.get("node_id", node.get("id", "")))
+
+
+def get_node_name(node: Dict[str, Any]) -> str:
+    """Get the node display name from either node shape."""
+    return node.get("name") or node.get("nodeName") or node.get("tag") or f"Node-{get_node_id(node)}"
+
+
+def get_key_metrics(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the key metrics dict from either node shape."""
+    key_metrics = node.get("key_metrics", node.get("keyMetrics", {}))
+    return key_metrics if isinstance(key_metrics, dict) else {}
+
+
+def get_node_metric(
+    node: Dict[str, Any],
+    names: Union[str, Iterable[str]],
+    default: float = 0,
+) -> float:
+    """Look up a metric value by exact key or label.
+
+    Names are tried in order; for each name ``detailed_metrics`` is searched
+    first, then the raw ``metrics`` list, then the key metrics.
+
+    Args:
+        node: Profiler node in either shape
+        names: Metric name or names in order of preference
+        default: Value returned when no metric is found
+
+    Returns:
+        The first non-zero metric value found, or ``default``
+    """
+    if isinstance(names, str):
+        names = [names]
+
+    detailed_metrics = node.get("detailed_metrics", {})
+    raw_metrics = node.get("metrics", [])
+    key_metrics = get_key_metrics(node)
+
+    for name in names:
+        if isinstance(detailed_metrics, dict):
+            for metric_key, info in detailed_metrics.items():
+                if not isinstance(info, dict):
+                    continue
+                if metric_key == name or info.get("label") == name:
+                    value = info.get("value", 0) or 0
+                    if value:
+                        return value
+
+        if isinstance(raw_metrics, list):
+            for metric in raw_metrics:
+                if not isinstance(metric, dict):
+                    continue
+                if metric.get("key") == name or metric.get("label") == name:
+                    value = metric.get("value", 0) or 0
+                    if value:
+                        return value
+
+        value = key_metrics.get(name, 0)
+        if value:
+            return value
+
+    return default
+
+
+def get_node_metadata_values(node: Dict[str, Any], names: Union[str, Iterable[str]]) -> List[str]:
+    """Collect metadata values (e.g. table names, attributes) by key or label."""
+    if isinstance(names, str):
+        names = [names]
+    names = set(names)
+
+    values: List[str] = []
+    for source in (node.get("metadata", []), node.get("metrics", [])):
+        if not isinstance(source, list):
+            continue
+        for item in source:
+            if not isinstance(item, dict):
+                continue
+            if item.get("key") in names or item.get("label") in names:
+                item_values = item.get("values")
+                if isinstance(item_values, list):
+                    values.extend(str(v) for v in item_values)
+                elif item.get("value") not in (None, ""):
+                    values.append(str(item.get("value")))
+
+    # Remove duplicates while keeping order
+    return list(dict.fromkeys(values))
@@ -0,0 +1,226 @@
+"""Photon fallback analysis.
+
+Joins the ``== Photon Explanation ==`` section of EXPLAIN output with the
+profile's plan nodes: every operator that ran outside Photon is listed with
+its time and the unsupported expression or feature reported for it, ranked
+by the time that moving it onto Photon could recover.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from ..models import PhotonBlocker, PhotonFallbackOperator, PhotonFallbackResult
+from .node_metrics import get_key_metrics, get_node_id, get_node_metadata_values, get_node_name
+
+# Typical Photon speedup over the row-based engine for the same operator
+DEFAULT_PHOTON_SPEEDUP = 2.0
+
+_UNSUPPORTED_RE = re.compile(
+    r"unsupported\s+(expression\(s\)|expressions?|nodes?|data\s+types?|aggregates?|functions?)\s*:\s*(.+)",
+    re.IGNORECASE,
+)
+_NOT_SUPPORTED_RE = re.compile(r"^(.+?)\s+(?:is|are)\s+not\s+supported", re.IGNORECASE)
+_FUNCTION_RE = re.compile(r"([A-Za-z_][A-Za-z0-9_]*)\s*\(")
+_SECTION_RE = re.compile(r"^==\s.*\s==$")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]")
+
+
+def parse_photon_blockers(photon_text: str) -> List[PhotonBlocker]:
+    """Parse the Photon explanation into blockers.
+
+    Args:
+        photon_text: Photon explanation section (or full EXPLAIN output)
+
+    Returns:
+        Blockers in the order they appear; empty when fully supported
+    """
+    if not photon_text or "fully supported by photon" in photon_text.lower():
+        return []
+
+    blockers: List[PhotonBlocker] = []
+    collecting = False
+    expect_reference = False
+
+    for raw_line in photon_text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        lower = line.lower()
+
+        if "photon does not fully support the query" in lower:
+            collecting = True
+            continue
+        if not collecting:
+            continue
+        if _SECTION_RE.match(line):
+            break
+
+        if lower.startswith("reference node"):
+            expect_reference = True
+            continue
+
+        if expect_reference:
+            operator = line.split("[", 1)[0].split("(", 1)[0].split()[0] if line.split() else ""
+            for blocker in reversed(blockers):
+                if blocker.operator:
+                    break
+                blocker.operator = operator
+            expect_reference = False
+            continue
+
+        if line.startswith(("- ", "* ", "• ")):
+            line = line[2:].strip()
+        blockers.append(_build_blocker(line))
+
+    return blockers
+
+
+def _build_blocker(reason: str) -> PhotonBlocker:
+    """Extract the blocking feature (and operator, for unsupported nodes) from a reason."""
+    blocker = PhotonBlocker(reason=reason)
+
+    match = _UNSUPPORTED_RE.search(reason)
+    if match:
+        kind, detail = match.group(1).lower(), match.group(2).strip()
+        function = _FUNCTION_RE.match(detail)
+        blocker.feature = function.group(1) if function else detail.split(",")[0].strip()
+        if kind.startswith("node"):
+            blocker.operator = detail.split("[", 1)[0].split()[0] if detail.split() else ""
+            blocker.feature = blocker.operator
+        return blocker
+
+    match = _NOT_SUPPORTED_RE.search(reason)
+    if match:
+        blocker.feature = match.group(1).strip()
+        return blocker
+
+    function = _FUNCTION_RE.search(reason)
+    if function:
+        blocker.feature = function.group(1)
+    return blocker
+
+
+def is_photon_node(node: Dict[str, Any]) -> bool:
+    """Check whether a plan node ran on Photon."""
+    if "true" in [v.lower() for v in get_node_metadata_values(node, "IS_PHOTON")]:
+        return True
+    tag = str(node.get("tag", "")).upper()
+    return tag.startswith("PHOTON") or get_node_name(node).startswith("Photon")
+
+
+def analyze_photon_fallback(
+    node_metrics: List[Dict[str, Any]],
+    photon_explanation: str = "",
+    overall_metrics: Optional[Dict[str, Any]] = None,
+    photon_speedup: float = DEFAULT_PHOTON_SPEEDUP,
+) -> PhotonFallbackResult:
+    """Break down non-Photon time per operator and attribute it to blockers.
+
+    Args:
+        node_metrics: Profiler nodes (extracted node dicts or raw nodes)
+        photon_explanation: Photon explanation text from EXPLAIN
+        overall_metrics: Optional ``overall_metrics`` for Photon/task totals
+        photon_speedup: Assumed speedup once an operator runs on Photon
+
+    Returns:
+        PhotonFallbackResult with operators ranked by recoverable time
+    """
+    overall_metrics = overall_metrics or {}
+    blockers = parse_photon_blockers(photon_explanation)
+
+    result = PhotonFallbackResult(
+        fully_supported="fully supported by photon" in (photon_explanation or "").lower(),
+        photon_time_ms=overall_metrics.get("photon_total_time_ms", 0) or 0,
+        task_time_ms=overall_metrics.get("task_total_time_ms", 0) or 0,
+    )
+    recoverable_fraction = max(1.0 - 1.0 / photon_speedup, 0.0) if photon_speedup > 0 else 0.0
+
+    attributed = set()
+    for node in node_metrics:
+        if is_photon_node(node):
+            continue
+        time_ms = get_key_metrics(node).get("durationMs", 0) or 0
+        if time_ms <= 0:
+            continue
+
+        operator = PhotonFallbackOperator(
+            node_id=get_node_id(node),
+            node_name=get_node_name(node),
+            tag=str(node.get("tag", "")),
+            exclusive_time_ms=time_ms,
+            recoverable_time_ms=time_ms * recoverable_fraction,
+        )
+        # The explanation names operators by type only, so a blocker applies to every node of that type
+        node_keys = {_normalize(operator.node_name), _normalize(operator.tag)} - {""}
+        for index, blocker in enumerate(blockers):
+            if blocker.operator and _normalize(blocker.operator) in node_keys:
+                operator.blockers.append(blocker)
+                attributed.add(index)
+
+        result.operators.append(operator)
+        result.non_photon_time_ms += time_ms
+        result.total_recoverable_time_ms += operator.recoverable_time_ms
+
+    result.operators.sort(key=lambda o: o.recoverable_time_ms, reverse=True)
+    result.unattributed_blockers = [b for i, b in enumerate(blockers) if i not in attributed]
+    return result
+
+
+def _normalize(text: str) -> str:
+    """Lower-case and strip non-alphanumerics and a trailing 'Exec' so 'SortMergeJoinExec' matches 'Sort Merge Join'."""
+    key = _NON_ALNUM_RE.sub("", text.lower())
+    return key[:-4] if key.endswith("exec") and len(key) > 4 else key
+
+
+def format_photon_fallback_report(result: PhotonFallbackResult, language: str = "en", limit: int = 10) -> str:
+    """Format a Photon fallback analysis as a markdown report.
+
+    Args:
+        result: Result of analyze_photon_fallback
+        language: Output language ('ja' or 'en')
+        limit: Maximum number of operators to list
+
+    Returns:
+        Formatted markdown report
+    """
+    ja = language == "ja"
+    lines = ["## Photon フォールバック分析" if ja else "## Photon Fallback Analysis", ""]
+
+    if result.task_time_ms > 0:
+        ratio = result.photon_time_ms / result.task_time_ms * 100
+        lines.append(
+            f"- Photon 利用率: {ratio:.1f}%" if ja else f"- Photon utilization: {ratio:.1f}%"
+        )
+    lines.append(
+        f"- 非Photon 時間: {result.non_photon_time_ms:,.0f} ms / 回収可能: {result.total_recoverable_time_ms:,.0f} ms"
+        if ja
+        else f"- Non-Photon time: {result.non_photon_time_ms:,.0f} ms / recoverable: {result.total_recoverable_time_ms:,.0f} ms"
+    )
+    lines.append("")
+
+    if not result.operators:
+        lines.append(
+            "✅ すべての演算子が Photon で実行されています。"
+            if ja
+            else "✅ All operators ran on Photon."
+        )
+    else:
+        if ja:
+            lines.append("| 順位 | 演算子 | 時間 | 回収可能時間 | Photon 阻害要因 |")
+        else:
+            lines.append("| Rank | Operator | Time | Recoverable | Photon Blocker |")
+        lines.append("|------|----------|------|-------------|----------------|")
+        for rank, operator in enumerate(result.operators[:limit], 1):
+            blocker_text = ", ".join(b.feature or b.reason for b in operator.blockers) or "-"
+            lines.append(
+                f"| {rank} | {operator.node_name} ({operator.node_id}) | "
+                f"{operator.exclusive_time_ms:,.0f} ms | {operator.recoverable_time_ms:,.0f} ms | {blocker_text} |"
+            )
+
+    if result.unattributed_blockers:
+        lines.append("")
+        lines.append("### 演算子に紐付かない阻害要因" if ja else "### Blockers Not Matched to an Operator")
+        for blocker in result.unattributed_blockers:
+            lines.append(f"- {blocker.reason}")
+
+    return "\n".join(lines)
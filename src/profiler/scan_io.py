@@ -0,0 +1,208 @@
+"""Scan I/O efficiency analysis.
+
+Aggregates every scan node of a query per table and derives bytes per
+file, small-file overhead, pruning effectiveness and remote/cache read
+throughput, then predicts the scan time after OPTIMIZE (file compaction)
+and after clustering on the filter columns (pruning down to the rows the
+scan actually kept).
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+from ..config import get_config
+from ..models import ScanIOResult, TableScanIO
+from .node_metrics import get_key_metrics, get_node_id, get_node_metadata_values, get_node_metric, get_node_name
+
+MB = 1024 * 1024
+
+_TABLE_METADATA_KEYS = ["SCAN_IDENTIFIER", "SCAN_TABLE", "TABLE_NAME", "RELATION", "SCAN_RELATION"]
+_FILES_READ_BYTES = ["Size of files read", "Files read size"]
+_FILES_PRUNED_BYTES = ["Size of files pruned", "Files pruned size"]
+_FILES_READ_COUNT = ["Files read", "Number of files read", "Num files read"]
+_FILES_PRUNED_COUNT = ["Files pruned", "Number of files pruned", "Num files pruned"]
+_REMOTE_BYTES = ["Size of data read with io requests", "Data read with io requests"]
+_CACHE_BYTES = ["Cache hits size", "Size of data read from cache", "Cache hit size"]
+_ROWS_READ = ["Rows read", "Number of rows read", "Num rows read"]
+
+
+def is_scan_node(node: Dict[str, Any]) -> bool:
+    """Check whether a node is a table scan."""
+    return "scan" in get_node_name(node).lower() or "SCAN" in str(node.get("tag", "")).upper()
+
+
+def get_scan_table_name(node: Dict[str, Any]) -> str:
+    """Get the table a scan node reads."""
+    values = get_node_metadata_values(node, _TABLE_METADATA_KEYS)
+    if values:
+        return values[0]
+    name = get_node_name(node)
+    for prefix in ("Photon Scan ", "Scan "):
+        if name.startswith(prefix):
+            return name[len(prefix):].strip()
+    return name
+
+
+def analyze_scan_io(
+    node_metrics: List[Dict[str, Any]],
+    overall_metrics: Optional[Dict[str, Any]] = None,
+) -> ScanIOResult:
+    """Analyze scan I/O efficiency per table.
+
+    Args:
+        node_metrics: Profiler nodes (extracted node dicts or raw nodes)
+        overall_metrics: Optional ``overall_metrics``; query-level
+            ``read_cache_bytes``/``read_bytes`` apportion cache reads to
+            scans whose nodes carry no cache metric
+
+    Returns:
+        ScanIOResult with tables ordered by scan time
+    """
+    overall_metrics = overall_metrics or {}
+    query_read_bytes = overall_metrics.get("read_bytes", 0) or 0
+    query_cache_bytes = overall_metrics.get("read_cache_bytes", 0) or 0
+    query_cache_ratio = query_cache_bytes / query_read_bytes if query_read_bytes > 0 else 0.0
+
+    tables: Dict[str, TableScanIO] = {}
+
+    for node in node_metrics:
+        if not is_scan_node(node):
+            continue
+
+        bytes_read = int(get_node_metric(node, _FILES_READ_BYTES))
+        scan_time = get_key_metrics(node).get("durationMs", 0) or 0
+        if bytes_read <= 0 and scan_time <= 0:
+            continue
+
+        table_name = get_scan_table_name(node)
+        stats = tables.setdefault(table_name, TableScanIO(table_name=table_name))
+
+        cache_bytes = int(get_node_metric(node, _CACHE_BYTES))
+        remote_bytes = int(get_node_metric(node, _REMOTE_BYTES))
+        if not cache_bytes and query_cache_ratio > 0:
+            cache_bytes = int(bytes_read * query_cache_ratio)
+        if not remote_bytes:
+            remote_bytes = max(bytes_read - cache_bytes, 0)
+
+        stats.scan_node_ids.append(get_node_id(node))
+        stats.files_read += int(get_node_metric(node, _FILES_READ_COUNT))
+        stats.files_pruned += int(get_node_metric(node, _FILES_PRUNED_COUNT))
+        stats.bytes_read += bytes_read
+        stats.bytes_pruned += int(get_node_metric(node, _FILES_PRUNED_BYTES))
+        stats.remote_bytes += remote_bytes
+        stats.cache_bytes += cache_bytes
+        stats.rows_read += int(get_node_metric(node, _ROWS_READ))
+        stats.rows_output += int(get_key_metrics(node).get("rowsNum", 0) or 0)
+        stats.scan_time_ms += scan_time
+
+    result = ScanIOResult()
+    for stats in tables.values():
+        _derive_table_io(stats)
+        result.tables.append(stats)
+        result.total_bytes_read += stats.bytes_read
+        result.total_files_read += stats.files_read
+        result.total_scan_time_ms += stats.scan_time_ms
+        result.remote_bytes += stats.remote_bytes
+        result.cache_bytes += stats.cache_bytes
+
+    result.tables.sort(key=lambda s: s.scan_time_ms, reverse=True)
+    return result
+
+
+def _derive_table_io(stats: TableScanIO) -> None:
+    """Fill in the derived efficiency figures and predictions for one table."""
+    scan_io_config = get_config().scan_io
+    target_file_bytes = scan_io_config.target_file_size_bytes
+    per_file_ms = scan_io_config.per_file_overhead_ms
+
+    if stats.files_read > 0:
+        stats.avg_file_size_bytes = stats.bytes_read / stats.files_read
+    total_bytes = stats.bytes_read + stats.bytes_pruned
+    if total_bytes > 0:
+        stats.pruning_ratio = stats.bytes_pruned / total_bytes
+
+    overhead_ms = stats.files_read * per_file_ms
+    # Never attribute more than 90% of the scan to per-file overhead
+    overhead_ms = min(overhead_ms, stats.scan_time_ms * 0.9)
+    if stats.files_read > 0 and stats.avg_file_size_bytes < scan_io_config.small_file_threshold_mb * MB:
+        stats.small_file_overhead_ms = overhead_ms
+    data_time_ms = stats.scan_time_ms - overhead_ms
+
+    # Model: data_time = remote / Tr + cache / (k * Tr)
+    remote_equivalent = stats.remote_bytes + stats.cache_bytes / scan_io_config.cache_speedup
+    if data_time_ms > 0 and remote_equivalent > 0:
+        remote_bytes_per_ms = remote_equivalent / data_time_ms
+        stats.remote_throughput_mb_s = remote_bytes_per_ms * 1000 / MB
+        stats.cache_throughput_mb_s = stats.remote_throughput_mb_s * scan_io_config.cache_speedup
+
+    if stats.bytes_read <= 0:
+        stats.predicted_optimize_time_ms = stats.scan_time_ms
+        stats.predicted_clustered_time_ms = stats.scan_time_ms
+        return
+
+    files_after_optimize = stats.files_read
+    if stats.files_read > 0 and stats.avg_file_size_bytes < target_file_bytes:
+        files_after_optimize = max(math.ceil(stats.bytes_read / target_file_bytes), 1)
+    stats.predicted_optimize_time_ms = files_after_optimize * per_file_ms + data_time_ms
+
+    # Clustering on the filter columns prunes down to roughly the rows the scan kept
+    selectivity = 1.0
+    if stats.rows_read > 0 and stats.rows_output > 0:
+        selectivity = min(stats.rows_output / stats.rows_read, 1.0)
+    bytes_after_clustering = max(stats.bytes_read * selectivity, min(target_file_bytes, stats.bytes_read))
+    files_after_clustering = max(math.ceil(bytes_after_clustering / target_file_bytes), 1)
+    stats.predicted_clustered_time_ms = (
+        files_after_clustering * per_file_ms
+        + data_time_ms * bytes_after_clustering / stats.bytes_read
+    )
+
+
+def format_scan_io_report(result: ScanIOResult, language: str = "en", limit: int = 10) -> str:
+    """Format a scan I/O analysis as a markdown report.
+
+    Args:
+        result: Result of analyze_scan_io
+        language: Output language ('ja' or 'en')
+        limit: Maximum number of tables to list
+
+    Returns:
+        Formatted markdown report
+    """
+    ja = language == "ja"
+    lines = ["## スキャン I/O 効率分析" if ja else "## Scan I/O Efficiency", ""]
+
+    if not result.tables:
+        lines.append("スキャンノードが見つかりません。" if ja else "No scan nodes found.")
+        return "\n".join(lines)
+
+    total_read = result.remote_bytes + result.cache_bytes
+    cache_ratio = result.cache_bytes / total_read * 100 if total_read > 0 else 0.0
+    if ja:
+        lines.append(
+            f"- 読み込み: {result.total_bytes_read / MB / 1024:,.2f} GB / {result.total_files_read:,} ファイル "
+            f"(キャッシュ {cache_ratio:.1f}%)"
+        )
+        lines.append(f"- スキャン時間合計: {result.total_scan_time_ms / 1000:,.1f} 秒")
+        lines.append("")
+        lines.append("| テーブル | 読込 | ファイル数 | 平均ファイル | プルーニング | 小ファイル負荷 | リモート/キャッシュ MB/s | 現在 | OPTIMIZE後 | クラスタリング後 |")
+    else:
+        lines.append(
+            f"- Read: {result.total_bytes_read / MB / 1024:,.2f} GB in {result.total_files_read:,} files "
+            f"(cache {cache_ratio:.1f}%)"
+        )
+        lines.append(f"- Total scan time: {result.total_scan_time_ms / 1000:,.1f} s")
+        lines.append("")
+        lines.append("| Table | Read | Files | Avg File | Pruning | Small-file Overhead | Remote/Cache MB/s | Current | After OPTIMIZE | After Clustering |")
+    lines.append("|-------|------|-------|----------|---------|---------------------|-------------------|---------|----------------|------------------|")
+
+    for stats in result.tables[:limit]:
+        lines.append(
+            f"| {stats.table_name} | {stats.bytes_read / MB / 1024:,.2f} GB | {stats.files_read:,} | "
+            f"{stats.avg_file_size_bytes / MB:,.1f} MB | {stats.pruning_ratio * 100:.1f}% | "
+            f"{stats.small_file_overhead_ms / 1000:,.1f} s | "
+            f"{stats.remote_throughput_mb_s:,.0f} / {stats.cache_throughput_mb_s:,.0f} | "
+            f"{stats.scan_time_ms / 1000:,.1f} s | {stats.predicted_optimize_time_ms / 1000:,.1f} s | "
+            f"{stats.predicted_clustered_time_ms / 1000:,.1f} s |"
+        )
+
+    return "\n".join(lines)
@@ -0,0 +1,293 @@
+"""Shuffle partition sizing solver.
+
+For each shuffle node the solver picks the partition count whose partition
+size lands in the configured target band, given the observed shuffle data
+size, what AQE already coalesced the shuffle into, and the available task
+slots. The per-node plans are folded into query-level SET statements.
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+from ..config import get_config
+from ..models import ShufflePartitionPlan, ShuffleSizingResult
+from .node_metrics import get_node_id, get_node_metric, get_node_name
+
+MB = 1024 * 1024
+
+_DATA_SIZE_METRICS = [
+    "AQEShuffleRead - Partition data size",
+    "Sink - Num bytes written",
+    "Sink - Shuffle bytes written",
+    "Shuffle bytes written",
+    "shuffleWriteBytes",
+    "shuffleReadBytes",
+]
+_PARTITION_METRICS = [
+    "Sink - Number of partitions",
+    "Number of partitions",
+    "numPartitions",
+]
+_AQE_PARTITION_METRICS = ["AQEShuffleRead - Number of partitions"]
+_SPILL_METRICS = [
+    "Sink - Num bytes spilled to disk due to memory pressure",
+    "Num bytes spilled to disk due to memory pressure",
+    "spillToDisk",
+]
+
+
+def is_shuffle_node(node: Dict[str, Any]) -> bool:
+    """Check whether a node is a shuffle exchange."""
+    name = get_node_name(node).lower()
+    tag = str(node.get("tag", ""))
+    return "SHUFFLE" in tag.upper() or "shuffle" in name or "exchange" in name
+
+
+def solve_partition_plan(
+    node: Dict[str, Any],
+    task_slots: int = 0,
+    target_size_bytes: Optional[int] = None,
+    min_size_bytes: Optional[int] = None,
+    max_size_bytes: Optional[int] = None,
+) -> Optional[ShufflePartitionPlan]:
+    """Compute the partition count and advisory size for one shuffle node.
+
+    A spilling shuffle is sized from the spill-free per-task capacity
+    (capped at the target size) and never gets fewer partitions than ran.
+
+    Args:
+        node: Shuffle node (raw profiler node or extracted node dict)
+        task_slots: Total task slots; when known the partition count is
+            rounded up to whole waves as long as the size stays in the band
+        target_size_bytes: Target partition size (defaults to config)
+        min_size_bytes: Lower edge of the target band (defaults to config)
+        max_size_bytes: Upper edge of the target band (defaults to config)
+
+    Returns:
+        ShufflePartitionPlan, or None if the node has no usable data size
+    """
+    shuffle_config = get_config().shuffle_analysis
+    if target_size_bytes is None:
+        target_size_bytes = shuffle_config.target_partition_size_mb * MB
+    if min_size_bytes is None:
+        min_size_bytes = shuffle_config.min_partition_size_mb * MB
+    if max_size_bytes is None:
+        max_size_bytes = shuffle_config.max_partition_size_mb * MB
+
+    data_size = int(get_node_metric(node, _DATA_SIZE_METRICS))
+    if data_size <= 0:
+        return None
+
+    current_partitions = int(get_node_metric(node, _PARTITION_METRICS))
+    aqe_partitions = int(get_node_metric(node, _AQE_PARTITION_METRICS))
+    spill_bytes = int(get_node_metric(node, _SPILL_METRICS))
+
+    # AQE's coalesced partition count is what actually ran as tasks
+    effective_partitions = aqe_partitions or current_partitions
+    current_size = data_size // effective_partitions if effective_partitions > 0 else data_size
+
+    within_target = (
+        effective_partitions > 0
+        and min_size_bytes <= current_size <= max_size_bytes
+        and spill_bytes == 0
+    )
+
+    if within_target:
+        partitions = effective_partitions
+    else:
+        size_bytes = target_size_bytes
+        if spill_bytes > 0 and effective_partitions > 0:
+            # Size from what fitted in task memory; a spilling shuffle never gets fewer, larger partitions
+            spill_free_size = current_size * (1 - spill_bytes / data_size)
+            if spill_free_size > 0:
+                size_bytes = min(target_size_bytes, spill_free_size)
+        partitions = max(1, math.ceil(data_size / size_bytes))
+        if spill_bytes > 0:
+            partitions = max(partitions, effective_partitions)
+        if task_slots > 0 and partitions > task_slots:
+            waves = math.ceil(partitions / task_slots)
+            wave_aligned = waves * task_slots
+            if data_size / wave_aligned >= min_size_bytes:
+                partitions = wave_aligned
+
+    advisory_size = math.ceil(data_size / partitions / MB) * MB
+
+    return ShufflePartitionPlan(
+        node_id=get_node_id(node),
+        node_name=get_node_name(node),
+        data_size_bytes=data_size,
+        current_partitions=current_partitions,
+        aqe_partitions=aqe_partitions,
+        current_partition_size_bytes=current_size,
+        recommended_partitions=partitions,
+        advisory_partition_size_bytes=advisory_size,
+        current_spill_bytes=spill_bytes,
+        predicted_spill_bytes=_predict_spill(
+            spill_bytes, effective_partitions, current_size, partitions, data_size
+        ),
+        task_count_change=partitions - effective_partitions,
+        within_target=within_target,
+    )
+
+
+def _predict_spill(
+    spill_bytes: int,
+    current_partitions: int,
+    current_size: int,
+    new_partitions: int,
+    data_size: int,
+) -> int:
+    """Predict spill after resizing.
+
+    The memory that fit per task is inferred from the observed spill
+    (partition size minus spilled bytes per task); anything above that
+    capacity in the new partition size is assumed to spill.
+    """
+    if spill_bytes <= 0 or current_partitions <= 0:
+        return 0
+
+    capacity_per_task = max(current_size - spill_bytes / current_partitions, 0)
+    new_size = data_size / new_partitions
+    return int(new_partitions * max(new_size - capacity_per_task, 0))
+
+
+def solve_shuffle_partition_sizing(
+    node_metrics: List[Dict[str, Any]],
+    task_slots: Optional[int] = None,
+) -> ShuffleSizingResult:
+    """Solve partition sizing for every shuffle node of a query.
+
+    Args:
+        node_metrics: Profiler nodes (``extracted_metrics['node_metrics']``
+            or raw ``graphs[*]['nodes']``)
+        task_slots: Total task slots; defaults to the configured value
+
+    Returns:
+        ShuffleSizingResult with per-node plans and SET statements
+    """
+    shuffle_config = get_config().shuffle_analysis
+    if task_slots is None:
+        task_slots = shuffle_config.task_slots
+
+    result = ShuffleSizingResult()
+
+    for node in node_metrics:
+        if not is_shuffle_node(node):
+            continue
+        plan = solve_partition_plan(node, task_slots=task_slots)
+        if plan:
+            result.plans.append(plan)
+
+    if not result.plans:
+        return result
+
+    for plan in result.plans:
+        result.current_total_tasks += plan.aqe_partitions or plan.current_partitions
+        result.predicted_total_tasks += plan.recommended_partitions
+        result.current_total_spill_bytes += plan.current_spill_bytes
+        result.predicted_total_spill_bytes += plan.predicted_spill_bytes
+
+    changed = [p for p in result.plans if not p.within_target]
+    if not changed:
+        return result
+
+    # spark.sql.shuffle.partitions is query-wide: size it for the largest
+    # shuffle and let AQE coalesce the smaller ones down to the advisory size.
+    largest = max(changed, key=lambda p: p.data_size_bytes)
+    result.shuffle_partitions = max(p.recommended_partitions for p in changed)
+    result.advisory_partition_size_bytes = largest.advisory_partition_size_bytes
+
+    result.set_statements = [
+        f"SET spark.sql.shuffle.partitions = {result.shuffle_partitions};",
+        f"SET spark.sql.adaptive.advisoryPartitionSizeInBytes = {result.advisory_partition_size_bytes};",
+    ]
+    min_size_bytes = shuffle_config.min_partition_size_mb * MB
+    if any(p.current_partition_size_bytes < min_size_bytes for p in changed):
+        result.set_statements.append("SET spark.sql.adaptive.coalescePartitions.enabled = true;")
+
+    return result
+
+
+def format_shuffle_sizing_report(result: ShuffleSizingResult, language: str = "en") -> str:
+    """Format a shuffle sizing result as a markdown report.
+
+    Args:
+        result: Result of solve_shuffle_partition_sizing
+        language: Output language ('ja' or 'en')
+
+    Returns:
+        Formatted markdown report
+    """
+    lines = []
+
+    if language == "ja":
+        lines.append("## シャッフルパーティションサイズ最適化")
+    else:
+        lines.append("## Shuffle Partition Sizing")
+    lines.append("")
+
+    if not result.plans:
+        lines.append(
+            "サイズ情報を持つシャッフル操作はありません。"
+            if language == "ja"
+            else "No shuffle operations with data size information."
+        )
+        return "\n".join(lines)
+
+    if language == "ja":
+        lines.append("| ノード | データ量 | 現在のパーティション数 | 現在のサイズ | 推奨パーティション数 | 推奨サイズ | タスク数変化 | スピル (現在→予測) |")
+    else:
+        lines.append("| Node | Data Size | Current Partitions | Current Size | Recommended Partitions | Advisory Size | Task Change | Spill (current→predicted) |")
+    lines.append("|------|-----------|--------------------|--------------|------------------------|---------------|-------------|---------------------------|")
+
+    for plan in result.plans:
+        current = plan.aqe_partitions or plan.current_partitions
+        partitions_label = f"{current:,}"
+        if plan.aqe_partitions and plan.current_partitions:
+            partitions_label = f"{plan.current_partitions:,} → AQE {plan.aqe_partitions:,}"
+        lines.append(
+            f"| {plan.node_name} ({plan.node_id}) | {_format_mb(plan.data_size_bytes)} | "
+            f"{partitions_label} | {_format_mb(plan.current_partition_size_bytes)} | "
+            f"{plan.recommended_partitions:,} | {_format_mb(plan.advisory_partition_size_bytes)} | "
+            f"{plan.task_count_change:+,} | "
+            f"{_format_mb(plan.current_spill_bytes)} → {_format_mb(plan.predicted_spill_bytes)} |"
+        )
+
+    lines.append("")
+    if not result.set_statements:
+        lines.append(
+            "✅ すべてのシャッフルが目標サイズ範囲内です。"
+            if language == "ja"
+            else "✅ All shuffles are within the target partition size band."
+        )
+        return "\n".join(lines)
+
+    if language == "ja":
+        lines.append(
+            f"**タスク数**: {result.current_total_tasks:,} → {result.predicted_total_tasks:,} / "
+            f"**スピル**: {_format_mb(result.current_total_spill_bytes)} → "
+            f"{_format_mb(result.predicted_total_spill_bytes)}"
+        )
+        lines.append("")
+        lines.append("### 推奨設定")
+    else:
+        lines.append(
+            f"**Tasks**: {result.current_total_tasks:,} → {result.predicted_total_tasks:,} / "
+            f"**Spill**: {_format_mb(result.current_total_spill_bytes)} → "
+            f"{_format_mb(result.predicted_total_spill_bytes)}"
+        )
+        lines.append("")
+        lines.append("### Recommended Settings")
+    lines.append("")
+    lines.append("```sql")
+    lines.extend(result.set_statements)
+    lines.append("```")
+
+    return "\n".join(lines)
+
+
+def _format_mb(bytes_val: float) -> str:
+    """Format bytes as MB/GB for the sizing table."""
+    if bytes_val >= 1024 * MB:
+        return f"{bytes_val / (1024 * MB):.2f} GB"
+    return f"{bytes_val / MB:.1f} MB"
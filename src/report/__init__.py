@@ -4,8 +4,26 @@ from .generator import (
     generate_comprehensive_report,
     save_optimization_files,
 )
+from .sections import (
+    refine_report_sections,
+    section_token_budget,
+    split_report_sections,
+)
+from .translation import (
+    contains_japanese,
+    count_translatable_characters,
+    split_markdown_segments,
+    translate_free_text,
+)
 
 __all__ = [
     "generate_comprehensive_report",
     "save_optimization_files",
+    "refine_report_sections",
+    "section_token_budget",
+    "split_report_sections",
+    "contains_japanese",
+    "count_translatable_characters",
+    "split_markdown_segments",
+    "translate_free_text",
 ]
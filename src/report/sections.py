@@ -0,0 +1,152 @@
+"""Section-level refinement of markdown reports.
+
+Refining a whole report in one LLM call caps its size (long reports had to
+be truncated) and its latency grows with the length of the answer. Here the
+report is split at its top-level headings, each section is refined by its
+own call with a token budget sized to the section, the calls run
+concurrently, and the results are put back in report order. Section prompts
+depend only on the section text, so sections unchanged since an earlier
+run are answered from the LLM response cache.
+"""
+
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from ..profiler.compact import estimate_text_tokens
+
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s")
+_FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+
+
+def _split_blocks(text: str) -> List[str]:
+    """Split text after blank lines outside code blocks (paragraphs and whole code blocks)."""
+    blocks: List[str] = []
+    current: List[str] = []
+    in_code_block = False
+    for line in text.splitlines(keepends=True):
+        if _FENCE_PATTERN.match(line):
+            in_code_block = not in_code_block
+        current.append(line)
+        if not in_code_block and not line.strip():
+            blocks.append("".join(current))
+            current = []
+    if current:
+        blocks.append("".join(current))
+    return blocks
+
+
+def _pack_blocks(section: str, max_chars: int) -> List[str]:
+    """Split an oversized section into chunks of whole blocks of at most max_chars (when possible)."""
+    if max_chars <= 0 or len(section) <= max_chars:
+        return [section]
+    chunks: List[str] = []
+    current = ""
+    for block in _split_blocks(section):
+        if current and len(current) + len(block) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += block
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_report_sections(text: str, max_level: int = 2, max_chars: int = 12000) -> List[str]:
+    """Split a markdown report at its headings.
+
+    Headings inside code blocks are ignored. Sections longer than max_chars
+    are split further between paragraphs, never inside a code block.
+
+    Args:
+        text: Markdown report
+        max_level: Deepest heading level starting a new section (2 = ``#`` and ``##``)
+        max_chars: Size above which a section is split further (0 = never)
+
+    Returns:
+        Sections in report order; joining them gives back the report
+    """
+    sections: List[str] = []
+    current: List[str] = []
+    in_code_block = False
+    for line in text.splitlines(keepends=True):
+        if _FENCE_PATTERN.match(line):
+            in_code_block = not in_code_block
+        elif not in_code_block and current:
+            heading = _HEADING_PATTERN.match(line)
+            if heading and len(heading.group(1)) <= max_level:
+                sections.append("".join(current))
+                current = []
+        current.append(line)
+    if current:
+        sections.append("".join(current))
+    return [chunk for section in sections for chunk in _pack_blocks(section, max_chars)]
+
+
+def section_token_budget(section: str, ratio: float = 1.5, minimum: int = 1024, step: int = 1024) -> int:
+    """Response token budget of a section.
+
+    Tokens are estimated with estimate_text_tokens (Japanese text counts at
+    one token per character). The budget is rounded up to a multiple of
+    step so sections of similar size share one LLM client.
+
+    Args:
+        section: Section text
+        ratio: Budget relative to the section's own token count
+        minimum: Smallest budget
+        step: Rounding step
+
+    Returns:
+        Token budget for the refined section
+    """
+    return max(minimum, int(math.ceil(estimate_text_tokens(section) * ratio / step)) * step)
+
+
+def refine_report_sections(
+    text: str,
+    refine: Callable[[str, int], Optional[str]],
+    max_workers: int = 4,
+    max_level: int = 2,
+    max_chars: int = 12000,
+) -> str:
+    """Refine a report section by section, concurrently.
+
+    Args:
+        text: Markdown report
+        refine: Refines one section within a token budget; returns None (or
+            raises) to keep the section as it is
+        max_workers: Concurrent refinement calls
+        max_level: Deepest heading level starting a new section
+        max_chars: Size above which a section is split further
+
+    Returns:
+        The report with every refined section replaced in place; failed and
+        blank sections keep their original text
+    """
+    sections = split_report_sections(text, max_level, max_chars)
+    pending = [index for index, section in enumerate(sections) if section.strip()]
+    if not pending:
+        return text
+
+    def run(index: int) -> Optional[str]:
+        section = sections[index]
+        try:
+            return refine(section, section_token_budget(section))
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+        results = dict(zip(pending, executor.map(run, pending)))
+
+    refined = []
+    for index, section in enumerate(sections):
+        result = results.get(index)
+        if result and result.strip():
+            suffix = section[len(section.rstrip("\n")):]
+            if not suffix and index < len(sections) - 1:
+                suffix = "\n"
+            # Keep the original blank lines between sections
+            section = result.strip("\n") + suffix
+        refined.append(section)
+    return "".join(refined)
@@ -0,0 +1,145 @@
+"""Translation of only the free-text parts of a markdown document.
+
+Reports mix deterministic content (tables, SQL, metrics, identifiers)
+with prose written by the LLM. Deterministic sections are rendered in the
+target language directly, so only prose still in the source language needs
+an LLM: the document is split into segments, code blocks and lines already
+in the target language are kept verbatim, and the remaining segments are
+sent in one numbered prompt and put back in place.
+"""
+
+import re
+from typing import Callable, Dict, List, Tuple
+
+# Hiragana, katakana, CJK ideographs and full-width forms
+_JAPANESE_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff01-\uff5e]")
+_ENGLISH_WORD_PATTERN = re.compile(r"[A-Za-z]{3,}")
+_FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+_SEGMENT_MARKER_PATTERN = re.compile(r"^<<<(\d+)>>>[ \t]*\n?", re.MULTILINE)
+
+_LANGUAGE_NAMES = {"en": "English", "ja": "Japanese"}
+
+
+def contains_japanese(text: str) -> bool:
+    """Whether the text contains Japanese characters."""
+    return bool(_JAPANESE_PATTERN.search(text or ""))
+
+
+def needs_translation(line: str, target_language: str) -> bool:
+    """Whether a line still holds text in the source language.
+
+    Args:
+        line: One markdown line (outside code blocks)
+        target_language: 'en' or 'ja'
+
+    Returns:
+        For English output, lines with Japanese text; for Japanese output,
+        lines with English words and no Japanese text
+    """
+    if target_language == "en":
+        return contains_japanese(line)
+    return bool(_ENGLISH_WORD_PATTERN.search(line)) and not contains_japanese(line)
+
+
+def split_markdown_segments(text: str, target_language: str) -> List[Tuple[str, bool]]:
+    """Split markdown into runs of lines to translate and to keep.
+
+    Fenced code blocks are never translated. Blank lines join the run they
+    follow, so a paragraph with blank lines stays one segment.
+
+    Args:
+        text: Markdown document
+        target_language: 'en' or 'ja'
+
+    Returns:
+        ``(segment, translate)`` pairs; joining the segments with newlines
+        gives back the document
+    """
+    segments: List[Tuple[List[str], bool]] = []
+    in_code_block = False
+    for line in text.split("\n"):
+        if _FENCE_PATTERN.match(line):
+            translate = False
+            in_code_block = not in_code_block
+        elif in_code_block:
+            translate = False
+        elif not line.strip() and segments:
+            translate = segments[-1][1]
+        else:
+            translate = needs_translation(line, target_language)
+
+        if segments and segments[-1][1] == translate:
+            segments[-1][0].append(line)
+        else:
+            segments.append(([line], translate))
+    return [("\n".join(lines), translate) for lines, translate in segments]
+
+
+def count_translatable_characters(text: str, target_language: str) -> int:
+    """Characters of the document that translate_free_text would send to the LLM."""
+    return sum(len(segment) for segment, translate in split_markdown_segments(text, target_language) if translate)
+
+
+def build_translation_prompt(segments: List[str], target_language: str) -> str:
+    """Build one prompt translating numbered segments.
+
+    Args:
+        segments: Text segments to translate
+        target_language: 'en' or 'ja'
+
+    Returns:
+        Prompt asking for the segments back under the same markers
+    """
+    language = _LANGUAGE_NAMES.get(target_language, target_language)
+    body = "\n".join(f"<<<{index}>>>\n{segment}" for index, segment in enumerate(segments, 1))
+    return f"""Translate each numbered segment of a Databricks SQL performance report into natural, technically accurate {language}.
+
+Rules:
+- Keep every <<<n>>> marker line exactly as given and output the segments in the same order
+- Translate only the text; keep markdown syntax, emojis, numbers, units, SQL keywords, table and column names unchanged
+- Output only the translated segments, without any explanation
+
+{body}
+"""
+
+
+def parse_translated_segments(response: str) -> Dict[int, str]:
+    """Map segment numbers to translated text from a marked-up response."""
+    parts = _SEGMENT_MARKER_PATTERN.split(response or "")
+    translated: Dict[int, str] = {}
+    # parts = [preamble, number, text, number, text, ...]
+    for index in range(1, len(parts) - 1, 2):
+        translated[int(parts[index])] = parts[index + 1].rstrip("\n")
+    return translated
+
+
+def translate_free_text(text: str, target_language: str, translate: Callable[[str], str]) -> str:
+    """Translate the prose of a markdown document, keeping everything else verbatim.
+
+    Segments missing from the LLM response keep their original text.
+
+    Args:
+        text: Markdown document
+        target_language: 'en' or 'ja'
+        translate: Sends a prompt to the LLM and returns the response
+
+    Returns:
+        The document with its source-language prose translated; unchanged
+        (and no LLM call made) when there is nothing to translate
+    """
+    segments = split_markdown_segments(text, target_language)
+    pending = [segment.rstrip("\n") for segment, needed in segments if needed]
+    if not pending:
+        return text
+
+    translated = parse_translated_segments(translate(build_translation_prompt(pending, target_language)))
+    result = []
+    number = 0
+    for segment, needed in segments:
+        if needed:
+            number += 1
+            core = segment.rstrip("\n")
+            # Trailing blank lines are layout, not text: keep the original ones
+            segment = (translated.get(number) or core) + segment[len(core):]
+        result.append(segment)
+    return "\n".join(result)
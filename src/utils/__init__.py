@@ -2,6 +2,8 @@
 
 from .sql import (
     extract_sql_from_llm_response,
+    extract_sql_candidates,
+    strip_candidate_marker,
     clean_sql,
     extract_select_from_ctas,
     fix_broadcast_hint_placement,
@@ -10,6 +12,19 @@ from .sql import (
     validate_sql_syntax,
     format_sql,
 )
+from .explain_plan import (
+    parse_explain_plan,
+    find_plan_nodes,
+    clear_explain_plan_cache,
+    compile_pattern_matcher,
+    scan_text_chunks,
+)
+from .structured_output import (
+    build_structured_output_instruction,
+    parse_optimization_response,
+    format_optimization_response,
+)
+from .formatting import format_bytes
 from .io import (
     get_output_path,
     generate_timestamp_filename,
@@ -24,6 +39,8 @@ from .io import (
 __all__ = [
     # SQL utilities
     "extract_sql_from_llm_response",
+    "extract_sql_candidates",
+    "strip_candidate_marker",
     "clean_sql",
     "extract_select_from_ctas",
     "fix_broadcast_hint_placement",
@@ -31,6 +48,18 @@ __all__ = [
     "extract_broadcast_hints",
     "validate_sql_syntax",
     "format_sql",
+    # EXPLAIN plan parsing
+    "parse_explain_plan",
+    "find_plan_nodes",
+    "clear_explain_plan_cache",
+    "compile_pattern_matcher",
+    "scan_text_chunks",
+    # Structured LLM output
+    "build_structured_output_instruction",
+    "parse_optimization_response",
+    "format_optimization_response",
+    # Formatting
+    "format_bytes",
     # I/O utilities
     "get_output_path",
     "generate_timestamp_filename",
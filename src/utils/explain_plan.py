@@ -0,0 +1,234 @@
+"""EXPLAIN / EXPLAIN COST plan tree parser.
+
+Parses plan text once into operator trees, one list of roots per
+``== Section ==``. Nesting follows Spark's tree-string layout: ``+-`` and
+``:-`` markers at column ``3 * (depth - 1)``, ``:`` / space padding for the
+levels above, and indented lines without a marker continuing the previous
+operator. ``Statistics(sizeInBytes=..., rowCount=...)`` is decoded into
+bytes and rows on the node it belongs to.
+
+Parsed plans are cached by content hash, so the plan and cost extraction
+functions that all look at the same EXPLAIN output share one parse.
+
+``scan_text_chunks`` streams plan text to a sink (e.g. a file) while
+searching it for error markers with one combined pattern, so multi-MB
+plans are written and checked in a single linear pass.
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, Optional, Pattern, Union
+
+from ..models import ExplainPlan, PlanNode
+
+_SECTION_RE = re.compile(r"^==\s*(.+?)\s*==\s*$")
+_TREE_LINE_RE = re.compile(r"^([ :|!]*?)([+:]- )(.*)$")
+_OPERATOR_PREFIX_RE = re.compile(r"^(?:\*\(\d+\)\s*|\(\d+\)\s*)+")
+_OPERATOR_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_STATISTICS_RE = re.compile(
+    r"Statistics\(sizeInBytes=\s*([0-9.]+(?:[Ee][+\-]?\d+)?)\s*([KMGTPE]?i?B)?"
+    r"(?:,\s*rowCount=\s*([0-9.Ee+\-]+))?"
+)
+
+_UNIT_FACTORS = {
+    "": 1,
+    "b": 1,
+    "kb": 1024,
+    "kib": 1024,
+    "mb": 1024 ** 2,
+    "mib": 1024 ** 2,
+    "gb": 1024 ** 3,
+    "gib": 1024 ** 3,
+    "tb": 1024 ** 4,
+    "tib": 1024 ** 4,
+    "pb": 1024 ** 5,
+    "pib": 1024 ** 5,
+    "eb": 1024 ** 6,
+    "eib": 1024 ** 6,
+}
+
+_CACHE_SIZE = 32
+_plan_cache: "OrderedDict[str, ExplainPlan]" = OrderedDict()
+
+
+def parse_size_to_bytes(value: str, unit: Optional[str] = "") -> int:
+    """Convert a Spark size string such as ``('1.5', 'GiB')`` to bytes."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0
+    return int(number * _UNIT_FACTORS.get((unit or "").lower(), 1))
+
+
+def parse_explain_plan(text: str) -> ExplainPlan:
+    """Parse EXPLAIN output into operator trees (cached by content hash).
+
+    Args:
+        text: EXPLAIN, EXPLAIN EXTENDED or EXPLAIN COST output
+
+    Returns:
+        ExplainPlan shared with other callers; treat it as read-only
+    """
+    text = text or ""
+    content_hash = hashlib.sha256(text.encode("utf-8", "replace")).hexdigest()
+
+    plan = _plan_cache.get(content_hash)
+    if plan is not None:
+        _plan_cache.move_to_end(content_hash)
+        return plan
+
+    plan = _parse(text, content_hash)
+    _plan_cache[content_hash] = plan
+    if len(_plan_cache) > _CACHE_SIZE:
+        _plan_cache.popitem(last=False)
+    return plan
+
+
+def clear_explain_plan_cache() -> None:
+    """Drop all cached plan parses."""
+    _plan_cache.clear()
+
+
+def _parse(text: str, content_hash: str) -> ExplainPlan:
+    plan = ExplainPlan(content_hash=content_hash)
+    section = ""
+    stack = []  # stack[depth] = most recent node at that depth
+    last_node: Optional[PlanNode] = None
+
+    for line_number, raw_line in enumerate(text.splitlines(), 1):
+        line = raw_line.rstrip()
+        if not line.strip():
+            continue
+
+        header = _SECTION_RE.match(line)
+        if header:
+            section = header.group(1)
+            plan.sections.setdefault(section, [])
+            stack = []
+            last_node = None
+            continue
+
+        tree_line = _TREE_LINE_RE.match(line)
+        if tree_line:
+            depth = len(tree_line.group(1)) // 3 + 1
+            body = tree_line.group(3).strip()
+        elif line[0] in " \t:|" and last_node is not None:
+            # Wrapped operator text or a nested subplan's padding
+            last_node.text += " " + line.strip()
+            if last_node.size_bytes is None:
+                _apply_statistics(last_node, line)
+            continue
+        else:
+            depth = 0
+            body = line.strip()
+
+        node = PlanNode(text=body, section=section, depth=depth, line_number=line_number)
+        operator = _OPERATOR_RE.search(_OPERATOR_PREFIX_RE.sub("", body))
+        node.operator = operator.group(0) if operator else ""
+        _apply_statistics(node, body)
+
+        # A marker deeper than any open parent hangs off the deepest one
+        depth = min(depth, len(stack))
+        node.depth = depth
+        del stack[depth:]
+        if depth == 0:
+            plan.sections.setdefault(section, []).append(node)
+        else:
+            stack[depth - 1].children.append(node)
+        stack.append(node)
+        plan.nodes.append(node)
+        last_node = node
+
+    return plan
+
+
+def _apply_statistics(node: PlanNode, text: str) -> None:
+    match = _STATISTICS_RE.search(text)
+    if not match:
+        return
+    node.size_bytes = parse_size_to_bytes(match.group(1), match.group(2))
+    if match.group(3):
+        try:
+            node.row_count = float(match.group(3))
+        except ValueError:
+            pass
+
+
+def find_plan_nodes(
+    plan: ExplainPlan,
+    operator_contains: Optional[str] = None,
+    section_contains: Optional[str] = None,
+) -> Iterator[PlanNode]:
+    """Iterate plan nodes in text order, optionally filtered.
+
+    Args:
+        plan: Parsed plan
+        operator_contains: Case-insensitive substring of the operator name
+        section_contains: Case-insensitive substring of the section title,
+            e.g. ``"physical plan"``
+
+    Yields:
+        Matching nodes
+    """
+    operator_filter = operator_contains.lower() if operator_contains else None
+    section_filter = section_contains.lower() if section_contains else None
+    for node in plan.nodes:
+        if operator_filter and operator_filter not in node.operator.lower():
+            continue
+        if section_filter and section_filter not in node.section.lower():
+            continue
+        yield node
+
+
+def compile_pattern_matcher(patterns: Iterable[str]) -> Pattern:
+    """Compile literal patterns into one lower-case alternation (longest first).
+
+    The pattern is matched against lower-cased text by scan_text_chunks,
+    which is much faster than ``re.IGNORECASE`` on multi-MB plans.
+    """
+    unique = sorted({p.lower() for p in patterns if p}, key=len, reverse=True)
+    return re.compile("|".join(re.escape(p) for p in unique))
+
+
+def scan_text_chunks(
+    text: Union[str, Iterable[str]],
+    matcher: Pattern,
+    sink: Optional[Callable[[str], object]] = None,
+    chunk_size: int = 1 << 20,
+    overlap: int = 256,
+) -> Optional[str]:
+    """Stream text to ``sink`` while searching it case-insensitively for the first match.
+
+    Args:
+        text: Whole text, or an iterable of chunks (e.g. result rows)
+        matcher: Pattern from compile_pattern_matcher
+        sink: Called with every chunk in order (e.g. ``file.write``)
+        chunk_size: Chunk length used when ``text`` is a string
+        overlap: Characters carried over between chunks; must be at least
+            the longest possible match minus one
+
+    Returns:
+        The first matched text (lower-cased), or None
+    """
+    if isinstance(text, str):
+        chunks: Iterable[str] = (text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+    else:
+        chunks = text
+
+    found: Optional[str] = None
+    tail = ""
+    for chunk in chunks:
+        if sink is not None:
+            sink(chunk)
+        if found is not None:
+            continue
+        window = tail + chunk.lower()
+        match = matcher.search(window)
+        if match:
+            found = match.group(0)
+            if sink is None:
+                break
+        else:
+            tail = window[-overlap:] if overlap else ""
+    return found
@@ -0,0 +1,20 @@
+"""Formatting helpers for report text."""
+
+
+def format_bytes(bytes_val: int) -> str:
+    """Format bytes as human-readable string.
+
+    Args:
+        bytes_val: Size in bytes
+
+    Returns:
+        Size in B, KB, MB or GB (e.g. ``1.5 MB``)
+    """
+    if bytes_val < 1024:
+        return f"{bytes_val} B"
+    elif bytes_val < 1024 ** 2:
+        return f"{bytes_val / 1024:.1f} KB"
+    elif bytes_val < 1024 ** 3:
+        return f"{bytes_val / (1024 ** 2):.1f} MB"
+    else:
+        return f"{bytes_val / (1024 ** 3):.2f} GB"
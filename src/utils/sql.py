@@ -3,6 +3,11 @@
 import re
 from typing import List, Optional, Tuple
 
+from .structured_output import parse_optimization_response
+
+_SQL_CODE_BLOCK_PATTERN = re.compile(r"```sql\s*(.*?)\s*```", re.DOTALL | re.IGNORECASE)
+_CANDIDATE_MARKER_PATTERN = re.compile(r"\A(?:\s*--\s*Candidate\s*\d+[^\n]*(?:\n|\Z))+", re.IGNORECASE)
+
 
 def extract_sql_from_llm_response(llm_response: str) -> str:
     """Extract SQL query from LLM response.
@@ -16,6 +21,11 @@ def extract_sql_from_llm_response(llm_response: str) -> str:
     if not llm_response:
         return ""
 
+    # Structured JSON responses carry the SQL in a field: no heuristics needed
+    structured = parse_optimization_response(llm_response)
+    if structured:
+        return clean_sql(structured[0].sql)
+
     # Try to extract from code blocks
     patterns = [
         r"```sql\s*(.*?)\s*```",
@@ -44,6 +54,48 @@ def extract_sql_from_llm_response(llm_response: str) -> str:
     return ""
 
 
+def strip_candidate_marker(sql: str) -> str:
+    """Remove leading ``-- Candidate n`` comment lines from a candidate SQL block.
+
+    Args:
+        sql: SQL text of one code block
+
+    Returns:
+        The SQL without the marker lines, otherwise unchanged
+    """
+    if not sql:
+        return ""
+    return _CANDIDATE_MARKER_PATTERN.sub("", sql).strip()
+
+
+def extract_sql_candidates(llm_response: str, max_candidates: int = 0) -> List[str]:
+    """Extract every SQL code block of a multi-candidate LLM response.
+
+    Candidate marker lines are removed; the SQL is otherwise kept verbatim
+    so line comments and literals survive. Duplicates (ignoring whitespace
+    and case) are dropped, response order is kept.
+
+    Args:
+        llm_response: Raw LLM response text
+        max_candidates: Maximum number of candidates returned (0 = all)
+
+    Returns:
+        Candidate SQL queries
+    """
+    candidates: List[str] = []
+    seen = set()
+    for block in _SQL_CODE_BLOCK_PATTERN.findall(llm_response or ""):
+        sql = strip_candidate_marker(block)
+        key = " ".join(sql.split()).rstrip(";").lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        candidates.append(sql)
+        if max_candidates and len(candidates) >= max_candidates:
+            break
+    return candidates
+
+
 def clean_sql(sql: str) -> str:
     """Clean and normalize SQL query.
 
@@ -0,0 +1,168 @@
+"""Structured JSON output mode of the optimization prompts.
+
+Free-form optimization responses need layers of heuristics to separate
+the SQL from the explanation, and a response they cannot parse costs a
+retry. In the structured mode the prompt asks for one JSON object with
+``sql``, ``rationale``, ``applied_hints`` and ``expected_effects``. The
+strict parser below accepts exactly that shape (optionally in a ```json
+fence, or as ``{"candidates": [...]}`` for multi-candidate prompts) and
+returns nothing otherwise, so callers fall back to the heuristics.
+"""
+
+import json
+import re
+from typing import Any, List, Optional
+
+from ..models import OptimizationResponse
+
+_JSON_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*\n(.*)\n\s*```$", re.DOTALL | re.IGNORECASE)
+
+_LANGUAGE_NAMES = {"ja": ("日本語", "Japanese"), "en": ("英語", "English")}
+
+
+def build_structured_output_instruction(
+    language: str = "ja",
+    candidate_count: int = 1,
+    content_language: Optional[str] = None,
+) -> str:
+    """Prompt addendum requesting the JSON answer instead of markdown.
+
+    Args:
+        language: Language of the instruction itself ('ja' or 'en')
+        candidate_count: Alternative rewrites requested (2 or more uses the candidates form)
+        content_language: Language of rationale and expected_effects (defaults to ``language``)
+
+    Returns:
+        Instruction text to append to the prompt
+    """
+    content_ja, content_en = _LANGUAGE_NAMES.get(content_language or language, _LANGUAGE_NAMES["en"])
+    item = (
+        '{"sql": "<complete SQL>", "rationale": "<why this rewrite is faster>", '
+        '"applied_hints": ["<optimization actually applied>", ...], '
+        '"expected_effects": ["<expected effect>", ...]}'
+    )
+    multiple = candidate_count and candidate_count >= 2
+    schema = f'{{"candidates": [{item}, ...]}}' if multiple else item
+
+    if language == "ja":
+        lines = [
+            "",
+            "",
+            "【📦 出力形式（JSON） - 上記のMarkdown出力形式より優先】",
+            "- 次のスキーマの**JSONのみ**を出力してください（前後に説明文やMarkdownを付けない）:",
+            f"  {schema}",
+            "- sql: 省略のない完全なSQLクエリ（文字列、改行は \\n でエスケープ）",
+            "- applied_hints: 実際に適用した最適化手法のみ（適用していない手法は記載禁止）",
+            f"- rationale と expected_effects は{content_ja}で記述してください",
+        ]
+        if multiple:
+            lines.append(f"- candidates には異なる最適化アプローチの代替クエリを{candidate_count}個含めてください（各候補は単独で実行可能であること）")
+    else:
+        lines = [
+            "",
+            "",
+            "## Output Format (JSON) - takes precedence over the markdown format above",
+            "- Output **only JSON** in the following schema, with no text or markdown around it:",
+            f"  {schema}",
+            "- sql: the complete SQL query without omissions (a string, newlines escaped as \\n)",
+            "- applied_hints: only the optimizations actually applied",
+            f"- Write rationale and expected_effects in {content_en}",
+        ]
+        if multiple:
+            lines.append(f"- Include {candidate_count} alternative rewrites using different approaches in candidates (each runnable on its own)")
+    return "\n".join(lines) + "\n"
+
+
+def _string_list(value: Any) -> Optional[List[str]]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return [item for item in value if item.strip()]
+    return None
+
+
+def parse_optimization_response(llm_response: Any) -> List[OptimizationResponse]:
+    """Strictly parse a structured optimization response.
+
+    Args:
+        llm_response: Raw LLM response text
+
+    Returns:
+        The rewrites in response order; an empty list when the response is
+        not exactly the structured schema (callers then use the heuristics)
+    """
+    if not isinstance(llm_response, str):
+        return []
+    text = llm_response.strip()
+    fenced = _JSON_FENCE_PATTERN.match(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    if not text.startswith(("{", "[")):
+        return []
+    try:
+        # strict=False accepts raw newlines inside strings, which models often emit in SQL
+        data = json.loads(text, strict=False)
+    except ValueError:
+        return []
+
+    if isinstance(data, dict) and "candidates" in data:
+        data = data["candidates"]
+    items = data if isinstance(data, list) else [data]
+
+    responses = []
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get("sql"), str) or not item["sql"].strip():
+            return []
+        rationale = item.get("rationale", "")
+        hints = _string_list(item.get("applied_hints"))
+        effects = _string_list(item.get("expected_effects"))
+        if not isinstance(rationale, str) or hints is None or effects is None:
+            return []
+        responses.append(OptimizationResponse(
+            sql=item["sql"].strip(),
+            rationale=rationale.strip(),
+            applied_hints=hints,
+            expected_effects=effects,
+        ))
+    return responses
+
+
+def format_optimization_response(
+    responses: List[OptimizationResponse],
+    language: str = "ja",
+    include_sql: bool = True,
+) -> str:
+    """Render structured rewrites as the markdown the free-form prompts ask for.
+
+    Multiple rewrites get one ```sql block each under a ``### Candidate n``
+    heading; the blocks hold only the SQL, which is planned as it is.
+
+    Args:
+        responses: Parsed rewrites
+        language: Language of the headings ('ja' or 'en')
+        include_sql: Include the SQL code blocks (False for analysis-only content)
+
+    Returns:
+        Markdown with the applied optimizations, SQL, rationale and expected effects
+    """
+    ja = language == "ja"
+    lines = ["## 🚀 処理速度重視の最適化されたSQL" if ja else "## 🚀 Optimized SQL for Processing Speed", ""]
+    multiple = len(responses) > 1
+    for number, response in enumerate(responses, 1):
+        if multiple:
+            lines += [f"### {'候補' if ja else 'Candidate'} {number}", ""]
+        if response.applied_hints:
+            lines.append("**🎯 実際に適用した最適化手法**:" if ja else "**🎯 Optimizations Actually Applied**:")
+            lines += [f"- {hint}" for hint in response.applied_hints]
+            lines.append("")
+        if include_sql:
+            lines += ["```sql", response.sql, "```", ""]
+        if response.rationale:
+            lines += ["#### 最適化の根拠" if ja else "#### Rationale", response.rationale, ""]
+        if response.expected_effects:
+            lines.append("#### 期待効果" if ja else "#### Expected Effects")
+            lines += [f"- {effect}" for effect in response.expected_effects]
+            lines.append("")
+    return "\n".join(lines).rstrip() + "\n"
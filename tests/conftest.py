@@ -4,6 +4,25 @@ import pytest
 from src.config import AnalysisConfig, LLMConfig, set_config
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-benchmarks",
+        action="store_true",
+        default=False,
+        help="run the wall-clock benchmark tests (marked 'benchmark')",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip timing comparisons by default; they are unreliable on loaded machines."""
+    if config.getoption("--run-benchmarks"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="wall-clock benchmark; run with --run-benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
+
+
 @pytest.fixture(autouse=True)
 def reset_config():
     """Reset global config before each test."""
@@ -0,0 +1,332 @@
+"""Throughput benchmarks for EXPLAIN plan text processing and prompt size.
+
+Run directly (``python -m tests.test_benchmark``) to print timings. Under
+pytest the default run checks results and operation counts only; the
+wall-clock comparisons are marked ``benchmark`` and run with
+``pytest --run-benchmarks``.
+"""
+
+import hashlib
+import json
+import random
+import re
+import time
+from pathlib import Path
+
+import pytest
+
+from src.profiler.compact import (
+    encode_clustering_data,
+    encode_overall_metrics,
+    encode_shuffle_analysis,
+    encode_top_nodes,
+    estimate_text_tokens,
+)
+from src.utils.explain_plan import (
+    clear_explain_plan_cache,
+    compile_pattern_matcher,
+    find_plan_nodes,
+    parse_explain_plan,
+    scan_text_chunks,
+)
+
+BENCHMARK_LINES = 100_000
+
+_OPERATOR_LINES = [
+    "Project [a#{i}, b#{i}], Statistics(sizeInBytes=1.5 GiB, rowCount=1.00E+7)",
+    "Join Inner, (a#{i} = b#{i}), Statistics(sizeInBytes=20.0 MiB)",
+    "Filter isnotnull(a#{i}), Statistics(sizeInBytes=8.0 MiB, rowCount=1000)",
+    "Relation main.db.t{i}[a#{i},b#{i}] parquet, Statistics(sizeInBytes=8.0 MiB, rowCount=1000)",
+    "Exchange hashpartitioning(a#{i}, 200), ENSURE_REQUIREMENTS, [plan_id=#{i}]",
+    "PhotonBroadcastHashJoin [a#{i}], [b#{i}], Inner, BuildRight",
+]
+
+
+def generate_explain_output(num_lines: int = BENCHMARK_LINES, max_depth: int = 40) -> str:
+    """Generate a synthetic EXPLAIN COST tree of ``num_lines`` operator lines."""
+    lines = ["== Optimized Logical Plan ==", _OPERATOR_LINES[0].format(i=0)]
+    depth = 1
+    for i in range(1, num_lines):
+        marker = "+- " if i % 3 else ":- "
+        lines.append("   " * (depth - 1) + marker + _OPERATOR_LINES[i % len(_OPERATOR_LINES)].format(i=i))
+        depth = depth + 1 if depth < max_depth else 1
+    return "\n".join(lines)
+
+
+def legacy_line_scan(text: str) -> int:
+    """Per-line scan with uncompiled patterns, as the plan extractors used to do."""
+    found = 0
+    for line in text.split("\n"):
+        line = line.strip()
+        if re.search(r"(\w*Join)\s+([^,\n]+).*?Statistics\(([^)]+)\)", line):
+            found += 1
+        if re.search(r"(Photon\w*Join)\s+\[([^\]]+)\],\s*\[([^\]]+)\],\s*(\w+),\s*(\w+)", line):
+            found += 1
+        if "Statistics(" in line:
+            re.search(r"sizeInBytes=([0-9.]+)\s*([KMGT]i?B)?", line)
+            re.search(r"rowCount=(\d+)", line)
+    return found
+
+
+# Error markers checked on every EXPLAIN result (mirrors the notebook registry)
+ERROR_PATTERNS = [
+    "Error occurred during query planning", "Query planning failed", "Plan optimization failed",
+    "Failed to plan query", "Analysis exception", "AMBIGUOUS_REFERENCE", "reference is ambiguous",
+    "ambiguous reference", "ParseException", "SemanticException", "AnalysisException", "Syntax error",
+    "PARSE_SYNTAX_ERROR", "INVALID_IDENTIFIER", "TABLE_OR_VIEW_NOT_FOUND", "COLUMN_NOT_FOUND",
+    "UNRESOLVED_COLUMN", "UNRESOLVED_COLUMN.WITH_SUGGESTION",
+]
+
+# The former per-pattern list, including its case variants
+LEGACY_ERROR_PATTERNS = ERROR_PATTERNS + [
+    "error occurred during query planning", "query planning failed", "plan optimization failed",
+    "failed to plan query", "analysis exception", "ambiguous_reference", "[AMBIGUOUS_REFERENCE]",
+    "syntax error", "[UNRESOLVED_COLUMN", "[UNRESOLVED_COLUMN.WITH_SUGGESTION]",
+    "UNRESOLVED_COLUMN.WITH_SUGGESTION",
+]
+
+
+def legacy_error_scan(text: str):
+    """One lower-cased copy of the text per pattern, as the EXPLAIN error check used to do."""
+    for pattern in LEGACY_ERROR_PATTERNS:
+        if pattern in text.lower():
+            return pattern
+    return None
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+@pytest.fixture(scope="module")
+def explain_text():
+    return generate_explain_output()
+
+
+class TestExplainParsingThroughput:
+    """Throughput guards for the EXPLAIN plan parser."""
+
+    def test_parse_100k_lines(self, explain_text):
+        """Test that 100k plan lines parse into one node per line."""
+        clear_explain_plan_cache()
+        plan = parse_explain_plan(explain_text)
+
+        assert len(plan.nodes) == BENCHMARK_LINES
+        assert sum(1 for n in plan.nodes if n.size_bytes is not None) > BENCHMARK_LINES // 2
+
+    def test_cached_parse_returns_same_plan(self, explain_text):
+        """Test that repeated consumers of the same plan hit the cache instead of re-parsing."""
+        clear_explain_plan_cache()
+        first = parse_explain_plan(explain_text)
+
+        assert parse_explain_plan(explain_text) is first
+
+    @pytest.mark.benchmark
+    def test_parse_100k_lines_within_bounds(self, explain_text):
+        """Test that 100k plan lines parse in a single pass within bounds."""
+        clear_explain_plan_cache()
+        _, elapsed = _timed(parse_explain_plan, explain_text)
+
+        assert elapsed < 10.0
+
+    @pytest.mark.benchmark
+    def test_cached_parse_is_near_free(self, explain_text):
+        """Test that a cached parse costs a fraction of the first one."""
+        clear_explain_plan_cache()
+        _, first = _timed(parse_explain_plan, explain_text)
+        _, second = _timed(parse_explain_plan, explain_text)
+
+        assert second < first / 5
+
+    @pytest.mark.benchmark
+    def test_tree_queries_beat_line_rescan(self, explain_text):
+        """Test that parse + query is faster than one legacy per-line rescan."""
+        clear_explain_plan_cache()
+
+        def parse_and_query(text):
+            plan = parse_explain_plan(text)
+            return sum(1 for _ in find_plan_nodes(plan, "join"))
+
+        joins, tree_elapsed = _timed(parse_and_query, explain_text)
+        _, legacy_elapsed = _timed(legacy_line_scan, explain_text)
+
+        assert joins > 0
+        assert tree_elapsed < legacy_elapsed
+
+
+class TestExplainErrorScanThroughput:
+    """Throughput guard for the combined error-pattern scan."""
+
+    def test_combined_scan_streams_whole_text(self, explain_text):
+        """Test one streamed pass over a multi-MB clean plan writes every chunk and finds nothing."""
+        matcher = compile_pattern_matcher(ERROR_PATTERNS)
+        written = []
+
+        found = scan_text_chunks(explain_text, matcher, written.append)
+
+        assert len(explain_text) > 5_000_000
+        assert found is None and legacy_error_scan(explain_text) is None
+        assert sum(len(chunk) for chunk in written) == len(explain_text)
+
+    @pytest.mark.benchmark
+    def test_combined_scan_beats_per_pattern_loop(self, explain_text):
+        """Test one streamed pass over a multi-MB clean plan beats the per-pattern loop."""
+        matcher = compile_pattern_matcher(ERROR_PATTERNS)
+
+        _, scan_elapsed = _timed(scan_text_chunks, explain_text, matcher, lambda chunk: None)
+        _, legacy_elapsed = _timed(legacy_error_scan, explain_text)
+
+        assert scan_elapsed < legacy_elapsed
+
+
+def generate_profile_metrics(num_nodes: int, num_shuffles: int, num_tables: int, seed: int = 0) -> dict:
+    """Generate a sample profile in the shapes of the notebook's metric dictionaries."""
+    rng = random.Random(seed)
+    total_ms = 600_000
+    nodes = []
+    for rank in range(1, num_nodes + 1):
+        duration_ms = int(total_ms / (rank + 1))
+        spill = rng.choice([0, 0, rng.randint(1, 50) * 1024 ** 3])
+        nodes.append({
+            "rank": rank, "node_id": str(1000 + rank),
+            "node_name": f"Photon Grouping Aggregate (main.sales.store_sales_{rank}) [ss_item_sk#{rank}]",
+            "duration_ms": duration_ms, "time_percentage": duration_ms / total_ms * 100,
+            "memory_mb": rng.uniform(100, 50_000), "rows_processed": rng.randint(10 ** 5, 10 ** 10),
+            "num_tasks": rng.choice([1, 200, 2000]), "spill_detected": spill > 0, "spill_bytes": spill,
+            "spill_gb": spill / 1024 ** 3, "skew_detected": rank % 4 == 0, "skewed_partitions": 3 if rank % 4 == 0 else 0,
+            "severity": "CRITICAL" if rank <= 2 else "HIGH" if rank <= 4 else "MEDIUM",
+        })
+    shuffle_nodes = [{
+        "node_id": str(2000 + i), "partition_count": rng.choice([200, 800, 4000]),
+        "peak_memory_gb": rng.uniform(1, 400), "memory_per_partition_mb": rng.uniform(10, 2000),
+        "duration_sec": rng.uniform(1, 300), "priority": rng.choice(["HIGH", "LOW"]),
+    } for i in range(num_shuffles)]
+    table_info = {}
+    for i in range(num_tables):
+        size_gb = rng.uniform(0.1, 300)
+        table_info[f"main.tpcds.table_{i}"] = {
+            "node_name": f"Scan main.tpcds.table_{i}", "table_size_gb": size_gb,
+            "size_classification": "small" if size_gb < 10 else "medium" if size_gb < 50 else "large",
+            "current_clustering_keys": rng.choice([[], [f"col_{i}_sk"]]),
+            "filter_info": {"has_filter_metrics": True, "filter_rate": rng.random(),
+                            "files_read_bytes": rng.randint(1, 10 ** 12), "files_pruned_bytes": rng.randint(1, 10 ** 12)},
+        }
+
+    def usage(kind: str, n: int) -> list:
+        return [
+            {"expression": f"t{i}.{kind}_col_{i} = {i}", "node_name": f"Photon Filter {i}", "key_type": "INNER"}
+            for i in range(n)
+        ]
+
+    return {
+        "overall_metrics": {
+            "total_time_ms": total_ms, "execution_time_ms": total_ms - 5000, "compilation_time_ms": 5000,
+            "task_total_time_ms": total_ms * 200, "read_bytes": 300 * 1024 ** 3, "read_remote_bytes": 250 * 1024 ** 3,
+            "read_cache_bytes": 50 * 1024 ** 3, "read_files_count": 120_000, "rows_read_count": 8 * 10 ** 9,
+            "rows_produced_count": 100, "spill_to_disk_bytes": 40 * 1024 ** 3, "photon_utilization_ratio": 0.72,
+        },
+        "bottleneck_indicators": {"cache_hit_ratio": 0.17, "shuffle_impact_ratio": 0.35, "low_parallelism_stages_count": 2},
+        "top_bottleneck_nodes": nodes,
+        "enhanced_shuffle_analysis": {
+            "overall_assessment": {"total_shuffle_nodes": num_shuffles, "inefficient_nodes": num_shuffles // 2,
+                                   "total_memory_gb": 812.5, "avg_memory_per_partition_mb": 640.0, "needs_optimization": True},
+            "shuffle_nodes": shuffle_nodes,
+        },
+        "clustering_data": {
+            "table_info": table_info,
+            "scan_nodes": [{"name": f"Scan main.tpcds.table_{i}", "rows": rng.randint(10 ** 6, 10 ** 10),
+                            "duration_ms": rng.randint(1000, 200_000)} for i in range(num_tables)],
+            "filter_columns": usage("filter", 12), "join_columns": usage("join", 12),
+            "groupby_columns": usage("groupby", 6), "aggregate_columns": usage("agg", 8),
+        },
+    }
+
+
+# Prompt sections the notebook built before the compact encoding, captured from its verbose prompt code
+LEGACY_PROMPT_SECTIONS = Path(__file__).parent / "fixtures" / "legacy_prompt_sections.json"
+
+# calculate_filter_rate_percentage result used when the legacy sections were captured
+FILTER_RATE = 0.0123
+
+
+def profile_digest(profile: dict) -> str:
+    """Digest of a sample profile, matching the one recorded with the legacy sections."""
+    return hashlib.sha256(json.dumps(profile, sort_keys=True).encode()).hexdigest()
+
+
+def compact_prompt_sections(profile: dict, top_k: int) -> dict:
+    """The same prompt sections as the notebook builds them with COMPACT_PROMPT_METRICS = 'Y'.
+
+    Mirrors analyze_liquid_clustering_opportunities (profile_data_section) and
+    generate_optimized_query_with_llm (shuffle summary, TOP3 bottleneck table).
+    """
+    needs_optimization = profile["enhanced_shuffle_analysis"]["overall_assessment"]["needs_optimization"]
+    shuffle = encode_shuffle_analysis(profile["enhanced_shuffle_analysis"], top_k, 512) + (
+        "\n🎯 最適化必要時: パーティション数調整（目標: target_mem/part以下）、高メモリノードのクラスター拡張、"
+        "REPARTITIONヒント（スピル検出時のみ）、Liquid ClusteringによるShuffle削減"
+        if needs_optimization else "\n✅ Shuffle操作は効率的に動作しており、特別な最適化は不要です。"
+    )
+    clustering = f"""【Query Performance Overview】
+{encode_overall_metrics(profile)} filter_rate={FILTER_RATE:.4f}
+
+【プロファイルデータ（表形式、|区切り、others(n)=上位以外の集計）】
+{encode_clustering_data(profile["clustering_data"], top_k)}
+⚠️ 注意: aggregate_columns のカラムは参考情報のみで、クラスタリングキーの候補から除外してください。
+⚠️ class: small=10GB未満（推奨しない）、medium=10-50GB（条件付き推奨）、large=50GB以上（強く推奨）"""
+    bottlenecks = "\n".join([
+        "📊 TOP3処理時間ボトルネック（表形式、|区切り）:",
+        encode_top_nodes(profile["top_bottleneck_nodes"], min(top_k, 3)),
+    ])
+    return {"clustering_profile": clustering, "optimization_shuffle": shuffle, "optimization_bottlenecks": bottlenecks}
+
+
+def prompt_token_counts(num_nodes: int, num_shuffles: int, num_tables: int) -> tuple:
+    """Estimated tokens of the legacy and the compact prompt sections of one sample profile."""
+    profile = generate_profile_metrics(num_nodes, num_shuffles, num_tables)
+    recorded = json.loads(LEGACY_PROMPT_SECTIONS.read_text(encoding="utf-8"))["profiles"][f"{num_nodes}_{num_shuffles}_{num_tables}"]
+    assert recorded["profile_sha256"] == profile_digest(profile), "sample profile changed; recapture the legacy sections"
+    compact = compact_prompt_sections(profile, top_k=5)
+    legacy_tokens = sum(estimate_text_tokens(text) for text in recorded["sections"].values())
+    compact_tokens = sum(estimate_text_tokens(compact[name]) for name in recorded["sections"])
+    return legacy_tokens, compact_tokens, compact
+
+
+# (nodes, shuffles, tables) of the sample profiles
+SAMPLE_PROFILES = [(10, 3, 3), (30, 8, 8), (100, 20, 20)]
+
+
+class TestPromptCompression:
+    """Token reduction of the compact prompt metric encoding."""
+
+    @pytest.mark.parametrize("num_nodes,num_shuffles,num_tables", SAMPLE_PROFILES)
+    def test_compact_encoding_cuts_tokens(self, num_nodes, num_shuffles, num_tables):
+        """Test the compact sections need fewer tokens than the recorded legacy sections, while covering every table."""
+        legacy_tokens, compact_tokens, compact = prompt_token_counts(num_nodes, num_shuffles, num_tables)
+
+        # Measured: 32% / 40% / 55% fewer tokens for the three sample profiles
+        assert compact_tokens <= legacy_tokens * 3 / 4
+        # Nodes past the top 3 are still represented by the aggregate row
+        assert f"others({num_nodes - 3})" in compact["optimization_bottlenecks"]
+        profile = generate_profile_metrics(num_nodes, num_shuffles, num_tables)
+        assert all(name in compact["clustering_profile"] for name in profile["clustering_data"]["table_info"])
+
+if __name__ == "__main__":
+    text = generate_explain_output()
+    clear_explain_plan_cache()
+    _, parse_elapsed = _timed(parse_explain_plan, text)
+    _, cached_elapsed = _timed(parse_explain_plan, text)
+    _, legacy_elapsed = _timed(legacy_line_scan, text)
+    _, error_scan_elapsed = _timed(scan_text_chunks, text, compile_pattern_matcher(ERROR_PATTERNS))
+    _, legacy_error_elapsed = _timed(legacy_error_scan, text)
+    print(f"Lines:                 {BENCHMARK_LINES:,}")
+    print(f"Tree parse:            {parse_elapsed:.3f} s ({BENCHMARK_LINES / parse_elapsed:,.0f} lines/s)")
+    print(f"Cached parse:          {cached_elapsed:.3f} s")
+    print(f"Legacy per-line scan:  {legacy_elapsed:.3f} s ({BENCHMARK_LINES / legacy_elapsed:,.0f} lines/s)")
+    print(f"Error scan (combined): {error_scan_elapsed:.3f} s ({len(text) / 1024 ** 2:.1f} MiB)")
+    print(f"Error scan (legacy):   {legacy_error_elapsed:.3f} s")
+    for num_nodes, num_shuffles, num_tables in SAMPLE_PROFILES:
+        legacy_tokens, compact_tokens, _ = prompt_token_counts(num_nodes, num_shuffles, num_tables)
+        print(f"Prompt metrics ({num_nodes} nodes, {num_tables} tables): {legacy_tokens:,} → {compact_tokens:,} tokens "
+              f"({1 - compact_tokens / legacy_tokens:.0%} fewer)")
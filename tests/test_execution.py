@@ -0,0 +1,174 @@
+"""Tests for query executors, execute-and-measure verification and result equivalence."""
+
+import pytest
+
+from src.config import ExecutionConfig
+from src.execution import (
+    QueryFixtureNotFoundError,
+    ReplayQueryExecutor,
+    SparkQueryExecutor,
+    create_query_executor,
+)
+from src.optimization.equivalence import (
+    apply_table_sample,
+    check_result_equivalence,
+    format_equivalence_result,
+)
+from src.optimization.verification import (
+    CACHE_DISABLING_SETTINGS,
+    format_execution_verification,
+    limit_query,
+    verify_by_execution,
+)
+
+ORIGINAL_SQL = "SELECT * FROM sales s JOIN items i ON s.item_id = i.id"
+OPTIMIZED_SQL = "SELECT /*+ BROADCAST(i) */ * FROM sales s JOIN items i ON s.item_id = i.id"
+
+
+def _runs(*durations, bytes_read=1024 ** 3):
+    return [{"duration_ms": d, "bytes_read": bytes_read, "row_count": 10} for d in durations]
+
+
+class TestQueryExecutors:
+    """Tests for the query executor implementations."""
+
+    def test_replay_cycles_recorded_runs(self):
+        """Test that repeated runs cycle through the recorded runs."""
+        executor = ReplayQueryExecutor(fixtures={ORIGINAL_SQL: _runs(100, 300)})
+
+        durations = [executor.run(ORIGINAL_SQL + ";").duration_ms for _ in range(3)]
+
+        assert durations == [100, 300, 100]
+        with pytest.raises(QueryFixtureNotFoundError):
+            executor.run("SELECT 1")
+
+    def test_factory(self):
+        """Test executor creation from configuration."""
+        assert isinstance(create_query_executor(ExecutionConfig(executor="replay")), ReplayQueryExecutor)
+        assert isinstance(create_query_executor(ExecutionConfig(), spark=object()), SparkQueryExecutor)
+        with pytest.raises(ValueError):
+            create_query_executor(ExecutionConfig(executor="spark"))
+
+
+class TestExecutionVerification:
+    """Tests for measuring original vs. optimized queries."""
+
+    def test_medians_and_speedup(self):
+        """Test that medians resist an outlier run and the speedup is recorded with the estimate."""
+        executor = ReplayQueryExecutor(fixtures={
+            ORIGINAL_SQL: _runs(1000, 1100, 5000),
+            OPTIMIZED_SQL: _runs(400, 500, 450, bytes_read=256 * 1024 ** 2),
+        })
+
+        result = verify_by_execution(executor, ORIGINAL_SQL, OPTIMIZED_SQL, repeats=3, row_limit=0, estimated_cost_ratio=0.6)
+
+        assert result.is_successful
+        assert result.original.median_duration_ms == 1100
+        assert result.optimized.median_duration_ms == 450
+        assert result.measured_speedup == pytest.approx(1100 / 450)
+        assert result.optimized.median_bytes_read == 256 * 1024 ** 2
+        # Runs are interleaved and alternate which query goes first
+        assert executor.executed[:4] == [ORIGINAL_SQL, OPTIMIZED_SQL, OPTIMIZED_SQL, ORIGINAL_SQL]
+
+        report = format_execution_verification(result)
+        assert "2.44x" in report
+        assert "cost ratio 0.600" in report
+
+    def test_row_limit_and_failure(self):
+        """Test that LIMIT wrapping is applied and a failing run is reported."""
+        limited = limit_query(ORIGINAL_SQL + ";", 1000)
+        executor = ReplayQueryExecutor(fixtures={limited: _runs(100)})
+
+        result = verify_by_execution(executor, ORIGINAL_SQL, OPTIMIZED_SQL, repeats=1, row_limit=1000)
+
+        assert limited.endswith("LIMIT 1000")
+        assert not result.is_successful
+        assert "No recorded run" in result.error_message
+        assert "failed" in format_execution_verification(result)
+
+
+    def test_cache_settings_restored(self):
+        """Test that caches are disabled during the runs and the previous settings come back, also on failure."""
+        class RecordingExecutor(ReplayQueryExecutor):
+            def run(self, sql):
+                self.settings_during_runs = dict(self.settings)
+                return super().run(sql)
+
+        executor = RecordingExecutor(fixtures={ORIGINAL_SQL: _runs(100), OPTIMIZED_SQL: _runs(50)})
+        executor.configure({"use_cached_result": "true"})
+
+        assert verify_by_execution(executor, ORIGINAL_SQL, OPTIMIZED_SQL, repeats=1, row_limit=0).is_successful
+        assert executor.settings_during_runs == CACHE_DISABLING_SETTINGS
+        assert executor.settings == {"use_cached_result": "true"}
+
+        failing = ReplayQueryExecutor()
+        assert not verify_by_execution(failing, ORIGINAL_SQL, OPTIMIZED_SQL, repeats=1, row_limit=0).is_successful
+        assert failing.settings == {}
+
+
+class TestResultEquivalence:
+    """Tests for comparing the results of original vs. optimized queries."""
+
+    def test_order_insensitive_match(self):
+        """Test that the same rows in a different order are equivalent."""
+        executor = ReplayQueryExecutor(results={
+            ORIGINAL_SQL: [[1, "a"], [2, "b"], [2, "b"]],
+            OPTIMIZED_SQL: [[2, "b"], [1, "a"], [2, "b"]],
+        })
+
+        result = check_result_equivalence(executor, ORIGINAL_SQL, OPTIMIZED_SQL, sample_percent=0)
+
+        assert result.is_equivalent
+        assert result.status == "equivalent"
+        assert result.original.row_count == 3
+        assert "Results match" in format_equivalence_result(result)
+
+    def test_mismatches_and_failure(self):
+        """Test row count and content mismatches, and a missing result."""
+        executor = ReplayQueryExecutor(results={
+            ORIGINAL_SQL: [[1, "a"], [2, "b"], [2, "b"]],
+            OPTIMIZED_SQL: [[1, "a"], [2, "b"]],
+            "SELECT 3": [[1, "a"], [2, "b"], [3, "c"]],
+        })
+
+        assert check_result_equivalence(executor, ORIGINAL_SQL, OPTIMIZED_SQL, 0).status == "row_count_mismatch"
+        assert check_result_equivalence(executor, ORIGINAL_SQL, "SELECT 3", 0).status == "checksum_mismatch"
+        failed = check_result_equivalence(executor, ORIGINAL_SQL, "SELECT 4", 0)
+        assert failed.status == "error"
+        assert not failed.is_equivalent
+        assert "失敗" in format_equivalence_result(failed, "ja")
+
+    def test_table_sample_rewrite(self):
+        """Test that only base tables get a repeatable TABLESAMPLE clause."""
+        sql = (
+            "WITH recent AS (SELECT * FROM main.sales.orders WHERE EXTRACT(YEAR FROM order_date) = 2024) "
+            "SELECT * FROM recent r JOIN items AS i ON r.item_id = i.id "
+            "JOIN (SELECT * FROM stores) s ON r.store_id = s.id"
+        )
+
+        sampled = apply_table_sample(sql, 5, seed=7)
+
+        clause = "TABLESAMPLE (5 PERCENT) REPEATABLE (7)"
+        assert f"FROM main.sales.orders {clause} WHERE" in sampled
+        assert f"JOIN items {clause} AS i" in sampled
+        assert f"FROM stores {clause})" in sampled
+        assert "FROM order_date)" in sampled
+        assert "FROM recent r" in sampled
+        assert apply_table_sample(sql, 0) == sql
+
+    def test_table_sample_comma_join(self):
+        """Test that every table of a comma-separated FROM list is sampled like an explicit JOIN."""
+        clause = "TABLESAMPLE (5 PERCENT) REPEATABLE (7)"
+        comma_join = apply_table_sample("SELECT * FROM a, b WHERE a.id = b.id", 5, seed=7)
+        explicit_join = apply_table_sample("SELECT * FROM a JOIN b ON a.id = b.id", 5, seed=7)
+
+        assert comma_join == f"SELECT * FROM a {clause}, b {clause} WHERE a.id = b.id"
+        assert explicit_join == f"SELECT * FROM a {clause} JOIN b {clause} ON a.id = b.id"
+
+        mixed = apply_table_sample(
+            "SELECT * FROM main.s.a AS x, (SELECT * FROM c) y, b z JOIN d ON z.id = d.id", 5, seed=7
+        )
+        assert mixed == (
+            f"SELECT * FROM main.s.a {clause} AS x, (SELECT * FROM c {clause}) y, b {clause} z "
+            f"JOIN d {clause} ON z.id = d.id"
+        )
@@ -0,0 +1,148 @@
+"""Tests for EXPLAIN backends."""
+
+import pytest
+
+import src.optimization.iterative as iterative
+from src.config import ExplainBackendConfig
+from src.explain import (
+    DatabricksSQLExplainBackend,
+    ExplainFixtureNotFoundError,
+    RecordingExplainBackend,
+    ReplayExplainBackend,
+    SparkExplainBackend,
+    create_explain_backend,
+)
+from src.models import ExtractedMetrics, QueryMetrics
+from src.optimization.explain_service import (
+    ExplainService,
+    create_execute_explain_fn,
+    explain_cost_metrics,
+)
+
+ORIGINAL_SQL = "SELECT * FROM sales s JOIN items i ON s.item_id = i.id"
+OPTIMIZED_SQL = "SELECT * FROM sales s JOIN items i ON s.item_id = i.id WHERE s.qty > 0"
+
+ORIGINAL_COST = """== Optimized Logical Plan ==
+Join Inner, (item_id#1 = id#2), Statistics(sizeInBytes=8.0 GiB, rowCount=1.0E+8)
+:- Relation main.db.sales[item_id#1,qty#3] parquet, Statistics(sizeInBytes=6.0 GiB, rowCount=1.0E+8)
++- Relation main.db.items[id#2] parquet, Statistics(sizeInBytes=2.0 GiB, rowCount=1000)
+
+== Physical Plan ==
+PhotonShuffledHashJoin [item_id#1], [id#2], Inner, BuildRight
+:- PhotonScan parquet main.db.sales[item_id#1,qty#3]
++- PhotonScan parquet main.db.items[id#2]
+
+== Photon Explanation ==
+The query is fully supported by Photon.
+"""
+
+OPTIMIZED_COST = ORIGINAL_COST.replace("8.0 GiB, rowCount=1.0E+8)", "2.0 GiB, rowCount=2.0E+7)", 1)
+
+
+class _Rows:
+    def __init__(self, text):
+        self._text = text
+
+    def toLocalIterator(self):
+        return iter([(self._text,)])
+
+
+class RecordingSpark:
+    """Spark session double returning canned text."""
+
+    def __init__(self):
+        self.statements = []
+
+    def sql(self, statement):
+        self.statements.append(statement)
+        return _Rows("== Optimized Logical Plan ==\nplan for " + statement)
+
+
+class TestExplainBackends:
+    """Tests for the EXPLAIN backend implementations."""
+
+    def test_replay_matches_normalized_statement(self):
+        """Test that replay ignores whitespace and trailing semicolons."""
+        backend = ReplayExplainBackend(fixtures={"EXPLAIN COST SELECT 1": "plan"})
+
+        assert backend.execute("EXPLAIN COST\n  SELECT 1;") == "plan"
+        with pytest.raises(ExplainFixtureNotFoundError):
+            backend.execute("EXPLAIN COST SELECT 2")
+        assert ReplayExplainBackend(default_output="none").execute("EXPLAIN SELECT 2") == "none"
+
+    def test_record_then_replay(self, tmp_path):
+        """Test that outputs recorded from Spark replay offline."""
+        spark = RecordingSpark()
+        recorder = RecordingExplainBackend(SparkExplainBackend(spark), str(tmp_path))
+        recorder.set_context("main", "db")
+        recorded = recorder.execute("EXPLAIN COST SELECT 1")
+
+        replay = ReplayExplainBackend(fixture_dir=str(tmp_path))
+
+        assert spark.statements[:2] == ["USE CATALOG main", "USE DATABASE db"]
+        assert len(list(tmp_path.glob("*.json"))) == 1
+        assert replay.execute("EXPLAIN COST SELECT 1") == recorded
+
+    def test_databricks_sql_payload_and_result(self):
+        """Test statement API payload context and result parsing."""
+        backend = DatabricksSQLExplainBackend(warehouse_id="wh1", workspace_url="https://x.cloud.databricks.com/")
+        backend.set_context("main", "db")
+        payload = backend._build_payload("EXPLAIN SELECT 1")
+
+        assert payload["warehouse_id"] == "wh1"
+        assert (payload["catalog"], payload["schema"]) == ("main", "db")
+        assert backend._get_workspace_url() == "x.cloud.databricks.com"
+
+        succeeded = {"status": {"state": "SUCCEEDED"}, "result": {"data_array": [["== Physical Plan ==\n..."]]}}
+        failed = {"status": {"state": "FAILED", "error": {"error_code": "PARSE_SYNTAX_ERROR", "message": "bad"}}}
+        assert DatabricksSQLExplainBackend.parse_result(succeeded).startswith("== Physical Plan ==")
+        with pytest.raises(RuntimeError, match="PARSE_SYNTAX_ERROR"):
+            DatabricksSQLExplainBackend.parse_result(failed)
+
+    def test_factory(self, tmp_path):
+        """Test backend creation from configuration."""
+        assert isinstance(create_explain_backend(ExplainBackendConfig(backend="replay")), ReplayExplainBackend)
+        recording = create_explain_backend(
+            ExplainBackendConfig(backend="spark", record_dir=str(tmp_path)),
+            spark=RecordingSpark(),
+        )
+        assert isinstance(recording, RecordingExplainBackend)
+        with pytest.raises(ValueError):
+            create_explain_backend(ExplainBackendConfig(backend="spark"))
+        with pytest.raises(ValueError):
+            create_explain_backend(ExplainBackendConfig(backend="databricks_sql"))
+
+
+class TestOfflinePipeline:
+    """Tests for running the optimization loop against recorded EXPLAIN outputs."""
+
+    def test_explain_cost_metrics(self):
+        """Test metric extraction from EXPLAIN COST output."""
+        metrics = explain_cost_metrics(ORIGINAL_COST)
+
+        assert metrics["total_size_bytes"] == 8 * 1024 ** 3
+        assert metrics["row_count"] == 100_000_000
+        assert metrics["scan_operations"] == 2
+        assert metrics["join_operations"] == 1
+
+    def test_iterative_optimization_with_replay(self, monkeypatch):
+        """Test the iterative loop end to end with a replay backend."""
+        backend = ReplayExplainBackend(fixtures={
+            f"EXPLAIN COST {OPTIMIZED_SQL}": OPTIMIZED_COST,
+        })
+        service = ExplainService(backend, catalog="main", database="db")
+        monkeypatch.setattr(iterative, "generate_optimized_query", lambda *args, **kwargs: OPTIMIZED_SQL)
+        monkeypatch.setattr(iterative, "generate_refined_query", lambda *args, **kwargs: OPTIMIZED_SQL)
+
+        metrics = ExtractedMetrics(query_metrics=QueryMetrics(
+            total_size_bytes=explain_cost_metrics(ORIGINAL_COST)["total_size_bytes"],
+            row_count=100_000_000,
+        ))
+        result = iterative.execute_iterative_optimization(
+            ORIGINAL_SQL, metrics, execute_explain_fn=create_execute_explain_fn(service)
+        )
+
+        assert result.optimization_success
+        assert result.best_optimized_query == OPTIMIZED_SQL
+        assert result.attempts[0].explain_result.startswith("== Physical Plan ==")
+        assert service.stats["roundtrips"] == 1
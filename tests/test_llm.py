@@ -0,0 +1,463 @@
+"""Tests for the LLM dispatch layer, call telemetry, retries and provider routing."""
+
+import json
+import random
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from src.config import LLMConfig, LLMRetryConfig, LLMStageConfig, MockLLMConfig, llm_config_from_dict
+from src.llm import (
+    APIError,
+    CircuitOpenError,
+    LLMClient,
+    LLMDispatcher,
+    MockLLMClient,
+    MockLLMServer,
+    RoutingLLMClient,
+    TokenLimitError,
+    create_llm_client,
+    format_llm_telemetry,
+    save_llm_telemetry,
+    summarize_llm_calls,
+)
+from src.llm.mock import append_recorded_response, load_recorded_responses
+from src.llm.retry import is_token_limit_message, parse_retry_after, retry_delay, shrink_prompt
+from src.models import LLMCallRecord
+
+
+class EchoClient(LLMClient):
+    """Client answering with the prompt, optionally failing every call."""
+
+    def __init__(self, fail: bool = False, usage: dict = None):
+        super().__init__(max_retries=1, timeout=1)
+        self.fail = fail
+        self.usage = usage
+        self.prompts = []
+
+    @property
+    def provider_name(self) -> str:
+        return "Echo"
+
+    def call(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        if self.fail:
+            raise RuntimeError("endpoint unavailable")
+        self._record_usage(self.usage)
+        return f"answer: {prompt}"
+
+
+class ScriptedClient(LLMClient):
+    """Client raising the scripted errors in order, then answering."""
+
+    def __init__(self, errors, max_retries: int = 3, retry: LLMRetryConfig = None):
+        super().__init__(max_retries=max_retries, timeout=1, retry=retry)
+        self.errors = list(errors)
+        self.prompts = []
+
+    @property
+    def provider_name(self) -> str:
+        return "Scripted"
+
+    def call(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class SlowClient(EchoClient):
+    """Client answering only once released (or after a timeout)."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def call(self, prompt: str) -> str:
+        self.release.wait(timeout=5)
+        return super().call(prompt)
+
+
+class TestLLMDispatcher:
+    """Tests for routing prompts through LLMDispatcher."""
+
+    def test_cache_and_records(self):
+        """Test that identical prompts hit the cache and every call is recorded."""
+        client = EchoClient()
+        dispatcher = LLMDispatcher(LLMConfig(provider="databricks"), clients={"databricks": client})
+
+        first = dispatcher.dispatch("optimize", stage="sql_optimization")
+        second = dispatcher.dispatch("optimize", stage="sql_optimization")
+        dispatcher.dispatch("translate", stage="translation_en")
+
+        assert first == second == "answer: optimize"
+        assert client.prompts == ["optimize", "translate"]
+        assert [(r.stage, r.cache_hit, r.success) for r in dispatcher.records] == [
+            ("sql_optimization", False, True),
+            ("sql_optimization", True, True),
+            ("translation_en", False, True),
+        ]
+
+    def test_cache_eviction_and_providers(self):
+        """Test LRU eviction and that providers do not share cached responses."""
+        primary, secondary = EchoClient(), EchoClient()
+        dispatcher = LLMDispatcher(
+            LLMConfig(provider="databricks", response_cache_size=1),
+            clients={"databricks": primary, "openai": secondary},
+        )
+
+        dispatcher.dispatch("a")
+        dispatcher.dispatch("a", provider="openai")
+        dispatcher.dispatch("b")
+        dispatcher.dispatch("a")
+
+        assert primary.prompts == ["a", "b", "a"]
+        assert secondary.prompts == ["a"]
+
+    def test_failure_is_recorded_and_raised(self):
+        """Test that a failing call is recorded and the error propagates uncached."""
+        client = EchoClient(fail=True)
+        dispatcher = LLMDispatcher(LLMConfig(), clients={"databricks": client})
+
+        with pytest.raises(RuntimeError):
+            dispatcher.dispatch("optimize", stage="sql_optimization")
+        with pytest.raises(RuntimeError):
+            dispatcher.dispatch("optimize", stage="sql_optimization")
+
+        assert len(client.prompts) == 2
+        assert not dispatcher.records[0].success
+        assert dispatcher.records[0].error_message == "endpoint unavailable"
+
+    def test_config_from_notebook_dict(self):
+        """Test building LLMConfig from the notebook LLM_CONFIG dictionary."""
+        config = llm_config_from_dict({
+            "provider": "openai",
+            "timeout_sec": 60,
+            "openai": {"model": "gpt-4o-mini", "max_tokens": 4000, "unknown": 1},
+            "databricks": {"endpoint_name": "my-endpoint"},
+        })
+
+        assert config.provider == "openai"
+        assert config.timeout_sec == 60
+        assert config.openai.model == "gpt-4o-mini"
+        assert config.openai.max_tokens == 4000
+        assert config.databricks.endpoint_name == "my-endpoint"
+        assert config.anthropic.model == LLMConfig().anthropic.model
+
+
+class TestLLMTelemetry:
+    """Tests for per-call token/cost records and the per-stage breakdown."""
+
+    def test_tokens_and_cost_recorded(self):
+        """Test that API-reported token usage is recorded and priced."""
+        client = EchoClient(usage={"input_tokens": 1000, "output_tokens": 500})
+        config = LLMConfig(prompt_price_per_1k_tokens=0.003, completion_price_per_1k_tokens=0.015)
+        dispatcher = LLMDispatcher(config, clients={"databricks": client})
+
+        dispatcher.dispatch("optimize", stage="sql_optimization")
+        dispatcher.dispatch("optimize", stage="sql_optimization")
+
+        first, cached = dispatcher.records
+        assert (first.prompt_tokens, first.completion_tokens) == (1000, 500)
+        assert first.cost_usd == pytest.approx(0.003 + 0.0075)
+        assert cached.cache_hit
+        assert cached.prompt_tokens == 0
+
+    def test_stage_breakdown(self, tmp_path):
+        """Test per-stage totals ordered by latency, and the JSON/markdown outputs."""
+        records = [
+            LLMCallRecord(stage="translation_en", latency_ms=1000, prompt_tokens=100, success=True),
+            LLMCallRecord(stage="report_refinement", latency_ms=6000, retries=2, success=True),
+            LLMCallRecord(stage="report_refinement", latency_ms=3000, success=False),
+        ]
+
+        summary = summarize_llm_calls(records)
+
+        assert list(summary["stages"]) == ["report_refinement", "translation_en"]
+        refinement = summary["stages"]["report_refinement"]
+        assert (refinement["calls"], refinement["retries"], refinement["failures"]) == (2, 2, 1)
+        assert refinement["latency_share"] == pytest.approx(0.9)
+        assert summary["total"]["prompt_tokens"] == 100
+
+        markdown = format_llm_telemetry(records)
+        assert "| report_refinement | 2 | 0 | 2 | 1 | 9.0 s | 90% |" in markdown
+
+        path = tmp_path / "telemetry.json"
+        save_llm_telemetry(records, str(path))
+        saved = json.loads(path.read_text(encoding="utf-8"))
+        assert len(saved["calls"]) == 3
+        assert saved["summary"]["total"]["calls"] == 3
+
+
+class TestRetryPolicy:
+    """Tests for the shared LLM retry policy."""
+
+    @pytest.fixture
+    def sleeps(self, monkeypatch):
+        delays = []
+        monkeypatch.setattr("src.llm.base.time.sleep", delays.append)
+        return delays
+
+    def test_retry_after_and_non_retryable(self, sleeps):
+        """Test that Retry-After is honored and client errors are not retried."""
+        client = ScriptedClient([APIError("rate limited", status_code=429, retry_after=7)])
+        assert client.call_with_retry("p") == "ok"
+        assert sleeps == [7]
+        assert client.last_call_stats()[2] == 1
+
+        client = ScriptedClient([APIError("unauthorized", status_code=401)])
+        with pytest.raises(APIError):
+            client.call_with_retry("p")
+        assert len(client.prompts) == 1
+
+    def test_token_limit_shrinks_prompt(self, sleeps):
+        """Test that a token-limit error retries at once with a shorter prompt."""
+        client = ScriptedClient([TokenLimitError("too long", status_code=400)])
+        prompt = "HEAD " + "x" * 1000 + " TAIL"
+
+        assert client.call_with_retry(prompt, lambda p: shrink_prompt(p, 0.7)) == "ok"
+
+        retried = client.prompts[1]
+        assert sleeps == []
+        assert len(retried) < len(prompt)
+        assert retried.startswith("HEAD") and retried.endswith("TAIL")
+        assert "omitted" in retried
+
+    def test_sql_prompts_never_shrink(self, sleeps):
+        """Test that only shrinkable stages retry with a shorter prompt and SQL stages fail whole."""
+        prompt = "HEAD " + "x" * 1000 + " TAIL"
+        client = ScriptedClient([TokenLimitError("too long", status_code=400)] * 2)
+        dispatcher = LLMDispatcher(LLMConfig(), clients={"databricks": client})
+
+        with pytest.raises(TokenLimitError):
+            dispatcher.dispatch(prompt, stage="sql_optimization")
+        assert client.prompts == [prompt]
+
+        assert dispatcher.dispatch(prompt, stage="report_refinement") == "ok"
+        assert len(client.prompts[-1]) < len(prompt)
+
+    def test_max_tokens_parameter_error_is_not_token_limit(self):
+        """Test that an oversized max_tokens request parameter is not treated as a long prompt."""
+        assert is_token_limit_message("This model's maximum context length is 8192 tokens")
+        assert not is_token_limit_message("max_tokens: 200000 > 64000, which is the maximum allowed number of output tokens")
+        assert not is_token_limit_message("Requested maximum tokens exceed the max_tokens limit of the endpoint")
+
+    def test_circuit_breaker_fails_fast(self, sleeps):
+        """Test that consecutive endpoint failures open the circuit for later calls."""
+        retry = LLMRetryConfig(circuit_failure_threshold=3, circuit_reset_sec=60)
+        client = ScriptedClient([TimeoutError("timed out")] * 3, max_retries=3, retry=retry)
+
+        with pytest.raises(TimeoutError):
+            client.call_with_retry("p")
+        with pytest.raises(CircuitOpenError):
+            client.call_with_retry("p")
+        assert len(client.prompts) == 3
+
+    def test_backoff_helpers(self):
+        """Test jittered backoff bounds, Retry-After parsing and prompt shrinking."""
+        config = LLMRetryConfig(backoff_base_sec=1.0, backoff_max_sec=5.0)
+        delays = [retry_delay(10, TimeoutError(), config, random.Random(seed)) for seed in range(20)]
+
+        assert all(0 <= d <= 5.0 for d in delays)
+        assert len(set(delays)) > 1
+        assert retry_delay(1, APIError("", 503, retry_after=500), config) == config.retry_after_max_sec
+        assert parse_retry_after("12") == 12
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+        assert parse_retry_after("soon") is None
+        assert shrink_prompt("short", 1.0) == "short"
+
+
+class TestProviderRouting:
+    """Tests for multi-provider fallback and hedged requests."""
+
+    def test_failover_in_order(self):
+        """Test that a failing primary falls back to the next provider."""
+        primary, fallback = EchoClient(fail=True), EchoClient(usage={"prompt_tokens": 12})
+        config = LLMConfig(provider="databricks", fallback_providers=["openai"])
+        router = create_llm_client(config, clients={"databricks": primary, "openai": fallback})
+
+        assert isinstance(router, RoutingLLMClient)
+        assert router.call_with_retry("p") == "answer: p"
+        assert router.last_call_stats()[0] == 12
+        assert primary.prompts == ["p"]
+
+    def test_hedged_request_takes_first_answer(self):
+        """Test that a slow primary is hedged and the faster provider's answer wins."""
+        slow, fast = SlowClient(), EchoClient()
+        router = RoutingLLMClient([slow, fast], hedge_after_sec=0.05)
+
+        try:
+            assert router.call_with_retry("p") == "answer: p"
+            assert fast.prompts == ["p"]
+            assert slow.prompts == []
+        finally:
+            slow.release.set()
+
+    def test_hedge_delay_follows_primary_p95(self):
+        """Test that the hedge delay switches to the observed p95 latency."""
+        router = RoutingLLMClient([EchoClient(), EchoClient()], hedge_after_sec=10, hedge_min_samples=20)
+        assert router.hedge_delay() == 10
+
+        router._primary_latencies.extend([1.0] * 19 + [3.0])
+        assert 1.0 <= router.hedge_delay() <= 3.0
+        assert RoutingLLMClient([EchoClient(), EchoClient()]).hedge_delay() is None
+
+
+class TestModelTiering:
+    """Tests for per-stage model and max_tokens selection."""
+
+    def test_stage_config_resolution(self):
+        """Test light-stage and explicit per-stage overrides."""
+        config = LLMConfig(
+            provider="databricks",
+            fallback_providers=["openai"],
+            light_model="fast-endpoint",
+            light_max_tokens=4000,
+            stages={"sql_optimization": LLMStageConfig(max_tokens=64000)},
+        )
+
+        translation = config.for_stage("translation_en")
+        assert translation.databricks.endpoint_name == "fast-endpoint"
+        assert translation.databricks.max_tokens == 4000
+        # The model applies to the primary provider only, max_tokens to all
+        assert translation.openai.model == config.openai.model
+        assert translation.openai.max_tokens == 4000
+
+        rewrite = config.for_stage("sql_optimization")
+        assert rewrite.databricks.endpoint_name == config.databricks.endpoint_name
+        assert rewrite.databricks.max_tokens == 64000
+        assert config.for_stage("sql_refinement") is config
+
+    def test_dispatcher_uses_stage_clients(self):
+        """Test that stages get their own client and separate cache entries."""
+        config = LLMConfig(provider="databricks", light_model="fast-endpoint")
+        dispatcher = LLMDispatcher(config)
+
+        light = dispatcher.client(stage="translation_en")
+        heavy = dispatcher.client(stage="sql_optimization")
+
+        assert light.config.endpoint_name == "fast-endpoint"
+        assert heavy.config.endpoint_name == config.databricks.endpoint_name
+        assert dispatcher.client(stage="report_refinement") is light
+
+    def test_per_call_token_cap(self):
+        """Test that a max_tokens cap gets its own client and cache entry."""
+        config = LLMConfig(provider="mock", mock=MockLLMConfig(max_tokens=16000))
+        config.databricks.thinking_enabled = True
+        capped = config.with_max_tokens(2048)
+
+        assert capped.mock.max_tokens == 2048
+        assert capped.databricks.max_tokens == 2048 + config.databricks.thinking_budget_tokens
+        assert config.with_max_tokens(64000).mock.max_tokens == 16000
+
+        dispatcher = LLMDispatcher(config)
+        assert dispatcher.client(max_tokens=2048).config.max_tokens == 2048
+        dispatcher.dispatch("prompt", stage="report_refinement", max_tokens=2048)
+        dispatcher.dispatch("prompt", stage="report_refinement")
+        assert [record.cache_hit for record in dispatcher.records] == [False, False]
+
+    def test_config_from_notebook_dict(self):
+        """Test reading tiering settings from LLM_CONFIG."""
+        config = llm_config_from_dict({
+            "provider": "databricks",
+            "light_model": "fast-endpoint",
+            "stages": {"explain_summary": {"model": "summary-endpoint", "max_tokens": 2000}},
+        })
+
+        assert config.light_model == "fast-endpoint"
+        assert config.for_stage("explain_summary").databricks.endpoint_name == "summary-endpoint"
+
+
+class TestMockLLM:
+    """Tests for the local mock provider and its HTTP server."""
+
+    def _templates(self, tmp_path):
+        path = tmp_path / "responses.json"
+        path.write_text(json.dumps({
+            "responses": [
+                {"match": r"optimi[sz]e the query on (?P<table>\w+)", "response": "```sql\nSELECT * FROM $table\n```"},
+                {"match": "translate", "response": "translated"},
+            ],
+            "default": "fallback answer",
+        }))
+        return str(path)
+
+    def test_recorded_then_templated_then_default(self, tmp_path):
+        """Test the response precedence of the in-process client."""
+        recorded = str(tmp_path / "recorded.jsonl")
+        append_recorded_response(recorded, "translate this", "recorded answer", stage="translation_en")
+        client = MockLLMClient(MockLLMConfig(responses_path=self._templates(tmp_path), recorded_path=recorded))
+
+        assert client.call("translate this") == "recorded answer"
+        assert client.call("please translate that") == "translated"
+        assert client.call("Optimize the query on sales") == "```sql\nSELECT * FROM sales\n```"
+        assert client.call("something else") == "fallback answer"
+        assert client.last_call_stats()[:2] == (len("something else") // 4, len("fallback answer") // 4)
+
+    def test_seeded_latency_is_reproducible(self):
+        """Test that latency jitter is deterministic for a seed."""
+        config = MockLLMConfig(latency_ms=10, latency_jitter_ms=50, seed=7)
+        client_a, client_b = MockLLMClient(config), MockLLMClient(config)
+        latencies = [client_a.responder.latency_sec() for _ in range(5)]
+
+        assert latencies == [client_b.responder.latency_sec() for _ in range(5)]
+        assert all(0.010 <= latency <= 0.060 for latency in latencies)
+
+    def test_dispatcher_records_and_replays(self, tmp_path):
+        """Test that live responses recorded by the dispatcher replay offline."""
+        recorded = str(tmp_path / "recorded.jsonl")
+        live = LLMDispatcher(LLMConfig(provider="databricks", record_path=recorded), clients={"databricks": EchoClient()})
+        live.dispatch("what is slow?", stage="sql_optimization")
+
+        assert load_recorded_responses(recorded)
+        replay = LLMDispatcher(llm_config_from_dict({"provider": "mock", "mock": {"recorded_path": recorded}}))
+        assert replay.dispatch("what is slow?", stage="sql_optimization") == "answer: what is slow?"
+        assert replay.records[-1].provider == "mock"
+        assert replay.records[-1].model == "mock"
+
+    def test_concurrent_calls_overlap(self):
+        """Test that simulated latency overlaps up to the concurrency limit."""
+        dispatcher = LLMDispatcher(llm_config_from_dict({
+            "provider": "mock",
+            "max_concurrency": 4,
+            "response_cache_size": 0,
+            "mock": {"latency_ms": 200},
+        }))
+        start = time.perf_counter()
+        threads = [threading.Thread(target=dispatcher.dispatch, args=(f"prompt {i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(dispatcher.records) == 4
+        assert time.perf_counter() - start < 0.6
+
+    def test_http_server_speaks_chat_schema(self, tmp_path):
+        """Test the Databricks and OpenAI routes of the mock server."""
+        config = MockLLMConfig(responses_path=self._templates(tmp_path))
+        with MockLLMServer(config) as server:
+            for path in ("/serving-endpoints/my-endpoint/invocations", "/v1/chat/completions"):
+                request = urllib.request.Request(
+                    server.url + path,
+                    data=json.dumps({"messages": [{"role": "user", "content": "translate me"}]}).encode(),
+                    headers={"Content-Type": "application/json"},
+                )
+                with urllib.request.urlopen(request, timeout=5) as response:
+                    result = json.loads(response.read())
+
+                assert result["choices"][0]["message"]["content"] == "translated"
+                assert result["usage"]["prompt_tokens"] == len("translate me") // 4
+
+    def test_databricks_client_against_server(self):
+        """Test the real Databricks client end to end against the mock server."""
+        pytest.importorskip("requests")
+        config = llm_config_from_dict({"provider": "databricks", "databricks": {"token": "t"}})
+        with MockLLMServer(MockLLMConfig(default_response="mocked")) as server:
+            config.databricks.workspace_url = server.url
+            dispatcher = LLMDispatcher(config)
+
+            assert dispatcher.dispatch("hello") == "mocked"
+            assert dispatcher.records[-1].completion_tokens == 1
@@ -0,0 +1,385 @@
+"""Tests for optimization modules."""
+
+import re
+import threading
+import time
+
+import pytest
+
+from src.optimization.explain_service import (
+    ExplainService,
+    derive_plain_explain,
+    get_explain_service,
+    normalize_sql,
+    reset_explain_service,
+)
+from src.optimization.cost_model import (
+    DEFAULT_COST_WEIGHTS,
+    calibrate_cost_model,
+    fit_cost_model,
+    get_cost_weights,
+    make_cost_observation,
+    predict_cost_ratio,
+)
+from src.optimization.plan_diff import diff_explain_plans, format_plan_diff
+from src.utils.sql import extract_sql_candidates
+
+PHOTON_COST_OUTPUT = """== Optimized Logical Plan ==
+Project [id#1], Statistics(sizeInBytes=1.0 MiB, rowCount=100)
++- Relation main.db.t[id#1] parquet, Statistics(sizeInBytes=1.0 MiB, rowCount=100)
+
+== Physical Plan ==
+AdaptiveSparkPlan isFinalPlan=false
++- PhotonResultStage
+   +- PhotonScan parquet main.db.t[id#1]
+
+== Photon Explanation ==
+The query is fully supported by Photon.
+"""
+
+JOIN_COST_OUTPUT = """== Optimized Logical Plan ==
+Join Inner, (item_id#1 = id#2), Statistics(sizeInBytes=8.0 GiB, rowCount=1.0E+8)
+:- Filter (qty#3 > 0), Statistics(sizeInBytes=6.0 GiB, rowCount=1.0E+8)
+:  +- Relation main.db.sales[item_id#1,qty#3] parquet, Statistics(sizeInBytes=6.0 GiB, rowCount=1.0E+8)
++- Relation main.db.items[id#2] parquet, Statistics(sizeInBytes=2.0 MiB, rowCount=1000)
+
+== Physical Plan ==
+PhotonBroadcastHashJoin [item_id#1], [id#2], Inner, BuildRight
+:- PhotonFilter (qty#3 > 0)
+:  +- PhotonScan parquet main.db.sales[item_id#1,qty#3]
++- PhotonShuffleExchangeSink SinglePartition
+   +- PhotonScan parquet main.db.items[id#2]
+"""
+
+# Join sides swapped, expression ids renumbered, join output grown and no longer broadcast
+REGRESSED_JOIN_COST_OUTPUT = """== Optimized Logical Plan ==
+Join Inner, (id#12 = item_id#10), Statistics(sizeInBytes=20.0 GiB, rowCount=3.0E+8)
+:- Relation main.db.items[id#12] parquet, Statistics(sizeInBytes=2.0 MiB, rowCount=1000)
++- Filter (qty#11 > 0), Statistics(sizeInBytes=6.0 GiB, rowCount=1.0E+8)
+   +- Relation main.db.sales[item_id#10,qty#11] parquet, Statistics(sizeInBytes=6.0 GiB, rowCount=1.0E+8)
+
+== Physical Plan ==
+SortMergeJoin [id#12], [item_id#10], Inner
+:- PhotonScan parquet main.db.items[id#12]
++- PhotonFilter (qty#11 > 0)
+   +- PhotonScan parquet main.db.sales[item_id#10,qty#11]
+"""
+
+SPARK_COST_OUTPUT = """== Optimized Logical Plan ==
+Project [id#1], Statistics(sizeInBytes=1.0 MiB, rowCount=100)
+
+== Physical Plan ==
+*(1) Project [id#1]
++- FileScan parquet main.db.t[id#1]
+"""
+
+
+class _Rows:
+    def __init__(self, text):
+        self._text = text
+
+    def toLocalIterator(self):
+        return iter([(self._text,)] if self._text else [])
+
+
+class FakeSpark:
+    """Spark session double recording the statements it receives."""
+
+    def __init__(self, cost_output=PHOTON_COST_OUTPUT, plain_output="== Physical Plan ==\nplain\n"):
+        self.cost_output = cost_output
+        self.plain_output = plain_output
+        self.statements = []
+
+    def sql(self, statement):
+        self.statements.append(statement)
+        if statement.startswith("EXPLAIN COST"):
+            return _Rows(self.cost_output)
+        if statement.startswith("EXPLAIN"):
+            return _Rows(self.plain_output)
+        return _Rows("")
+
+
+class SlowFakeSpark(FakeSpark):
+    """Spark double that fails on a marker and tracks concurrent EXPLAINs."""
+
+    def __init__(self, delay=0.05):
+        super().__init__()
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def sql(self, statement):
+        if "broken" in statement:
+            raise RuntimeError("[PARSE_SYNTAX_ERROR] Syntax error")
+        if statement.startswith("EXPLAIN"):
+            with self._lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(self.delay)
+            with self._lock:
+                self.active -= 1
+        return super().sql(statement)
+
+
+@pytest.fixture(autouse=True)
+def reset_service():
+    reset_explain_service()
+    yield
+    reset_explain_service()
+
+
+class TestExplainService:
+    """Tests for the cached EXPLAIN service."""
+
+    def test_normalize_sql(self):
+        """Test that EXPLAIN prefixes, whitespace and the trailing ';' are ignored."""
+        assert normalize_sql("EXPLAIN COST  SELECT *\n  FROM t;") == "SELECT * FROM t"
+        assert normalize_sql("explain explain select 1") == "select 1"
+
+    def test_query_sent_verbatim(self):
+        """Test that line comments and literal whitespace reach the backend unchanged."""
+        spark = FakeSpark()
+        service = ExplainService(spark, catalog="main", database="db")
+        sql = "SELECT a -- first col\nFROM t WHERE x = 'a  b'"
+
+        service.explain(f"EXPLAIN COST {sql};")
+
+        assert [s for s in spark.statements if s.startswith("EXPLAIN")] == [f"EXPLAIN COST {sql}"]
+
+    def test_plain_plan_derived_from_cost_output(self):
+        """Test that one EXPLAIN COST roundtrip serves both outputs on Photon plans."""
+        spark = FakeSpark()
+        service = ExplainService(spark, catalog="main", database="db")
+
+        result = service.explain("SELECT id FROM t")
+
+        assert result.plain_plan_derived
+        assert result.explain_output.startswith("== Physical Plan ==")
+        assert "Optimized Logical Plan" not in result.explain_output
+        assert "fully supported by Photon" in result.photon_explanation
+        assert [s for s in spark.statements if s.startswith("EXPLAIN")] == ["EXPLAIN COST SELECT id FROM t"]
+
+    def test_falls_back_to_plain_explain(self):
+        """Test that plain EXPLAIN runs when the cost output has no Photon explanation."""
+        assert derive_plain_explain(SPARK_COST_OUTPUT) is None
+
+        spark = FakeSpark(cost_output=SPARK_COST_OUTPUT)
+        result = ExplainService(spark, catalog="main", database="db").explain("SELECT id FROM t")
+
+        assert not result.plain_plan_derived
+        assert result.explain_output.strip() == "== Physical Plan ==\nplain"
+        assert "EXPLAIN SELECT id FROM t" in spark.statements
+
+    def test_cache_hit_for_equivalent_sql(self):
+        """Test that formatting variants of one query share a cache entry."""
+        spark = FakeSpark()
+        service = ExplainService(spark, catalog="main", database="db")
+
+        first = service.explain("SELECT id FROM t")
+        second = service.explain("EXPLAIN  SELECT id\nFROM t;", query_type="optimized")
+
+        assert not first.from_cache
+        assert second.from_cache
+        assert second.query_type == "optimized"
+        assert second.explain_cost_output == first.explain_cost_output
+        assert service.stats["hits"] == 1
+        assert service.stats["misses"] == 1
+
+    def test_use_statements_only_on_context_change(self):
+        """Test that USE CATALOG/DATABASE is issued once per context."""
+        spark = FakeSpark()
+        service = ExplainService(spark, catalog="main", database="db")
+
+        service.explain("SELECT 1")
+        service.explain("SELECT 2")
+        service.explain("SELECT 1", catalog="other")
+
+        use_statements = [s for s in spark.statements if s.startswith("USE")]
+        assert use_statements == [
+            "USE CATALOG main",
+            "USE DATABASE db",
+            "USE CATALOG other",
+            "USE DATABASE db",
+        ]
+        assert service.stats["misses"] == 3
+
+    def test_shared_service(self):
+        """Test that the shared service is reused and requires a session first."""
+        with pytest.raises(ValueError):
+            get_explain_service()
+
+        spark = FakeSpark()
+        service = get_explain_service(spark, catalog="main", database="db")
+        service.explain("SELECT 1")
+
+        assert get_explain_service() is service
+        assert get_explain_service(spark).explain("SELECT 1").from_cache
+        assert not get_explain_service(FakeSpark()).explain("SELECT 1").from_cache
+
+    def test_explain_many_runs_concurrently(self):
+        """Test that candidates are planned in parallel, in input order, once each."""
+        spark = SlowFakeSpark()
+        service = ExplainService(spark, catalog="main", database="db")
+        queries = ["SELECT 1", "SELECT 2", "SELECT 3", "SELECT  1;"]
+
+        results = service.explain_many(queries, max_workers=4)
+
+        assert len(results) == 4
+        assert all(r.is_successful for r in results)
+        assert spark.max_active > 1
+        assert service.stats["misses"] == 3
+        assert [s for s in spark.statements if s.startswith("USE")] == ["USE CATALOG main", "USE DATABASE db"]
+        assert service.explain("SELECT 2").from_cache
+
+    def test_explain_many_captures_failures(self):
+        """Test that one failing candidate does not fail the batch."""
+        service = ExplainService(SlowFakeSpark(delay=0), catalog="main", database="db")
+
+        ok, failed = service.explain_many(["SELECT 1", "SELECT broken"])
+
+        assert ok.is_successful
+        assert not failed.is_successful
+        assert "PARSE_SYNTAX_ERROR" in failed.error_message
+
+
+class CommentAwareFakeSpark(FakeSpark):
+    """Spark double that, like the SQL parser, ignores ``--`` comments up to the end of the line."""
+
+    def sql(self, statement):
+        query = re.sub(r"^EXPLAIN(\s+COST)?\s", "", statement)
+        if query != statement and not re.sub(r"--[^\n]*", "", query).strip():
+            raise RuntimeError("[PARSE_SYNTAX_ERROR] Syntax error at end of input")
+        return super().sql(statement)
+
+
+class TestCandidateExplain:
+    """Tests for multi-candidate responses planned through the EXPLAIN service."""
+
+    def test_multi_line_candidates_are_planned(self):
+        """Test that marked multi-line candidates reach the backend as real queries."""
+        response = (
+            "### 候補 1\n\n```sql\n-- Candidate 1\nSELECT a -- first col\nFROM t\nWHERE x = 'a  b'\n```\n\n"
+            "### 候補 2\n\n```sql\n-- Candidate 2\nSELECT a\nFROM t\nWHERE x = 'a  b';\n```\n"
+        )
+        spark = CommentAwareFakeSpark()
+        service = ExplainService(spark, catalog="main", database="db")
+
+        candidates = extract_sql_candidates(response)
+        results = service.explain_many(candidates, max_workers=2)
+
+        assert candidates[0] == "SELECT a -- first col\nFROM t\nWHERE x = 'a  b'"
+        assert len(candidates) == 2
+        assert all(r.is_successful for r in results)
+        explained = {s for s in spark.statements if s.startswith("EXPLAIN COST")}
+        assert explained == {
+            "EXPLAIN COST SELECT a -- first col\nFROM t\nWHERE x = 'a  b'",
+            "EXPLAIN COST SELECT a\nFROM t\nWHERE x = 'a  b'",
+        }
+
+
+class TestPlanDiff:
+    """Tests for the operator-level plan diff."""
+
+    def test_aligns_operators_across_rewrites(self):
+        """Test that operators align by tables below them despite reordering."""
+        result = diff_explain_plans(JOIN_COST_OUTPUT, REGRESSED_JOIN_COST_OUTPUT)
+
+        by_key = {d.key: d for d in result.operators}
+        assert set(by_key) == {
+            "Join[main.db.items, main.db.sales]",
+            "Filter[main.db.sales]",
+            "Relation[main.db.sales]",
+            "Relation[main.db.items]",
+        }
+        assert all(d.status == "matched" for d in result.operators)
+        assert by_key["Filter[main.db.sales]"].size_ratio == 1.0
+
+    def test_reports_regressed_join(self):
+        """Test that the grown join and its lost broadcast are reported first."""
+        result = diff_explain_plans(JOIN_COST_OUTPUT, REGRESSED_JOIN_COST_OUTPUT)
+
+        worst = result.regressions[0]
+        assert len(result.regressions) == 1
+        assert worst.key == "Join[main.db.items, main.db.sales]"
+        assert worst.size_ratio == 2.5
+        assert worst.row_ratio == 3.0
+        assert (worst.original_join_strategy, worst.optimized_join_strategy) == (
+            "broadcast_hash_join",
+            "sort_merge_join",
+        )
+        assert result.join_strategy_changes == [worst]
+        assert "broadcast_hash_join → sort_merge_join" in format_plan_diff(result)
+
+    def test_added_join_and_identical_plans(self):
+        """Test that an extra join is a regression and identical plans have none."""
+        duplicated = JOIN_COST_OUTPUT.replace(
+            "+- Relation main.db.items[id#2] parquet",
+            "+- Join Inner, (id#2 = id#5), Statistics(sizeInBytes=2.0 MiB, rowCount=1000)\n"
+            "   :- Relation main.db.items[id#2] parquet, Statistics(sizeInBytes=2.0 MiB, rowCount=1000)\n"
+            "   +- Relation main.db.items_dup[id#5] parquet",
+        )
+
+        result = diff_explain_plans(JOIN_COST_OUTPUT, duplicated)
+        added = [d for d in result.regressions if d.status == "added"]
+
+        assert [d.key for d in added] == ["Join[main.db.items, main.db.items_dup]"]
+        assert not [d for d in result.operators if d.status == "removed"]
+        assert not diff_explain_plans(JOIN_COST_OUTPUT, JOIN_COST_OUTPUT).regressions
+
+
+def _observation(size_gb, joins, duration_ms, group="main.db.sales"):
+    metrics = {"total_size_bytes": size_gb * 1024 ** 3, "total_rows": 1000, "join_operations": joins, "scan_operations": 2}
+    observation = make_cost_observation(f"SELECT {size_gb}, {joins}", metrics, duration_ms)
+    observation.group = group
+    return observation
+
+
+class TestCostModel:
+    """Tests for cost ratio weight calibration."""
+
+    def test_identical_plans_predict_one(self):
+        """Test that default weights sum to 1 and identical metrics give ratio 1.0."""
+        metrics = {"total_size_bytes": 10, "total_rows": 5, "join_operations": 1}
+
+        assert sum(DEFAULT_COST_WEIGHTS.values()) == pytest.approx(1.0)
+        assert predict_cost_ratio(metrics, metrics) == pytest.approx(1.0)
+
+    def test_fit_learns_dominant_component(self):
+        """Test that durations driven by data size shift weight to data processing."""
+        # Duration tracks data size only; join count varies independently
+        observations = [
+            _observation(size, joins, size * 1000)
+            for size, joins in [(1, 4), (2, 1), (4, 3), (8, 2), (3, 1), (6, 4)]
+        ]
+
+        model = fit_cost_model(observations, min_pairs=10, ridge=0.01)
+
+        assert model.calibrated
+        assert model.pair_count == 30
+        assert model.weights["data_processing"] > DEFAULT_COST_WEIGHTS["data_processing"]
+        assert model.weights["operation_complexity"] < DEFAULT_COST_WEIGHTS["operation_complexity"]
+        assert sum(model.weights.values()) == pytest.approx(1.0)
+        assert model.mean_abs_log_error < model.baseline_mean_abs_log_error
+
+    def test_too_few_pairs_keeps_defaults(self):
+        """Test that pairs only form within a group and small histories keep defaults."""
+        observations = [_observation(1, 1, 100, group="a"), _observation(2, 1, 200, group="b")]
+
+        model = fit_cost_model(observations, min_pairs=1)
+
+        assert model.pair_count == 0
+        assert not model.calibrated
+        assert model.weights == DEFAULT_COST_WEIGHTS
+
+    def test_calibrate_persists_model(self, tmp_path):
+        """Test that calibration appends history and persisted weights are picked up."""
+        history = str(tmp_path / "history.jsonl")
+        model_path = str(tmp_path / "model.json")
+        for size, joins in [(1, 4), (2, 1), (4, 3), (8, 2)]:
+            model = calibrate_cost_model(_observation(size, joins, size * 1000), history, model_path)
+
+        assert model.observation_count == 4
+        assert model.calibrated
+        assert get_cost_weights(model_path) == pytest.approx(model.weights)
+        assert get_cost_weights(str(tmp_path / "missing.json")) == DEFAULT_COST_WEIGHTS
@@ -5,6 +5,20 @@ import pytest
 from src.profiler.loader import detect_data_format, extract_query_text, extract_query_id
 from src.profiler.metrics import extract_metrics, calculate_filter_rate
 from src.profiler.bottleneck import analyze_bottlenecks
+from src.profiler.shuffle_sizing import solve_shuffle_partition_sizing
+from src.profiler.cluster_sizing import (
+    estimate_serial_fraction,
+    estimate_peak_stage_concurrency,
+    recommend_cluster_size,
+)
+from src.profiler.photon_fallback import analyze_photon_fallback, parse_photon_blockers
+from src.profiler.scan_io import analyze_scan_io
+from src.profiler.join_strategy import (
+    describe_join_rewrite,
+    evaluate_join_strategies,
+    format_join_strategy_report,
+)
+from src.profiler.compact import encode_overall_metrics, encode_shuffle_analysis, encode_table
 from src.models import OptimizationPriority
 
 
@@ -143,3 +157,390 @@ class TestBottleneckAnalysis:
 
         high_priority = [i for i in indicators if i.severity == OptimizationPriority.HIGH]
         assert len(high_priority) == 0
+
+
+class TestShufflePartitionSizing:
+    """Tests for the shuffle partition sizing solver."""
+
+    @staticmethod
+    def _shuffle_node(node_id, data_bytes, partitions, aqe_partitions=0, spill_bytes=0):
+        metrics = [
+            {"label": "Sink - Num bytes written", "value": data_bytes},
+            {"label": "Sink - Number of partitions", "value": partitions},
+        ]
+        if aqe_partitions:
+            metrics.append({"label": "AQEShuffleRead - Number of partitions", "value": aqe_partitions})
+        if spill_bytes:
+            metrics.append({
+                "label": "Sink - Num bytes spilled to disk due to memory pressure",
+                "value": spill_bytes,
+            })
+        return {"id": node_id, "name": "Shuffle Exchange", "tag": "SHUFFLE", "metrics": metrics}
+
+    def test_oversized_partitions_are_split(self):
+        """Test that partitions above the band get more partitions and less spill."""
+        gb = 1024 ** 3
+        node = self._shuffle_node("10", 100 * gb, 200, spill_bytes=20 * gb)
+
+        result = solve_shuffle_partition_sizing([node], task_slots=64)
+        plan = result.plans[0]
+
+        assert plan.recommended_partitions == 832  # 800 rounded up to 13 waves of 64
+        assert 64 * 1024 ** 2 <= plan.advisory_partition_size_bytes <= 256 * 1024 ** 2
+        assert plan.task_count_change == 632
+        assert plan.predicted_spill_bytes < plan.current_spill_bytes
+        assert "SET spark.sql.shuffle.partitions = 832;" in result.set_statements
+
+    def test_spilling_partitions_within_band_are_not_merged(self):
+        """Test that a spilling shuffle inside the band is split, not coalesced."""
+        mb = 1024 ** 2
+        node = self._shuffle_node("12", 7000 * mb, 100, spill_bytes=1075 * mb)
+
+        plan = solve_shuffle_partition_sizing([node]).plans[0]
+
+        assert plan.within_target is False
+        assert plan.recommended_partitions >= 100
+        assert plan.advisory_partition_size_bytes <= 60 * mb
+        assert plan.predicted_spill_bytes < plan.current_spill_bytes
+
+    def test_aqe_coalesced_partitions_within_band(self):
+        """Test that shuffles already coalesced into the band are left alone."""
+        mb = 1024 ** 2
+        node = self._shuffle_node("11", 1280 * mb, 200, aqe_partitions=10)
+
+        result = solve_shuffle_partition_sizing([node])
+
+        assert result.plans[0].within_target is True
+        assert result.plans[0].task_count_change == 0
+        assert result.set_statements == []
+
+    def test_non_shuffle_nodes_ignored(self, sample_sql_profiler_data):
+        """Test that only shuffle nodes produce plans."""
+        nodes = sample_sql_profiler_data["graphs"][0]["nodes"]
+        result = solve_shuffle_partition_sizing(nodes)
+        assert result.plans == []
+
+
+class TestClusterSizing:
+    """Tests for the Amdahl-style cluster sizing model."""
+
+    @staticmethod
+    def _metrics(task_total_ms, execution_ms, stages):
+        return {
+            "overall_metrics": {
+                "task_total_time_ms": task_total_ms,
+                "execution_time_ms": execution_ms,
+            },
+            "stage_metrics": stages,
+            "node_metrics": [],
+        }
+
+    def test_serial_fraction_fit(self):
+        """Test that the fitted serial fraction reproduces the observation."""
+        # 10% serial on 32 slots: wall = 1000 * (0.1 + 0.9 / 32)
+        wall = 1000 * (0.1 + 0.9 / 32)
+        assert abs(estimate_serial_fraction(1000, wall, 32) - 0.1) < 1e-9
+        assert estimate_serial_fraction(1000, 1000, 1) == 0.0
+
+    def test_peak_stage_concurrency(self):
+        """Test overlapping stage task counts are summed."""
+        stages = [
+            {"start_time_ms": 0, "end_time_ms": 100, "num_tasks": 50},
+            {"start_time_ms": 50, "end_time_ms": 150, "num_tasks": 30},
+            {"start_time_ms": 150, "end_time_ms": 200, "num_tasks": 70},
+        ]
+        assert estimate_peak_stage_concurrency(stages) == 80
+
+    def test_recommendation_respects_parallelism_cap(self):
+        """Test that sizes beyond the available task parallelism are not recommended."""
+        stages = [{"start_time_ms": 0, "end_time_ms": 1000, "num_tasks": 64}]
+        metrics = self._metrics(640_000, 21_000, stages)
+
+        result = recommend_cluster_size(metrics, task_slots=32)
+
+        assert result.max_task_parallelism == 64
+        assert result.recommended is not None
+        assert result.recommended.task_slots <= 128
+        latencies = {o.size: o.predicted_latency_ms for o in result.options}
+        assert latencies["4X-Large"] == latencies["Large"]
+
+    def test_missing_metrics(self):
+        """Test that missing task time yields no options."""
+        result = recommend_cluster_size({"overall_metrics": {}})
+        assert result.options == []
+        assert result.recommended is None
+
+
+PHOTON_EXPLANATION = """== Photon Explanation ==
+Photon does not fully support the query because:
+	Unsupported expression(s): regexp_extract(name#12, ^a, 0)
+reference node:
+	Project [regexp_extract(name#12, ^a, 0) AS k#20]
+	Unsupported node: SortMergeJoin [id#1], [id#2], Inner
+"""
+
+
+class TestPhotonFallback:
+    """Tests for the Photon fallback analyzer."""
+
+    def test_parse_blockers(self):
+        """Test blocker feature and operator extraction."""
+        blockers = parse_photon_blockers(PHOTON_EXPLANATION)
+
+        assert [b.feature for b in blockers] == ["regexp_extract", "SortMergeJoin"]
+        assert [b.operator for b in blockers] == ["Project", "SortMergeJoin"]
+
+    def test_fully_supported(self):
+        """Test fully supported explanation has no blockers."""
+        text = "== Photon Explanation ==\nThe query is fully supported by Photon."
+        assert parse_photon_blockers(text) == []
+
+    def test_operators_ranked_and_attributed(self):
+        """Test non-Photon operators are ranked and joined with blockers."""
+        nodes = [
+            {"id": "1", "name": "Project", "tag": "PROJECT", "keyMetrics": {"durationMs": 1000}},
+            {"id": "2", "name": "Sort Merge Join", "tag": "SORT_MERGE_JOIN", "keyMetrics": {"durationMs": 4000}},
+            {"id": "3", "name": "Photon Scan", "tag": "PHOTON_SCAN_EXEC", "keyMetrics": {"durationMs": 9000}},
+            {
+                "id": "4", "name": "Filter", "tag": "FILTER", "keyMetrics": {"durationMs": 500},
+                "metadata": [{"key": "IS_PHOTON", "value": "true"}],
+            },
+        ]
+
+        result = analyze_photon_fallback(nodes, PHOTON_EXPLANATION, photon_speedup=2.0)
+
+        assert [o.node_id for o in result.operators] == ["2", "1"]
+        assert result.operators[0].blockers[0].feature == "SortMergeJoin"
+        assert result.operators[1].blockers[0].feature == "regexp_extract"
+        assert result.non_photon_time_ms == 5000
+        assert result.total_recoverable_time_ms == 2500
+        assert result.unattributed_blockers == []
+
+    def test_blocker_matches_operator_name_exactly(self):
+        """Test that a Sort blocker is not attributed to a Sort Merge Join node."""
+        explanation = (
+            "Photon does not fully support the query because:\n"
+            "Unsupported expression(s): regexp_extract(name#1, x, 1)\n"
+            "reference node:\n"
+            "Sort [name#1 ASC NULLS FIRST]\n"
+        )
+        nodes = [
+            {"id": "1", "name": "Sort Merge Join", "tag": "SORT_MERGE_JOIN", "keyMetrics": {"durationMs": 4000}},
+            {"id": "2", "name": "Sort", "tag": "SORT_EXEC", "keyMetrics": {"durationMs": 1000}},
+        ]
+
+        result = analyze_photon_fallback(nodes, explanation)
+
+        blockers = {o.node_id: [b.operator for b in o.blockers] for o in result.operators}
+        assert blockers == {"1": [], "2": ["Sort"]}
+
+
+class TestScanIO:
+    """Tests for the scan I/O efficiency analyzer."""
+
+    @staticmethod
+    def _scan_node(node_id, table, bytes_read, files_read, duration_ms, rows_read=0, rows_out=0, pruned=0):
+        return {
+            "id": node_id,
+            "name": f"Scan {table}",
+            "tag": "PHOTON_SCAN_EXEC",
+            "keyMetrics": {"durationMs": duration_ms, "rowsNum": rows_out},
+            "metadata": [{"key": "SCAN_IDENTIFIER", "value": table}],
+            "metrics": [
+                {"label": "Size of files read", "value": bytes_read},
+                {"label": "Size of files pruned", "value": pruned},
+                {"label": "Files read", "value": files_read},
+                {"label": "Rows read", "value": rows_read},
+            ],
+        }
+
+    def test_scans_aggregated_per_table(self):
+        """Test that multiple scans of a table are summed."""
+        mb = 1024 ** 2
+        nodes = [
+            self._scan_node("1", "main.sales", 512 * mb, 100, 4000, pruned=512 * mb),
+            self._scan_node("2", "main.sales", 512 * mb, 100, 4000),
+            self._scan_node("3", "main.stores", 64 * mb, 1, 100),
+        ]
+
+        result = analyze_scan_io(nodes)
+
+        sales = result.tables[0]
+        assert sales.table_name == "main.sales"
+        assert sales.scan_node_ids == ["1", "2"]
+        assert sales.files_read == 200
+        assert abs(sales.pruning_ratio - 1 / 3) < 1e-9
+        assert result.total_files_read == 201
+
+    def test_small_files_predict_optimize_gain(self):
+        """Test that compacting small files predicts a faster scan."""
+        mb = 1024 ** 2
+        nodes = [self._scan_node("1", "events", 1024 * mb, 1000, 10_000)]
+
+        stats = analyze_scan_io(nodes).tables[0]
+
+        assert stats.avg_file_size_bytes < 32 * mb
+        assert stats.small_file_overhead_ms == 5000
+        assert stats.predicted_optimize_time_ms == 5000 + 4 * 5.0
+
+    def test_clustering_uses_selectivity(self):
+        """Test that selective scans predict a clustering gain."""
+        gb = 1024 ** 3
+        nodes = [self._scan_node("1", "events", 10 * gb, 40, 20_000, rows_read=1_000_000, rows_out=10_000)]
+
+        stats = analyze_scan_io(nodes, {"read_bytes": 10 * gb, "read_cache_bytes": 5 * gb}).tables[0]
+
+        assert stats.cache_bytes == 5 * gb
+        assert stats.cache_throughput_mb_s > stats.remote_throughput_mb_s
+        assert stats.predicted_clustered_time_ms < stats.predicted_optimize_time_ms
+
+
+class TestJoinStrategy:
+    """Tests for the join strategy evaluator."""
+
+    MB = 1024 ** 2
+
+    def _profile(self, dim_bytes, fact_shuffle, dim_shuffle, join_name="SortMergeJoin", join_rows=1000):
+        nodes = [
+            {"id": "1", "name": "Scan main.fact", "keyMetrics": {"rowsNum": 1_000_000},
+             "metrics": [{"key": "Size of files read", "value": 10 * 1024 * self.MB}]},
+            {"id": "2", "name": "Scan main.dim", "keyMetrics": {"rowsNum": 1000},
+             "metrics": [{"key": "Size of files read", "value": dim_bytes}]},
+            {"id": "3", "name": "Shuffle Exchange", "tag": "SHUFFLE", "keyMetrics": {"rowsNum": 1_000_000},
+             "metrics": [{"key": "Sink - Num bytes written", "value": fact_shuffle}]},
+            {"id": "4", "name": "Shuffle Exchange", "tag": "SHUFFLE", "keyMetrics": {"rowsNum": 1000},
+             "metrics": [{"key": "Sink - Num bytes written", "value": dim_shuffle}]},
+            {"id": "5", "name": join_name, "keyMetrics": {"rowsNum": join_rows}},
+        ]
+        edges = [
+            {"source": "1", "target": "3"},
+            {"source": "2", "target": "4"},
+            {"source": "3", "target": "5"},
+            {"source": "4", "target": "5"},
+        ]
+        return {"graphs": [{"nodes": nodes, "edges": edges}]}
+
+    def test_small_build_side_broadcast_recommended(self):
+        """Test a shuffled join with a small side gets a BROADCAST rewrite."""
+        profile = self._profile(2 * self.MB, 4096 * self.MB, 2 * self.MB, join_rows=900_000)
+
+        result = evaluate_join_strategies(profile)
+
+        join = result.joins[0]
+        assert join.strategy == "sort_merge_join"
+        assert join.build.tables == ["main.dim"]
+        assert join.build.estimated_bytes == 6 * self.MB
+        assert join.broadcastable
+        rewrite = result.rewrites[0]
+        assert rewrite.kind == "broadcast"
+        assert rewrite.hint == "/*+ BROADCAST(dim) */"
+        assert rewrite.expected_shuffle_bytes_saved == 4096 * self.MB
+        assert describe_join_rewrite(rewrite) == "Broadcast the build side (6.0 MB uncompressed) of SortMergeJoin"
+
+    def test_report_language_follows_argument(self):
+        """Test that rewrite lines use the report's language, not the global config."""
+        profile = self._profile(2 * self.MB, 4096 * self.MB, 2 * self.MB, join_rows=900_000)
+
+        result = evaluate_join_strategies(profile)
+
+        ja_report = format_join_strategy_report(result, "ja")
+        assert "SortMergeJoin のビルド側 (非圧縮 6.0 MB) をブロードキャスト" in ja_report
+        assert "Broadcast the build side" not in ja_report
+        assert "Broadcast the build side" in format_join_strategy_report(result, "en")
+
+    def test_build_side_above_threshold_suggests_raise(self):
+        """Test a build side just above the threshold suggests raising it."""
+        profile = self._profile(40 * self.MB, 4096 * self.MB, 20 * self.MB, join_rows=900_000)
+
+        result = evaluate_join_strategies(profile, threshold_bytes=30 * self.MB)
+
+        assert not result.joins[0].broadcastable
+        assert result.rewrites[0].kind == "raise_threshold"
+        assert "autoBroadcastJoinThreshold" in result.rewrites[0].hint
+
+    def test_broadcast_join_has_no_broadcast_rewrite(self):
+        """Test that joins already broadcast are not rewritten."""
+        profile = self._profile(2 * self.MB, 4096 * self.MB, 2 * self.MB,
+                                join_name="BroadcastHashJoin", join_rows=900_000)
+
+        result = evaluate_join_strategies(profile)
+
+        assert result.joins[0].strategy == "broadcast_hash_join"
+        assert result.rewrites == []
+
+    def test_selective_join_reorder_ranked(self):
+        """Test a selective join above another join is suggested to run first."""
+        profile = self._profile(2 * self.MB, 4096 * self.MB, 2 * self.MB,
+                                join_name="BroadcastHashJoin", join_rows=1_000_000)
+        graph = profile["graphs"][0]
+        graph["nodes"] += [
+            {"id": "6", "name": "Scan main.region", "keyMetrics": {"rowsNum": 10},
+             "metrics": [{"key": "Size of files read", "value": self.MB}]},
+            {"id": "7", "name": "Shuffle Exchange", "tag": "SHUFFLE", "keyMetrics": {"rowsNum": 1_000_000},
+             "metrics": [{"key": "Sink - Num bytes written", "value": 2048 * self.MB}]},
+            {"id": "8", "name": "BroadcastHashJoin", "keyMetrics": {"rowsNum": 100_000}},
+        ]
+        graph["edges"] += [
+            {"source": "5", "target": "7"},
+            {"source": "7", "target": "8"},
+            {"source": "6", "target": "8"},
+        ]
+
+        result = evaluate_join_strategies(profile)
+
+        reorder = [r for r in result.rewrites if r.kind == "reorder"]
+        assert len(reorder) == 1
+        assert reorder[0].node_id == "8"
+        assert reorder[0].expected_shuffle_bytes_saved == int(2048 * self.MB * 0.9)
+
+
+class TestCompactEncoding:
+    """Tests for the compact tabular encoding of prompt metrics."""
+
+    COLUMNS = [
+        ("node", "name", "text"),
+        ("time", "duration_ms", "ms"),
+        ("read", ("io.bytes", "read_bytes"), "bytes"),
+        ("share", "share", "ratio"),
+    ]
+
+    def test_table_with_others_row(self):
+        """Test top-k rows, abbreviated units and the aggregate of the remaining rows."""
+        rows = [
+            {"name": "Scan | sales", "duration_ms": 12_345, "io": {"bytes": 3 * 1024 ** 3}, "share": 0.5},
+            {"name": "Join", "duration_ms": 850, "read_bytes": 1536, "share": 0.25},
+            {"name": "Sort", "duration_ms": 150_000, "read_bytes": 1024 ** 2},
+        ]
+
+        assert encode_table(self.COLUMNS, rows, top_k=1).split("\n") == [
+            "node|time|read|share",
+            "Scan / sales|12.3s|3GB|50%",
+            "others(2)|2.5min|1MB|-",
+        ]
+        assert encode_table(self.COLUMNS, rows).split("\n")[-1] == "Sort|2.5min|1MB|-"
+        assert encode_table(self.COLUMNS, []) == ""
+
+    def test_overall_metrics_line(self):
+        """Test query-level metrics become one name=value line without missing values."""
+        line = encode_overall_metrics({
+            "overall_metrics": {"total_time_ms": 95_000, "read_bytes": 5 * 1024 ** 3, "rows_read_count": 2_500_000,
+                                "photon_utilization_ratio": 0.853},
+            "bottleneck_indicators": {"cache_hit_ratio": 0.1},
+        })
+
+        assert line == "total=1.6min read=5GB rows_read=2.5M cache_hit=10% photon=85.3%"
+
+    def test_shuffle_nodes_over_threshold_first(self):
+        """Test shuffle nodes above the memory-per-partition threshold lead the table."""
+        text = encode_shuffle_analysis({
+            "overall_assessment": {"total_shuffle_nodes": 2, "needs_optimization": True},
+            "shuffle_nodes": [
+                {"node_id": "1", "memory_per_partition_mb": 100, "partition_count": 200},
+                {"node_id": "2", "memory_per_partition_mb": 900, "partition_count": 4000},
+            ],
+        }, top_k=1)
+
+        assert text.split("\n")[0] == "shuffles=2 needs_optimization=Y target_mem/part=512MB"
+        assert text.split("\n")[2].startswith("2|-|4K|-|900MB|")
+        assert text.split("\n")[3].startswith("others(1)|-|200|")
+
@@ -0,0 +1,192 @@
+"""Tests for report modules."""
+
+import threading
+
+from src.config import LLMConfig
+from src.llm import LLMClient, LLMDispatcher
+from src.report import (
+    count_translatable_characters,
+    refine_report_sections,
+    section_token_budget,
+    split_markdown_segments,
+    split_report_sections,
+    translate_free_text,
+)
+
+OPTIMIZATION_RESULT = """## 🚀 処理速度重視の最適化されたSQL
+
+**適用した手法**: ブロードキャストJOIN
+
+```sql
+SELECT s.id, c.name -- 顧客名を結合
+FROM sales s JOIN customers c ON s.cid = c.id
+```
+
+| Metric | Value |
+|--------|-------|
+| 実行時間 | 10.0s |
+"""
+
+
+class TestFreeTextTranslation:
+    """Tests for translating only the prose of a markdown document."""
+
+    def test_code_blocks_and_target_language_lines_are_kept(self):
+        """Test that SQL blocks and lines already in English are never sent."""
+        segments = split_markdown_segments(OPTIMIZATION_RESULT, "en")
+
+        assert "\n".join(segment for segment, _ in segments) == OPTIMIZATION_RESULT
+        translated = [segment for segment, needed in segments if needed]
+        assert translated == [
+            "## 🚀 処理速度重視の最適化されたSQL\n\n**適用した手法**: ブロードキャストJOIN\n",
+            "| 実行時間 | 10.0s |\n",
+        ]
+        assert count_translatable_characters(OPTIMIZATION_RESULT, "en") < len(OPTIMIZATION_RESULT) / 2
+
+    def test_segments_are_translated_in_one_call_and_put_back(self):
+        """Test the numbered round trip through a single LLM call."""
+        prompts = []
+
+        def translate(prompt: str) -> str:
+            prompts.append(prompt)
+            return (
+                "<<<1>>>\n## 🚀 Optimized SQL for Speed\n\n**Applied technique**: Broadcast JOIN\n"
+                "<<<2>>>\n| Execution time | 10.0s |"
+            )
+
+        result = translate_free_text(OPTIMIZATION_RESULT, "en", translate)
+
+        assert len(prompts) == 1
+        assert "SELECT s.id" not in prompts[0]
+        assert result.startswith("## 🚀 Optimized SQL for Speed\n\n**Applied technique**: Broadcast JOIN\n\n```sql")
+        assert "SELECT s.id, c.name -- 顧客名を結合" in result
+        assert result.endswith("| Execution time | 10.0s |\n")
+
+    def test_missing_segments_keep_original_text(self):
+        """Test that an error response leaves the document unchanged."""
+        result = translate_free_text(OPTIMIZATION_RESULT, "en", lambda prompt: "❌ API call error")
+
+        assert result == OPTIMIZATION_RESULT
+
+    def test_nothing_to_translate_makes_no_call(self):
+        """Test that a document already in the target language is returned as-is."""
+        def fail(prompt: str) -> str:
+            raise AssertionError("LLM must not be called")
+
+        english = "## Summary\n\n```sql\nSELECT 1\n```\n"
+        assert translate_free_text(english, "en", fail) == english
+        assert translate_free_text("## 概要\n\n| 指標 | 値 |", "ja", fail) == "## 概要\n\n| 指標 | 値 |"
+
+
+REPORT = """# 📊 SQL最適化レポート
+
+## 🎯 1. パフォーマンス概要
+
+実行時間: 10.0s
+
+```sql
+-- ## not a heading
+SELECT 1
+```
+
+### 詳細
+
+Photon利用率: 45%
+
+## 🚀 2. SQL最適化分析結果
+
+候補1を採用
+"""
+
+
+class SectionClient(LLMClient):
+    """Client refining sections to upper case, failing for prompts containing a marker."""
+
+    def __init__(self, fail_on: str):
+        super().__init__(max_retries=1, timeout=1)
+        self.fail_on = fail_on
+
+    @property
+    def provider_name(self) -> str:
+        return "Section"
+
+    def call(self, prompt: str) -> str:
+        if self.fail_on in prompt:
+            raise RuntimeError("Databricks API call error: endpoint unavailable")
+        return prompt.upper()
+
+
+class TestSectionRefinement:
+    """Tests for refining a report section by section."""
+
+    def test_split_at_headings_outside_code(self):
+        """Test sections start at # and ## headings only, and join back to the report."""
+        sections = split_report_sections(REPORT)
+
+        assert "".join(sections) == REPORT
+        assert [section.split("\n", 1)[0] for section in sections] == [
+            "# 📊 SQL最適化レポート",
+            "## 🎯 1. パフォーマンス概要",
+            "## 🚀 2. SQL最適化分析結果",
+        ]
+
+    def test_oversized_sections_split_between_paragraphs(self):
+        """Test long sections are cut at blank lines and never inside a code block."""
+        text = "## Big\n\n" + "".join(f"Paragraph {n} " + "x" * 50 + "\n\n" for n in range(10))
+        text += "```sql\n" + "SELECT 1\n" * 30 + "```\n"
+        sections = split_report_sections(text, max_chars=200)
+
+        assert "".join(sections) == text
+        assert len(sections) > 3
+        assert sum("```" in section for section in sections) == 1
+
+    def test_sections_refined_concurrently_and_reassembled_in_order(self):
+        """Test every section is refined in parallel, with budgets, and put back in place."""
+        budgets = []
+        threads = set()
+        barrier = threading.Barrier(3, timeout=5)
+
+        def refine(section: str, budget: int) -> str:
+            budgets.append(budget)
+            threads.add(threading.get_ident())
+            barrier.wait()
+            return section.strip().upper() + "\n"
+
+        refined = refine_report_sections(REPORT, refine, max_workers=3)
+
+        assert len(threads) == 3
+        assert all(budget >= 1024 and budget % 1024 == 0 for budget in budgets)
+        assert refined == "".join(section.upper() for section in split_report_sections(REPORT))
+
+    def test_failed_sections_keep_original_text(self):
+        """Test sections whose refinement fails or raises stay as they were."""
+        def refine(section: str, budget: int):
+            if "概要" in section:
+                raise RuntimeError("endpoint down")
+            if "SQL最適化分析結果" in section:
+                return None
+            return "# Report\n"
+
+        refined = refine_report_sections(REPORT, refine)
+
+        assert refined == "# Report\n\n" + REPORT.split("\n\n", 1)[1]
+
+    def test_failed_llm_call_keeps_section(self):
+        """Test that a section whose LLM call fails keeps its text instead of the error message."""
+        dispatcher = LLMDispatcher(LLMConfig(), clients={"databricks": SectionClient(fail_on="概要")})
+
+        def refine(section: str, budget: int) -> str:
+            return dispatcher.dispatch(section, stage="report_refinement", max_tokens=budget)
+
+        refined = refine_report_sections(REPORT, refine)
+
+        sections = split_report_sections(REPORT)
+        assert "API call error" not in refined
+        assert sections[1] in refined
+        assert sections[2].strip().upper() in refined
+        assert sum(not record.success for record in dispatcher.records) == 1
+
+    def test_budget_counts_japanese_characters(self):
+        """Test Japanese text gets a larger budget than the same length of ASCII."""
+        assert section_token_budget("a" * 4000) == 2048
+        assert section_token_budget("あ" * 4000) == 6144
@@ -4,12 +4,25 @@ import pytest
 
 from src.utils.sql import (
     extract_sql_from_llm_response,
+    extract_sql_candidates,
     clean_sql,
     extract_select_from_ctas,
     extract_table_names,
     extract_broadcast_hints,
     validate_sql_syntax,
 )
+from src.utils.explain_plan import (
+    compile_pattern_matcher,
+    find_plan_nodes,
+    parse_explain_plan,
+    scan_text_chunks,
+)
+from src.utils.structured_output import (
+    build_structured_output_instruction,
+    format_optimization_response,
+    parse_optimization_response,
+)
+from src.utils.formatting import format_bytes
 
 
 class TestSqlExtraction:
@@ -203,3 +216,170 @@ class TestSqlValidation:
         sql = "UPDATE users SET name = 'test'"
         is_valid, error = validate_sql_syntax(sql)
         assert is_valid is False
+
+
+EXPLAIN_COST_OUTPUT = """== Optimized Logical Plan ==
+Project [id#1, amount#3], Statistics(sizeInBytes=1.5 GiB, rowCount=1.00E+7)
++- Join Inner, (id#1 = cid#2), Statistics(sizeInBytes=2.0 GiB)
+   :- Filter isnotnull(id#1), Statistics(sizeInBytes=8.0 MiB, rowCount=1000)
+   :  +- Relation main.sales.customers[id#1] parquet, Statistics(sizeInBytes=8.0 MiB, rowCount=1000)
+   +- Relation main.sales.orders[cid#2,amount#3] parquet,
+      Statistics(sizeInBytes=1.9 GiB, rowCount=1.00E+7)
+
+== Physical Plan ==
+AdaptiveSparkPlan isFinalPlan=false
++- PhotonResultStage
+   +- PhotonBroadcastHashJoin [id#1], [cid#2], Inner, BuildLeft
+      :- PhotonShuffleExchangeSource
+      :  +- PhotonScan parquet main.sales.customers[id#1]
+      +- *(1) PhotonScan parquet main.sales.orders[cid#2,amount#3]
+"""
+
+
+class TestExplainPlanParser:
+    """Tests for the EXPLAIN plan tree parser."""
+
+    def test_sections_and_nesting(self):
+        """Test that tree markers build the operator hierarchy per section."""
+        plan = parse_explain_plan(EXPLAIN_COST_OUTPUT)
+
+        assert list(plan.sections) == ["Optimized Logical Plan", "Physical Plan"]
+        root = plan.sections["Optimized Logical Plan"][0]
+        join = root.children[0]
+        assert join.operator == "Join"
+        assert [c.operator for c in join.children] == ["Filter", "Relation"]
+        assert join.children[0].children[0].operator == "Relation"
+
+        physical_join = plan.sections["Physical Plan"][0].children[0].children[0]
+        assert physical_join.operator == "PhotonBroadcastHashJoin"
+        assert [c.operator for c in physical_join.children] == ["PhotonShuffleExchangeSource", "PhotonScan"]
+
+    def test_statistics_decoded(self):
+        """Test sizes/rows are decoded, including continuation lines."""
+        plan = parse_explain_plan(EXPLAIN_COST_OUTPUT)
+
+        relations = list(find_plan_nodes(plan, "relation"))
+        assert relations[0].size_bytes == 8 * 1024 ** 2
+        assert relations[0].row_count == 1000
+        assert relations[1].size_bytes == int(1.9 * 1024 ** 3)
+        assert relations[1].row_count == 1e7
+        assert plan.sections["Optimized Logical Plan"][0].children[0].row_count is None
+
+    def test_section_filter(self):
+        """Test filtering nodes by section."""
+        plan = parse_explain_plan(EXPLAIN_COST_OUTPUT)
+
+        scans = list(find_plan_nodes(plan, "scan", section_contains="physical"))
+        assert len(scans) == 2
+        assert not list(find_plan_nodes(plan, "scan", section_contains="logical"))
+
+    def test_parse_cached_by_content(self):
+        """Test that identical content returns the cached parse."""
+        assert parse_explain_plan(EXPLAIN_COST_OUTPUT) is parse_explain_plan(str(EXPLAIN_COST_OUTPUT))
+        assert parse_explain_plan(EXPLAIN_COST_OUTPUT) is not parse_explain_plan(EXPLAIN_COST_OUTPUT + "\n")
+
+
+class TestExplainTextScan:
+    """Tests for streaming error-pattern scans of EXPLAIN text."""
+
+    MATCHER = compile_pattern_matcher(["AnalysisException", "UNRESOLVED_COLUMN", "UNRESOLVED_COLUMN.WITH_SUGGESTION"])
+
+    def test_case_insensitive_longest_match(self):
+        """Test one combined pattern, case-insensitive, preferring longer literals."""
+        assert scan_text_chunks("failed: analysisException", self.MATCHER) == "analysisexception"
+        assert scan_text_chunks("x [UNRESOLVED_COLUMN.WITH_SUGGESTION] y", self.MATCHER) == "unresolved_column.with_suggestion"
+        assert scan_text_chunks(EXPLAIN_COST_OUTPUT, self.MATCHER) is None
+
+    def test_match_across_chunk_boundary(self):
+        """Test a match split between chunks is found and all text reaches the sink."""
+        text = "a" * 95 + "AnalysisException" + "b" * 100
+        written = []
+
+        found = scan_text_chunks(text, self.MATCHER, sink=written.append, chunk_size=100, overlap=64)
+
+        assert found == "analysisexception"
+        assert "".join(written) == text
+
+    def test_iterable_of_rows(self):
+        """Test scanning an iterator of rows without a sink stops at the first match."""
+        consumed = []
+
+        def rows():
+            for row in ["== Physical Plan ==\n", "Error: AnalysisException\n", "never read\n"]:
+                consumed.append(row)
+                yield row
+
+        assert scan_text_chunks(rows(), self.MATCHER) == "analysisexception"
+        assert len(consumed) == 2
+
+
+class TestStructuredOutput:
+    """Tests for the structured JSON output mode of optimization prompts."""
+
+    RESPONSE = """```json
+{"sql": "SELECT /*+ BROADCAST(c) */ s.id\nFROM sales s JOIN customers c ON s.cid = c.id",
+ "rationale": "customers is small", "applied_hints": "BROADCAST", "expected_effects": ["No shuffle"]}
+```"""
+
+    def test_strict_parse(self):
+        """Test a fenced object with raw newlines and a string hint list is accepted."""
+        responses = parse_optimization_response(self.RESPONSE)
+
+        assert len(responses) == 1
+        assert responses[0].sql.startswith("SELECT /*+ BROADCAST(c) */ s.id\nFROM sales")
+        assert responses[0].applied_hints == ["BROADCAST"]
+        assert responses[0].expected_effects == ["No shuffle"]
+
+    def test_candidates_form(self):
+        """Test the multi-candidate form keeps response order."""
+        text = '{"candidates": [{"sql": "SELECT 1"}, {"sql": "SELECT 2", "rationale": "r"}]}'
+
+        assert [r.sql for r in parse_optimization_response(text)] == ["SELECT 1", "SELECT 2"]
+
+    @pytest.mark.parametrize("text", [
+        "Here is the query:\n```sql\nSELECT 1\n```",
+        '{"sql": "SELECT 1",',
+        '{"rationale": "no sql"}',
+        '{"candidates": [{"sql": "SELECT 1"}, {"sql": ""}]}',
+        '{"sql": "SELECT 1", "applied_hints": [1, 2]}',
+    ])
+    def test_non_schema_responses_are_rejected(self, text):
+        """Test anything that is not exactly the schema yields no result."""
+        assert parse_optimization_response(text) == []
+
+    def test_extract_sql_fast_path(self):
+        """Test SQL extraction reads the sql field of a structured response."""
+        sql = extract_sql_from_llm_response(self.RESPONSE)
+
+        assert sql == "SELECT s.id FROM sales s JOIN customers c ON s.cid = c.id;"
+
+    def test_rendered_markdown_round_trips(self):
+        """Test the rendered markdown keeps one SQL block per candidate for the heuristics."""
+        text = '{"candidates": [{"sql": "SELECT 1", "applied_hints": ["A"]}, {"sql": "SELECT 2"}]}'
+        markdown = format_optimization_response(parse_optimization_response(text), "en")
+
+        assert markdown.count("```sql") == 2
+        assert "### Candidate 2\n\n```sql\nSELECT 2\n```" in markdown
+        assert "-- Candidate" not in markdown
+        assert extract_sql_candidates(markdown) == ["SELECT 1", "SELECT 2"]
+        assert "**🎯 Optimizations Actually Applied**:\n- A" in markdown
+        assert "```sql" not in format_optimization_response(parse_optimization_response(text), "en", include_sql=False)
+
+    def test_instruction(self):
+        """Test the instruction asks for the candidates form only with several candidates."""
+        single = build_structured_output_instruction("ja", 1, "en")
+        multiple = build_structured_output_instruction("en", 3)
+
+        assert '"candidates"' not in single and "英語" in single
+        assert '{"candidates": [' in multiple and "Include 3 alternative rewrites" in multiple
+
+
+class TestFormatting:
+    """Tests for report formatting helpers."""
+
+    def test_format_bytes_units(self):
+        """Test that sizes pick the largest fitting unit."""
+        assert format_bytes(512) == "512 B"
+        assert format_bytes(1536) == "1.5 KB"
+        assert format_bytes(256 * 1024 ** 2) == "256.0 MB"
+        assert format_bytes(3 * 1024 ** 3) == "3.00 GB"